@@ -0,0 +1,414 @@
+"""
+Synthetic alarm storms and replay of recorded alarm events.
+
+Generates CloudWatch "Alarm State Change" EventBridge events, shaped like the
+ones ``parse_cloudwatch_alarm`` in the ingestion Lambda reads, plus the log
+lines and metric datapoints that would surround each alarm. Scenarios:
+
+- steady:       independent alarms at a Poisson rate, each resolving later;
+- flapping:     a few alarms toggling between ALARM and OK around their threshold;
+- cascade:      a root failure followed by alarms on the services that depend on it;
+- multi-region: the same alarm firing in every region within seconds (regional outage).
+
+Scenarios mix by weight (``steady=0.6,cascade=0.3,flapping=0.1``). Everything
+is produced lazily, in time order, with memory bounded by the number of
+overlapping incidents, so million-event files can be written as a stream.
+
+Recorded files (JSON lines, optionally gzipped, one EventBridge event per
+line) are replayed with their original spacing divided by ``--speed``.
+
+Usage:
+    python backend/benchmarks/alarm_storm.py generate --events 1000000 --scenario steady=0.7,cascade=0.3 \\
+        --output storm.jsonl.gz [--logs logs.jsonl.gz] [--metrics metrics.jsonl.gz]
+    python backend/benchmarks/alarm_storm.py replay storm.jsonl.gz --speed 10 [--target lambda --function NAME]
+"""
+import argparse
+import gzip
+import heapq
+import itertools
+import random
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../layers/shared/python'))
+
+from serialization import dumps, dumps_bytes, loads  # noqa: E402
+
+ACCOUNT_ID = '123456789012'
+REGIONS = ('us-east-1', 'eu-west-1', 'ap-southeast-2')
+
+# Alarm catalog: what fires, where its metric and logs live, and what it sounds like
+ALARMS = {
+    'database-connections': {
+        'alarmName': 'DatabaseConnectionsAlarm', 'namespace': 'AWS/RDS', 'metric': 'DatabaseConnections',
+        'dimension': ('DBInstanceIdentifier', 'orders-db'), 'unit': 'Count', 'baseline': 40.0, 'threshold': 90.0,
+        'logGroup': '/aws/rds/instance/orders-db/postgresql',
+        'logs': ('FATAL: remaining connection slots are reserved for non-replication superuser connections',
+                 'LOG: could not receive data from client: Connection reset by peer')
+    },
+    'api-latency': {
+        'alarmName': 'ApiLatencyAlarm', 'namespace': 'AWS/ApiGateway', 'metric': 'Latency',
+        'dimension': ('ApiName', 'orders-api'), 'unit': 'Milliseconds', 'baseline': 180.0, 'threshold': 2000.0,
+        'logGroup': '/aws/lambda/orders-api',
+        'logs': ('WARN request exceeded 2000ms route=/orders', 'ERROR upstream timeout waiting for db pool')
+    },
+    'error-rate': {
+        'alarmName': 'ErrorRateAlarm', 'namespace': 'AWS/ApplicationELB', 'metric': 'HTTPCode_Target_5XX_Count',
+        'dimension': ('LoadBalancer', 'app/web/50dc6c495c0c9188'), 'unit': 'Count', 'baseline': 2.0, 'threshold': 50.0,
+        'logGroup': '/aws/lambda/application',
+        'logs': ('ERROR 503 Service Unavailable from target group web', 'ERROR request failed: connection refused')
+    },
+    'high-cpu': {
+        'alarmName': 'HighCPUAlarm', 'namespace': 'AWS/EC2', 'metric': 'CPUUtilization',
+        'dimension': ('AutoScalingGroupName', 'web-asg'), 'unit': 'Percent', 'baseline': 35.0, 'threshold': 90.0,
+        'logGroup': '/aws/ec2/web',
+        'logs': ('WARN worker loop lagging by 4200ms', 'ERROR health check timed out after 5s')
+    },
+    'high-memory': {
+        'alarmName': 'HighMemoryAlarm', 'namespace': 'CWAgent', 'metric': 'mem_used_percent',
+        'dimension': ('AutoScalingGroupName', 'worker-asg'), 'unit': 'Percent', 'baseline': 55.0, 'threshold': 85.0,
+        'logGroup': '/aws/ec2/worker',
+        'logs': ('ERROR java.lang.OutOfMemoryError: Java heap space', 'WARN GC overhead limit exceeded')
+    },
+    'queue-depth': {
+        'alarmName': 'QueueDepthAlarm', 'namespace': 'AWS/SQS', 'metric': 'ApproximateNumberOfMessagesVisible',
+        'dimension': ('QueueName', 'orders-events'), 'unit': 'Count', 'baseline': 100.0, 'threshold': 5000.0,
+        'logGroup': '/aws/lambda/orders-consumer',
+        'logs': ('WARN batch processing behind by 3400 messages', 'ERROR consumer throttled: Rate exceeded')
+    }
+}
+
+# Failure propagation used by the cascade scenario: root -> alarms that follow it
+DEPENDENTS = {
+    'database-connections': ('api-latency', 'error-rate', 'queue-depth'),
+    'high-memory': ('high-cpu', 'error-rate'),
+    'high-cpu': ('api-latency',),
+    'queue-depth': ('high-memory',)
+}
+
+SCENARIOS = ('steady', 'flapping', 'cascade', 'multi-region')
+
+# A transition is (offset seconds from the start, region, alarm key, state)
+
+def _in_time_order(waves):
+    """Flatten (start, transitions) waves whose starts ascend into one time-ordered stream."""
+    heap = []
+    tiebreak = itertools.count()
+    for start, transitions in waves:
+        while heap and heap[0][0] <= start:
+            yield heapq.heappop(heap)[2]
+        for transition in transitions:
+            heapq.heappush(heap, (transition[0], next(tiebreak), transition))
+    while heap:
+        yield heapq.heappop(heap)[2]
+
+def _arrivals(rng, per_minute):
+    """Poisson arrival offsets, in seconds."""
+    offset = 0.0
+    while True:
+        offset += rng.expovariate(per_minute / 60.0)
+        yield offset
+
+def steady(rng, per_minute, regions):
+    def waves():
+        for start in _arrivals(rng, per_minute):
+            alarm = rng.choice(list(ALARMS))
+            region = regions[0] if rng.random() < 0.7 else rng.choice(regions)
+            yield start, [(start, region, alarm, 'ALARM'), (start + rng.uniform(120, 1800), region, alarm, 'OK')]
+    return _in_time_order(waves())
+
+def flapping(rng, per_minute, regions, alarms=2):
+    """Each chosen alarm crosses its threshold back and forth, roughly per_minute / alarms times a minute."""
+    def waves():
+        chosen = rng.sample(list(ALARMS), alarms)
+        period = 60.0 * alarms / per_minute
+        for cycle in itertools.count():
+            start = cycle * 2 * period
+            transitions = []
+            for index, alarm in enumerate(chosen):
+                fired = start + index * period / alarms + rng.uniform(0, period / 4)
+                transitions += [(fired, regions[0], alarm, 'ALARM'),
+                                (fired + period * rng.uniform(0.5, 0.9), regions[0], alarm, 'OK')]
+            yield start, transitions
+    return _in_time_order(waves())
+
+def cascade(rng, per_minute, regions):
+    """Per_minute counts alarms; a failure wave raises its root plus two levels of dependents."""
+    def waves():
+        for start in _arrivals(rng, per_minute / 4.0):
+            root = rng.choice(list(DEPENDENTS))
+            region = rng.choice(regions)
+            transitions = []
+            frontier = [(root, start)]
+            seen = set()
+            for _ in range(3):
+                next_frontier = []
+                for alarm, fired in frontier:
+                    if alarm in seen:
+                        continue
+                    seen.add(alarm)
+                    transitions += [(fired, region, alarm, 'ALARM'), (fired + rng.uniform(600, 2400), region, alarm, 'OK')]
+                    next_frontier += [(dependent, fired + rng.uniform(5, 90)) for dependent in DEPENDENTS.get(alarm, ())]
+                frontier = next_frontier
+            yield start, transitions
+    return _in_time_order(waves())
+
+def multi_region(rng, per_minute, regions):
+    """Per_minute counts alarms; an outage raises one alarm in every region within 30 seconds."""
+    def waves():
+        for start in _arrivals(rng, per_minute / len(regions)):
+            alarm = rng.choice(list(ALARMS))
+            recovered = start + rng.uniform(300, 3600)
+            transitions = []
+            for region in regions:
+                transitions += [(start + rng.uniform(0, 30), region, alarm, 'ALARM'),
+                                (recovered + rng.uniform(0, 60), region, alarm, 'OK')]
+            yield start, transitions
+    return _in_time_order(waves())
+
+SCENARIO_STREAMS = {'steady': steady, 'flapping': flapping, 'cascade': cascade, 'multi-region': multi_region}
+
+def parse_mix(spec):
+    """'steady=0.6,cascade=0.4' -> {'steady': 0.6, 'cascade': 0.4}; a bare name has weight 1."""
+    mix = {}
+    for part in spec.split(','):
+        name, _, weight = part.strip().partition('=')
+        if name not in SCENARIO_STREAMS:
+            raise ValueError(f'Unknown scenario {name!r}; expected one of {", ".join(SCENARIOS)}')
+        mix[name] = float(weight or 1)
+    return mix
+
+def transitions(mix, per_minute=60.0, regions=REGIONS, seed=7):
+    """Endless time-ordered alarm transitions for a scenario mix; rates split by weight."""
+    total = sum(mix.values())
+    streams = [
+        SCENARIO_STREAMS[name](random.Random(f'{seed}:{name}'), per_minute * weight / total, list(regions))
+        for name, weight in mix.items() if weight > 0
+    ]
+    return heapq.merge(*streams, key=lambda transition: transition[0])
+
+def alarm_events(stream, start=None, seed=7):
+    """EventBridge 'CloudWatch Alarm State Change' events for a stream of transitions."""
+    start = start or datetime(2025, 1, 15, 10, 0, 0)
+    previous = {}
+    for sequence, (offset, region, key, state) in enumerate(stream):
+        alarm = ALARMS[key]
+        at = start + timedelta(seconds=offset)
+        arn = f'arn:aws:cloudwatch:{region}:{ACCOUNT_ID}:alarm:{alarm["alarmName"]}'
+        old_state = previous.get((region, key), 'OK')
+        previous[(region, key)] = state
+        dimension_name, dimension_value = alarm['dimension']
+        comparison = 'greater than' if state == 'ALARM' else 'not greater than'
+        yield {
+            'version': '0',
+            'id': f'storm-{seed}-{sequence:010d}',
+            'detail-type': 'CloudWatch Alarm State Change',
+            'source': 'aws.cloudwatch',
+            'account': ACCOUNT_ID,
+            'time': at.strftime('%Y-%m-%dT%H:%M:%SZ'),
+            'region': region,
+            'resources': [arn],
+            'detail': {
+                'alarmName': alarm['alarmName'],
+                'alarmArn': arn,
+                'state': {
+                    'value': state,
+                    'reason': f'Threshold Crossed: 1 datapoint was {comparison} the threshold ({alarm["threshold"]}).',
+                    'timestamp': at.isoformat() + 'Z'
+                },
+                'previousState': {'value': old_state},
+                'configuration': {'metrics': [{
+                    'id': 'm1',
+                    'metricStat': {
+                        'metric': {
+                            'namespace': alarm['namespace'],
+                            'name': alarm['metric'],
+                            'dimensions': {dimension_name: dimension_value}
+                        },
+                        'period': 60,
+                        'stat': 'Average'
+                    }
+                }]}
+            }
+        }
+
+def alarm_key(event):
+    """Catalog key of a generated event's alarm, or None for alarms outside the catalog."""
+    name = event.get('detail', {}).get('alarmName')
+    return next((key for key, alarm in ALARMS.items() if alarm['alarmName'] == name), None)
+
+def event_time(event):
+    return datetime.fromisoformat(event['time'][:19])
+
+def correlated_logs(event, rng, lines=5):
+    """Log records leading up to an ALARM transition, shaped like PutLogEvents input."""
+    key = alarm_key(event)
+    if key is None or event['detail']['state']['value'] != 'ALARM':
+        return
+    alarm = ALARMS[key]
+    at = event_time(event)
+    for index in range(lines):
+        when = at - timedelta(seconds=rng.uniform(0, 120))
+        yield {
+            'region': event['region'],
+            'logGroupName': alarm['logGroup'],
+            'logStreamName': f'{key}/{event["region"]}',
+            'timestamp': int(when.timestamp() * 1000),
+            'message': rng.choice(alarm['logs'])
+        }
+
+def metric_series(event, rng, minutes=15):
+    """One-minute datapoints ending at a transition: ramping past the threshold for ALARM, back to baseline for OK."""
+    key = alarm_key(event)
+    if key is None:
+        return
+    alarm = ALARMS[key]
+    at = event_time(event)
+    firing = event['detail']['state']['value'] == 'ALARM'
+    for minute in range(minutes, 0, -1):
+        progress = (minutes - minute) / (minutes - 1) if minutes > 1 else 1.0
+        if firing:
+            level = alarm['baseline'] + (alarm['threshold'] * 1.15 - alarm['baseline']) * progress ** 2
+        else:
+            level = alarm['threshold'] * 1.1 - (alarm['threshold'] * 1.1 - alarm['baseline']) * progress
+        dimension_name, dimension_value = alarm['dimension']
+        yield {
+            'region': event['region'],
+            'Namespace': alarm['namespace'],
+            'MetricName': alarm['metric'],
+            'Dimensions': [{'Name': dimension_name, 'Value': dimension_value}],
+            'Timestamp': (at - timedelta(minutes=minute - 1)).isoformat() + 'Z',
+            'Value': round(max(0.0, level * rng.uniform(0.95, 1.05)), 2),
+            'Unit': alarm['unit']
+        }
+
+def matches_alarm_rule(event):
+    """The stack's AlarmRule only forwards transitions into ALARM to the ingestion Lambda."""
+    return (event.get('source') == 'aws.cloudwatch'
+            and event.get('detail-type') == 'CloudWatch Alarm State Change'
+            and event.get('detail', {}).get('state', {}).get('value') == 'ALARM')
+
+def open_text(path, mode):
+    """Open a path for text I/O; '-' is stdin/stdout and '.gz' paths are gzipped."""
+    if path == '-':
+        return sys.stdout if 'w' in mode else sys.stdin
+    if path.endswith('.gz'):
+        return gzip.open(path, mode + 't', encoding='utf-8')
+    return open(path, mode, encoding='utf-8')
+
+def read_events(path):
+    """Stream events from a JSON-lines file (one EventBridge event per line)."""
+    source = open_text(path, 'r')
+    try:
+        for line in source:
+            if line.strip():
+                yield loads(line)
+    finally:
+        if source is not sys.stdin:
+            source.close()
+
+def replay(events, speed, send, clock=time.monotonic, sleep=time.sleep):
+    """
+    Send events keeping their recorded spacing divided by ``speed`` (0 = no waiting).
+
+    Returns the number of events sent and the worst lag behind schedule, in seconds.
+    """
+    first = None
+    started = clock()
+    sent = 0
+    worst_lag = 0.0
+    for event in events:
+        if speed > 0:
+            at = event_time(event)
+            first = first or at
+            due = (at - first).total_seconds() / speed
+            wait = due - (clock() - started)
+            if wait > 0:
+                sleep(wait)
+            else:
+                worst_lag = max(worst_lag, -wait)
+        send(event)
+        sent += 1
+    return sent, worst_lag
+
+def generate_command(args):
+    rng = random.Random(args.seed)
+    events = alarm_events(
+        transitions(parse_mix(args.scenario), args.rate, args.regions.split(','), args.seed),
+        seed=args.seed
+    )
+    if args.alarm_rule_only:
+        events = filter(matches_alarm_rule, events)
+
+    outputs = [open_text(path, 'w') if path else None for path in (args.output, args.logs, args.metrics)]
+    alarms_out, logs_out, metrics_out = outputs
+    try:
+        for event in itertools.islice(events, args.events):
+            alarms_out.write(dumps(event) + '\n')
+            if logs_out:
+                for record in correlated_logs(event, rng):
+                    logs_out.write(dumps(record) + '\n')
+            if metrics_out:
+                for record in metric_series(event, rng):
+                    metrics_out.write(dumps(record) + '\n')
+    finally:
+        for output in outputs:
+            if output and output is not sys.stdout:
+                output.close()
+
+def replay_command(args):
+    events = read_events(args.file)
+    if not args.all_states:
+        events = filter(matches_alarm_rule, events)
+
+    if args.target == 'lambda':
+        import boto3
+        lambda_client = boto3.client('lambda')
+
+        def send(event):
+            lambda_client.invoke(FunctionName=args.function, InvocationType='Event',
+                                 Payload=dumps_bytes(event))
+    else:
+        def send(event):
+            sys.stdout.write(dumps(event) + '\n')
+
+    started = time.monotonic()
+    sent, worst_lag = replay(events, args.speed, send)
+    print(f'replayed {sent} events in {time.monotonic() - started:.1f}s '
+          f'(speed {args.speed}x, worst lag {worst_lag:.2f}s)', file=sys.stderr)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    generate = commands.add_parser('generate', help='write a synthetic storm as JSON lines')
+    generate.add_argument('--events', type=int, default=1000, help='alarm events to write')
+    generate.add_argument('--scenario', default='steady', help=f'mix of {", ".join(SCENARIOS)} (name=weight,...)')
+    generate.add_argument('--rate', type=float, default=60.0, help='alarms per minute of simulated time')
+    generate.add_argument('--regions', default=','.join(REGIONS))
+    generate.add_argument('--seed', type=int, default=7)
+    generate.add_argument('--alarm-rule-only', action='store_true', help='only transitions the AlarmRule forwards')
+    generate.add_argument('--output', default='-', help="events file ('-' for stdout, .gz to compress)")
+    generate.add_argument('--logs', help='correlated log records file')
+    generate.add_argument('--metrics', help='correlated metric datapoints file')
+
+    replay_parser = commands.add_parser('replay', help='replay a recorded or generated events file')
+    replay_parser.add_argument('file', help="JSON-lines events file ('-' for stdin, .gz accepted)")
+    replay_parser.add_argument('--speed', type=float, default=1.0, help='time compression (0 = as fast as possible)')
+    replay_parser.add_argument('--target', choices=('stdout', 'lambda'), default='stdout')
+    replay_parser.add_argument('--function', help='ingestion Lambda name for --target lambda')
+    replay_parser.add_argument('--all-states', action='store_true', help='also send OK/INSUFFICIENT_DATA transitions')
+
+    args = parser.parse_args()
+    if args.command == 'replay' and args.target == 'lambda' and not args.function:
+        parser.error('--target lambda requires --function')
+    try:
+        generate_command(args) if args.command == 'generate' else replay_command(args)
+    except BrokenPipeError:
+        # Output piped into e.g. head, which has stopped reading
+        sys.stderr.close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,154 @@
+"""
+Read capacity per access pattern: legacy incidents table vs the single-table store.
+
+Builds a synthetic incident population with the real item layouts and prices
+every hot read with DynamoDB's capacity rules (4 KB per read unit, summed over
+the items a Query/Scan page touches, half a unit when eventually consistent).
+Filtered scans are charged for every item scanned, not only the matches.
+
+Usage:
+    python backend/benchmarks/bench_access_patterns.py [--incidents N] [--duplicate-ratio R]
+"""
+import argparse
+import math
+import os
+import random
+import sys
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../layers/shared/python'))
+
+import incident_store  # noqa: E402
+
+STATUSES = ('OPEN', 'PENDING_APPROVAL', 'IN_PROGRESS', 'RESOLVED', 'RESOLVED', 'RESOLVED', 'DENIED')
+UPDATES_PER_INCIDENT = 3
+PAGE_BYTES = 1024 * 1024
+
+def value_size(value):
+    """Approximate stored size of an attribute value in bytes."""
+    if isinstance(value, str):
+        return len(value.encode('utf-8'))
+    if isinstance(value, bool) or value is None:
+        return 1
+    if isinstance(value, (int, float, Decimal)):
+        return len(str(value).lstrip('-').replace('.', '')) // 2 + 2
+    if isinstance(value, dict):
+        return 3 + sum(len(k.encode('utf-8')) + value_size(v) + 1 for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return 3 + sum(value_size(v) + 1 for v in value)
+    return len(str(value))
+
+def item_size(item):
+    """Stored size of an item: attribute names plus values."""
+    return sum(len(name.encode('utf-8')) + value_size(value) for name, value in item.items())
+
+def read_units(sizes, consistent=False):
+    """Capacity consumed by one paginated Query/Scan reading items of these sizes."""
+    units, page = 0.0, 0
+    for size in sizes:
+        page += size
+        if page >= PAGE_BYTES:
+            units += math.ceil(page / 4096)
+            page = 0
+    units += math.ceil(page / 4096) if page else 0.5
+    return units * (1 if consistent else 0.5)
+
+def synthetic_incidents(count, duplicate_ratio, seed=7):
+    """Incidents as the agent leaves them: OPEN at ingestion, then three updates."""
+    rng = random.Random(seed)
+    start = datetime(2025, 1, 1)
+    incidents = []
+    for n in range(count):
+        created = start + timedelta(minutes=7 * n)
+        status = rng.choice(STATUSES)
+        incident = {
+            'incidentId': f'inc-{n:06d}-{rng.getrandbits(48):012x}',
+            'timestamp': int(created.timestamp() * 1000),
+            'status': status,
+            'severity': rng.choice(incident_store.SEVERITIES),
+            'title': f'CloudWatch Alarm: Alarm{n % 40}',
+            'description': 'Threshold Crossed: 1 datapoint was greater than the threshold.' * 2,
+            'source': 'cloudwatch',
+            'metadata': {'alarmArn': f'arn:aws:cloudwatch:us-east-1:123456789012:alarm:Alarm{n % 40}', 'region': 'us-east-1'},
+            'createdAt': created.isoformat(),
+            'updatedAt': (created + timedelta(minutes=rng.randint(1, 600))).isoformat(),
+            'version': 1 + UPDATES_PER_INCIDENT,
+            'requiresApproval': True,
+            'autoApprove': False
+        }
+        if status != 'OPEN':
+            incident['diagnosis'] = {'diagnosis': 'Memory leak in the session cache. ' * 12, 'confidence': 82}
+            incident['plan'] = {'actions': [{'type': 'restart_service', 'target': 'app', 'safe': True}] * 3, 'success': True}
+            incident['actionsTaken'] = [{'action': 'restart_service', 'status': 'SUCCESS'}] * 3
+        incidents.append(incident)
+
+    # Re-ingested incidents left extra rows behind in the legacy table
+    legacy_rows = list(incidents)
+    for incident in rng.sample(incidents, int(count * duplicate_ratio)):
+        legacy_rows.append({**incident, 'timestamp': incident['timestamp'] - 60000})
+    return incidents, legacy_rows
+
+def single_table_items(incident):
+    """Current item and history events for one incident in the new layout."""
+    base = {k: v for k, v in incident.items() if k != 'timestamp'}
+    items = [{**base, **incident_store.incident_key(base['incidentId']), **incident_store.index_attributes(base)}]
+    items.append(incident_store.event_item(base['incidentId'], 1, 'CREATED', {'status': 'OPEN'}, base['createdAt']))
+    updates = ({'status': 'PENDING_APPROVAL'}, {'status': 'IN_PROGRESS'},
+               {k: base[k] for k in ('status', 'diagnosis', 'plan', 'actionsTaken') if k in base})
+    for version, changes in enumerate(updates, start=2):
+        items.append(incident_store.event_item(base['incidentId'], version, 'UPDATED', changes, base['updatedAt']))
+    return items
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--incidents', type=int, default=5000, help='incidents in the table')
+    parser.add_argument('--duplicate-ratio', type=float, default=0.1, help='share of incidents with an extra legacy row')
+    parser.add_argument('--page', type=int, default=50, help='dashboard list size')
+    args = parser.parse_args()
+
+    incidents, legacy_rows = synthetic_incidents(args.incidents, args.duplicate_ratio)
+    new_items = [item for incident in incidents for item in single_table_items(incident)]
+    current = [item for item in new_items if item['sk'] == incident_store.CURRENT_SK]
+    legacy_sizes = [item_size(row) for row in legacy_rows]
+    legacy_scan = read_units(legacy_sizes)
+
+    target = incidents[len(incidents) // 2]
+    target_id = target['incidentId']
+    target_rows = [row for row in legacy_rows if row['incidentId'] == target_id]
+    high_open = [i for i in current if i.get('gsi1pk') == 'OPEN#HIGH']
+    since = sorted(i['gsi2sk'] for i in current)[-len(current) // 100 or -1]
+    changed = [i for i in current if i['gsi2sk'] > since]
+    shards = {}
+    for item in current:
+        shards.setdefault(item['gsi2pk'], []).append(item)
+    for items in shards.values():
+        items.sort(key=lambda item: item['gsi2sk'], reverse=True)
+
+    patterns = [
+        ('latest by id',
+         read_units([item_size(max(target_rows, key=lambda row: row['timestamp']))]),
+         read_units([item_size(next(i for i in current if i['incidentId'] == target_id))])),
+        (f'dashboard list ({args.page})',
+         legacy_scan,  # the legacy list needs a full scan to find the latest rows
+         sum(read_units([item_size(i) for i in items[:args.page]]) for items in shards.values())),
+        ('open HIGH incidents',
+         legacy_scan,
+         read_units([item_size(i) for i in high_open])),
+        ('since poll (1% changed)',
+         legacy_scan,
+         sum(read_units([item_size(i) for i in items if i['gsi2sk'] > since]) for items in shards.values())),
+        ('timeline for one incident',
+         read_units([item_size(row) for row in target_rows]),
+         read_units([item_size(i) for i in new_items if i['pk'] == incident_store.incident_pk(target_id) and i['sk'] != incident_store.CURRENT_SK])),
+    ]
+
+    print(f"{args.incidents} incidents, {len(legacy_rows)} legacy rows, {len(new_items)} single-table items "
+          f"({len(changed)} changed since cursor, {len(high_open)} open HIGH)")
+    print(f"{'access pattern':<28} {'legacy RCU':>11} {'single-table RCU':>17}")
+    for name, before, after in patterns:
+        print(f"{name:<28} {before:>11.1f} {after:>17.1f}")
+    print("note: the legacy timeline only holds re-ingested rows; in-place updates kept no history")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,132 @@
+"""
+Approval decision time: compiled policy vs reading the rules on every incident.
+
+"legacy" is the old determine_approval_requirement, which re-read and split
+the AUTO_APPROVE_* variables per incident. "interpreted" walks the raw rule
+documents in order, matching globs with fnmatch, which is what a policy costs
+without compiling it. "compiled" is approval_policy.CompiledPolicy.
+
+Rule sets are synthetic: rules on one or two severities and a few of
+SOURCE_COUNT sources, some with alarm-name globs, hour windows or rate limits,
+closed by a catch-all. Incidents are drawn from the same value pools.
+
+Usage:
+    python backend/benchmarks/bench_approval_policy.py [--rules 10,1000,10000] [--incidents N]
+"""
+import argparse
+import fnmatch
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../functions/ingestion'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../layers/shared/python'))
+
+from approval_policy import SEVERITIES, CompiledPolicy  # noqa: E402
+
+SOURCE_COUNT = 40
+ALARMS = ('DatabaseConnectionsAlarm', 'HighCPUAlarm', 'ApiLatencyAlarm', 'ErrorRateAlarm', 'DiskSpaceAlarm')
+GLOBS = ('Database*', '*CPU*', 'Api*', '*Rate*', 'Disk*Alarm', 'RDS-*')
+ENVIRON = {'AUTO_APPROVE_LOW_SEVERITY': 'true', 'AUTO_APPROVE_SOURCES': 'synthetic,canary'}
+
+def synthetic_policy(count, seed=11):
+    """A policy of ``count`` rules ending in a catch-all."""
+    rng = random.Random(seed)
+    sources = [f'source-{i}' for i in range(SOURCE_COUNT)]
+    rules = []
+    for position in range(count - 1):
+        when = {'severity': rng.sample(SEVERITIES, rng.choice((1, 2))), 'source': rng.sample(sources, rng.randint(1, 3))}
+        if rng.random() < 0.5:
+            when['alarmName'] = rng.choice(GLOBS)
+        if rng.random() < 0.3:
+            start = rng.randrange(24)
+            when['hours'] = f'{start}-{(start + rng.randint(2, 10)) % 24}'
+        if rng.random() < 0.1:
+            when['minIncidentsPerHour'] = rng.randint(10, 100)
+        rules.append({'name': f'rule-{position}', 'decision': rng.choice(('auto', 'require')), 'when': when})
+    rules.append({'name': 'catch-all', 'decision': 'require', 'when': {}})
+    return {'version': str(count), 'default': 'require', 'rules': rules}
+
+def synthetic_incidents(count, seed=5):
+    rng = random.Random(seed)
+    return [
+        (
+            {
+                'severity': rng.choice(SEVERITIES),
+                'source': f'source-{rng.randrange(SOURCE_COUNT + 10)}',
+                'metadata': {'alarmName': rng.choice(ALARMS)}
+            },
+            rng.randrange(24)
+        )
+        for _ in range(count)
+    ]
+
+def legacy_requirement(incident, environ=ENVIRON):
+    """The per-incident environment parsing the policy engine replaced."""
+    auto_approve = {
+        severity: environ.get(f'AUTO_APPROVE_{severity}_SEVERITY', 'true' if severity == 'LOW' else 'false').lower() == 'true'
+        for severity in SEVERITIES
+    }
+    if incident.get('autoApprove'):
+        return False
+    severity = incident.get('severity', 'MEDIUM')
+    if auto_approve.get(severity):
+        return False
+    if incident.get('source', 'manual') in environ.get('AUTO_APPROVE_SOURCES', '').split(','):
+        return False
+    return True
+
+def interpreted_requirement(config, incident, hour, rate):
+    """First matching rule, read straight from the policy document."""
+    for rule in config['rules']:
+        when = rule['when']
+        if 'severity' in when and incident['severity'] not in when['severity']:
+            continue
+        if 'source' in when and incident['source'] not in when['source']:
+            continue
+        if 'alarmName' in when and not fnmatch.fnmatchcase(incident['metadata']['alarmName'], when['alarmName']):
+            continue
+        if 'hours' in when:
+            start, end = (int(part) for part in when['hours'].split('-'))
+            if not (start <= hour < end if start < end else hour >= start or hour < end):
+                continue
+        if 'minIncidentsPerHour' in when and rate() < when['minIncidentsPerHour']:
+            continue
+        return rule['decision'] == 'require'
+    return config['default'] == 'require'
+
+def per_call_us(function, incidents):
+    started = time.perf_counter()
+    for incident, hour in incidents:
+        function(incident, hour)
+    return (time.perf_counter() - started) / len(incidents) * 1e6
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rules', default='10,1000,10000', help='comma-separated rule set sizes')
+    parser.add_argument('--incidents', type=int, default=50000, help='evaluations per measurement')
+    args = parser.parse_args()
+
+    incidents = synthetic_incidents(args.incidents)
+    rate = lambda: 42  # noqa: E731
+    print(f"legacy (env per incident): {per_call_us(lambda incident, hour: legacy_requirement(incident), incidents):.2f} us/decision")
+    print(f"{'rules':>6} {'compile ms':>10} {'interpreted us':>15} {'compiled us':>12} {'speedup':>8} {'candidates':>11}")
+    for count in (int(value) for value in args.rules.split(',')):
+        config = synthetic_policy(count)
+        started = time.perf_counter()
+        policy = CompiledPolicy(config)
+        compile_ms = (time.perf_counter() - started) * 1000
+
+        # Decisions must agree before the timings mean anything
+        for incident, hour in incidents[:2000]:
+            expected = interpreted_requirement(config, incident, hour, rate)
+            assert policy.evaluate(incident, hour, rate).requires_approval == expected, (incident, hour)
+
+        interpreted = per_call_us(lambda incident, hour: interpreted_requirement(config, incident, hour, rate), incidents)
+        compiled = per_call_us(lambda incident, hour: policy.evaluate(incident, hour, rate), incidents)
+        reachable = sum(len(rules) for rules in policy._candidates.values()) / max(len(policy._candidates), 1)
+        print(f"{count:>6} {compile_ms:>10.1f} {interpreted:>15.2f} {compiled:>12.2f} {interpreted / compiled:>7.1f}x {reachable:>11.1f}")
+
+if __name__ == '__main__':
+    main()
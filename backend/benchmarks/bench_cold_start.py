@@ -0,0 +1,143 @@
+"""
+Cold start per handler path: lazy client registry vs creating every client at import.
+
+Each sample runs in a fresh interpreter against moto, times the handler module
+import and its first request (where lazy clients get created), then a second,
+warm request. "eager" sets AWS_CLIENT_PREWARM to every client the handler
+binds, which reproduces the old import-time construction.
+
+Usage:
+    python backend/benchmarks/bench_cold_start.py [--samples N] [--path NAME]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+BACKEND = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+PATHS = {
+    'agent-get-incident': {
+        'module': 'agent',
+        'services': 'dynamodb,bedrock-runtime,cloudwatch,logs,s3,lambda,stepfunctions',
+        'event': {'httpMethod': 'GET', 'path': '/incidents/inc-1', 'pathParameters': {'id': 'inc-1'}}
+    },
+    'agent-list-incidents': {
+        'module': 'agent',
+        'services': 'dynamodb,bedrock-runtime,cloudwatch,logs,s3,lambda,stepfunctions',
+        'event': {'httpMethod': 'GET', 'path': '/incidents'}
+    },
+    'ingestion-create': {
+        'module': 'ingestion',
+        'services': 'dynamodb,lambda,sqs',
+        'event': {'body': json.dumps({'title': 'High CPU', 'severity': 'LOW', 'autoApprove': True})}
+    },
+    'scheduler-tick': {
+        'module': 'scheduler',
+        'services': 'dynamodb,sqs,lambda,cloudwatch',
+        'event': {}
+    },
+    'archiver-noop': {
+        'module': 'archiver',
+        'services': 'dynamodb,s3',
+        'event': {'Records': []}
+    }
+}
+
+def setup_environment():
+    """Create the tables, bucket and queues the handlers expect, outside the timed region."""
+    import boto3
+    session = boto3.session.Session()
+    dynamodb = session.resource('dynamodb')
+    table = dynamodb.create_table(
+        TableName='bench-incidents',
+        KeySchema=[{'AttributeName': 'pk', 'KeyType': 'HASH'}, {'AttributeName': 'sk', 'KeyType': 'RANGE'}],
+        AttributeDefinitions=[
+            {'AttributeName': name, 'AttributeType': 'S'}
+            for name in ('pk', 'sk', 'gsi1pk', 'gsi1sk', 'gsi2pk', 'gsi2sk')
+        ],
+        GlobalSecondaryIndexes=[
+            {'IndexName': 'byOpenSeverity', 'Projection': {'ProjectionType': 'ALL'},
+             'KeySchema': [{'AttributeName': 'gsi1pk', 'KeyType': 'HASH'}, {'AttributeName': 'gsi1sk', 'KeyType': 'RANGE'}]},
+            {'IndexName': 'byUpdated', 'Projection': {'ProjectionType': 'ALL'},
+             'KeySchema': [{'AttributeName': 'gsi2pk', 'KeyType': 'HASH'}, {'AttributeName': 'gsi2sk', 'KeyType': 'RANGE'}]}
+        ],
+        BillingMode='PAY_PER_REQUEST'
+    )
+    dynamodb.create_table(
+        TableName='bench-stats',
+        KeySchema=[{'AttributeName': 'statsKey', 'KeyType': 'HASH'}],
+        AttributeDefinitions=[{'AttributeName': 'statsKey', 'AttributeType': 'S'}],
+        BillingMode='PAY_PER_REQUEST'
+    )
+    session.client('s3').create_bucket(Bucket='bench-postmortems')
+    sqs = session.client('sqs')
+    urls = {p: sqs.create_queue(QueueName=f'bench-{p.lower()}')['QueueUrl'] for p in ('CRITICAL', 'HIGH', 'MEDIUM', 'LOW')}
+    os.environ['AGENT_QUEUE_URLS'] = json.dumps(urls)
+
+    import incident_store
+    incident = {'incidentId': 'inc-1', 'title': 'High CPU', 'severity': 'HIGH', 'status': 'OPEN',
+                'createdAt': '2025-01-15T10:00:00', 'updatedAt': '2025-01-15T10:00:00'}
+    dynamodb.meta.client.transact_write_items(
+        TransactItems=incident_store.creation_transaction(table.name, incident)
+    )
+
+def run_child(path_name, mode):
+    """Runs in the fresh interpreter; prints one JSON line of timings."""
+    spec = PATHS[path_name]
+    os.environ.update({
+        'AWS_DEFAULT_REGION': 'us-east-1', 'AWS_ACCESS_KEY_ID': 'testing', 'AWS_SECRET_ACCESS_KEY': 'testing',
+        'INCIDENTS_TABLE': 'bench-incidents', 'STATS_TABLE': 'bench-stats',
+        'POSTMORTEMS_BUCKET': 'bench-postmortems', 'RUNBOOKS_BUCKET': 'bench-runbooks',
+        'BEDROCK_MODEL_ID': 'anthropic.claude-3-sonnet-20240229-v1:0', 'AGENT_LAMBDA_NAME': 'bench-agent',
+        'AWS_CLIENT_PREWARM': spec['services'] if mode == 'eager' else ''
+    })
+    for directory in ('layers/shared/python', f"functions/{spec['module']}"):
+        sys.path.insert(0, os.path.join(BACKEND, directory))
+
+    from moto import mock_aws
+    with mock_aws():
+        setup_environment()
+
+        start = time.perf_counter()
+        module = __import__(spec['module'])
+        imported = time.perf_counter()
+        module.handler(dict(spec['event']), None)
+        first = time.perf_counter()
+        module.handler(dict(spec['event']), None)
+        warm = time.perf_counter()
+
+    print(json.dumps({'import': imported - start, 'first': first - imported, 'warm': warm - first}))
+
+def sample(path_name, mode):
+    output = subprocess.run(
+        [sys.executable, __file__, '--child', path_name, '--mode', mode],
+        check=True, capture_output=True, text=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--samples', type=int, default=5, help='fresh interpreters per path and mode')
+    parser.add_argument('--path', choices=sorted(PATHS), help='benchmark a single handler path')
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    parser.add_argument('--mode', default='lazy', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child, args.mode)
+        return
+
+    print(f"{'path':<22} {'mode':<6} {'import ms':>10} {'first req ms':>13} {'cold total ms':>14} {'warm req ms':>12}")
+    for path_name in ([args.path] if args.path else PATHS):
+        for mode in ('eager', 'lazy'):
+            runs = [sample(path_name, mode) for _ in range(args.samples)]
+            median = {key: statistics.median(run[key] for run in runs) * 1e3 for key in runs[0]}
+            print(f"{path_name:<22} {mode:<6} {median['import']:>10.1f} {median['first']:>13.1f} "
+                  f"{median['import'] + median['first']:>14.1f} {median['warm']:>12.1f}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,379 @@
+"""
+Load test: the whole incident pipeline (ingestion -> agent -> notification) under an alarm storm.
+
+The real handlers run in-process against local stand-ins:
+- moto for DynamoDB, S3, CloudWatch and CloudWatch Logs, seeded with the
+  repository's runbooks and an application log group;
+- a stub Bedrock client with configurable latency and jitter;
+- a local HTTP server as the Slack webhook;
+- an in-process Lambda client, so ingestion's and the agent's asynchronous
+  invokes queue work for the next handler instead of calling AWS.
+
+One process stands for one warm container per function: queued invocations
+run one at a time, in FIFO order, after each alarm is ingested. The report
+gives p50/p95/p99 per handler and per agent phase (from the timings stored on
+each incident), incidents per second, and the count and time of every AWS
+call. ``--output`` writes it as JSON; ``--compare`` checks a run against a
+saved report and exits non-zero when p95 latency or throughput regress by
+more than ``--max-regression``.
+
+Usage:
+    python backend/benchmarks/bench_pipeline.py [--incidents N] [--scenario steady=0.7,cascade=0.3]
+        [--replay FILE --speed N] [--bedrock-latency-ms MS] [--webhook-latency-ms MS]
+        [--output FILE] [--compare FILE]
+"""
+import argparse
+import io
+import itertools
+import json
+import math
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+import types
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+BACKEND = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+RUNBOOKS = os.path.join(BACKEND, '..', 'runbooks')
+
+for directory in ('layers/shared/python', 'functions/agent', 'functions/ingestion', 'functions/tools'):
+    sys.path.insert(0, os.path.join(BACKEND, directory))
+
+import alarm_storm  # noqa: E402
+
+AGENT_FUNCTION = 'bench-agent'
+NOTIFICATION_FUNCTION = 'bench-notification'
+
+def percentile(values, q):
+    """Nearest-rank percentile of a list of numbers."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return round(ordered[max(0, math.ceil(q / 100 * len(ordered)) - 1)], 2)
+
+def summarize(values):
+    return {
+        'count': len(values),
+        'mean': round(sum(values) / len(values), 2) if values else None,
+        'p50': percentile(values, 50),
+        'p95': percentile(values, 95),
+        'p99': percentile(values, 99)
+    }
+
+class CallRecorder:
+    """Counts and times every AWS API call made through the client registry, by botocore hooks."""
+
+    def __init__(self):
+        self.calls = {}
+
+    def install(self, session):
+        session.events.register('before-call', self.before, unique_id='bench-calls-before')
+        session.events.register('after-call', self.after, unique_id='bench-calls-after')
+        session.events.register('after-call-error', self.after, unique_id='bench-calls-error')
+
+    def before(self, context=None, **kwargs):
+        if context is not None:
+            context['bench.startedAt'] = time.perf_counter()
+
+    def after(self, event_name='', context=None, **kwargs):
+        started = (context or {}).pop('bench.startedAt', None)
+        if started is not None:
+            _, service, operation = event_name.split('.', 2)
+            self.record(f'{service}.{operation}', (time.perf_counter() - started) * 1000)
+
+    def record(self, name, milliseconds):
+        entry = self.calls.setdefault(name, {'count': 0, 'totalMs': 0.0})
+        entry['count'] += 1
+        entry['totalMs'] += milliseconds
+
+    def report(self):
+        return {
+            name: {'count': entry['count'], 'totalMs': round(entry['totalMs'], 1)}
+            for name, entry in sorted(self.calls.items())
+        }
+
+class StubBedrock:
+    """bedrock-runtime stand-in: sleeps for the configured latency and returns an analysis tool call."""
+
+    def __init__(self, recorder, latency_ms, jitter_ms, seed):
+        self.recorder = recorder
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.rng = random.Random(seed)
+
+    def invoke_model(self, modelId, body, **kwargs):
+        started = time.perf_counter()
+        request = json.loads(body)
+        prompt = request['messages'][0]['content']
+        cause = 'memory' if 'Memory' in prompt or 'memory' in prompt else 'cpu' if 'CPU' in prompt else 'connection pool'
+        time.sleep(max(0.0, self.rng.gauss(self.latency_ms, self.jitter_ms)) / 1000)
+        analysis = {
+            'diagnosis': f'Saturated {cause} on the affected tier',
+            'confidence': 80,
+            'category': {'cpu': 'high-cpu', 'connection pool': 'database-connection'}.get(cause, f'{cause}-saturation'),
+            'actions': [{'type': 'scale_up'}, {'type': 'restart_service'}]
+        }
+        content = [{'type': 'tool_use', 'name': request['tools'][0]['name'], 'input': analysis}]
+        self.recorder.record('bedrock-runtime.InvokeModel', (time.perf_counter() - started) * 1000)
+        return {'body': io.BytesIO(json.dumps({'content': content}).encode())}
+
+class LocalLambda:
+    """Lambda client stand-in: 'Event' invokes queue the target handler's invocation."""
+
+    def __init__(self, recorder):
+        self.recorder = recorder
+        self.handlers = {}
+        self.pending = deque()
+        self.latencies = {}
+
+    def invoke(self, FunctionName, Payload=b'{}', InvocationType='RequestResponse', **kwargs):
+        self.recorder.record('lambda.Invoke', 0.0)
+        event = json.loads(Payload)
+        if InvocationType == 'Event':
+            self.pending.append((FunctionName, event))
+            return {'StatusCode': 202}
+        return {'StatusCode': 200, 'Payload': io.BytesIO(json.dumps(self.run(FunctionName, event)).encode())}
+
+    def run(self, function_name, event):
+        handler = self.handlers[function_name]
+        context = types.SimpleNamespace(aws_request_id=f'bench-{time.perf_counter_ns()}', function_name=function_name)
+        started = time.perf_counter()
+        result = handler(event, context)
+        self.latencies.setdefault(function_name, []).append((time.perf_counter() - started) * 1000)
+        return result
+
+    def drain(self):
+        while self.pending:
+            self.run(*self.pending.popleft())
+
+def start_webhook_sink(latency_ms):
+    """Local HTTP server standing in for the Slack webhook; returns (server, counter)."""
+    received = {'requests': 0, 'bytes': 0}
+
+    class Sink(BaseHTTPRequestHandler):
+        def do_POST(self):
+            length = int(self.headers.get('Content-Length', 0))
+            self.rfile.read(length)
+            received['requests'] += 1
+            received['bytes'] += length
+            time.sleep(latency_ms / 1000)
+            self.send_response(200)
+            self.send_header('Content-Length', '2')
+            self.end_headers()
+            self.wfile.write(b'ok')
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Sink)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, received
+
+def create_resources(session):
+    """Tables, buckets, runbooks and an application log group, as deployed by the stack."""
+    dynamodb = session.resource('dynamodb')
+    dynamodb.create_table(
+        TableName='bench-incidents',
+        KeySchema=[{'AttributeName': 'pk', 'KeyType': 'HASH'}, {'AttributeName': 'sk', 'KeyType': 'RANGE'}],
+        AttributeDefinitions=[
+            {'AttributeName': name, 'AttributeType': 'S'}
+            for name in ('pk', 'sk', 'gsi1pk', 'gsi1sk', 'gsi2pk', 'gsi2sk')
+        ],
+        GlobalSecondaryIndexes=[
+            {'IndexName': 'byOpenSeverity', 'Projection': {'ProjectionType': 'ALL'},
+             'KeySchema': [{'AttributeName': 'gsi1pk', 'KeyType': 'HASH'}, {'AttributeName': 'gsi1sk', 'KeyType': 'RANGE'}]},
+            {'IndexName': 'byUpdated', 'Projection': {'ProjectionType': 'ALL'},
+             'KeySchema': [{'AttributeName': 'gsi2pk', 'KeyType': 'HASH'}, {'AttributeName': 'gsi2sk', 'KeyType': 'RANGE'}]}
+        ],
+        BillingMode='PAY_PER_REQUEST'
+    )
+    dynamodb.create_table(
+        TableName='bench-stats',
+        KeySchema=[{'AttributeName': 'statsKey', 'KeyType': 'HASH'}],
+        AttributeDefinitions=[{'AttributeName': 'statsKey', 'AttributeType': 'S'}],
+        BillingMode='PAY_PER_REQUEST'
+    )
+
+    s3 = session.client('s3')
+    for bucket in ('bench-postmortems', 'bench-runbooks'):
+        s3.create_bucket(Bucket=bucket)
+    for name in sorted(os.listdir(RUNBOOKS)):
+        with open(os.path.join(RUNBOOKS, name), 'rb') as runbook:
+            s3.put_object(Bucket='bench-runbooks', Key=name, Body=runbook.read())
+
+    logs = session.client('logs')
+    logs.create_log_group(logGroupName='/aws/lambda/application')
+    logs.create_log_stream(logGroupName='/aws/lambda/application', logStreamName='app')
+    now = int(time.time() * 1000)
+    logs.put_log_events(logGroupName='/aws/lambda/application', logStreamName='app', logEvents=[
+        {'timestamp': now - (50 - i) * 1000, 'message': f'ERROR worker-{i % 4} request timed out after 30000ms'}
+        for i in range(50)
+    ])
+
+def current_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BACKEND,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def storm_events(args):
+    """The alarms the stack's AlarmRule would forward: from a recorded file, or generated."""
+    if args.replay:
+        events = alarm_storm.read_events(args.replay)
+    else:
+        events = alarm_storm.alarm_events(
+            alarm_storm.transitions(alarm_storm.parse_mix(args.scenario), seed=args.seed), seed=args.seed
+        )
+    return filter(alarm_storm.matches_alarm_rule, events)
+
+def run_pipeline(args):
+    os.environ.update({
+        'AWS_DEFAULT_REGION': 'us-east-1', 'AWS_ACCESS_KEY_ID': 'testing', 'AWS_SECRET_ACCESS_KEY': 'testing',
+        'INCIDENTS_TABLE': 'bench-incidents', 'STATS_TABLE': 'bench-stats',
+        'POSTMORTEMS_BUCKET': 'bench-postmortems', 'RUNBOOKS_BUCKET': 'bench-runbooks',
+        'BEDROCK_MODEL_ID': 'anthropic.claude-3-sonnet-20240229-v1:0',
+        'AGENT_LAMBDA_NAME': AGENT_FUNCTION, 'NOTIFICATION_LAMBDA_NAME': NOTIFICATION_FUNCTION,
+        'AUTO_APPROVE_SOURCES': 'cloudwatch', 'AWS_CLIENT_PREWARM': '',
+        'LOG_LEVEL': 'WARNING'
+    })
+    server, webhooks = start_webhook_sink(args.webhook_latency_ms)
+    os.environ['SLACK_WEBHOOK_URL'] = f'http://127.0.0.1:{server.server_port}/services/bench'
+
+    from moto import mock_aws
+    with mock_aws():
+        import aws_clients
+        import structured_logging
+
+        recorder = CallRecorder()
+        # Registered before any client exists; clients copy the session's hooks when created
+        recorder.install(aws_clients.session())
+        create_resources(aws_clients.session())
+        recorder.calls.clear()
+        structured_logging.logger.stream = open(args.log_file or os.devnull, 'w')
+
+        import agent
+        import ingestion
+        import notification
+
+        invoker = LocalLambda(recorder)
+        invoker.handlers = {AGENT_FUNCTION: agent.handler, NOTIFICATION_FUNCTION: notification.handler}
+        ingestion.lambda_client = agent.lambda_client = invoker
+        agent.bedrock = StubBedrock(recorder, args.bedrock_latency_ms, args.bedrock_jitter_ms, args.seed)
+
+        incident_ids = []
+        ingestion_ms = []
+        started = time.perf_counter()
+        def ingest(event):
+            context = types.SimpleNamespace(aws_request_id=event['id'], function_name='bench-ingestion')
+            request_started = time.perf_counter()
+            response = ingestion.handler(event, context)
+            ingestion_ms.append((time.perf_counter() - request_started) * 1000)
+            incident_ids.append(json.loads(response['body']).get('incidentId'))
+            invoker.drain()
+
+        alarm_storm.replay(itertools.islice(storm_events(args), args.incidents), args.speed, ingest)
+        wall = time.perf_counter() - started
+
+        phases = {}
+        statuses = {}
+        for incident_id in incident_ids:
+            incident = agent.load_incident(incident_id) or {}
+            statuses[incident.get('status', 'MISSING')] = statuses.get(incident.get('status', 'MISSING'), 0) + 1
+            for phase, timing in (incident.get('timings') or {}).items():
+                phases.setdefault(phase, []).append(float(timing['durationMs']))
+
+    server.shutdown()
+    latency = {'ingestion': summarize(ingestion_ms)}
+    latency['agent'] = summarize(invoker.latencies.get(AGENT_FUNCTION, []))
+    latency['notification'] = summarize(invoker.latencies.get(NOTIFICATION_FUNCTION, []))
+    for phase in agent.AGENT_PHASES:
+        latency[f'phase.{phase}'] = summarize(phases.get(phase, []))
+
+    return {
+        'commit': current_commit(),
+        'config': {
+            'incidents': args.incidents, 'scenario': args.scenario, 'replay': args.replay,
+            'speed': args.speed, 'seed': args.seed,
+            'bedrockLatencyMs': args.bedrock_latency_ms, 'bedrockJitterMs': args.bedrock_jitter_ms,
+            'webhookLatencyMs': args.webhook_latency_ms
+        },
+        'wallSeconds': round(wall, 3),
+        'incidentsPerSecond': round(len(incident_ids) / wall, 2),
+        'statuses': statuses,
+        'latencyMs': latency,
+        'awsCalls': recorder.report(),
+        'webhookRequests': webhooks['requests']
+    }
+
+def print_report(report):
+    print(f"commit {report['commit']}  {report['config']}")
+    print(f"{report['config']['incidents']} incidents in {report['wallSeconds']:.2f}s "
+          f"= {report['incidentsPerSecond']:.1f} incidents/s   statuses {report['statuses']}   "
+          f"webhooks {report['webhookRequests']}")
+    print(f"\n{'latency (ms)':<22} {'count':>6} {'p50':>9} {'p95':>9} {'p99':>9}")
+    for name, stats in report['latencyMs'].items():
+        if stats['count']:
+            print(f"{name:<22} {stats['count']:>6} {stats['p50']:>9.1f} {stats['p95']:>9.1f} {stats['p99']:>9.1f}")
+    print(f"\n{'aws call':<40} {'count':>7} {'total ms':>10}")
+    for name, entry in report['awsCalls'].items():
+        print(f"{name:<40} {entry['count']:>7} {entry['totalMs']:>10.1f}")
+
+def compare(report, baseline, max_regression):
+    """Print p95/throughput changes against a baseline report; return the regressions."""
+    regressions = []
+    print(f"\ncompared with {baseline.get('commit')}:")
+    for name, stats in report['latencyMs'].items():
+        before = baseline.get('latencyMs', {}).get(name, {}).get('p95')
+        if not (before and stats['p95']):
+            continue
+        change = stats['p95'] / before - 1
+        flag = '  REGRESSION' if change > max_regression else ''
+        print(f"  {name:<22} p95 {before:>9.1f} -> {stats['p95']:>9.1f} ms ({change:+.0%}){flag}")
+        if flag:
+            regressions.append(name)
+    before = baseline.get('incidentsPerSecond')
+    if before:
+        change = report['incidentsPerSecond'] / before - 1
+        flag = '  REGRESSION' if -change > max_regression else ''
+        print(f"  {'throughput':<22} {before:>13.1f} -> {report['incidentsPerSecond']:>9.1f} /s ({change:+.0%}){flag}")
+        if flag:
+            regressions.append('throughput')
+    for name, entry in report['awsCalls'].items():
+        before = baseline.get('awsCalls', {}).get(name, {}).get('count')
+        if before is not None and before != entry['count']:
+            print(f"  {name:<22} calls {before} -> {entry['count']}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--incidents', type=int, default=100, help='alarms in the storm')
+    parser.add_argument('--scenario', default='steady', help='alarm_storm scenario mix, e.g. steady=0.7,cascade=0.3')
+    parser.add_argument('--replay', help='recorded events file (JSON lines) instead of a generated storm')
+    parser.add_argument('--speed', type=float, default=0.0, help='replay time compression (0 = as fast as possible)')
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--bedrock-latency-ms', type=float, default=250.0)
+    parser.add_argument('--bedrock-jitter-ms', type=float, default=50.0)
+    parser.add_argument('--webhook-latency-ms', type=float, default=20.0)
+    parser.add_argument('--log-file', help='keep the handlers\' log lines and EMF documents here')
+    parser.add_argument('--output', help='write the report as JSON')
+    parser.add_argument('--compare', help='baseline JSON report to compare against')
+    parser.add_argument('--max-regression', type=float, default=0.2, help='allowed p95/throughput regression (0.2 = 20%%)')
+    args = parser.parse_args()
+
+    report = run_pipeline(args)
+    print_report(report)
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump(report, output, indent=2)
+    if args.compare:
+        with open(args.compare) as baseline:
+            if compare(report, json.load(baseline), args.max_regression):
+                sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+"""
+Micro-benchmark: encoding representative incident documents.
+
+Compares the previous ``json.dumps(default=str)`` calls with the shared
+serialization module (orjson when installed, and its stdlib fallback), the
+ETag-keyed body cache, and the DynamoDB conversion of agent phase output.
+
+Usage:
+    python backend/benchmarks/bench_serialization.py [--number N]
+"""
+import argparse
+import json
+import os
+import sys
+import timeit
+from decimal import Decimal
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../layers/shared/python'))
+
+import serialization  # noqa: E402
+
+def incident_document(n):
+    """A resolved incident as read from DynamoDB: Decimal numbers, nested diagnosis and plan."""
+    return {
+        'incidentId': f'inc-{n:06d}-7f3a9c1e-2b4d-4e8f-9a6b',
+        'title': 'CloudWatch Alarm: HighCPUAlarm',
+        'description': 'Threshold Crossed: 1 datapoint [93.2] was greater than the threshold (90.0).',
+        'severity': 'HIGH',
+        'status': 'RESOLVED',
+        'source': 'cloudwatch',
+        'version': Decimal(6),
+        'createdAt': '2025-01-15T10:00:00',
+        'updatedAt': '2025-01-15T10:31:12',
+        'requiresApproval': False,
+        'metadata': {'alarmName': 'HighCPUAlarm', 'region': 'us-east-1', 'accountId': '123456789012'},
+        'diagnosis': {
+            'rootCause': 'A runaway worker process pinned all vCPUs after a deploy.',
+            'confidence': Decimal('0.87'),
+            'affectedResources': ['i-0abc123def4567890', 'asg-web-prod'],
+            'evidence': ['CPUUtilization 99% for 15m', 'worker restarts: 0']
+        },
+        'plan': {
+            'actions': [
+                {'type': 'ssm_command', 'target': 'i-0abc123def4567890', 'command': 'systemctl restart worker'},
+                {'type': 'scale', 'target': 'asg-web-prod', 'desired': Decimal(4)}
+            ],
+            'requiresApproval': False,
+            'success': True
+        },
+        'actionsTaken': [
+            {'action': 'ssm_command', 'status': 'SUCCESS', 'durationMs': Decimal(1834)},
+            {'action': 'scale', 'status': 'SUCCESS', 'durationMs': Decimal(422)}
+        ]
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--number', type=int, default=2000, help='encodings per measurement')
+    args = parser.parse_args()
+
+    incident = incident_document(1)
+    listing = {'incidents': [incident_document(n) for n in range(50)]}
+    phase_output = json.loads(serialization.dumps(incident['plan']))  # plain floats, as Bedrock returns them
+    cache = serialization.EncodedCache()
+
+    def measure(label, func):
+        per_call = timeit.timeit(func, number=args.number) / args.number * 1e6
+        print(f"{label:<44} {per_call:>9.1f} us")
+
+    print(f"encoder: {'orjson' if serialization.orjson else 'json (stdlib)'}")
+    for name, document in (('incident', incident), ('list of 50 incidents', listing)):
+        measure(f"{name}: json.dumps(default=str)", lambda: json.dumps(document, default=str))
+        measure(f"{name}: serialization.dumps", lambda: serialization.dumps(document))
+        measure(f"{name}: serialization.dumps_bytes", lambda: serialization.dumps_bytes(document))
+        measure(f"{name}: EncodedCache hit", lambda: cache.dumps(name, document))
+
+    measure("phase output: json round-trip to Decimal",
+            lambda: json.loads(json.dumps(phase_output, default=str), parse_float=Decimal))
+    measure("phase output: serialization.to_item_value", lambda: serialization.to_item_value(phase_output))
+
+    if serialization.orjson:
+        orjson, serialization.orjson = serialization.orjson, None
+        measure("list of 50 incidents: stdlib fallback", lambda: serialization.dumps(listing))
+        serialization.orjson = orjson
+
+if __name__ == '__main__':
+    main()
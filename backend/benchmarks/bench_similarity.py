@@ -0,0 +1,65 @@
+"""
+Micro-benchmark: signature and k-nearest lookup time of the similar-incident index.
+
+Usage:
+    python backend/benchmarks/bench_similarity.py [--incidents N] [--queries Q]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../layers/shared/python'))
+
+from similarity import SimilarityIndex, incident_signature  # noqa: E402
+
+ALARMS = ['HighCPUAlarm', 'HighMemoryAlarm', 'DiskFull', 'DatabaseConnections', 'Http5xxRate',
+          'LatencyP99', 'QueueBacklog', 'ThrottledRequests', 'UnhealthyHosts', 'LambdaErrors']
+LOG_LINES = [
+    'ERROR request {id} timed out after {n} ms on {ip}',
+    'WARN connection pool exhausted ({n} active) for db-{n}',
+    'ERROR OutOfMemoryError in worker {n} heap {n} MB',
+    'INFO retrying call to {ip} attempt {n}',
+    'ERROR disk /dev/xvd{c} usage {n}%'
+]
+
+def synthetic_incident(rng):
+    alarm = rng.choice(ALARMS)
+    logs = [
+        line.format(id=f'{rng.getrandbits(32):08x}-1111-2222-3333-{rng.getrandbits(48):012x}',
+                    n=rng.randint(1, 9999), ip=f'10.0.{rng.randint(0, 255)}.{rng.randint(0, 255)}',
+                    c=rng.choice('abcdef'))
+        for line in rng.sample(LOG_LINES, 3)
+    ]
+    incident = {
+        'title': f'CloudWatch Alarm: {alarm}',
+        'description': f'Threshold Crossed: 1 datapoint [{rng.uniform(50, 99):.1f}] was greater than the threshold for {alarm}.'
+    }
+    return incident, logs
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--incidents', type=int, default=10000, help='resolved incidents in the index')
+    parser.add_argument('--queries', type=int, default=200, help='lookups to time')
+    args = parser.parse_args()
+
+    rng = random.Random(11)
+    index = SimilarityIndex()
+    start = time.perf_counter()
+    for n in range(args.incidents):
+        incident, logs = synthetic_incident(rng)
+        index.add(f'inc-{n}', incident_signature(incident, logs), {'title': incident['title']})
+    build = time.perf_counter() - start
+
+    queries = [incident_signature(*synthetic_incident(rng)) for _ in range(args.queries)]
+    start = time.perf_counter()
+    for sig in queries:
+        index.query(sig, k=3, min_similarity=0.3)
+    lookup = time.perf_counter() - start
+
+    print(f"{args.incidents} incidents indexed in {build:.2f}s ({build / args.incidents * 1e3:.3f} ms/incident incl. signature)")
+    print(f"k=3 lookup: {lookup / args.queries * 1e3:.3f} ms/query")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,136 @@
+"""
+List and summarize the profiles stored by ``profiling.profiled``.
+
+Profiles live in ``PROFILES_BUCKET`` under ``profiles/<incidentId>/``, one
+gzipped object per kind and invocation:
+
+- ``*.pstats.gz``: cProfile data; shown as the top functions by cumulative
+  and by own time;
+- ``*.folded.gz``: sampled stacks; shown as the functions most often on top
+  of the stack (self) and anywhere in it (total), and the hottest stacks.
+  ``gunzip`` it and feed it to flamegraph.pl or speedscope for a flame graph;
+- ``*.memory.json.gz``: tracemalloc peak and largest allocation sites.
+
+Usage:
+    python backend/benchmarks/profile_report.py --bucket BUCKET list --incident INCIDENT_ID
+    python backend/benchmarks/profile_report.py --bucket BUCKET show profiles/INC-1/...pstats.gz [--top 20]
+    python backend/benchmarks/profile_report.py show ./downloaded.folded.gz
+"""
+import argparse
+import gzip
+import io
+import marshal
+import os
+import pstats
+import sys
+from collections import Counter
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../layers/shared/python'))
+
+from serialization import loads  # noqa: E402
+
+PROFILE_PREFIX = 'profiles'
+
+def read_artifact(key, bucket=None):
+    """The decompressed artifact, from a local file or from S3."""
+    if os.path.exists(key):
+        with open(key, 'rb') as f:
+            body = f.read()
+    else:
+        import boto3
+        body = boto3.client('s3').get_object(Bucket=bucket, Key=key)['Body'].read()
+    return gzip.decompress(body)
+
+class LoadedStats:
+    """Marshalled pstats data in the shape ``pstats.Stats`` loads from a profiler."""
+
+    def __init__(self, stats):
+        self.stats = stats
+
+    def create_stats(self):
+        pass
+
+def pstats_report(data, top):
+    out = io.StringIO()
+    stats = pstats.Stats(LoadedStats(marshal.loads(data)), stream=out)
+    for title, sort_key in (('cumulative', 'cumulative'), ('own time', 'tottime')):
+        out.write(f'== top {top} by {title} ==\n')
+        stats.sort_stats(sort_key).print_stats(top)
+    return out.getvalue().rstrip()
+
+def folded_report(data, top):
+    stacks = Counter()
+    for line in data.decode('utf-8').splitlines():
+        stack, _, count = line.rpartition(' ')
+        if stack:
+            stacks[stack] += int(count)
+    total = sum(stacks.values()) or 1
+    own, anywhere = Counter(), Counter()
+    for stack, count in stacks.items():
+        frames = stack.split(';')
+        own[frames[-1]] += count
+        for frame in set(frames):
+            anywhere[frame] += count
+    lines = [f'{total} samples']
+    for title, counter in (('self', own), ('total', anywhere)):
+        lines.append(f'== top {top} functions by {title} samples ==')
+        lines.extend(f'{count / total:7.1%}  {frame}' for frame, count in counter.most_common(top))
+    lines.append('== hottest stacks ==')
+    for stack, count in stacks.most_common(min(top, 5)):
+        lines.append(f'{count / total:7.1%}  ' + ' > '.join(stack.split(';')[-6:]))
+    return '\n'.join(lines)
+
+def memory_report(data, top):
+    summary = loads(data)
+    lines = [
+        f"elapsed {summary['elapsedMs']} ms, peak {summary['peakBytes'] / 1024:.1f} KiB, "
+        f"still allocated {summary['currentBytes'] / 1024:.1f} KiB",
+        f'== top {top} allocation sites =='
+    ]
+    for stat in summary['top'][:top]:
+        site = stat['traceback'][0] if stat['traceback'] else '?'
+        lines.append(f"{stat['size'] / 1024:10.1f} KiB {stat['count']:7d} blocks  {site}")
+    return '\n'.join(lines)
+
+def render(key, data, top):
+    if key.endswith('.pstats.gz'):
+        return pstats_report(data, top)
+    if key.endswith('.folded.gz'):
+        return folded_report(data, top)
+    if key.endswith('.memory.json.gz'):
+        return memory_report(data, top)
+    raise ValueError(f'unknown profile kind: {key}')
+
+def list_profiles(bucket, incident_id=None):
+    import boto3
+    prefix = f'{PROFILE_PREFIX}/{incident_id}/' if incident_id else f'{PROFILE_PREFIX}/'
+    pages = boto3.client('s3').get_paginator('list_objects_v2').paginate(Bucket=bucket, Prefix=prefix)
+    for page in pages:
+        for item in page.get('Contents', []):
+            yield item['Key'], item['Size']
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--bucket', default=os.environ.get('PROFILES_BUCKET') or os.environ.get('POSTMORTEMS_BUCKET'))
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    list_parser = commands.add_parser('list', help='list stored profiles')
+    list_parser.add_argument('--incident', help='only this incident')
+
+    show = commands.add_parser('show', help='summarize one profile')
+    show.add_argument('key', help='S3 key or local file')
+    show.add_argument('--top', type=int, default=20)
+
+    args = parser.parse_args()
+    if args.command == 'list':
+        if not args.bucket:
+            parser.error('--bucket (or PROFILES_BUCKET) is required')
+        for key, size in list_profiles(args.bucket, args.incident):
+            print(f'{size:10d}  {key}')
+    else:
+        if not os.path.exists(args.key) and not args.bucket:
+            parser.error('--bucket (or PROFILES_BUCKET) is required for S3 keys')
+        print(render(args.key, read_artifact(args.key, args.bucket), args.top))
+
+if __name__ == '__main__':
+    main()
@@ -1,29 +1,101 @@
-import json
+import hashlib
 import os
-import boto3
-from datetime import datetime
+import re
+import time
+from botocore.exceptions import ClientError
+from datetime import date, datetime, timedelta
 
-dynamodb = boto3.resource('dynamodb')
-bedrock = boto3.client('bedrock-runtime')
-cloudwatch = boto3.client('cloudwatch')
-logs_client = boto3.client('logs')
-s3 = boto3.client('s3')
-lambda_client = boto3.client('lambda')
+import aws_clients
+import incident_store
+from archive_store import ARCHIVE_STATUSES, MAX_QUERY_DAYS, archive_expiry, query_archive
+from incident_cache import IncidentCache
+from incident_stats import apply_updates, read_stats, transition_updates
+from metrics import emit, timings
+from plan_templates import ANALYSIS_SCHEMA, PlanTemplates, instantiate, validate_analysis
+from postmortem_store import read_index, read_postmortem
+from priority_queue import release_lease
+from profiling import profiled
+from router import Router
+from serialization import EncodedCache, dumps, dumps_bytes, loads, to_item_value
+from similar_incidents import SimilarIncidentStore
+from similarity import incident_signature
+from slack_interactions import parse_interaction, raw_body, verify_signature
+from structured_output import repair_json, tool_input
+from tenancy import DEFAULT_TENANT, TenantClients, tenant_id
+from utils import format_response, log_event, logged_handler, parse_event_body
+
+# Created on first use; most invocations need one or two of these
+dynamodb = aws_clients.lazy_resource('dynamodb')
+bedrock = aws_clients.lazy_client('bedrock-runtime')
+cloudwatch = aws_clients.lazy_client('cloudwatch')
+logs_client = aws_clients.lazy_client('logs')
+s3 = aws_clients.lazy_client('s3')
+lambda_client = aws_clients.lazy_client('lambda')
+stepfunctions = aws_clients.lazy_client('stepfunctions')
 
 INCIDENTS_TABLE = os.environ['INCIDENTS_TABLE']
 BEDROCK_MODEL_ID = os.environ['BEDROCK_MODEL_ID']
 RUNBOOKS_BUCKET = os.environ['RUNBOOKS_BUCKET']
 POSTMORTEMS_BUCKET = os.environ['POSTMORTEMS_BUCKET']
+STATS_TABLE = os.environ.get('STATS_TABLE', '')
+INCIDENT_CACHE_TTL_SECONDS = float(os.environ.get('INCIDENT_CACHE_TTL_SECONDS', '2'))
+# GET /incidents page sizes; the default page is the one cached per container
+LIST_DEFAULT_LIMIT = 50
+LIST_MAX_LIMIT = 500
+LIST_CURSOR_LAG_SECONDS = float(os.environ.get('LIST_CURSOR_LAG_SECONDS', '10'))
+ARCHIVE_AFTER_DAYS = int(os.environ.get('ARCHIVE_AFTER_DAYS', '30'))
+STATE_MACHINE_ARN = os.environ.get('STATE_MACHINE_ARN', '')
+SIMILARITY_MIN_SCORE = float(os.environ.get('SIMILARITY_MIN_SCORE', '0.3'))
+SIMILARITY_REUSE_THRESHOLD = float(os.environ.get('SIMILARITY_REUSE_THRESHOLD', '0.85'))
+SLACK_SIGNING_SECRET = os.environ.get('SLACK_SIGNING_SECRET', '')
+PLAN_TEMPLATE_REFRESH_SECONDS = float(os.environ.get('PLAN_TEMPLATE_REFRESH_SECONDS', '900'))
+# Runs are dispatched by the priority scheduler and hold a slot until they finish
+AGENT_SCHEDULED = os.environ.get('AGENT_SCHEDULED', '').lower() == 'true'
+AGENT_METRICS_NAMESPACE = 'ResiliBot/Agent'
+# An approve or deny decision is only recorded while the incident waits for one;
+# OPEN only counts before the agent has started on an incident that needs approval
+DECIDABLE_STATUSES = ('OPEN', 'PENDING_APPROVAL')
+# A concurrent write touching these invalidates updates computed before it
+CONFLICT_ATTRIBUTES = ('status', 'agentPhase')
+
+table = aws_clients.lazy_table(INCIDENTS_TABLE)
 
-table = dynamodb.Table(INCIDENTS_TABLE)
+# Read model shared by warm invocations of this container
+incident_cache = IncidentCache(ttl_seconds=INCIDENT_CACHE_TTL_SECONDS)
+incident_list_cache = {'expiresAt': 0.0, 'incidents': None}
+similar_incident_store = SimilarIncidentStore(s3, POSTMORTEMS_BUCKET)
+# Observation runs in the incident's own account and region
+tenant_clients = TenantClients.from_env()
+plan_template_store = PlanTemplates(s3, RUNBOOKS_BUCKET, refresh_seconds=PLAN_TEMPLATE_REFRESH_SECONDS)
+# Encoded API bodies keyed by ETag, which names one version of the content
+response_bodies = EncodedCache()
 
+# Clients named in AWS_CLIENT_PREWARM are created during init instead of the first request
+aws_clients.prewarm()
+
+@logged_handler
+@profiled
 def handler(event, context):
     """
     Agent Orchestrator: Implements Observe-Reason-Plan-Act loop
     using Amazon Bedrock for intelligent decision making.
     """
-    print(f"Agent triggered with event: {json.dumps(event)}")
+    timings.reset()
+    
+    # Handle API Gateway reads; these use the short-TTL cache tier
+    if event.get('httpMethod') == 'GET':
+        return handle_api_request(event)
     
+    # Agent runs and approvals read each incident at most once per invocation
+    incident_cache.begin_invocation()
+    try:
+        return dispatch_event(event)
+    finally:
+        incident_cache.end_invocation()
+        log_event('agent.incident_cache', incident_cache.stats(), level='DEBUG')
+
+def dispatch_event(event):
+    """Route API writes, approval actions and direct agent invocations."""
     # Handle API Gateway requests
     if 'httpMethod' in event:
         return handle_api_request(event)
@@ -37,94 +109,325 @@ def handler(event, context):
     if not incident_id:
         return {'error': 'Missing incidentId'}
     
+    # One checkpointed phase, called by the Step Functions state machine;
+    # errors propagate so the state machine retries the phase
+    if event.get('action') == 'step':
+        result = run_agent_phase(incident_id)
+        if result.get('done'):
+            release_agent_slot(incident_id)
+        return result
+    
     # Execute agent loop
     try:
-        result = execute_agent_loop(incident_id)
-        return {'statusCode': 200, 'body': json.dumps(result)}
+        if STATE_MACHINE_ARN and event.get('run') != 'local':
+            result = start_agent(incident_id)
+        else:
+            result = execute_agent_loop(incident_id)
+        return {'statusCode': 200, 'body': dumps(result)}
     except Exception as e:
-        print(f"Agent error: {str(e)}")
+        log_event('agent.failed', {'incidentId': incident_id, 'error': str(e)}, level='ERROR')
         return {'statusCode': 500, 'error': str(e)}
 
+api = Router()
+
 def handle_api_request(event):
     """Handle API Gateway requests for incident status."""
-    path = event.get('path', '')
-    method = event.get('httpMethod', 'GET')
+    return api.dispatch(event)
+
+@api.route('POST', '/incidents/{incident_id}/approve')
+def approve_incident_request(event, incident_id):
+    """Approve or deny an incident from the dashboard."""
+    try:
+        body = parse_event_body(event)
+        approval_event = {
+            'action': body.get('action'),  # 'approve' or 'deny'
+            'incidentId': incident_id,
+            'user': body.get('user', 'Unknown'),
+            'reason': body.get('reason')
+        }
+    except Exception as e:
+        return api_response(400, {'error': f'Invalid request: {str(e)}'})
     
-    if '/approve' in path and method == 'POST':
-        # Handle approval request
-        incident_id = path.split('/')[-2]  # Extract incident ID from path like /incidents/{id}/approve
-        
-        try:
-            body = json.loads(event.get('body', '{}'))
-            action = body.get('action')  # 'approve' or 'deny'
-            user = body.get('user', 'Unknown')
-            reason = body.get('reason')
-            
-            approval_event = {
-                'action': action,
-                'incidentId': incident_id,
-                'user': user,
-                'reason': reason
-            }
-            
-            return handle_approval_action(approval_event)
-            
-        except Exception as e:
-            return {
-                'statusCode': 400,
-                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                'body': json.dumps({'error': f'Invalid request: {str(e)}'})
-            }
+    return handle_approval_action(approval_event)
+
+@api.route('POST', '/slack/interactions')
+def slack_interaction_request(event):
+    """Approve or deny from the buttons on a Slack incident message."""
+    body = raw_body(event)
+    if not verify_signature(SLACK_SIGNING_SECRET, event, body):
+        log_event('agent.slack_signature_rejected', {'configured': bool(SLACK_SIGNING_SECRET)}, level='WARNING')
+        return api_response(401, {'error': 'Invalid Slack signature'})
     
-    elif '/incidents/' in path and method == 'GET':
-        # Get specific incident
-        incident_id = path.split('/')[-1]
-        if incident_id == 'approve':  # Handle case where path ends with /approve
-            incident_id = path.split('/')[-2]
-        
-        # Query using partition key only, get the latest entry
-        response = table.query(
-            KeyConditionExpression='incidentId = :id',
-            ExpressionAttributeValues={':id': incident_id},
-            ScanIndexForward=False,  # Sort descending by timestamp
-            Limit=1
-        )
-        
-        items = response.get('Items', [])
-        incident = items[0] if items else {}
-        
+    approval_event = parse_interaction(body)
+    if approval_event:
+        result = handle_approval_action(approval_event)
+        log_event('agent.slack_decision', {
+            'incidentId': approval_event['incidentId'],
+            'action': approval_event['action'],
+            'user': approval_event['user'],
+            'statusCode': result.get('statusCode')
+        })
+    # Slack only needs the acknowledgement; other buttons (e.g. the dashboard link) are ignored
+    return api_response(200)
+
+@api.route('GET', '/stats')
+def get_stats(event):
+    """Dashboard aggregates served from precomputed counters."""
+    if not STATS_TABLE:
+        return api_response(404, {'error': 'Stats are not enabled'})
+    
+    params = event.get('queryStringParameters') or {}
+    try:
+        hours = min(max(int(params.get('hours', 24)), 1), 168)
+    except ValueError:
+        return api_response(400, {'error': 'hours must be an integer'})
+    
+    return api_response(200, read_stats(dynamodb, STATS_TABLE, hours))
+
+@api.route('GET', '/archive')
+def get_archive(event):
+    """Expired incidents, read on demand from the S3 archive."""
+    return query_archived_incidents(event.get('queryStringParameters') or {})
+
+@api.route('GET', '/postmortems')
+def list_postmortems(event):
+    """A month's postmortems from its index manifest, without listing the bucket."""
+    params = event.get('queryStringParameters') or {}
+    month = params.get('month') or datetime.utcnow().strftime('%Y-%m')
+    if not re.fullmatch(r'\d{4}-\d{2}', month):
+        return api_response(400, {'error': 'month must be YYYY-MM'})
+    
+    entries, _ = read_index(s3, POSTMORTEMS_BUCKET, month)
+    return api_response(200, {'month': month, 'postmortems': entries})
+
+@api.route('GET', '/incidents/{incident_id}/postmortem')
+def get_postmortem(event, incident_id):
+    """One postmortem, located through the index of the month it was resolved in."""
+    incident = get_incident(incident_id)
+    resolved_at = str((incident or {}).get('resolvedAt') or (incident or {}).get('updatedAt') or '')
+    params = event.get('queryStringParameters') or {}
+    month = params.get('month') or resolved_at[:7]
+    entries, _ = read_index(s3, POSTMORTEMS_BUCKET, month) if re.fullmatch(r'\d{4}-\d{2}', month) else ([], None)
+    entry = next((entry for entry in entries if entry['incidentId'] == incident_id), None)
+    if not entry:
+        return api_response(404, {'error': 'Postmortem not found', 'incidentId': incident_id})
+    
+    return api_response(200, read_postmortem(s3, POSTMORTEMS_BUCKET, entry))
+
+@api.route('GET', '/incidents/{incident_id}/timeline')
+def get_incident_timeline(event, incident_id):
+    """Version history of one incident, a single query on its partition."""
+    events = incident_store.get_timeline(table, incident_id)
+    if not events:
+        return api_response(404, {'error': 'Incident not found'})
+    
+    return api_response(200, {'incidentId': incident_id, 'events': events})
+
+@api.route('GET', '/incidents/{incident_id}')
+def get_incident_request(event, incident_id):
+    hits = incident_cache.hits
+    incident = get_incident(incident_id)
+    cache_status = {'X-Cache': 'HIT' if incident_cache.hits > hits else 'MISS'}
+    if not incident:
+        return api_response(404, {'error': 'Incident not found'}, headers=cache_status)
+    
+    etag = incident_etag(incident)
+    if etag_matches(event, etag):
+        return api_response(304, headers={'ETag': etag, **cache_status})
+    
+    return api_response(200, response_bodies.dumps(etag, incident), headers={'ETag': etag, **cache_status})
+
+@api.route('GET', '/incidents')
+def list_incidents_request(event):
+    """List incidents, most recently updated first."""
+    params = event.get('queryStringParameters') or {}
+    since = parse_since(params.get('since'))
+    severity = (params.get('severity') or '').upper() or None
+    if severity and severity not in incident_store.SEVERITIES:
+        return api_response(400, {'error': f"severity must be one of {', '.join(incident_store.SEVERITIES)}"})
+    try:
+        limit = min(max(int(params.get('limit', LIST_DEFAULT_LIMIT)), 1), LIST_MAX_LIMIT)
+    except ValueError:
+        return api_response(400, {'error': 'limit must be an integer'})
+    
+    if params.get('status', '').lower() == 'open':
+        # Active incidents come from the sparse open-by-severity index
+        incidents = incident_store.list_open_incidents(table, severity, limit=limit)
+    elif since:
+        # Only incidents updated after the cursor, a range query on the updatedAt index, one page
+        # at a time. While pages remain the cursor resumes after the last change returned; the
+        # final page's cursor stays LIST_CURSOR_LAG_SECONDS behind the clock, since updatedAt is
+        # stamped before the write commits and the index is eventually consistent. Changes in
+        # that window are returned again, and clients dedupe them by incidentId and version
+        incidents, last_key, more = incident_store.list_changes(table, since, limit)
+        horizon = (datetime.utcnow() - timedelta(seconds=LIST_CURSOR_LAG_SECONDS)).isoformat()
+        cursor = last_key if more else min(last_key or since, horizon)
+    elif limit > LIST_DEFAULT_LIMIT:
+        incidents = incident_store.list_incidents(table, limit=limit)
+    else:
+        if incident_list_cache['expiresAt'] <= time.monotonic():
+            incident_list_cache.update(
+                expiresAt=time.monotonic() + INCIDENT_CACHE_TTL_SECONDS,
+                incidents=incident_store.list_incidents(table, limit=LIST_DEFAULT_LIMIT)
+            )
+        incidents = incident_list_cache['incidents'][:limit]
+    
+    etag = list_etag(incidents, since)
+    if etag_matches(event, etag):
+        return api_response(304, headers={'ETag': etag})
+    
+    if since:
+        # The cursor differs per request, so these bodies are not reused
+        return api_response(200, {'incidents': incidents, 'cursor': cursor, 'more': more}, headers={'ETag': etag})
+    
+    key = ('list', params.get('status', '').lower(), severity, limit, etag)
+    return api_response(200, response_bodies.dumps(key, {'incidents': incidents}), headers={'ETag': etag})
+
+def query_archived_incidents(params):
+    """Search archived incidents by day range, ID, severity, status or text."""
+    try:
+        end = date.fromisoformat(params['to']) if params.get('to') else datetime.utcnow().date()
+        start = date.fromisoformat(params['from']) if params.get('from') else end - timedelta(days=6)
+        limit = min(max(int(params.get('limit', 50)), 1), 500)
+    except ValueError:
+        return api_response(400, {'error': 'from/to must be YYYY-MM-DD and limit an integer'})
+    
+    if start > end or (end - start).days >= MAX_QUERY_DAYS:
+        return api_response(400, {'error': f'Date range must cover 1 to {MAX_QUERY_DAYS} days'})
+    
+    incident_id = params.get('incidentId')
+    severity = (params.get('severity') or '').upper()
+    status = (params.get('status') or '').upper()
+    text = (params.get('q') or '').lower()
+    
+    def matches(incident):
+        if incident_id and incident.get('incidentId') != incident_id:
+            return False
+        if severity and incident.get('severity') != severity:
+            return False
+        if status and incident.get('status') != status:
+            return False
+        if text and text not in f"{incident.get('title', '')} {incident.get('description', '')}".lower():
+            return False
+        return True
+    
+    records = query_archive(s3, POSTMORTEMS_BUCKET, start, end, matches, limit)
+    body = {
+        'from': start.isoformat(),
+        'to': end.isoformat(),
+        'incidents': [record['incident'] for record in records]
+    }
+    if incident_id and records:
+        body['events'] = records[0]['events']
+    return api_response(200, body)
+
+def api_response(status_code, body=None, headers=None):
+    """Build an API Gateway response; 304 responses carry no body."""
+    return format_response(status_code, body, {
+        'Access-Control-Expose-Headers': 'ETag',
+        # Let browsers cache the body but revalidate it with If-None-Match every time
+        'Cache-Control': 'no-cache',
+        **(headers or {})
+    })
+
+def incident_etag(incident):
+    """Per-incident ETag derived from the version attribute bumped on every update."""
+    version = incident.get('version')
+    if version is None:
+        # Items written before versioning fall back to their last update time
+        version = incident.get('updatedAt') or incident.get('createdAt') or incident.get('timestamp', 0)
+    return f'"{incident.get("incidentId")}-{version}"'
+
+def list_etag(incidents, since=None):
+    """ETag for a list response, derived from the member incidents' ETags."""
+    digest = hashlib.sha1((since or '').encode('utf-8'))
+    for tag in sorted(incident_etag(incident) for incident in incidents):
+        digest.update(tag.encode('utf-8'))
+    return f'"{digest.hexdigest()[:20]}"'
+
+def etag_matches(event, etag):
+    """Check the request's If-None-Match header against an ETag."""
+    headers = event.get('headers') or {}
+    if_none_match = next((v for k, v in headers.items() if k.lower() == 'if-none-match'), None)
+    if not if_none_match:
+        return False
+    
+    candidates = [tag.strip() for tag in if_none_match.split(',')]
+    return '*' in candidates or etag in candidates or f'W/{etag}' in candidates
+
+def parse_since(value):
+    """Normalize a since cursor (ISO-8601 or epoch milliseconds) to an ISO string."""
+    if not value:
+        return None
+    
+    if value.isdigit():
+        return datetime.utcfromtimestamp(int(value) / 1000).isoformat()
+    return value.rstrip('Z')
+
+def execute_agent_loop(incident_id):
+    """Run the agent phases in-process until the incident finishes or waits for approval."""
+    result = {}
+    # One step per phase plus the approval gate
+    for _ in range(len(AGENT_PHASES) + 1):
+        result = run_agent_phase(incident_id)
+        if result.get('done'):
+            break
+    release_agent_slot(incident_id)
+    
+    incident = get_incident(incident_id)
+    if incident.get('status') == 'PENDING_APPROVAL':
         return {
-            'statusCode': 200 if incident else 404,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps(incident if incident else {'error': 'Incident not found'}, default=str)
+            'incidentId': incident_id,
+            'status': 'PENDING_APPROVAL',
+            'message': 'Waiting for user approval to proceed with incident analysis'
         }
-    else:
-        # List all incidents - get latest version of each
-        response = table.scan(Limit=50)
-        incidents = response.get('Items', [])
-        
-        # Group by incidentId and keep only the latest (highest timestamp)
-        incident_map = {}
-        for item in incidents:
-            inc_id = item.get('incidentId')
-            timestamp = item.get('timestamp', 0)
-            if inc_id not in incident_map or timestamp > incident_map[inc_id].get('timestamp', 0):
-                incident_map[inc_id] = item
-        
-        unique_incidents = list(incident_map.values())
-        
+    
+    # Check if incident was denied
+    if incident.get('status') == 'DENIED':
         return {
-            'statusCode': 200,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'incidents': unique_incidents}, default=str)
+            'incidentId': incident_id,
+            'status': 'DENIED',
+            'message': 'Incident processing was denied by user'
         }
+    
+    return {
+        'incidentId': incident_id,
+        'diagnosis': incident.get('diagnosis'),
+        'plan': incident.get('plan'),
+        'actionsTaken': incident.get('actionsTaken')
+    }
 
-def execute_agent_loop(incident_id):
-    """Execute the Observe-Reason-Plan-Act agent loop."""
+def release_agent_slot(incident_id):
+    """Give the scheduler back the slot this run was dispatched into."""
+    if not (AGENT_SCHEDULED and STATS_TABLE):
+        return
+    try:
+        release_lease(dynamodb.Table(STATS_TABLE), incident_id)
+    except Exception as e:
+        # The lease expires on its own
+        log_event('agent.slot_release_failed', {'incidentId': incident_id, 'error': str(e)}, level='WARNING')
+
+def run_agent_phase(incident_id):
+    """
+    Run the next phase of the Observe-Reason-Plan-Act loop and checkpoint it.
     
-    # Check if incident requires approval and hasn't been approved yet
+    The phase to run is read from the incident's agentPhase attribute, and the
+    phase output is written in the same versioned update that advances it, so
+    an orchestrator can call this repeatedly and resume after a failure.
+    """
+    mark = timings.mark()
     incident = get_incident(incident_id)
-    if incident.get('requiresApproval', True) and incident.get('status') == 'OPEN':
+    if not incident:
+        return {'incidentId': incident_id, 'done': True, 'error': 'Incident not found'}
+    
+    status = incident.get('status')
+    phase = incident.get('agentPhase') or AGENT_PHASES[0]
+    
+    if phase == AGENT_DONE or status == 'DENIED':
+        return {'incidentId': incident_id, 'phase': phase, 'status': status, 'done': True}
+    
+    # Check if incident requires approval and hasn't been approved yet
+    if phase == AGENT_PHASES[0] and status == 'OPEN' and incident.get('requiresApproval', True):
         # Send notification requesting approval
         send_approval_notification(incident_id, incident)
         
@@ -134,89 +437,283 @@ def execute_agent_loop(incident_id):
             'updatedAt': datetime.utcnow().isoformat(),
             'approvalRequested': True
         })
-        
-        return {
-            'incidentId': incident_id,
-            'status': 'PENDING_APPROVAL',
-            'message': 'Waiting for user approval to proceed with incident analysis'
-        }
+        status = 'PENDING_APPROVAL'
     
-    # Check if incident was denied
-    if incident.get('status') == 'DENIED':
+    if status == 'PENDING_APPROVAL':
+        # The approval endpoint resumes the agent
+        return {'incidentId': incident_id, 'phase': phase, 'status': status, 'done': True}
+    
+    log_event('agent.phase', {'incidentId': incident_id, 'phase': phase})
+    with timings.timer('phase'):
+        updates = PHASE_HANDLERS[phase](incident)
+    # A phase that waits for approval keeps its own agentPhase and is run again on resume
+    next_phase = updates.setdefault(
+        'agentPhase', AGENT_PHASES[AGENT_PHASES.index(phase) + 1] if phase != AGENT_PHASES[-1] else AGENT_DONE
+    )
+    # Per-phase breakdown for the dashboard; the checkpoint write itself is only in the metrics
+    updates['timings'] = to_item_value({**(incident.get('timings') or {}), phase: phase_timing(timings.since(mark))})
+    updated = update_incident(incident_id, updates)
+    emit_phase_metrics(incident, phase, timings.since(mark))
+    if updated is None:
+        # Denied or advanced by another run meanwhile; this run's output is dropped
+        current = get_incident(incident_id) or {}
         return {
             'incidentId': incident_id,
-            'status': 'DENIED',
-            'message': 'Incident processing was denied by user'
+            'phase': current.get('agentPhase', phase),
+            'status': current.get('status', status),
+            'done': True
         }
     
-    # Proceed with normal agent loop if approved or auto-approved
-    # 1. OBSERVE: Gather context
-    print(f"[OBSERVE] Gathering data for incident {incident_id}")
+    return {
+        'incidentId': incident_id,
+        'phase': next_phase,
+        'status': updated.get('status', status),
+        'done': next_phase == AGENT_DONE or updated.get('status') == 'PENDING_APPROVAL'
+    }
+
+def phase_timing(spent):
+    """Stored breakdown of one phase: its duration and the time in each external call."""
+    return {
+        'durationMs': spent.get('phase', 0.0),
+        'calls': {name: ms for name, ms in spent.items() if name != 'phase'}
+    }
+
+def emit_phase_metrics(incident, phase, spent):
+    """Phase duration and external call latencies as EMF metrics."""
+    emit(
+        {('PhaseDuration' if name == 'phase' else name): ms for name, ms in spent.items()},
+        {
+            'Phase': phase,
+            'Severity': incident.get('severity', 'UNKNOWN'),
+            'Source': incident.get('source', 'unknown')
+        },
+        dimension_sets=[['Phase'], ['Phase', 'Severity', 'Source']],
+        properties={'incidentId': incident['incidentId']},
+        namespace=AGENT_METRICS_NAMESPACE
+    )
+
+def observe_phase(incident):
+    """OBSERVE: gather metrics, logs, runbooks and similar resolved incidents."""
     metrics = observe_metrics(incident)
     logs = observe_logs(incident)
     runbooks = retrieve_runbooks(incident)
+    similar = find_similar_incidents(incident['incidentId'], incident_signature(incident, logs), tenant_id(incident))
     
-    context = {
-        'incident': incident,
-        'metrics': metrics,
-        'logs': logs,
-        'runbooks': runbooks
+    # Stored as JSON text: metric datapoints carry floats and datetimes DynamoDB cannot hold
+    observation = {
+        'metrics': metrics[:5],
+        'logs': logs[:50],
+        'runbooks': [runbook.strip().split('\n', 1)[0][:200] for runbook in runbooks],
+        'similarIncidents': similar
     }
+    return {'observation': dumps(observation)}
+
+def reason_phase(incident):
+    """REASON: diagnose the root cause with Bedrock, or reuse a near-duplicate's diagnosis."""
+    context = observation_context(incident)
+    similar = context['similarIncidents']
     
-    # 2. REASON: Use Bedrock LLM for root cause analysis
-    print(f"[REASON] Analyzing root cause")
-    diagnosis = reason_with_bedrock(context)
+    # A near-duplicate of a resolved incident reuses its diagnosis and plan
+    reused = similar[0] if similar and similar[0]['similarity'] >= SIMILARITY_REUSE_THRESHOLD else None
+    if reused and reused.get('plan'):
+        log_event('agent.reason', {'incidentId': incident['incidentId'], 'reusedFrom': reused['incidentId'], 'similarity': reused['similarity']})
+        diagnosis = {
+            **(reused.get('diagnosis') or {}),
+            'reusedFrom': reused['incidentId'],
+            'similarity': reused['similarity']
+        }
+    else:
+        log_event('agent.reason', {'incidentId': incident['incidentId'], 'model': BEDROCK_MODEL_ID})
+        diagnosis = reason_with_bedrock(context)
     
     # Send notification after diagnosis
-    send_notification(incident_id, incident, diagnosis, 'IN_PROGRESS')
-    
-    # 3. PLAN: Generate remediation strategy
-    print(f"[PLAN] Creating remediation plan")
-    plan = plan_remediation(diagnosis, context)
-    
-    # 4. ACT: Execute safe actions (with approval check for unsafe actions)
-    print(f"[ACT] Executing remediation")
-    actions_taken = execute_actions(plan, incident_id)
-    
-    # 5. Update incident status
-    status = 'RESOLVED' if plan.get('success') else 'IN_PROGRESS'
-    update_incident(incident_id, {
-        'status': status,
-        'diagnosis': diagnosis,
-        'plan': plan,
-        'actionsTaken': actions_taken,
-        'updatedAt': datetime.utcnow().isoformat()
-    })
+    send_notification(incident['incidentId'], incident, diagnosis, 'IN_PROGRESS')
+    return {'diagnosis': to_item_value(diagnosis)}
+
+def plan_phase(incident):
+    """PLAN: build the remediation plan, reusing the matched incident's plan when applicable."""
+    diagnosis = incident.get('diagnosis') or {}
+    context = observation_context(incident)
     
-    # Send notification after resolution
-    if plan.get('success'):
-        send_notification(incident_id, incident, diagnosis, 'RESOLVED')
-        generate_postmortem(incident_id, context, diagnosis, actions_taken)
+    reused_from = diagnosis.get('reusedFrom')
+    reused = next((entry for entry in context['similarIncidents'] if entry['incidentId'] == reused_from), None)
+    if reused:
+        # Only the match's category carries over: its actions targeted the other incident's
+        # resources, so the plan is instantiated again from this incident's metadata
+        matched = reused.get('plan') or {}
+        reused_diagnosis = {
+            **diagnosis,
+            'category': matched.get('category') or diagnosis.get('category'),
+            'actions': diagnosis.get('actions') or [{'type': action['type']} for action in matched.get('actions', [])]
+        }
+        plan = {**plan_remediation(reused_diagnosis, context), 'reusedFrom': reused_from}
+        log_event('agent.plan', {'incidentId': incident['incidentId'], 'reusedFrom': reused_from, 'category': plan.get('category')})
+    else:
+        plan = plan_remediation(diagnosis, context)
+        log_event('agent.plan', {'incidentId': incident['incidentId'], 'category': plan.get('category'), 'template': plan.get('template')})
+    return {'plan': to_item_value(plan)}
+
+def act_phase(incident):
+    """
+    ACT: execute safe actions, hold unsafe ones for approval and set the outcome.
+    
+    Held actions move the incident to PENDING_APPROVAL with agentPhase left at
+    ACT; the approval resumes the agent here, which then runs them and keeps
+    the results of the actions that already ran.
+    """
+    incident_id = incident['incidentId']
+    plan = incident.get('plan') or {}
+    if incident.get('actionsAwaitingApproval') and incident.get('status') == 'APPROVED':
+        previous = incident.get('actionsTaken') or []
+        held = [taken['action'] for taken in previous if taken.get('status') == 'PENDING_APPROVAL']
+        actions_taken = [taken for taken in previous if taken.get('status') != 'PENDING_APPROVAL']
+        actions_taken += execute_actions({'actions': held}, incident_id, approved=True)
+    else:
+        actions_taken = execute_actions(plan, incident_id)
+    
+    if any(taken.get('status') == 'PENDING_APPROVAL' for taken in actions_taken):
+        log_event('agent.act_held', {'incidentId': incident_id})
+        send_approval_notification(incident_id, incident)
+        return {
+            'actionsTaken': to_item_value(actions_taken),
+            'status': 'PENDING_APPROVAL',
+            'approvalRequested': True,
+            'actionsAwaitingApproval': True,
+            'agentPhase': 'ACT'
+        }
+    
+    # Resolved only when there was a plan and every action it took succeeded
+    resolved = plan.get('success') and all(
+        (taken.get('result') or {}).get('status') == 'SUCCESS' for taken in actions_taken
+    )
+    updates = {
+        'actionsTaken': to_item_value(actions_taken),
+        'actionsAwaitingApproval': False,
+        'status': 'RESOLVED' if resolved else 'IN_PROGRESS'
+    }
+    if resolved:
+        updates['resolvedAt'] = datetime.utcnow().isoformat()
+    return updates
+
+def postmortem_phase(incident):
+    """Notify about the resolution and index the incident for similar-incident reuse.
     
+    The postmortem itself is written off the critical path by the postmortem
+    Lambda, from the incidents stream's RESOLVED transition.
+    """
+    plan = incident.get('plan') or {}
+    if incident.get('status') == 'RESOLVED':
+        incident_id = incident['incidentId']
+        diagnosis = incident.get('diagnosis') or {}
+        send_notification(incident_id, incident, diagnosis, 'RESOLVED')
+        signature = incident_signature(incident, observation_context(incident)['logs'])
+        index_resolved_incident(incident_id, incident, signature, diagnosis, plan)
+    return {}
+
+def observation_context(incident):
+    """Rebuild the reasoning context from the OBSERVE checkpoint."""
+    observation = loads(incident.get('observation') or '{}')
     return {
-        'incidentId': incident_id,
-        'diagnosis': diagnosis,
-        'plan': plan,
-        'actionsTaken': actions_taken
+        'incident': incident,
+        'metrics': observation.get('metrics', []),
+        'logs': observation.get('logs', []),
+        'runbooks': observation.get('runbooks', []),
+        'similarIncidents': observation.get('similarIncidents', [])
     }
 
+AGENT_PHASES = ('OBSERVE', 'REASON', 'PLAN', 'ACT', 'POSTMORTEM')
+AGENT_DONE = 'DONE'
+PHASE_HANDLERS = {
+    'OBSERVE': observe_phase,
+    'REASON': reason_phase,
+    'PLAN': plan_phase,
+    'ACT': act_phase,
+    'POSTMORTEM': postmortem_phase
+}
+
+def start_agent(incident_id):
+    """Hand an incident to the orchestrator without waiting for the phases to run."""
+    if STATE_MACHINE_ARN:
+        incident = get_incident(incident_id)
+        # One execution per incident version, so duplicate triggers are ignored
+        name = re.sub(r'[^A-Za-z0-9_-]', '-', f"{incident_id}-v{incident.get('version', 0)}")[:80]
+        try:
+            response = stepfunctions.start_execution(
+                stateMachineArn=STATE_MACHINE_ARN,
+                name=name,
+                input=dumps({'incidentId': incident_id})
+            )
+        except stepfunctions.exceptions.ExecutionAlreadyExists:
+            log_event('agent.execution_exists', {'incidentId': incident_id, 'execution': name})
+            return {'incidentId': incident_id, 'status': 'ALREADY_STARTED'}
+        return {'incidentId': incident_id, 'executionArn': response['executionArn']}
+    
+    function_name = os.environ.get('AWS_LAMBDA_FUNCTION_NAME')
+    if function_name:
+        # Without a state machine, run the phases in a separate asynchronous invocation
+        lambda_client.invoke(
+            FunctionName=function_name,
+            InvocationType='Event',
+            Payload=dumps_bytes({'incidentId': incident_id, 'run': 'local'})
+        )
+        return {'incidentId': incident_id, 'status': 'QUEUED'}
+    
+    # Outside Lambda (tests, local runs) the in-process runner is the orchestrator
+    return execute_agent_loop(incident_id)
+
 def get_incident(incident_id):
-    """Retrieve incident from DynamoDB."""
-    # Query using partition key to get the latest entry
-    response = table.query(
-        KeyConditionExpression='incidentId = :id',
-        ExpressionAttributeValues={':id': incident_id},
-        ScanIndexForward=False,  # Sort descending by timestamp
-        Limit=1
-    )
-    items = response.get('Items', [])
-    return items[0] if items else {}
+    """Retrieve incident through the read-through cache."""
+    return incident_cache.get(incident_id, load_incident)
+
+def load_incident(incident_id):
+    """Retrieve the current item of an incident from DynamoDB."""
+    return incident_store.get_incident(table, incident_id)
+
+def find_similar_incidents(incident_id, signature, tenant, k=3):
+    """Return the k most similar resolved incidents of the same tenant from the similarity index."""
+    try:
+        return similar_incident_store.index().query(
+            signature, k=k, min_similarity=SIMILARITY_MIN_SCORE, exclude=incident_id,
+            where=lambda payload: payload.get('tenantId', DEFAULT_TENANT) == tenant
+        )
+    except Exception as e:
+        log_event('agent.similar_query_failed', {'incidentId': incident_id, 'error': str(e)}, level='WARNING')
+        return []
+
+def index_resolved_incident(incident_id, incident, signature, diagnosis, plan):
+    """Add a resolved incident to the similarity index."""
+    try:
+        similar_incident_store.add(incident_id, signature, {
+            'tenantId': tenant_id(incident),
+            'title': incident.get('title'),
+            'severity': incident.get('severity'),
+            'diagnosis': diagnosis,
+            'plan': {k: v for k, v in plan.items() if k != 'reusedFrom'},
+            'resolvedAt': datetime.utcnow().isoformat()
+        })
+    except Exception as e:
+        log_event('agent.similar_index_failed', {'incidentId': incident_id, 'error': str(e)}, level='WARNING')
+
+def format_similar_incidents(similar):
+    """Prompt section listing similar resolved incidents as examples."""
+    if not similar:
+        return ''
+    
+    lines = ['', 'Similar resolved incidents (for reference):']
+    for entry in similar:
+        diagnosis = entry.get('diagnosis') or {}
+        actions = [action.get('type') for action in (entry.get('plan') or {}).get('actions', [])]
+        lines.append(
+            f"- {entry.get('title')} (similarity {entry['similarity']}): "
+            f"{str(diagnosis.get('diagnosis', ''))[:300]} | actions: {', '.join(actions) or 'none'}"
+        )
+    return '\n'.join(lines) + '\n'
 
 def observe_metrics(incident):
     """Fetch relevant CloudWatch metrics."""
     try:
         # Example: Get CPU utilization
-        response = cloudwatch.get_metric_statistics(
+        response = tenant_clients.for_incident('cloudwatch', incident, default=cloudwatch).get_metric_statistics(
             Namespace='AWS/EC2',
             MetricName='CPUUtilization',
             Dimensions=[],
@@ -227,21 +724,21 @@ def observe_metrics(incident):
         )
         return response.get('Datapoints', [])
     except Exception as e:
-        print(f"Error fetching metrics: {str(e)}")
+        log_event('agent.observe_metrics_failed', {'incidentId': incident.get('incidentId'), 'error': str(e)}, level='WARNING')
         return []
 
 def observe_logs(incident):
     """Fetch relevant CloudWatch Logs."""
     try:
         # Example: Query application logs
-        response = logs_client.filter_log_events(
+        response = tenant_clients.for_incident('logs', incident, default=logs_client).filter_log_events(
             logGroupName='/aws/lambda/application',
             limit=50,
             startTime=int((datetime.utcnow().timestamp() - 3600) * 1000)
         )
         return [event.get('message', '') for event in response.get('events', [])]
     except Exception as e:
-        print(f"Error fetching logs: {str(e)}")
+        log_event('agent.observe_logs_failed', {'incidentId': incident.get('incidentId'), 'error': str(e)}, level='WARNING')
         return []
 
 def retrieve_runbooks(incident):
@@ -256,89 +753,91 @@ def retrieve_runbooks(incident):
         
         return runbooks
     except Exception as e:
-        print(f"Error retrieving runbooks: {str(e)}")
+        log_event('agent.runbooks_failed', {'incidentId': incident.get('incidentId'), 'error': str(e)}, level='WARNING')
         return []
 
 def reason_with_bedrock(context):
-    """Use Bedrock LLM for root cause analysis."""
+    """Diagnose the root cause and recommend actions with one structured Bedrock call."""
     prompt = f"""You are an expert SRE analyzing an incident.
 
 Incident: {context['incident'].get('title')}
 Description: {context['incident'].get('description')}
 
-Recent Metrics: {json.dumps(context['metrics'][:5])}
-Recent Logs: {json.dumps(context['logs'][:10])}
+Recent Metrics: {dumps(context['metrics'][:5])}
+Recent Logs: {dumps(context['logs'][:10])}
 
 Runbooks Available: {len(context['runbooks'])} runbooks
-
-Analyze the root cause and provide:
+Known Categories: {', '.join(plan_template_store.categories()) or 'none'}
+{format_similar_incidents(context.get('similarIncidents'))}
+Record your analysis with the incident_analysis tool:
 1. Root cause diagnosis
-2. Confidence level (0-100%)
-3. Recommended actions
-
-Respond in JSON format."""
+2. Confidence level (0-100)
+3. Category: one of the known categories if it fits, else a short kebab-case name
+4. Remediation actions, most effective first"""
 
     try:
         response = bedrock.invoke_model(
             modelId=BEDROCK_MODEL_ID,
-            body=json.dumps({
+            body=dumps_bytes({
                 "anthropic_version": "bedrock-2023-05-31",
                 "max_tokens": 1000,
+                "tools": [{
+                    "name": "incident_analysis",
+                    "description": "Record the incident diagnosis and remediation actions",
+                    "input_schema": ANALYSIS_SCHEMA
+                }],
+                "tool_choice": {"type": "tool", "name": "incident_analysis"},
                 "messages": [{
                     "role": "user",
                     "content": prompt
                 }]
             })
         )
-        
-        result = json.loads(response['body'].read())
-        diagnosis_text = result['content'][0]['text']
-        
-        # Parse JSON from response
-        try:
-            return json.loads(diagnosis_text)
-        except:
-            return {'diagnosis': diagnosis_text, 'confidence': 75}
-            
+        output = tool_input(loads(response['body'].read()), 'incident_analysis')
     except Exception as e:
-        print(f"Bedrock error: {str(e)}")
+        log_event('agent.bedrock_failed', {'model': BEDROCK_MODEL_ID, 'error': str(e)}, level='ERROR')
         return {
             'diagnosis': 'Unable to determine root cause',
             'confidence': 0,
             'error': str(e)
         }
+    
+    # A text answer instead of the tool call is repaired, then held to the same schema
+    try:
+        analysis = validate_analysis(repair_json(output) if isinstance(output, str) else output)
+    except ValueError as e:
+        log_event('agent.analysis_invalid', {'model': BEDROCK_MODEL_ID, 'error': str(e)}, level='WARNING')
+        return {
+            'diagnosis': output if isinstance(output, str) and output.strip() else 'Unable to determine root cause',
+            'confidence': 0,
+            'error': str(e)
+        }
+    if analysis.get('rejectedActions'):
+        log_event('agent.actions_rejected', {'actions': analysis['rejectedActions']}, level='WARNING')
+    return analysis
 
 def plan_remediation(diagnosis, context):
-    """Generate remediation plan based on diagnosis."""
-    # Simple rule-based planning (can be enhanced with Bedrock)
-    actions = []
-    
-    if 'cpu' in diagnosis.get('diagnosis', '').lower():
-        actions.append({
-            'type': 'restart_service',
-            'target': 'application',
-            'safe': True
-        })
-    
-    if 'memory' in diagnosis.get('diagnosis', '').lower():
-        actions.append({
-            'type': 'scale_up',
-            'target': 'auto_scaling_group',
-            'safe': True
-        })
+    """Generate the remediation plan from the template for the diagnosis category.
     
-    return {
-        'actions': actions,
-        'requiresApproval': any(not a.get('safe') for a in actions),
-        'success': True
-    }
+    A category no runbook covers is planned from the actions the model
+    recommended with the diagnosis, which are then kept as its template.
+    """
+    incident = context['incident']
+    category = plan_template_store.classify(diagnosis, incident)
+    template = plan_template_store.get(category) if category else None
+    if not template and category and diagnosis.get('actions'):
+        template = plan_template_store.learn(category, [action['type'] for action in diagnosis['actions']])
+        log_event('agent.plan_learned', {'category': category, 'actions': [action['type'] for action in template['actions']]})
+    if not template:
+        return {'category': category, 'actions': [], 'escalation': [], 'requiresApproval': False, 'success': False}
+    return instantiate(template, incident.get('metadata'))
 
-def execute_actions(plan, incident_id):
-    """Execute remediation actions."""
+def execute_actions(plan, incident_id, approved=False):
+    """Execute remediation actions; unsafe ones only once an operator approved them."""
     actions_taken = []
     
     for action in plan.get('actions', []):
-        if action.get('safe'):
+        if action.get('safe') or approved:
             # Execute safe actions automatically
             result = execute_single_action(action)
             actions_taken.append({
@@ -367,25 +866,63 @@ def execute_single_action(action):
     else:
         return {'status': 'UNKNOWN', 'message': f'Unknown action type: {action_type}'}
 
-def update_incident(incident_id, updates):
-    """Update incident in DynamoDB."""
-    # Get the current incident to get its timestamp
+def update_incident(incident_id, updates, expected_statuses=None):
+    """
+    Update incident in DynamoDB and write the result through to the cache.
+    
+    With ``expected_statuses`` the write is also conditioned on the incident's
+    status, and nothing is written (None is returned) once it has left them.
+    """
     incident = get_incident(incident_id)
     if not incident:
-        print(f"Warning: Incident {incident_id} not found for update")
+        log_event('agent.update_missing', {'incidentId': incident_id}, level='WARNING')
         return
     
-    timestamp = incident.get('timestamp')
+    # Every update bumps updatedAt and the version used for ETags
+    updates = dict(updates)
+    updates.setdefault('updatedAt', datetime.utcnow().isoformat())
+    if ARCHIVE_AFTER_DAYS and updates.get('status') in ARCHIVE_STATUSES:
+        # Finished incidents expire from the table via TTL and move to the S3 archive
+        updates.setdefault('expiresAt', archive_expiry(datetime.utcnow(), ARCHIVE_AFTER_DAYS))
     
-    update_expr = 'SET ' + ', '.join([f'#{k} = :{k}' for k in updates.keys()])
-    expr_attr_names = {f'#{k}': k for k in updates.keys()}
-    expr_attr_values = {f':{k}': v for k, v in updates.items()}
-    
-    table.update_item(
-        Key={'incidentId': incident_id, 'timestamp': timestamp},
-        UpdateExpression=update_expr,
-        ExpressionAttributeNames=expr_attr_names,
-        ExpressionAttributeValues=expr_attr_values
+    # The version check detects writes made by other invocations since our read.
+    # The updates were computed from the stale copy, so they are only reapplied
+    # when the other write left status and agentPhase alone; otherwise (a deny,
+    # another run's checkpoint) the conflict is returned to the caller as None
+    for attempt in range(2):
+        if expected_statuses and incident.get('status') not in expected_statuses:
+            return None
+        transact_items, updated = incident_store.update_transaction(INCIDENTS_TABLE, incident, updates, expected_statuses)
+        try:
+            dynamodb.meta.client.transact_write_items(TransactItems=transact_items)
+        except ClientError as e:
+            if not is_version_conflict(e) or attempt:
+                raise
+            incident_cache.invalidate(incident_id)
+            fresh = get_incident(incident_id)
+            superseded = not fresh or any(fresh.get(name) != incident.get(name) for name in CONFLICT_ATTRIBUTES)
+            log_event('agent.update_conflict', {'incidentId': incident_id, 'retried': not superseded})
+            if superseded:
+                return None
+            incident = fresh
+            continue
+        
+        if STATS_TABLE and 'status' in updates:
+            # Counters move from the status this write actually replaced, once it has committed
+            apply_updates(dynamodb.meta.client, transition_updates(STATS_TABLE, incident, updates['status'], datetime.utcnow()))
+        
+        incident_cache.put(updated)
+        incident_list_cache['expiresAt'] = 0.0
+        return updated
+
+def is_version_conflict(error):
+    """Check whether a write failed on the incident version condition."""
+    code = error.response['Error']['Code']
+    if code == 'ConditionalCheckFailedException':
+        return True
+    reasons = error.response.get('CancellationReasons', [])
+    return code == 'TransactionCanceledException' and any(
+        reason.get('Code') == 'ConditionalCheckFailed' for reason in reasons
     )
 
 def send_notification(incident_id, incident, diagnosis=None, status='OPEN'):
@@ -397,10 +934,12 @@ def send_notification(incident_id, incident, diagnosis=None, status='OPEN'):
                 'incidentId': incident_id,
                 'title': incident.get('title', 'Unknown Incident'),
                 'severity': incident.get('severity', 'MEDIUM'),
+                'source': incident.get('source', 'unknown'),
                 'description': incident.get('description', ''),
                 'status': status,
                 'diagnosis': diagnosis.get('diagnosis') if diagnosis else None,
-                'confidence': diagnosis.get('confidence') if diagnosis else None
+                'confidence': diagnosis.get('confidence') if diagnosis else None,
+                'jiraTicket': incident.get('jiraTicket')
             }
         }
         
@@ -410,72 +949,110 @@ def send_notification(incident_id, incident, diagnosis=None, status='OPEN'):
         lambda_client.invoke(
             FunctionName=notification_function,
             InvocationType='Event',
-            Payload=json.dumps(notification_payload)
+            Payload=dumps_bytes(notification_payload)
         )
-        print(f"Notification sent for incident {incident_id} (status: {status})")
+        log_event('agent.notification_sent', {'incidentId': incident_id, 'status': status})
     except Exception as e:
-        print(f"Failed to send notification: {str(e)}")
+        log_event('agent.notification_failed', {'incidentId': incident_id, 'error': str(e)}, level='WARNING')
 
 def handle_approval_action(event):
-    """Handle approval or denial of incident processing."""
+    """
+    Record an approve or deny decision and hand the incident on.
+    
+    The decision is a write conditioned on the incident still waiting for one,
+    so repeated or concurrent clicks cost a single condition check and are
+    answered from the decision already stored; only the first approval starts
+    the agent, which runs asynchronously.
+    """
     action = event.get('action')  # 'approve' or 'deny'
     incident_id = event.get('incidentId')
     user = event.get('user', 'Unknown')
     
     if not incident_id:
         return {'statusCode': 400, 'error': 'Missing incidentId'}
+    if action not in ('approve', 'deny'):
+        return {'statusCode': 400, 'error': 'Invalid action. Use "approve" or "deny"'}
     
     try:
         incident = get_incident(incident_id)
         if not incident:
             return {'statusCode': 404, 'error': 'Incident not found'}
         
+        if not awaits_decision(incident):
+            return decision_already_made(incident_id, action)
+        
+        now = datetime.utcnow().isoformat()
         if action == 'approve':
-            # Update incident status to approved and trigger processing
-            update_incident(incident_id, {
-                'status': 'APPROVED',
-                'approvedBy': user,
-                'approvedAt': datetime.utcnow().isoformat(),
-                'requiresApproval': False
-            })
-            
-            # Trigger agent processing
-            result = execute_agent_loop(incident_id)
+            updates = {'status': 'APPROVED', 'approvedBy': user, 'approvedAt': now, 'requiresApproval': False}
+        else:
+            updates = {'status': 'DENIED', 'deniedBy': user, 'deniedAt': now,
+                       'denialReason': event.get('reason') or 'No reason provided'}
+        
+        if not update_incident(incident_id, updates, expected_statuses=DECIDABLE_STATUSES):
+            return decision_already_made(incident_id, action)
+        
+        if action == 'approve':
+            # Resume the agent asynchronously; the caller does not wait for the phases
+            result = start_agent(incident_id)
             
             return {
-                'statusCode': 200,
-                'body': json.dumps({
+                'statusCode': 202,
+                'body': dumps({
                     'message': f'Incident {incident_id} approved and processing started',
                     'result': result
                 })
             }
-            
-        elif action == 'deny':
-            # Update incident status to denied
-            update_incident(incident_id, {
-                'status': 'DENIED',
-                'deniedBy': user,
-                'deniedAt': datetime.utcnow().isoformat(),
-                'denialReason': event.get('reason', 'No reason provided')
-            })
-            
-            # Send notification about denial
-            send_notification(incident_id, incident, None, 'DENIED')
-            
-            return {
-                'statusCode': 200,
-                'body': json.dumps({
-                    'message': f'Incident {incident_id} denied by {user}'
-                })
-            }
         
-        else:
-            return {'statusCode': 400, 'error': 'Invalid action. Use "approve" or "deny"'}
+        # Send notification about denial
+        send_notification(incident_id, incident, None, 'DENIED')
+        
+        return {
+            'statusCode': 200,
+            'body': dumps({
+                'message': f'Incident {incident_id} denied by {user}'
+            })
+        }
             
     except Exception as e:
-        print(f"Error handling approval action: {str(e)}")
+        log_event('agent.approval_failed', {'incidentId': incident_id, 'action': action, 'error': str(e)}, level='ERROR')
         return {'statusCode': 500, 'error': str(e)}
 
+def awaits_decision(incident):
+    """
+    Check whether an approve or deny decision may still be recorded.
+    
+    An OPEN incident that runs without approval, or whose phases have started,
+    is already in the agent's hands: approving it would start a second run.
+    Phase checkpoints bump the version, so the conditioned decision write also
+    fails if the agent starts after this read.
+    """
+    if incident.get('status') == 'OPEN':
+        return incident.get('requiresApproval', True) and not incident.get('agentPhase')
+    return incident.get('status') in DECIDABLE_STATUSES
+
+def decision_already_made(incident_id, action):
+    """Answer a decision on an incident that no longer waits for one."""
+    incident = get_incident(incident_id)
+    if not incident:
+        return {'statusCode': 404, 'error': 'Incident not found'}
+    if incident.get('status') == 'DENIED':
+        decided, user = 'deny', incident.get('deniedBy')
+    elif incident.get('approvedBy'):
+        decided, user = 'approve', incident.get('approvedBy')
+    else:
+        decided, user = None, None
+    
+    log_event('agent.approval_duplicate', {'incidentId': incident_id, 'action': action, 'decided': decided})
+    if decided != action:
+        return {'statusCode': 409, 'error': f"Incident {incident_id} is {incident.get('status')} and no longer awaits approval"}
+    return {
+        'statusCode': 200,
+        'body': dumps({
+            'message': f"Incident {incident_id} was already {'approved' if decided == 'approve' else 'denied'} by {user}",
+            'duplicate': True
+        })
+    }
+
 def send_approval_notification(incident_id, incident):
     """Send notification requesting user approval for incident processing."""
     try:
@@ -498,42 +1075,8 @@ def send_approval_notification(incident_id, incident):
         lambda_client.invoke(
             FunctionName=notification_function,
             InvocationType='Event',
-            Payload=json.dumps(notification_payload)
-        )
-        print(f"Approval notification sent for incident {incident_id}")
-    except Exception as e:
-        print(f"Failed to send approval notification: {str(e)}")
-
-def generate_postmortem(incident_id, context, diagnosis, actions):
-    """Generate and store postmortem report."""
-    postmortem = f"""# Incident Postmortem: {incident_id}
-
-## Summary
-{context['incident'].get('title')}
-
-## Timeline
-- Detected: {context['incident'].get('createdAt')}
-- Resolved: {datetime.utcnow().isoformat()}
-
-## Root Cause
-{diagnosis.get('diagnosis', 'Unknown')}
-
-## Actions Taken
-{json.dumps(actions, indent=2)}
-
-## Prevention
-- Review monitoring thresholds
-- Update runbooks
-- Implement additional safeguards
-"""
-    
-    try:
-        s3.put_object(
-            Bucket=POSTMORTEMS_BUCKET,
-            Key=f'{incident_id}/postmortem.md',
-            Body=postmortem.encode('utf-8'),
-            ContentType='text/markdown'
+            Payload=dumps_bytes(notification_payload)
         )
-        print(f"Postmortem saved for incident {incident_id}")
+        log_event('agent.approval_notification_sent', {'incidentId': incident_id})
     except Exception as e:
-        print(f"Error saving postmortem: {str(e)}")
+        log_event('agent.approval_notification_failed', {'incidentId': incident_id, 'error': str(e)}, level='WARNING')
@@ -0,0 +1,95 @@
+"""
+Read-through incident cache for the agent Lambda.
+
+Entries live in two tiers:
+- an invocation scope, active while the agent loop runs, in which an incident
+  is read from DynamoDB at most once per invocation;
+- a short-TTL tier shared by warm invocations, used by API reads.
+
+Writers call ``put`` with the item returned by DynamoDB after an update.
+Entries are ordered by the incident's ``version`` attribute, so an older copy
+never replaces a newer one.
+"""
+import time
+from collections import OrderedDict
+
+
+def incident_version(incident):
+    """Return the version of an incident item, 0 for unversioned items."""
+    return int(incident.get('version', 0) or 0)
+
+
+class IncidentCache:
+    """Two-tier incident cache with hit-ratio tracking."""
+
+    def __init__(self, ttl_seconds=2.0, max_entries=1024, clock=time.monotonic):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.clock = clock
+        self._entries = OrderedDict()  # incidentId -> (expires_at, incident)
+        self._scope = None
+        self.hits = 0
+        self.misses = 0
+
+    def begin_invocation(self):
+        """Start an invocation scope: first reads go to DynamoDB, repeats are cached."""
+        self._scope = {}
+
+    def end_invocation(self):
+        """Drop the invocation scope; the TTL tier survives for warm invocations."""
+        self._scope = None
+
+    def get(self, incident_id, loader):
+        """Return the cached incident, calling ``loader(incident_id)`` on a miss."""
+        if self._scope is not None:
+            if incident_id in self._scope:
+                self.hits += 1
+                return self._scope[incident_id]
+        else:
+            entry = self._entries.get(incident_id)
+            if entry and entry[0] > self.clock():
+                self.hits += 1
+                self._entries.move_to_end(incident_id)
+                return entry[1]
+
+        self.misses += 1
+        incident = loader(incident_id)
+        if incident:
+            self.put(incident)
+        return incident
+
+    def put(self, incident):
+        """Store an incident unless a newer version is already cached."""
+        incident_id = incident.get('incidentId')
+        if not incident_id:
+            return
+
+        if self._scope is not None:
+            current = self._scope.get(incident_id)
+            if current is None or incident_version(incident) >= incident_version(current):
+                self._scope[incident_id] = incident
+
+        entry = self._entries.get(incident_id)
+        if entry and incident_version(entry[1]) > incident_version(incident):
+            return
+
+        self._entries[incident_id] = (self.clock() + self.ttl_seconds, incident)
+        self._entries.move_to_end(incident_id)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, incident_id):
+        """Forget an incident in both tiers."""
+        self._entries.pop(incident_id, None)
+        if self._scope is not None:
+            self._scope.pop(incident_id, None)
+
+    def stats(self):
+        """Return hit/miss counters and the hit ratio since the container started."""
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hitRatio': round(self.hits / lookups, 3) if lookups else 0.0,
+            'size': len(self._entries)
+        }
@@ -0,0 +1,259 @@
+"""
+Remediation plan templates compiled from the runbooks bucket.
+
+Each runbook (``<category>-runbook.md``) compiles to one template: the
+actions under its ``## Remediation Actions`` heading, each a bold label such
+as ``- **Restart Service**: ...``. Actions listed under a "Safe" or
+"Auto-Execute" subheading run without approval; all others need it.
+
+A template's actions name a parameter for their target (``{service}``,
+``{instanceId}``, ...) that is filled from the incident's metadata when a
+plan is built, so one template serves every incident of its category.
+
+Templates are cached by the container and recompiled only when a runbook's
+ETag changes. The actions the model recommends with its diagnosis for a
+category no runbook covers are kept as that category's template too.
+"""
+import re
+import time
+
+from utils import log_event
+
+# Action types the tools can carry out, and the incident parameter each targets
+ACTION_TARGETS = {
+    'restart_service': 'service',
+    'scale_up': 'autoScalingGroup',
+    'clear_cache': 'service',
+    'terminate_instance': 'instanceId',
+    'rollback_deployment': 'service',
+    'modify_configuration': 'service',
+    'increase_pool_size': 'service',
+    'kill_long_queries': 'database',
+    'scale_read_replicas': 'database'
+}
+# Actions the agent executes itself; everything else is routed for approval
+AUTO_ACTIONS = {'restart_service', 'scale_up'}
+ACTION_ALIASES = {'restart_application': 'restart_service'}
+DEFAULT_PARAMETERS = {
+    'service': 'application',
+    'autoScalingGroup': 'auto_scaling_group',
+    'instanceId': 'unknown-instance',
+    'database': 'primary'
+}
+
+# Structured output of the combined diagnosis and plan call (Bedrock tool input schema)
+ANALYSIS_SCHEMA = {
+    'type': 'object',
+    'properties': {
+        'diagnosis': {'type': 'string', 'description': 'root cause, one or two sentences'},
+        'confidence': {'type': 'integer', 'minimum': 0, 'maximum': 100},
+        'category': {'type': 'string', 'description': 'short kebab-case failure category'},
+        'actions': {
+            'type': 'array',
+            'maxItems': 5,
+            'items': {
+                'type': 'object',
+                'properties': {
+                    'type': {'type': 'string', 'enum': sorted(ACTION_TARGETS)},
+                    'reason': {'type': 'string'}
+                },
+                'required': ['type']
+            }
+        }
+    },
+    'required': ['diagnosis', 'confidence', 'category', 'actions']
+}
+MAX_ACTIONS = ANALYSIS_SCHEMA['properties']['actions']['maxItems']
+
+_ACTION_LINE = re.compile(r'^\s*[-*]\s+\*\*(?P<label>[^*]+)\*\*\s*:?\s*(?P<description>.*)$')
+_WORD = re.compile(r'[a-z0-9]+')
+_GENERIC_WORDS = {'high', 'low', 'runbook', 'issue', 'issues', 'error', 'errors', 'and', 'the', 'of'}
+
+
+def category_name(text):
+    """Normalize a category label: lower-case kebab-case."""
+    return '-'.join(_WORD.findall((text or '').lower()))
+
+
+def template_action(action_type, safe=False, description=''):
+    """One template action; only actions the agent can run itself may skip approval."""
+    return {
+        'type': action_type,
+        'target': '{%s}' % ACTION_TARGETS[action_type],
+        'safe': bool(safe) and action_type in AUTO_ACTIONS,
+        'description': description
+    }
+
+
+def compile_runbook(key, text):
+    """Compile one runbook into a template; None when it lists no known actions."""
+    category = category_name(key.rsplit('/', 1)[-1].rsplit('.', 1)[0].replace('-runbook', ''))
+    title = ''
+    section = ''
+    subsection = ''
+    actions = []
+    for line in text.splitlines():
+        if line.startswith('# ') and not title:
+            title = line[2:].strip()
+        elif line.startswith('## '):
+            section = line[3:].strip().lower()
+        elif line.startswith('### '):
+            subsection = line[4:].strip().lower()
+        elif section.startswith('remediation'):
+            match = _ACTION_LINE.match(line)
+            if not match:
+                continue
+            slug = category_name(match['label']).replace('-', '_')
+            action_type = ACTION_ALIASES.get(slug, slug)
+            if action_type in ACTION_TARGETS and action_type not in (a['type'] for a in actions):
+                safe = ('safe' in subsection or 'auto' in subsection) and 'approval' not in subsection
+                actions.append(template_action(action_type, safe, match['description'].strip()))
+    if not actions:
+        return None
+    keywords = set(_WORD.findall(f'{title} {category}'.lower())) - _GENERIC_WORDS
+    return {'category': category, 'title': title, 'source': key, 'keywords': sorted(keywords), 'actions': actions}
+
+
+def validate_analysis(data):
+    """Check model output against ANALYSIS_SCHEMA and normalize it; ValueError if unusable.
+
+    Actions of unknown types are dropped and listed in ``rejectedActions``
+    rather than failing the diagnosis they came with.
+    """
+    if not isinstance(data, dict):
+        raise ValueError('analysis must be an object')
+    diagnosis = data.get('diagnosis')
+    if not isinstance(diagnosis, str) or not diagnosis.strip():
+        raise ValueError('analysis has no diagnosis')
+    confidence = data.get('confidence')
+    if isinstance(confidence, str):
+        confidence = confidence.strip().rstrip('%')
+    try:
+        confidence = min(100, max(0, int(float(confidence))))
+    except (TypeError, ValueError):
+        raise ValueError(f'confidence is not a number: {data.get("confidence")!r}')
+    actions = data.get('actions') or []
+    if not isinstance(actions, list):
+        raise ValueError('actions must be a list')
+
+    accepted, rejected = [], []
+    for action in actions:
+        action_type = action.get('type') if isinstance(action, dict) else action
+        if not isinstance(action_type, str):
+            rejected.append(str(action_type))
+        elif action_type in ACTION_TARGETS and action_type not in (a['type'] for a in accepted):
+            accepted.append({'type': action_type, 'reason': str(action.get('reason', '')) if isinstance(action, dict) else ''})
+        elif action_type not in ACTION_TARGETS:
+            rejected.append(str(action_type))
+    analysis = {
+        'diagnosis': diagnosis.strip(),
+        'confidence': confidence,
+        'category': category_name(data.get('category')),
+        'actions': accepted[:MAX_ACTIONS]
+    }
+    if rejected:
+        analysis['rejectedActions'] = rejected
+    return analysis
+
+
+def instantiate(template, parameters):
+    """A plan from a template, targets filled from the incident's parameters.
+
+    Actions the agent can run itself make up the plan; the others are listed
+    as ``escalation`` for an operator. A template with no automatic action
+    plans all of its actions, which ACT holds until an operator approves them.
+    """
+    values = {**DEFAULT_PARAMETERS, **{k: str(v) for k, v in (parameters or {}).items() if v}}
+    actions = [
+        {
+            'type': action['type'],
+            'target': action['target'].format_map(values),
+            'safe': action['safe'],
+            'description': action.get('description', '')
+        }
+        for action in template['actions']
+    ]
+    planned = [action for action in actions if action['safe']] or actions
+    return {
+        'category': template['category'],
+        'template': template['source'],
+        'actions': planned,
+        'escalation': [action for action in actions if action not in planned],
+        'requiresApproval': any(not action['safe'] for action in planned),
+        'success': bool(planned)
+    }
+
+
+class PlanTemplates:
+    """Templates compiled from the runbooks bucket, refreshed by ETag."""
+
+    def __init__(self, s3, bucket, refresh_seconds=900.0, clock=time.monotonic):
+        self.s3 = s3
+        self.bucket = bucket
+        self.refresh_seconds = refresh_seconds
+        self.clock = clock
+        self._compiled = {}
+        self._learned = {}
+        self._etags = {}
+        self._next_refresh = 0.0
+
+    def templates(self):
+        """Templates by category, refreshing compiled runbooks when the interval has passed."""
+        if self.clock() >= self._next_refresh:
+            self.refresh()
+        return {**self._learned, **self._compiled}
+
+    def categories(self):
+        return sorted(self.templates())
+
+    def refresh(self):
+        """Recompile runbooks whose ETag changed; drop deleted ones."""
+        etags = {}
+        try:
+            paginator = self.s3.get_paginator('list_objects_v2')
+            for page in paginator.paginate(Bucket=self.bucket):
+                etags.update({obj['Key']: obj['ETag'] for obj in page.get('Contents', []) if obj['Key'].endswith('.md')})
+        except Exception as e:
+            # Keep serving what was compiled; try again next interval
+            log_event('plan_templates.refresh_failed', {'bucket': self.bucket, 'error': str(e)}, level='WARNING')
+            self._next_refresh = self.clock() + self.refresh_seconds
+            return
+
+        compiled = {t['source']: t for t in self._compiled.values() if self._etags.get(t['source']) == etags.get(t['source'])}
+        for key, etag in etags.items():
+            if key in compiled:
+                continue
+            text = self.s3.get_object(Bucket=self.bucket, Key=key)['Body'].read().decode('utf-8')
+            template = compile_runbook(key, text)
+            if template:
+                compiled[key] = template
+        self._compiled = {template['category']: template for template in compiled.values()}
+        self._etags = etags
+        self._next_refresh = self.clock() + self.refresh_seconds
+        log_event('plan_templates.compiled', {'bucket': self.bucket, 'categories': sorted(self._compiled)})
+
+    def classify(self, diagnosis, incident):
+        """The diagnosis's category: the one it names, else the template whose keywords it mentions most."""
+        templates = self.templates()
+        named = category_name(diagnosis.get('category'))
+        if named:
+            return named
+        words = set(_WORD.findall(f"{diagnosis.get('diagnosis', '')} {incident.get('title', '')}".lower()))
+        scored = [(len(words & set(t['keywords'])), category) for category, t in templates.items()]
+        score, category = max(scored, default=(0, None))
+        return category if score else None
+
+    def get(self, category):
+        return self.templates().get(category)
+
+    def learn(self, category, action_types):
+        """Keep model-recommended actions as this container's template for their category."""
+        template = {
+            'category': category,
+            'title': category,
+            'source': 'model',
+            'keywords': sorted(set(category.split('-')) - _GENERIC_WORDS),
+            'actions': [template_action(action_type, safe=True) for action_type in action_types]
+        }
+        self._learned[category] = template
+        return template
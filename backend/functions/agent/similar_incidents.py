@@ -0,0 +1,120 @@
+"""
+Index of resolved incidents for similar-incident retrieval, persisted in S3.
+
+Objects under ``similarity/`` in the postmortems bucket:
+- ``base.json.gz``: compacted index entries;
+- ``deltas/<incidentId>.json``: one entry per incident resolved since the
+  last compaction.
+
+Writers only add delta objects, so concurrent agent invocations never
+overwrite each other's entries. A warm container keeps the loaded index and a
+refresh only fetches deltas it has not applied yet. Once enough deltas pile
+up, a refresh folds them into the base with a conditional write.
+"""
+import gzip
+import time
+from decimal import Decimal
+
+from botocore.exceptions import ClientError
+
+from serialization import dumps_bytes, loads
+from similarity import SimilarityIndex, encode_signature
+from utils import log_event
+
+
+class SimilarIncidentStore:
+    """S3 base + delta persistence for a SimilarityIndex.
+
+    Payload floats are loaded as Decimal so reused diagnoses and plans can be
+    written back to DynamoDB unchanged.
+    """
+
+    def __init__(self, s3, bucket, prefix='similarity/', refresh_seconds=300.0,
+                 compact_after=50, clock=time.monotonic):
+        self.s3 = s3
+        self.bucket = bucket
+        self.base_key = f'{prefix}base.json.gz'
+        self.delta_prefix = f'{prefix}deltas/'
+        self.refresh_seconds = refresh_seconds
+        self.compact_after = compact_after
+        self.clock = clock
+        self._index = None
+        self._base_etag = None
+        self._applied = set()
+        self._next_refresh = 0.0
+
+    def index(self):
+        """Return the index, refreshing it when the refresh interval has passed."""
+        if self._index is None or self.clock() >= self._next_refresh:
+            self.refresh()
+        return self._index
+
+    def refresh(self):
+        """Load the base when it changed, then apply unseen deltas."""
+        base_etag = self._head_base()
+        if self._index is None or base_etag != self._base_etag:
+            self._index = SimilarityIndex()
+            self._applied = set()
+            if base_etag:
+                body = self.s3.get_object(Bucket=self.bucket, Key=self.base_key)['Body'].read()
+                self._index.add_records(loads(gzip.decompress(body), parse_float=Decimal))
+            self._base_etag = base_etag
+
+        delta_keys = []
+        paginator = self.s3.get_paginator('list_objects_v2')
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=self.delta_prefix):
+            delta_keys.extend(obj['Key'] for obj in page.get('Contents', []))
+
+        for key in delta_keys:
+            if key not in self._applied:
+                record = loads(self.s3.get_object(Bucket=self.bucket, Key=key)['Body'].read(), parse_float=Decimal)
+                self._index.add_records([record])
+                self._applied.add(key)
+
+        self._next_refresh = self.clock() + self.refresh_seconds
+        if len(delta_keys) >= self.compact_after:
+            self.compact(delta_keys)
+
+    def add(self, incident_id, sig, payload):
+        """Record a resolved incident as a delta and add it to the loaded index."""
+        key = f'{self.delta_prefix}{incident_id}.json'
+        record = {'incidentId': incident_id, 'signature': encode_signature(sig), 'payload': payload}
+        self.s3.put_object(
+            Bucket=self.bucket,
+            Key=key,
+            Body=dumps_bytes(record),
+            ContentType='application/json'
+        )
+        if self._index is not None:
+            self._index.add(incident_id, sig, payload)
+            self._applied.add(key)
+
+    def compact(self, delta_keys):
+        """Fold applied deltas into the base and delete them."""
+        body = gzip.compress(dumps_bytes(self._index.to_records()))
+        # Only replace the base we loaded; a concurrent compaction wins otherwise
+        condition = {'IfMatch': self._base_etag} if self._base_etag else {'IfNoneMatch': '*'}
+        try:
+            response = self.s3.put_object(Bucket=self.bucket, Key=self.base_key, Body=body, **condition)
+        except ClientError as e:
+            if e.response['Error']['Code'] in ('PreconditionFailed', 'ConditionalRequestConflict'):
+                log_event('similarity.compaction_skipped', {'key': self.base_key})
+                return
+            raise
+        self._base_etag = response.get('ETag')
+
+        merged = [key for key in delta_keys if key in self._applied]
+        for start in range(0, len(merged), 1000):
+            self.s3.delete_objects(
+                Bucket=self.bucket,
+                Delete={'Objects': [{'Key': key} for key in merged[start:start + 1000]], 'Quiet': True}
+            )
+        log_event('similarity.compacted', {'deltas': len(merged), 'key': self.base_key})
+
+    def _head_base(self):
+        try:
+            return self.s3.head_object(Bucket=self.bucket, Key=self.base_key)['ETag']
+        except ClientError as e:
+            if e.response['Error']['Code'] in ('404', 'NoSuchKey', 'NotFound'):
+                return None
+            raise
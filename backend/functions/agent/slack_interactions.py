@@ -0,0 +1,78 @@
+"""
+Slack interactivity requests: the Approve / Deny buttons on incident messages.
+
+Slack signs every request with the app's signing secret, sending
+``v0=<hex HMAC-SHA256 of "v0:<timestamp>:<raw body>">`` in
+``X-Slack-Signature`` and the timestamp in ``X-Slack-Request-Timestamp``.
+Requests with a wrong signature, or a timestamp more than five minutes from
+now (a replay), are rejected. The body is form-encoded, with the interaction
+as JSON in its ``payload`` field.
+
+Slack retries a request it does not see acknowledged within three seconds, so
+the endpoint only verifies, records the decision and answers; the agent run
+it starts is asynchronous.
+"""
+import base64
+import hashlib
+import hmac
+import json
+import time
+from urllib.parse import parse_qs
+
+SIGNATURE_VERSION = 'v0'
+MAX_CLOCK_SKEW_SECONDS = 300
+# Button action_id -> approval action (see send_slack_notification)
+BUTTON_ACTIONS = {'approve_incident': 'approve', 'deny_incident': 'deny'}
+
+
+def raw_body(event):
+    """The request body exactly as Slack sent it, as text."""
+    body = event.get('body') or ''
+    if event.get('isBase64Encoded'):
+        body = base64.b64decode(body).decode('utf-8')
+    return body
+
+
+def header(event, name):
+    """A request header, looked up case-insensitively."""
+    name = name.lower()
+    for key, value in (event.get('headers') or {}).items():
+        if key.lower() == name:
+            return value
+    return None
+
+
+def verify_signature(secret, event, body, now=None):
+    """Check the request's Slack signature and timestamp; False without a secret."""
+    timestamp = header(event, 'X-Slack-Request-Timestamp')
+    signature = header(event, 'X-Slack-Signature')
+    if not (secret and timestamp and signature):
+        return False
+    try:
+        if abs((now if now is not None else time.time()) - int(timestamp)) > MAX_CLOCK_SKEW_SECONDS:
+            return False
+    except ValueError:
+        return False
+    base = f'{SIGNATURE_VERSION}:{timestamp}:{body}'.encode('utf-8')
+    expected = f"{SIGNATURE_VERSION}={hmac.new(secret.encode('utf-8'), base, hashlib.sha256).hexdigest()}"
+    return hmac.compare_digest(expected, signature)
+
+
+def parse_interaction(body):
+    """The approval event for an Approve / Deny click, or None for any other interaction."""
+    payload = json.loads((parse_qs(body).get('payload') or ['{}'])[0])
+    if payload.get('type') != 'block_actions':
+        return None
+    for action in payload.get('actions') or []:
+        decision = BUTTON_ACTIONS.get(action.get('action_id'))
+        # Button values are "<action>_<incidentId>"
+        prefix, _, incident_id = (action.get('value') or '').partition('_')
+        if decision and prefix == decision and incident_id:
+            user = payload.get('user') or {}
+            return {
+                'action': decision,
+                'incidentId': incident_id,
+                'user': user.get('username') or user.get('name') or user.get('id') or 'Unknown',
+                'source': 'slack'
+            }
+    return None
@@ -0,0 +1,111 @@
+"""
+Reading structured output from Bedrock (Anthropic messages) responses.
+
+The agent asks for output through a forced tool call, so the answer normally
+arrives as the ``input`` of a ``tool_use`` block, already parsed. When the
+model answers in text instead, ``repair_json`` recovers the object, trying
+cheaper repairs first:
+
+1. the first JSON object in the text, ignoring prose and code fences;
+2. the same with trailing commas removed and unterminated strings, arrays
+   and objects closed (output cut off by ``max_tokens``);
+3. cut back to each earlier member boundary in turn and closed again.
+"""
+import json
+
+_DECODER = json.JSONDecoder()
+_WHITESPACE = ' \t\r\n'
+# Cut-back attempts before giving up on a truncated object
+MAX_CUTS = 20
+
+
+def tool_input(result, tool_name):
+    """The input of the named tool_use block, else the response's text."""
+    text = []
+    for block in result.get('content', []):
+        if block.get('type') == 'tool_use' and block.get('name') == tool_name:
+            return block.get('input')
+        if block.get('type') == 'text':
+            text.append(block.get('text', ''))
+    return ''.join(text)
+
+
+def repair_json(text):
+    """Parse the JSON object in model text, repairing it if needed; ValueError if it cannot."""
+    start = text.find('{')
+    if start < 0:
+        raise ValueError('no JSON object in model output')
+    text = text[start:]
+    try:
+        return _DECODER.raw_decode(text)[0]
+    except ValueError:
+        pass
+
+    closed, cuts = _close(text)
+    for candidate in [closed] + [_close(text[:cut])[0] for cut in reversed(cuts[-MAX_CUTS:])]:
+        try:
+            value = json.loads(candidate)
+        except ValueError:
+            continue
+        if isinstance(value, dict):
+            return value
+    raise ValueError('model output is not repairable JSON')
+
+
+def _close(text):
+    """Drop trailing commas and close what is left open; also return the commas' offsets."""
+    out = []
+    closers = []
+    cuts = []
+    in_string = escaped = False
+    for position, ch in enumerate(text):
+        if in_string:
+            out.append(ch)
+            if escaped:
+                escaped = False
+            elif ch == '\\':
+                escaped = True
+            elif ch == '"':
+                in_string = False
+            continue
+        if ch == '"':
+            in_string = True
+        elif ch in '{[':
+            closers.append('}' if ch == '{' else ']')
+        elif ch in '}]':
+            if not closers:
+                break
+            _strip_dangling(out)
+            closers.pop()
+        elif ch == ',':
+            cuts.append(position)
+        out.append(ch)
+        if not closers and ch in '}]':
+            break
+
+    if in_string:
+        if escaped:
+            out.pop()
+        out.append('"')
+    _strip_dangling(out)
+    return ''.join(out) + ''.join(reversed(closers)), cuts
+
+
+def _strip_dangling(out):
+    """Remove trailing whitespace, a trailing comma, or a key left without a value."""
+    while out and out[-1] in _WHITESPACE:
+        out.pop()
+    if out and out[-1] == ',':
+        out.pop()
+    elif out and out[-1] == ':':
+        out.pop()
+        # The key before the colon
+        while out and out[-1] in _WHITESPACE:
+            out.pop()
+        if out and out[-1] == '"':
+            out.pop()
+            while out and out[-1] != '"':
+                out.pop()
+            if out:
+                out.pop()
+        _strip_dangling(out)
@@ -0,0 +1,72 @@
+import os
+
+from boto3.dynamodb.types import TypeDeserializer
+
+import aws_clients
+import incident_store
+from archive_store import write_archive
+from utils import log_event, logged_handler
+
+dynamodb = aws_clients.lazy_resource('dynamodb')
+s3 = aws_clients.lazy_client('s3')
+
+INCIDENTS_TABLE = os.environ['INCIDENTS_TABLE']
+POSTMORTEMS_BUCKET = os.environ['POSTMORTEMS_BUCKET']
+
+table = aws_clients.lazy_table(INCIDENTS_TABLE)
+
+_deserializer = TypeDeserializer()
+
+# Clients named in AWS_CLIENT_PREWARM are created during init instead of the first request
+aws_clients.prewarm()
+
+@logged_handler
+def handler(event, context):
+    """
+    Archiver Lambda: Consumes TTL expirations from the incidents table's
+    DynamoDB stream and moves expired incidents, with their history, to
+    the date-partitioned archive in S3.
+    """
+    records = []
+    for record in event.get('Records', []):
+        incident = expired_incident(record)
+        if incident:
+            records.append({
+                'incident': incident,
+                'events': incident_store.get_timeline(table, incident['incidentId'])
+            })
+    
+    if not records:
+        return {'archived': 0}
+    
+    # Write the archive before deleting history so a failed batch is retried intact
+    keys = write_archive(s3, POSTMORTEMS_BUCKET, records)
+    
+    with table.batch_writer() as batch:
+        for record in records:
+            for event_item in record['events']:
+                batch.delete_item(Key={
+                    'pk': incident_store.incident_pk(event_item['incidentId']),
+                    'sk': incident_store.event_sk(event_item['version'])
+                })
+    
+    log_event('archiver.archived', {'incidents': len(records), 'keys': keys})
+    return {'archived': len(records), 'keys': keys}
+
+def expired_incident(record):
+    """Return the incident removed by TTL in a stream record, or None."""
+    if record.get('eventName') != 'REMOVE':
+        return None
+    
+    # TTL deletions are performed by the DynamoDB service principal
+    identity = record.get('userIdentity') or {}
+    if identity.get('type') != 'Service' or identity.get('principalId') != 'dynamodb.amazonaws.com':
+        return None
+    
+    stream = record.get('dynamodb', {})
+    keys = {key: _deserializer.deserialize(value) for key, value in stream.get('Keys', {}).items()}
+    if keys.get('sk') != incident_store.CURRENT_SK:
+        return None
+    
+    old = {key: _deserializer.deserialize(value) for key, value in stream.get('OldImage', {}).items()}
+    return incident_store.to_incident(old) or None
@@ -0,0 +1,256 @@
+"""
+Approval policy: which new incidents the agent may work on without a human.
+
+A policy is a JSON document of ordered rules; the first rule whose conditions
+all hold decides, otherwise the policy's default does::
+
+    {
+      "version": "2025-01-15.1",
+      "default": "require",
+      "rules": [
+        {"name": "storm", "decision": "require", "when": {"minIncidentsPerHour": 50}},
+        {"name": "low", "decision": "auto", "when": {"severity": ["LOW"]}},
+        {"name": "night-db", "decision": "auto",
+         "when": {"source": ["cloudwatch"], "alarmName": "Database*", "hours": "22-06"}}
+      ]
+    }
+
+Conditions: ``severity`` and ``source`` (lists of values), ``alarmName`` (a
+glob, or a list of globs, on ``metadata.alarmName``), ``hours`` (UTC hours,
+``"start-end"`` wrapping past midnight, or a list of hours) and
+``minIncidentsPerHour`` / ``maxIncidentsPerHour`` (incidents created so far in
+the current hour). Decisions are ``auto`` or ``require``.
+
+A policy is compiled once per container. Rules are grouped by severity and,
+on first use, by (severity, source), so an evaluation only looks at the rules
+that can match those two fields, cut after the first rule with no other
+condition. The incident rate is only looked up when such a rule is reached.
+``PolicyStore`` re-reads the policy object at most every refresh interval,
+with a conditional GET on its ETag, and recompiles only when its version
+changes.
+"""
+import fnmatch
+import re
+import time
+
+from botocore.exceptions import ClientError
+
+from serialization import loads
+from utils import log_event
+
+DECISIONS = {'auto': False, 'require': True}
+CONDITIONS = {'severity', 'source', 'alarmName', 'hours', 'minIncidentsPerHour', 'maxIncidentsPerHour'}
+SEVERITIES = ('CRITICAL', 'HIGH', 'MEDIUM', 'LOW')
+
+
+class Decision:
+    """Outcome of a policy evaluation and the rule (or default) that made it."""
+
+    __slots__ = ('requires_approval', 'rule', 'version')
+
+    def __init__(self, requires_approval, rule, version):
+        self.requires_approval = requires_approval
+        self.rule = rule
+        self.version = version
+
+
+class Rule:
+    """One compiled rule; conditions that were not given are None."""
+
+    __slots__ = ('name', 'decision', 'severities', 'sources', 'alarm', 'hours', 'min_rate', 'max_rate')
+
+    def __init__(self, position, config, version):
+        when = config.get('when') or {}
+        unknown = set(when) - CONDITIONS
+        if unknown:
+            raise ValueError(f'rule {position}: unknown conditions {sorted(unknown)}')
+        if config.get('decision') not in DECISIONS:
+            raise ValueError(f'rule {position}: decision must be one of {sorted(DECISIONS)}')
+        self.name = str(config.get('name') or f'rule-{position}')
+        self.decision = Decision(DECISIONS[config['decision']], self.name, version)
+        self.severities = _value_set(when.get('severity'), str.upper)
+        self.sources = _value_set(when.get('source'), str)
+        self.alarm = _alarm_pattern(when.get('alarmName'))
+        self.hours = _hour_mask(when['hours']) if 'hours' in when else None
+        self.min_rate = when.get('minIncidentsPerHour')
+        self.max_rate = when.get('maxIncidentsPerHour')
+
+    def unconditional(self):
+        """True when severity and source alone decide whether the rule matches."""
+        return self.alarm is None and self.hours is None and self.min_rate is None and self.max_rate is None
+
+    def matches(self, alarm_name, hour_bit, rate):
+        """Check the conditions left after severity and source; ``rate`` is called at most once."""
+        if self.hours is not None and not self.hours & hour_bit:
+            return False
+        if self.alarm is not None and not self.alarm.match(alarm_name):
+            return False
+        if self.min_rate is not None or self.max_rate is not None:
+            count = rate()
+            if count is None:
+                return False
+            if self.min_rate is not None and count < self.min_rate:
+                return False
+            if self.max_rate is not None and count > self.max_rate:
+                return False
+        return True
+
+
+def _value_set(values, normalize):
+    """A condition's accepted values; a single string is one value."""
+    if values is None:
+        return None
+    if isinstance(values, str):
+        values = [values]
+    return frozenset(normalize(value) for value in values)
+
+
+def _alarm_pattern(patterns):
+    """One regular expression for a glob or a list of globs."""
+    if patterns is None:
+        return None
+    if isinstance(patterns, str):
+        patterns = [patterns]
+    return re.compile('|'.join(f'(?:{fnmatch.translate(pattern)})' for pattern in patterns))
+
+
+def _hour_mask(hours):
+    """Bit mask of UTC hours from "start-end" (end exclusive, may wrap), a single "hour" or a list."""
+    if isinstance(hours, str):
+        start, dash, end = hours.partition('-')
+        if not dash:
+            selected = [int(start)]
+        else:
+            start, end = int(start), int(end) % 24
+            selected = [(start + offset) % 24 for offset in range(((end - start) % 24) or 24)]
+    else:
+        selected = [int(hour) for hour in hours]
+    mask = 0
+    for hour in selected:
+        if not 0 <= hour < 24:
+            raise ValueError(f'hour out of range: {hour}')
+        mask |= 1 << hour
+    return mask
+
+
+def _truncate(rules):
+    """Rules after the first one with no other condition can never be reached."""
+    for index, rule in enumerate(rules):
+        if rule.unconditional():
+            return tuple(rules[:index + 1])
+    return tuple(rules)
+
+
+class CompiledPolicy:
+    """A policy document compiled for evaluation."""
+
+    def __init__(self, config):
+        self.version = str(config.get('version', ''))
+        default = config.get('default', 'require')
+        if default not in DECISIONS:
+            raise ValueError(f'default must be one of {sorted(DECISIONS)}')
+        self.default = Decision(DECISIONS[default], 'default', self.version)
+        self.rules = [Rule(position, rule, self.version) for position, rule in enumerate(config.get('rules') or [])]
+
+        # Rules that can match each severity, in policy order; None holds the other severities
+        severities = set(SEVERITIES).union(*(rule.severities or () for rule in self.rules))
+        self._by_severity = {
+            severity: [rule for rule in self.rules if rule.severities is None or severity in rule.severities]
+            for severity in severities
+        }
+        self._by_severity[None] = [rule for rule in self.rules if rule.severities is None]
+        self._sources = frozenset().union(*(rule.sources or () for rule in self.rules))
+        # (severity, source) -> reachable rules, filled as pairs are seen; None stands
+        # for a severity or source no rule names
+        self._candidates = {}
+
+    def candidates(self, severity, source):
+        """Rules that can match an incident of this severity and source."""
+        key = (severity if severity in self._by_severity else None, source if source in self._sources else None)
+        rules = self._candidates.get(key)
+        if rules is None:
+            rules = _truncate([
+                rule for rule in self._by_severity[key[0]] if rule.sources is None or key[1] in rule.sources
+            ])
+            self._candidates[key] = rules
+        return rules
+
+    def evaluate(self, incident, hour, rate=lambda: None):
+        """Decide for an incident created at ``hour`` (UTC); ``rate`` returns incidents this hour."""
+        rules = self.candidates(incident.get('severity', 'MEDIUM'), incident.get('source', 'manual'))
+        if not rules:
+            return self.default
+
+        alarm_name = (incident.get('metadata') or {}).get('alarmName') or ''
+        hour_bit = 1 << hour
+        counted = []
+
+        def rate_once():
+            if not counted:
+                counted.append(rate())
+            return counted[0]
+
+        for rule in rules:
+            if rule.matches(alarm_name, hour_bit, rate_once):
+                return rule.decision
+        return self.default
+
+
+def env_policy(environ):
+    """The policy the AUTO_APPROVE_* variables describe; used when no policy object is configured."""
+    auto_severities = [
+        severity for severity in SEVERITIES
+        if environ.get(f'AUTO_APPROVE_{severity}_SEVERITY', 'true' if severity == 'LOW' else 'false').lower() == 'true'
+    ]
+    sources = [source.strip() for source in environ.get('AUTO_APPROVE_SOURCES', '').split(',') if source.strip()]
+    rules = []
+    if auto_severities:
+        rules.append({'name': 'auto-approve-severity', 'decision': 'auto', 'when': {'severity': auto_severities}})
+    if sources:
+        rules.append({'name': 'auto-approve-source', 'decision': 'auto', 'when': {'source': sources}})
+    return {'version': 'env', 'default': 'require', 'rules': rules}
+
+
+class PolicyStore:
+    """The approval policy, compiled once and reloaded from S3 when its version changes."""
+
+    def __init__(self, s3, bucket, key, fallback, refresh_seconds=60.0, clock=time.monotonic):
+        self.s3 = s3
+        self.bucket = bucket
+        self.key = key
+        self.refresh_seconds = refresh_seconds
+        self.clock = clock
+        self._policy = CompiledPolicy(fallback)
+        self._etag = None
+        self._next_refresh = 0.0
+
+    def policy(self):
+        """The compiled policy, checking the policy object when the interval has passed."""
+        if self.bucket and self.key and self.clock() >= self._next_refresh:
+            self.refresh()
+        return self._policy
+
+    def refresh(self):
+        """Fetch the policy object if its ETag changed and recompile it if its version did."""
+        self._next_refresh = self.clock() + self.refresh_seconds
+        request = {'Bucket': self.bucket, 'Key': self.key}
+        if self._etag:
+            request['IfNoneMatch'] = self._etag
+        try:
+            response = self.s3.get_object(**request)
+            config = loads(response['Body'].read())
+            etag = response.get('ETag')
+            if str(config.get('version', '')) != self._policy.version:
+                self._policy = CompiledPolicy(config)
+                log_event('approval_policy.compiled', {'version': self._policy.version, 'rules': len(self._policy.rules)})
+            self._etag = etag
+        except ClientError as e:
+            if e.response['Error']['Code'] in ('304', 'NotModified'):
+                return
+            # Keep deciding with the policy already compiled
+            log_event('approval_policy.refresh_failed', {'key': self.key, 'error': str(e)}, level='WARNING')
+        except (ValueError, TypeError, AttributeError) as e:
+            log_event('approval_policy.invalid', {'key': self.key, 'error': str(e)}, level='ERROR')
+        except Exception as e:
+            # Connection errors and timeouts are not ClientErrors; the compiled policy still applies
+            log_event('approval_policy.refresh_failed', {'key': self.key, 'error': str(e)}, level='WARNING')
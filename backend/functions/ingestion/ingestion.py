@@ -2,74 +2,100 @@ import json
 import os
 import time
 import uuid
-import boto3
+from botocore.exceptions import ClientError
 from datetime import datetime
 
-dynamodb = boto3.resource('dynamodb')
-table = dynamodb.Table(os.environ['INCIDENTS_TABLE'])
-lambda_client = boto3.client('lambda')
+import aws_clients
+import incident_store
+from approval_policy import Decision, PolicyStore, env_policy
+from incident_stats import apply_updates, creation_updates, hour_key
+from priority_queue import SqsWorkQueue, priority_of
+from profiling import profiled
+from router import Router
+from serialization import dumps_bytes
+from tenancy import DEFAULT_TENANT
+from utils import format_response, log_event, logged_handler, parse_event_body
 
+dynamodb = aws_clients.lazy_resource('dynamodb')
+table = aws_clients.lazy_table(os.environ['INCIDENTS_TABLE'])
+lambda_client = aws_clients.lazy_client('lambda')
+sqs = aws_clients.lazy_client('sqs')
+s3 = aws_clients.lazy_client('s3')
+
+STATS_TABLE = os.environ.get('STATS_TABLE', '')
+# Per-severity agent queues; when unset the agent is invoked directly
+AGENT_QUEUE_URLS = json.loads(os.environ.get('AGENT_QUEUE_URLS', '{}'))
+SCHEDULER_LAMBDA_NAME = os.environ.get('SCHEDULER_LAMBDA_NAME', '')
+# Approval policy document; without one the AUTO_APPROVE_* variables are the policy
+APPROVAL_POLICY_BUCKET = os.environ.get('APPROVAL_POLICY_BUCKET', '')
+APPROVAL_POLICY_KEY = os.environ.get('APPROVAL_POLICY_KEY', '')
+APPROVAL_POLICY_REFRESH_SECONDS = float(os.environ.get('APPROVAL_POLICY_REFRESH_SECONDS', '60'))
+
+work_queue = SqsWorkQueue(sqs, AGENT_QUEUE_URLS)
+approval_policy = PolicyStore(
+    s3, APPROVAL_POLICY_BUCKET, APPROVAL_POLICY_KEY, env_policy(os.environ),
+    refresh_seconds=APPROVAL_POLICY_REFRESH_SECONDS
+)
+
+# Clients named in AWS_CLIENT_PREWARM are created during init instead of the first request
+aws_clients.prewarm()
+
+api = Router()
+
+@logged_handler
+@profiled
 def handler(event, context):
     """
     Ingestion Lambda: Receives CloudWatch alarms and API requests,
     stores incidents in DynamoDB, and triggers agent orchestrator.
     """
-    print(f"Received event: {json.dumps(event)}")
+    if 'detail' in event and 'alarmName' in event['detail']:
+        # CloudWatch alarm via EventBridge
+        try:
+            incident = parse_cloudwatch_alarm(event)
+        except Exception as e:
+            log_event('ingestion.alarm_parse_failed', {'error': str(e)}, level='ERROR')
+            return format_response(500, {'error': 'Internal server error', 'message': str(e)})
+        # EventBridge sets the source account; it is the only tenant ingestion trusts
+        return create_incident(incident, tenant=event.get('account') or DEFAULT_TENANT)
+    
+    if 'httpMethod' in event:
+        # API Gateway request
+        return api.dispatch(event)
+    
+    if 'body' in event:
+        # Direct invocation with an API-style body
+        return create_incident_request(event)
     
+    return format_response(400, {'error': 'Invalid event format'})
+
+@api.route('POST', '/incidents')
+def create_incident_request(event):
+    """Create an incident from a JSON request body."""
     try:
-        # Parse incident from CloudWatch alarm or API Gateway
-        if 'detail' in event and 'alarmName' in event['detail']:
-            # CloudWatch alarm via EventBridge
-            incident = parse_cloudwatch_alarm(event)
-        elif 'body' in event:
-            # API Gateway request
-            try:
-                incident = json.loads(event['body'])
-            except json.JSONDecodeError as e:
-                print(f"JSON parsing error: {str(e)}")
-                return {
-                    'statusCode': 400,
-                    'headers': {
-                        'Content-Type': 'application/json',
-                        'Access-Control-Allow-Origin': '*'
-                    },
-                    'body': json.dumps({
-                        'error': 'Invalid JSON format',
-                        'message': str(e)
-                    })
-                }
-        else:
-            return {
-                'statusCode': 400,
-                'headers': {
-                    'Content-Type': 'application/json',
-                    'Access-Control-Allow-Origin': '*'
-                },
-                'body': json.dumps({'error': 'Invalid event format'})
-            }
-    except Exception as e:
-        print(f"Error processing event: {str(e)}")
-        return {
-            'statusCode': 500,
-            'headers': {
-                'Content-Type': 'application/json',
-                'Access-Control-Allow-Origin': '*'
-            },
-            'body': json.dumps({
-                'error': 'Internal server error',
-                'message': str(e)
-            })
-        }
+        incident = parse_event_body(event)
+    except json.JSONDecodeError as e:
+        log_event('ingestion.invalid_json', {'error': str(e)}, level='WARNING')
+        return format_response(400, {'error': 'Invalid JSON format', 'message': str(e)})
+    
+    return create_incident(incident)
+
+def create_incident(incident, tenant=DEFAULT_TENANT):
+    """Store a new incident of ``tenant`` and hand it to the agent.
     
+    Any ``tenantId`` in the incident itself came from the caller and is ignored.
+    """
     try:
         # Generate incident ID
         incident_id = incident.get('incidentId', str(uuid.uuid4()))
         timestamp = int(time.time() * 1000)
         
         # Determine if approval is required
-        requires_approval = determine_approval_requirement(incident)
+        now = datetime.utcnow()
+        decision = determine_approval_requirement(incident, now)
         
         # Store in DynamoDB
+        created_at = now.isoformat()
         item = {
             'incidentId': incident_id,
             'timestamp': timestamp,
@@ -79,98 +105,120 @@ def handler(event, context):
             'description': incident.get('description', ''),
             'source': incident.get('source', 'manual'),
             'metadata': incident.get('metadata', {}),
-            'createdAt': datetime.utcnow().isoformat(),
-            'requiresApproval': requires_approval,
+            'tenantId': tenant,
+            'createdAt': created_at,
+            'updatedAt': created_at,
+            'version': 1,
+            'requiresApproval': decision.requires_approval,
+            'approvalRule': decision.rule,
             'autoApprove': incident.get('autoApprove', False)
         }
         
-        table.put_item(Item=item)
-        print(f"Stored incident {incident_id} in DynamoDB")
+        # Store the current item and its CREATED event atomically
+        transact_items = incident_store.creation_transaction(table.name, item)
+        try:
+            dynamodb.meta.client.transact_write_items(TransactItems=transact_items)
+        except ClientError as e:
+            if not is_duplicate_incident(e):
+                raise
+            # Retried deliveries of the same incident are acknowledged without a second agent run
+            log_event('ingestion.duplicate', {'incidentId': incident_id})
+            return format_response(200, {'incidentId': incident_id, 'message': 'Incident already exists'})
+        log_event('ingestion.stored', {'incidentId': incident_id, 'severity': item['severity']})
+        if STATS_TABLE:
+            # Only a stored (not a duplicate) incident is counted
+            apply_updates(dynamodb.meta.client, creation_updates(STATS_TABLE, item, now))
+        
+        if AGENT_QUEUE_URLS:
+            schedule_agent(incident_id, item['severity'], item['tenantId'])
+        else:
+            trigger_agent(incident_id)
         
-        # Trigger agent orchestrator asynchronously
+        return format_response(200, {
+            'incidentId': incident_id,
+            'status': 'OPEN',
+            'message': 'Incident created successfully'
+        })
+    except Exception as e:
+        log_event('ingestion.create_failed', {'error': str(e)}, level='ERROR')
+        return format_response(500, {'error': 'Failed to create incident', 'message': str(e)})
+
+def schedule_agent(incident_id, severity, tenant):
+    """Queue the incident for the agent by severity and nudge the scheduler."""
+    priority = priority_of(severity)
+    try:
+        work_queue.send(priority, {'incidentId': incident_id, 'severity': severity, 'tenantId': tenant})
+    except Exception as e:
+        # The incident is already stored, so a retried delivery would be skipped as a duplicate
+        log_event('ingestion.queue_failed', {'incidentId': incident_id, 'error': str(e)}, level='WARNING')
+        trigger_agent(incident_id)
+        return
+    log_event('ingestion.queued', {'incidentId': incident_id, 'priority': priority})
+    
+    # The scheduler also runs every minute, so a failed nudge only delays dispatch
+    if SCHEDULER_LAMBDA_NAME:
         try:
-            # Get the actual agent lambda function name from environment or discover it
-            agent_function_name = os.environ.get('AGENT_LAMBDA_NAME')
-            
-            if not agent_function_name:
-                # Try to discover the agent lambda name
-                lambda_list = lambda_client.list_functions()
-                for func in lambda_list.get('Functions', []):
-                    if 'AgentLambda' in func['FunctionName']:
-                        agent_function_name = func['FunctionName']
-                        break
-            
-            if agent_function_name:
-                lambda_client.invoke(
-                    FunctionName=agent_function_name,
-                    InvocationType='Event',
-                    Payload=json.dumps({'incidentId': incident_id})
-                )
-                print(f"Triggered agent for incident {incident_id} using function {agent_function_name}")
-            else:
-                print(f"Warning: Could not find agent lambda function name")
+            lambda_client.invoke(FunctionName=SCHEDULER_LAMBDA_NAME, InvocationType='Event', Payload=b'{}')
         except Exception as e:
-            print(f"Failed to trigger agent: {str(e)}")
+            log_event('ingestion.scheduler_nudge_failed', {'error': str(e)}, level='WARNING')
+
+def trigger_agent(incident_id):
+    """Invoke the agent orchestrator asynchronously."""
+    try:
+        # Get the actual agent lambda function name from environment or discover it
+        agent_function_name = os.environ.get('AGENT_LAMBDA_NAME')
         
-        return {
-            'statusCode': 200,
-            'headers': {
-                'Content-Type': 'application/json',
-                'Access-Control-Allow-Origin': '*'
-            },
-            'body': json.dumps({
-                'incidentId': incident_id,
-                'status': 'OPEN',
-                'message': 'Incident created successfully'
-            })
-        }
+        if not agent_function_name:
+            # Try to discover the agent lambda name
+            lambda_list = lambda_client.list_functions()
+            for func in lambda_list.get('Functions', []):
+                if 'AgentLambda' in func['FunctionName']:
+                    agent_function_name = func['FunctionName']
+                    break
+        
+        if agent_function_name:
+            lambda_client.invoke(
+                FunctionName=agent_function_name,
+                InvocationType='Event',
+                Payload=dumps_bytes({'incidentId': incident_id})
+            )
+            log_event('ingestion.agent_triggered', {'incidentId': incident_id, 'function': agent_function_name})
+        else:
+            log_event('ingestion.agent_not_found', {'incidentId': incident_id}, level='WARNING')
     except Exception as e:
-        print(f"Error creating incident: {str(e)}")
-        return {
-            'statusCode': 500,
-            'headers': {
-                'Content-Type': 'application/json',
-                'Access-Control-Allow-Origin': '*'
-            },
-            'body': json.dumps({
-                'error': 'Failed to create incident',
-                'message': str(e)
-            })
-        }
+        log_event('ingestion.agent_trigger_failed', {'incidentId': incident_id, 'error': str(e)}, level='ERROR')
 
-def determine_approval_requirement(incident):
-    """Determine if incident requires user approval based on rules."""
-    # Get approval settings from environment or use defaults
-    auto_approve_low = os.environ.get('AUTO_APPROVE_LOW_SEVERITY', 'true').lower() == 'true'
-    auto_approve_medium = os.environ.get('AUTO_APPROVE_MEDIUM_SEVERITY', 'false').lower() == 'true'
-    auto_approve_high = os.environ.get('AUTO_APPROVE_HIGH_SEVERITY', 'false').lower() == 'true'
-    auto_approve_critical = os.environ.get('AUTO_APPROVE_CRITICAL_SEVERITY', 'false').lower() == 'true'
-    
+def is_duplicate_incident(error):
+    """Check whether a creation failed because the incident already exists."""
+    if error.response['Error']['Code'] != 'TransactionCanceledException':
+        return False
+    # The current-item Put is the first entry of the creation transaction
+    reasons = error.response.get('CancellationReasons') or []
+    return bool(reasons) and reasons[0].get('Code') == 'ConditionalCheckFailed'
+
+def determine_approval_requirement(incident, now):
+    """Decide whether the incident needs user approval, by flag or by the approval policy."""
     # Check if incident has explicit auto-approve flag
     if incident.get('autoApprove'):
-        return False
+        return Decision(False, 'autoApprove', None)
     
-    # Check severity-based rules
-    severity = incident.get('severity', 'MEDIUM')
-    
-    if severity == 'LOW' and auto_approve_low:
-        return False
-    elif severity == 'MEDIUM' and auto_approve_medium:
-        return False
-    elif severity == 'HIGH' and auto_approve_high:
-        return False
-    elif severity == 'CRITICAL' and auto_approve_critical:
-        return False
-    
-    # Check source-based rules
-    source = incident.get('source', 'manual')
-    auto_approve_sources = os.environ.get('AUTO_APPROVE_SOURCES', '').split(',')
-    
-    if source in auto_approve_sources:
-        return False
-    
-    # Default: require approval
-    return True
+    severity = str(incident.get('severity', 'MEDIUM')).upper()
+    return approval_policy.policy().evaluate(
+        {**incident, 'severity': severity},
+        now.hour,
+        rate=lambda: incidents_this_hour(now)
+    )
+
+def incidents_this_hour(now):
+    """Incidents created so far this hour, from the dashboard counters; None if unavailable."""
+    if not STATS_TABLE:
+        return None
+    try:
+        item = dynamodb.Table(STATS_TABLE).get_item(Key={'statsKey': hour_key(now)}).get('Item') or {}
+    except Exception as e:
+        log_event('ingestion.rate_lookup_failed', {'error': str(e)}, level='WARNING')
+        return None
+    return int(item.get('created', 0))
 
 def parse_cloudwatch_alarm(event):
     """Parse CloudWatch alarm event into incident format."""
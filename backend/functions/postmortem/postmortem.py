@@ -0,0 +1,176 @@
+import os
+
+from boto3.dynamodb.types import TypeDeserializer
+
+import aws_clients
+import incident_store
+from postmortem_store import update_index, write_batch
+from serialization import dumps, dumps_bytes, loads
+from utils import log_event, logged_handler
+
+s3 = aws_clients.lazy_client('s3')
+bedrock = aws_clients.lazy_client('bedrock-runtime')
+
+INCIDENTS_TABLE = os.environ['INCIDENTS_TABLE']
+POSTMORTEMS_BUCKET = os.environ['POSTMORTEMS_BUCKET']
+BEDROCK_MODEL_ID = os.environ.get('BEDROCK_MODEL_ID', '')
+# Ask Bedrock to write the analysis sections from the full timeline
+POSTMORTEM_ENRICH = os.environ.get('POSTMORTEM_ENRICH', 'false').lower() == 'true'
+
+table = aws_clients.lazy_table(INCIDENTS_TABLE)
+
+# Bulky agent attributes left out of the timeline
+TIMELINE_OMITTED = frozenset(['observation', 'timings', 'diagnosis', 'plan', 'actionsTaken', 'jiraPendingUpdates'])
+
+_deserializer = TypeDeserializer()
+
+# Clients named in AWS_CLIENT_PREWARM are created during init instead of the first request
+aws_clients.prewarm()
+
+@logged_handler
+def handler(event, context):
+    """
+    Postmortem Lambda: Consumes RESOLVED transitions from the incidents
+    table's DynamoDB stream and writes the batch's postmortems to one
+    compressed object per day, plus the monthly index manifests.
+    """
+    incidents = [incident for incident in map(resolved_incident, event.get('Records', [])) if incident]
+    if not incidents:
+        return {'written': 0}
+    
+    records = [
+        build_postmortem(incident, incident_store.get_timeline(table, incident['incidentId']))
+        for incident in incidents
+    ]
+    
+    # The objects are written before the manifest, so every index entry points at data
+    entries = write_batch(s3, POSTMORTEMS_BUCKET, records)
+    manifests = update_index(s3, POSTMORTEMS_BUCKET, entries)
+    
+    keys = sorted({entry['key'] for entry in entries})
+    log_event('postmortem.written', {'postmortems': len(entries), 'keys': keys, 'manifests': manifests})
+    return {'written': len(entries), 'keys': keys}
+
+def resolved_incident(record):
+    """Return the incident a stream record moved to RESOLVED, or None."""
+    if record.get('eventName') not in ('INSERT', 'MODIFY'):
+        return None
+    
+    stream = record.get('dynamodb', {})
+    keys = {key: _deserializer.deserialize(value) for key, value in stream.get('Keys', {}).items()}
+    if keys.get('sk') != incident_store.CURRENT_SK:
+        return None
+    
+    new = {key: _deserializer.deserialize(value) for key, value in stream.get('NewImage', {}).items()}
+    old_status = stream.get('OldImage', {}).get('status', {}).get('S')
+    if new.get('status') != 'RESOLVED' or old_status == 'RESOLVED':
+        return None
+    return incident_store.to_incident(new)
+
+def build_postmortem(incident, timeline):
+    """The postmortem record of a resolved incident, enriched by Bedrock when enabled."""
+    diagnosis = incident.get('diagnosis') or {}
+    plan = incident.get('plan') or {}
+    sections = enrich_with_bedrock(incident, timeline) if POSTMORTEM_ENRICH else None
+    return {
+        'incidentId': incident['incidentId'],
+        'title': incident.get('title', ''),
+        'severity': incident.get('severity', 'UNKNOWN'),
+        'category': plan.get('category') or diagnosis.get('category'),
+        'resolvedAt': incident.get('resolvedAt') or incident.get('updatedAt'),
+        'enriched': sections is not None,
+        'markdown': render_postmortem(incident, timeline, sections)
+    }
+
+def timeline_lines(timeline):
+    """One line per history event: when, which version, and the fields it changed."""
+    lines = []
+    for event in timeline:
+        changes = event.get('changes') or {}
+        shown = ', '.join(
+            f'{name}={value}' if name in ('status', 'agentPhase') else name
+            for name, value in changes.items() if name not in TIMELINE_OMITTED
+        )
+        omitted = sorted(name for name in changes if name in TIMELINE_OMITTED)
+        if omitted:
+            shown = ', '.join(filter(None, [shown, '+' + '/'.join(omitted)]))
+        lines.append(f"- {event.get('at', '?')} v{event.get('version')} {event.get('eventType', '')}: {shown}")
+    return lines
+
+def render_postmortem(incident, timeline, sections=None):
+    """Markdown postmortem; ``sections`` replaces the default analysis sections."""
+    diagnosis = incident.get('diagnosis') or {}
+    actions = incident.get('actionsTaken') or []
+    action_lines = [
+        f"- {(taken.get('action') or {}).get('type')} on {(taken.get('action') or {}).get('target')}: "
+        f"{(taken.get('result') or {}).get('status') or taken.get('status', 'UNKNOWN')}"
+        for taken in actions
+    ] or ['- None']
+    sections = sections or {
+        'summary': incident.get('title', ''),
+        'rootCause': diagnosis.get('diagnosis', 'Unknown'),
+        'impact': incident.get('description', ''),
+        'prevention': ['Review monitoring thresholds', 'Update runbooks', 'Implement additional safeguards']
+    }
+    lines = [
+        f"# Incident Postmortem: {incident['incidentId']}",
+        '',
+        '## Summary',
+        sections.get('summary', ''),
+        '',
+        '## Impact',
+        sections.get('impact', ''),
+        '',
+        '## Timeline',
+        f"- Detected: {incident.get('createdAt')}",
+        f"- Resolved: {incident.get('resolvedAt') or incident.get('updatedAt')}",
+        *timeline_lines(timeline),
+        '',
+        '## Root Cause',
+        f"{sections.get('rootCause', '')} (confidence {diagnosis.get('confidence', 'n/a')})",
+        '',
+        '## Actions Taken',
+        *action_lines,
+        '',
+        '## Prevention',
+        *[f'- {item}' for item in sections.get('prevention', [])],
+        ''
+    ]
+    return '\n'.join(lines)
+
+def enrich_with_bedrock(incident, timeline):
+    """Analysis sections written by Bedrock from the full timeline; None if unavailable."""
+    diagnosis = incident.get('diagnosis') or {}
+    prompt = f"""You are an SRE writing a blameless postmortem.
+
+Incident: {incident.get('title')}
+Description: {incident.get('description')}
+Severity: {incident.get('severity')}
+Diagnosis: {diagnosis.get('diagnosis')}
+Actions Taken: {dumps(incident.get('actionsTaken') or [])}
+Timeline:
+{chr(10).join(timeline_lines(timeline))}
+
+Respond with a JSON object with keys "summary", "impact", "rootCause" (strings) and "prevention" (a list of strings)."""
+
+    try:
+        response = bedrock.invoke_model(
+            modelId=BEDROCK_MODEL_ID,
+            body=dumps_bytes({
+                "anthropic_version": "bedrock-2023-05-31",
+                "max_tokens": 800,
+                "messages": [{
+                    "role": "user",
+                    "content": prompt
+                }]
+            })
+        )
+        text = loads(response['body'].read())['content'][0]['text']
+        sections = loads(text[text.index('{'):text.rindex('}') + 1])
+        if not all(isinstance(sections.get(name), str) for name in ('summary', 'impact', 'rootCause')):
+            raise ValueError('missing sections')
+        sections['prevention'] = [str(item) for item in sections.get('prevention') or []]
+        return sections
+    except Exception as e:
+        log_event('postmortem.enrich_failed', {'incidentId': incident.get('incidentId'), 'error': str(e)}, level='WARNING')
+        return None
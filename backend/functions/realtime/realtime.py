@@ -0,0 +1,315 @@
+import json
+import os
+import time
+
+from boto3.dynamodb.conditions import Key
+from boto3.dynamodb.types import TypeDeserializer
+
+import aws_clients
+from incident_store import CURRENT_SK, KEY_ATTRIBUTES
+from serialization import dumps_bytes
+from utils import log_event, logged_handler
+
+CONNECTIONS_TABLE = os.environ.get('CONNECTIONS_TABLE', '')
+WEBSOCKET_CALLBACK_URL = os.environ.get('WEBSOCKET_CALLBACK_URL', '')
+CONNECTION_TTL_SECONDS = int(os.environ.get('CONNECTION_TTL_SECONDS', '7200'))
+
+# Topic that receives the deltas of every incident
+ALL_INCIDENTS = '*'
+
+# Attributes that are internal bookkeeping or storage keys and never pushed to clients
+DELTA_EXCLUDED_FIELDS = frozenset(['jiraPendingUpdates', *KEY_ATTRIBUTES])
+# Bulky agent attributes only named in deltas; clients that show them fetch the incident
+DELTA_OMITTED_FIELDS = frozenset(['observation', 'timings', 'diagnosis', 'plan', 'actionsTaken'])
+
+# API Gateway rejects WebSocket messages over 128 KB
+MAX_MESSAGE_BYTES = 128 * 1024
+MESSAGE_PREFIX = b'{"type":"incidents.delta","deltas":['
+MESSAGE_SUFFIX = b']}'
+
+_deserializer = TypeDeserializer()
+_store = None
+_publisher = None
+
+@logged_handler
+def handler(event, context):
+    """
+    Realtime Lambda: Manages WebSocket subscriptions and fans out incident
+    deltas from the incidents table's DynamoDB stream to subscribed clients.
+    """
+    if 'Records' in event:
+        return handle_stream_event(event)
+
+    if event.get('requestContext', {}).get('routeKey'):
+        return handle_websocket_event(event)
+
+    return {'error': 'Unsupported event'}
+
+class DynamoSubscriptionStore:
+    """Subscriptions stored as (topic, connectionId) items with a TTL."""
+
+    def __init__(self, table_name):
+        self.table = aws_clients.resource('dynamodb').Table(table_name)
+
+    def subscribe(self, connection_id, topics):
+        expires_at = int(time.time()) + CONNECTION_TTL_SECONDS
+        with self.table.batch_writer() as batch:
+            for topic in topics:
+                batch.put_item(Item={
+                    'topic': topic,
+                    'connectionId': connection_id,
+                    'expiresAt': expires_at
+                })
+
+    def unsubscribe(self, connection_id, topics=None):
+        if topics is None:
+            topics = [
+                item['topic'] for item in self._query(
+                    IndexName='byConnection',
+                    KeyConditionExpression=Key('connectionId').eq(connection_id)
+                )
+            ]
+
+        with self.table.batch_writer() as batch:
+            for topic in topics:
+                batch.delete_item(Key={'topic': topic, 'connectionId': connection_id})
+
+    def connections_for(self, topics):
+        connections = {}
+        for topic in topics:
+            for item in self._query(KeyConditionExpression=Key('topic').eq(topic)):
+                connections.setdefault(item['connectionId'], set()).add(topic)
+        return connections
+
+    def _query(self, **kwargs):
+        """Yield the items of every page of a query."""
+        while True:
+            response = self.table.query(**kwargs)
+            yield from response.get('Items', [])
+            if 'LastEvaluatedKey' not in response:
+                return
+            kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+class InMemorySubscriptionStore:
+    """Local stand-in for DynamoSubscriptionStore used in tests and local runs."""
+
+    def __init__(self):
+        self.topics = {}
+
+    def subscribe(self, connection_id, topics):
+        for topic in topics:
+            self.topics.setdefault(topic, set()).add(connection_id)
+
+    def unsubscribe(self, connection_id, topics=None):
+        for topic in list(self.topics if topics is None else topics):
+            self.topics.get(topic, set()).discard(connection_id)
+
+    def connections_for(self, topics):
+        connections = {}
+        for topic in topics:
+            for connection_id in self.topics.get(topic, ()):
+                connections.setdefault(connection_id, set()).add(topic)
+        return connections
+
+class ApiGatewayPublisher:
+    """Pushes messages to clients through the API Gateway management API."""
+
+    def __init__(self, callback_url):
+        self.client = aws_clients.client('apigatewaymanagementapi', endpoint_url=callback_url)
+
+    def send(self, connection_id, data):
+        """
+        Send bytes to a connection; returns False when the client is gone.
+        
+        Other errors (throttling once botocore's retries are spent, a
+        rejected payload) are raised for the caller to handle per connection.
+        """
+        try:
+            self.client.post_to_connection(ConnectionId=connection_id, Data=data)
+            return True
+        except self.client.exceptions.GoneException:
+            return False
+
+class InMemoryPublisher:
+    """Local stand-in for ApiGatewayPublisher that records sent messages."""
+
+    def __init__(self):
+        self.sent = {}
+        self.gone = set()
+        self.failing = set()
+
+    def send(self, connection_id, data):
+        if connection_id in self.gone:
+            return False
+        if connection_id in self.failing or len(data) > MAX_MESSAGE_BYTES:
+            raise ValueError(f'Cannot post {len(data)} bytes to {connection_id}')
+        self.sent.setdefault(connection_id, []).append(json.loads(data))
+        return True
+
+def get_store():
+    """Return the subscription store, in memory when no table is configured."""
+    global _store
+    if _store is None:
+        _store = DynamoSubscriptionStore(CONNECTIONS_TABLE) if CONNECTIONS_TABLE else InMemorySubscriptionStore()
+    return _store
+
+def get_publisher():
+    """Return the publisher, in memory when no callback URL is configured."""
+    global _publisher
+    if _publisher is None:
+        _publisher = ApiGatewayPublisher(WEBSOCKET_CALLBACK_URL) if WEBSOCKET_CALLBACK_URL else InMemoryPublisher()
+    return _publisher
+
+def handle_websocket_event(event):
+    """Handle $connect, $disconnect, subscribe and unsubscribe routes."""
+    request_context = event['requestContext']
+    route = request_context['routeKey']
+    connection_id = request_context['connectionId']
+    store = get_store()
+
+    if route == '$connect':
+        return {'statusCode': 200}
+
+    if route == '$disconnect':
+        store.unsubscribe(connection_id)
+        return {'statusCode': 200}
+
+    try:
+        body = json.loads(event.get('body') or '{}')
+    except json.JSONDecodeError:
+        return {'statusCode': 400, 'body': json.dumps({'error': 'Invalid JSON format'})}
+
+    topics = parse_topics(body)
+
+    if route == 'subscribe':
+        store.subscribe(connection_id, topics)
+        return {'statusCode': 200, 'body': json.dumps({'subscribed': topics})}
+
+    if route == 'unsubscribe':
+        store.unsubscribe(connection_id, topics)
+        return {'statusCode': 200, 'body': json.dumps({'unsubscribed': topics})}
+
+    return {'statusCode': 400, 'body': json.dumps({'error': f'Unknown route: {route}'})}
+
+def parse_topics(body):
+    """Extract subscription topics; no incident IDs means all incidents."""
+    incident_ids = body.get('incidentIds') or []
+    if body.get('incidentId'):
+        incident_ids = incident_ids + [body['incidentId']]
+    return [str(incident_id) for incident_id in incident_ids] or [ALL_INCIDENTS]
+
+def deserialize_image(image):
+    """Convert a DynamoDB stream image into plain Python values."""
+    return {key: _deserializer.deserialize(value) for key, value in (image or {}).items()}
+
+def compute_delta(old, new):
+    """Return the attributes that changed or were removed between two images."""
+    changes = {
+        key: value for key, value in new.items()
+        if key not in DELTA_EXCLUDED_FIELDS and old.get(key) != value
+    }
+    removed = [key for key in old if key not in new and key not in DELTA_EXCLUDED_FIELDS]
+    return changes, removed
+
+def split_omitted(changes, removed):
+    """Move bulky attributes out of a delta, returning the names that were left out."""
+    omitted = sorted(name for name in [*changes, *removed] if name in DELTA_OMITTED_FIELDS)
+    for name in omitted:
+        changes.pop(name, None)
+    removed = [name for name in removed if name not in DELTA_OMITTED_FIELDS]
+    return changes, removed, omitted
+
+def record_to_delta(record):
+    """Build the client-facing delta for one stream record, or None if nothing changed."""
+    stream = record.get('dynamodb', {})
+    old = deserialize_image(stream.get('OldImage'))
+    new = deserialize_image(stream.get('NewImage'))
+    keys = deserialize_image(stream.get('Keys'))
+    if keys.get('sk') != CURRENT_SK:
+        # History events are appended alongside every change and carry no new state
+        return None
+    incident_id = new.get('incidentId') or old.get('incidentId') or keys['pk'].split('#', 1)[-1]
+
+    event_name = record.get('eventName')
+    if event_name == 'REMOVE':
+        return {'type': 'incident.removed', 'incidentId': incident_id}
+
+    changes, removed = compute_delta(old, new)
+    if not changes and not removed:
+        return None
+    changes, removed, omitted = split_omitted(changes, removed)
+
+    delta = {
+        'type': 'incident.created' if event_name == 'INSERT' else 'incident.updated',
+        'incidentId': incident_id,
+        'changes': changes
+    }
+    if removed:
+        delta['removed'] = removed
+    if omitted:
+        delta['omitted'] = omitted
+    return delta
+
+def encode_delta(delta):
+    """Encode a delta, replaced by a refetch marker when it would not fit in a message."""
+    data = dumps_bytes(delta)
+    if len(data) > MAX_MESSAGE_BYTES - len(MESSAGE_PREFIX) - len(MESSAGE_SUFFIX):
+        data = dumps_bytes({'type': delta['type'], 'incidentId': delta['incidentId'], 'truncated': True})
+    return data
+
+def delta_messages(encoded):
+    """Splice encoded deltas into as few messages as fit under MAX_MESSAGE_BYTES."""
+    budget = MAX_MESSAGE_BYTES - len(MESSAGE_PREFIX) - len(MESSAGE_SUFFIX)
+    batch, size = [], 0
+    for data in encoded:
+        if batch and size + 1 + len(data) > budget:
+            yield MESSAGE_PREFIX + b','.join(batch) + MESSAGE_SUFFIX
+            batch, size = [], 0
+        size += len(data) + (1 if batch else 0)
+        batch.append(data)
+    if batch:
+        yield MESSAGE_PREFIX + b','.join(batch) + MESSAGE_SUFFIX
+
+def publish(publisher, connection_id, messages):
+    """Send a connection its messages; returns False when the client is gone."""
+    for message in messages:
+        if not publisher.send(connection_id, message):
+            return False
+    return True
+
+def handle_stream_event(event):
+    """
+    Fan out one DynamoDB stream batch, as few messages per connection as fit.
+    
+    A connection that fails is logged and skipped, so one client cannot fail
+    the batch (and have the stream redeliver it to everyone).
+    """
+    deltas = [delta for delta in map(record_to_delta, event['Records']) if delta]
+    if not deltas:
+        return {'delivered': 0, 'deltas': 0}
+
+    store = get_store()
+    publisher = get_publisher()
+    topics = {delta['incidentId'] for delta in deltas} | {ALL_INCIDENTS}
+    connections = store.connections_for(sorted(topics))
+
+    # Each delta is encoded once and spliced into every message that carries it
+    encoded = [encode_delta(delta) for delta in deltas]
+    delivered = failed = 0
+    for connection_id, subscribed in connections.items():
+        wanted = [
+            encoded[index] for index, delta in enumerate(deltas)
+            if ALL_INCIDENTS in subscribed or delta['incidentId'] in subscribed
+        ]
+        try:
+            if publish(publisher, connection_id, delta_messages(wanted)):
+                delivered += 1
+            else:
+                store.unsubscribe(connection_id)
+        except Exception as e:
+            # The client reconciles by refetching when it reconnects
+            failed += 1
+            log_event('realtime.send_failed', {'connectionId': connection_id, 'error': str(e)}, level='WARNING')
+
+    log_event('realtime.delivered', {'deltas': len(deltas), 'connections': delivered, 'failed': failed})
+    return {'delivered': delivered, 'deltas': len(deltas)}
@@ -0,0 +1,84 @@
+import json
+import os
+import time
+
+import aws_clients
+from priority_queue import (
+    METRICS_NAMESPACE, PRIORITIES, PriorityScheduler, SqsWorkQueue, acquire_lease, expire_leases,
+    metric_data, read_leases
+)
+from serialization import dumps_bytes
+from tenancy import DEFAULT_TENANT
+from utils import log_event, logged_handler
+
+sqs = aws_clients.lazy_client('sqs')
+lambda_client = aws_clients.lazy_client('lambda')
+cloudwatch = aws_clients.lazy_client('cloudwatch')
+
+AGENT_LAMBDA_NAME = os.environ['AGENT_LAMBDA_NAME']
+AGENT_QUEUE_URLS = json.loads(os.environ.get('AGENT_QUEUE_URLS', '{}'))
+AGENT_CAPACITY = int(os.environ.get('AGENT_CAPACITY', '10'))
+AGENT_RESERVED_CAPACITY = int(os.environ.get('AGENT_RESERVED_CAPACITY', '3'))
+# A run that never releases its slot (crash, timeout) frees it after this long
+AGENT_LEASE_SECONDS = int(os.environ.get('AGENT_LEASE_SECONDS', '1800'))
+LOW_PRIORITY_SHED_AFTER_SECONDS = int(os.environ.get('LOW_PRIORITY_SHED_AFTER_SECONDS', '3600'))
+# Most slots one tenant (source account) may hold; 0 for no limit
+AGENT_TENANT_CAPACITY = int(os.environ.get('AGENT_TENANT_CAPACITY', '0'))
+
+stats_table = aws_clients.lazy_table(os.environ['STATS_TABLE'])
+
+# Created per container so the weighted round-robin position survives warm invocations
+scheduler = PriorityScheduler(
+    SqsWorkQueue(sqs, AGENT_QUEUE_URLS),
+    capacity=AGENT_CAPACITY,
+    reserved=AGENT_RESERVED_CAPACITY,
+    shed_after_seconds=LOW_PRIORITY_SHED_AFTER_SECONDS,
+    tenant_capacity=AGENT_TENANT_CAPACITY
+)
+
+# Clients named in AWS_CLIENT_PREWARM are created during init instead of the first request
+aws_clients.prewarm()
+
+@logged_handler
+def handler(event, context):
+    """
+    Scheduler Lambda: Drains the per-severity agent queues into agent runs.
+    
+    Invoked by ingestion after every enqueue and by a one-minute schedule, which
+    picks up deferred work and slots freed by finished runs.
+    """
+    now = time.time()
+    leases = read_leases(stats_table)
+    expired = expire_leases(stats_table, leases, now)
+    in_flight = {priority: 0 for priority in PRIORITIES}
+    tenant_in_flight = {}
+    for incident_id, lease in leases.items():
+        if incident_id not in expired:
+            in_flight[lease.get('priority', 'MEDIUM')] += 1
+            tenant = lease.get('tenant', DEFAULT_TENANT)
+            tenant_in_flight[tenant] = tenant_in_flight.get(tenant, 0) + 1
+    
+    result = scheduler.run(in_flight, dispatch_agent, tenant_in_flight)
+    publish_metrics(result)
+    
+    summary = {name: result[name] for name in ('dispatched', 'deferred', 'throttled', 'shed', 'depth', 'inFlight')}
+    log_event('scheduler.run', summary)
+    return summary
+
+def dispatch_agent(priority, message):
+    """Take an agent slot for the incident and start its run."""
+    incident_id = message['incidentId']
+    tenant = message.get('tenantId') or DEFAULT_TENANT
+    acquire_lease(stats_table, incident_id, priority, time.time() + AGENT_LEASE_SECONDS, tenant)
+    lambda_client.invoke(
+        FunctionName=AGENT_LAMBDA_NAME,
+        InvocationType='Event',
+        Payload=dumps_bytes({'incidentId': incident_id})
+    )
+    log_event('scheduler.dispatched', {'incidentId': incident_id, 'priority': priority, 'tenantId': tenant})
+
+def publish_metrics(result):
+    try:
+        cloudwatch.put_metric_data(Namespace=METRICS_NAMESPACE, MetricData=metric_data(result))
+    except Exception as e:
+        log_event('scheduler.metrics_failed', {'error': str(e)}, level='WARNING')
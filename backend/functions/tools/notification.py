@@ -1,9 +1,19 @@
+import base64
+import functools
 import json
 import os
 import time
-import urllib3
 
-http = urllib3.PoolManager()
+from botocore.exceptions import ClientError
+
+import aws_clients
+from incident_store import incident_key
+from metrics import TimedPoolManager, emit, timings
+from notification_templates import compile_template, encode_json, slot
+from profiling import profiled
+from utils import log_event, logged_handler
+
+http = TimedPoolManager()
 
 # Environment variables
 SLACK_WEBHOOK_URL = os.environ.get('SLACK_WEBHOOK_URL', '')
@@ -11,6 +21,9 @@ JIRA_URL = os.environ.get('JIRA_URL', '')
 JIRA_USERNAME = os.environ.get('JIRA_USERNAME', '')
 JIRA_API_TOKEN = os.environ.get('JIRA_API_TOKEN', '')
 JIRA_PROJECT_KEY = os.environ.get('JIRA_PROJECT_KEY', 'INC')
+JIRA_UPDATE_WINDOW_SECONDS = int(os.environ.get('JIRA_UPDATE_WINDOW_SECONDS', '60'))
+JIRA_RESOLVE_TRANSITION_ID = os.environ.get('JIRA_RESOLVE_TRANSITION_ID', '')
+JIRA_FLUSH_QUEUE_URL = os.environ.get('JIRA_FLUSH_QUEUE_URL', '')
 PAGERDUTY_INTEGRATION_KEY = os.environ.get('PAGERDUTY_INTEGRATION_KEY', '')
 TEAMS_WEBHOOK_URL = os.environ.get('TEAMS_WEBHOOK_URL', '')
 SES_FROM_EMAIL = os.environ.get('SES_FROM_EMAIL', '')
@@ -20,30 +33,54 @@ ENABLE_JIRA = os.environ.get('ENABLE_JIRA_INTEGRATION', 'false').lower() == 'tru
 ENABLE_PAGERDUTY = os.environ.get('ENABLE_PAGERDUTY_INTEGRATION', 'false').lower() == 'true'
 ENABLE_TEAMS = os.environ.get('ENABLE_TEAMS_NOTIFICATIONS', 'false').lower() == 'true'
 ENABLE_EMAIL = os.environ.get('ENABLE_EMAIL_NOTIFICATIONS', 'false').lower() == 'true'
+INCIDENTS_TABLE = os.environ.get('INCIDENTS_TABLE', '')
+NOTIFICATION_METRICS_NAMESPACE = 'ResiliBot/Notifications'
+
+# Statuses that always flush pending Jira updates immediately
+JIRA_TERMINAL_STATUSES = ('RESOLVED', 'CLOSED', 'DENIED')
+# jiraTicket while one invocation creates the ticket; a claim older than this is abandoned
+JIRA_RESERVED = 'CREATING'
+JIRA_RESERVATION_SECONDS = 300
+# SQS caps message delays at 15 minutes
+MAX_FLUSH_DELAY_SECONDS = 900
+
+sqs = aws_clients.lazy_client('sqs')
 
+# Incident ID -> Jira ticket mapping, cached for the life of the container
+_jira_tickets = {}
+_incidents_table = None
+
+@logged_handler
+@profiled
 def handler(event, context):
     """
     Notification Tool: Send notifications to multiple channels.
     """
+    if 'Records' in event:
+        # Delayed Jira flushes from the flush queue
+        return flush_jira_batch(event)
+    
     channels = event.get('channels', ['slack'])  # Support multiple channels
     message = event.get('message', {})
     results = {}
+    timings.reset()
     
     # Send to all enabled channels
-    if 'slack' in channels and ENABLE_SLACK:
-        results['slack'] = send_slack_notification(message)
-    
-    if 'jira' in channels and ENABLE_JIRA:
-        results['jira'] = create_jira_ticket(message)
-    
-    if 'pagerduty' in channels and ENABLE_PAGERDUTY:
-        results['pagerduty'] = trigger_pagerduty(message)
+    for channel, enabled, send in (
+        ('slack', ENABLE_SLACK, send_slack_notification),
+        ('jira', ENABLE_JIRA, create_jira_ticket),
+        ('pagerduty', ENABLE_PAGERDUTY, trigger_pagerduty),
+        ('teams', ENABLE_TEAMS, send_teams_notification),
+        ('email', ENABLE_EMAIL, send_email_notification)
+    ):
+        if channel in channels and enabled:
+            with timings.timer(f'channel.{channel}'):
+                results[channel] = send(message)
     
-    if 'teams' in channels and ENABLE_TEAMS:
-        results['teams'] = send_teams_notification(message)
-    
-    if 'email' in channels and ENABLE_EMAIL:
-        results['email'] = send_email_notification(message)
+    emit(timings.since({}), {
+        'Severity': message.get('severity', 'MEDIUM'),
+        'Source': message.get('source', 'unknown')
+    }, properties={'incidentId': message.get('incidentId')}, namespace=NOTIFICATION_METRICS_NAMESPACE)
     
     return {
         'status': 'SUCCESS',
@@ -51,99 +88,109 @@ def handler(event, context):
         'channels_processed': len(results)
     }
 
-def send_slack_notification(message):
-    """Send notification to Slack via webhook."""
-    if not SLACK_WEBHOOK_URL:
-        return {'status': 'SKIPPED', 'message': 'Slack webhook not configured'}
-    
-    incident_id = message.get('incidentId', 'Unknown')
-    title = message.get('title', 'Incident Alert')
-    severity = message.get('severity', 'MEDIUM')
-    description = message.get('description', '')
-    status = message.get('status', 'OPEN')
-    diagnosis = message.get('diagnosis')
-    confidence = message.get('confidence')
-    requires_approval = message.get('requiresApproval', False)
-    approval_buttons = message.get('approvalButtons', False)
-    
-    # Get severity color
-    severity_colors = {
-        'CRITICAL': '#DC2626',  # Red
-        'HIGH': '#EA580C',      # Orange
-        'MEDIUM': '#F59E0B',    # Amber
-        'LOW': '#3B82F6'        # Blue
-    }
-    color = severity_colors.get(severity, '#6B7280')
-    
-    # Get status emoji and color
-    status_info = {
-        'OPEN': {'emoji': '🆕', 'color': '#3B82F6', 'text': 'New Incident'},
-        'PENDING_APPROVAL': {'emoji': '⏳', 'color': '#F59E0B', 'text': 'Awaiting Approval'},
-        'APPROVED': {'emoji': '✅', 'color': '#10B981', 'text': 'Approved'},
-        'DENIED': {'emoji': '❌', 'color': '#DC2626', 'text': 'Denied'},
-        'IN_PROGRESS': {'emoji': '⚙️', 'color': '#F59E0B', 'text': 'Agent Processing'},
-        'RESOLVED': {'emoji': '✅', 'color': '#10B981', 'text': 'Resolved'},
-        'CLOSED': {'emoji': '🔒', 'color': '#6B7280', 'text': 'Closed'}
-    }
-    status_data = status_info.get(status, status_info['OPEN'])
-    
-    # Build blocks
+DASHBOARD_URL = 'http://localhost:3000'
+AWS_CONSOLE_URL = 'https://console.aws.amazon.com/cloudwatch'
+
+SEVERITY_EMOJIS = {
+    'CRITICAL': ':fire:',
+    'HIGH': ':rotating_light:',
+    'MEDIUM': ':warning:',
+    'LOW': ':information_source:'
+}
+
+SLACK_SEVERITY_COLORS = {
+    'CRITICAL': '#DC2626',  # Red
+    'HIGH': '#EA580C',      # Orange
+    'MEDIUM': '#F59E0B',    # Amber
+    'LOW': '#3B82F6'        # Blue
+}
+
+TEAMS_SEVERITY_COLORS = {
+    'CRITICAL': 'FF0000',  # Red
+    'HIGH': 'FF8C00',      # Orange
+    'MEDIUM': 'FFD700',    # Gold
+    'LOW': '0078D4'        # Blue
+}
+
+JIRA_PRIORITIES = {
+    'CRITICAL': 'Highest',
+    'HIGH': 'High',
+    'MEDIUM': 'Medium',
+    'LOW': 'Low'
+}
+
+PAGERDUTY_SEVERITIES = {
+    'CRITICAL': 'critical',
+    'HIGH': 'error',
+    'MEDIUM': 'warning',
+    'LOW': 'info'
+}
+
+STATUS_INFO = {
+    'OPEN': {'emoji': '🆕', 'color': '#3B82F6', 'text': 'New Incident'},
+    'PENDING_APPROVAL': {'emoji': '⏳', 'color': '#F59E0B', 'text': 'Awaiting Approval'},
+    'APPROVED': {'emoji': '✅', 'color': '#10B981', 'text': 'Approved'},
+    'DENIED': {'emoji': '❌', 'color': '#DC2626', 'text': 'Denied'},
+    'IN_PROGRESS': {'emoji': '⚙️', 'color': '#F59E0B', 'text': 'Agent Processing'},
+    'RESOLVED': {'emoji': '✅', 'color': '#10B981', 'text': 'Resolved'},
+    'CLOSED': {'emoji': '🔒', 'color': '#6B7280', 'text': 'Closed'}
+}
+
+# Status strings used by the Slack blocks, derived once from STATUS_INFO
+_SLACK_STATUS_FIELDS = {
+    status: (
+        f'*Status:*\n{info["emoji"]} {info["text"]}',
+        f'*Status:* {info["emoji"]} {info["text"]}'
+    )
+    for status, info in STATUS_INFO.items()
+}
+
+def get_severity_emoji(severity):
+    """Get emoji for severity level."""
+    return SEVERITY_EMOJIS.get(severity, ':question:')
+
+@functools.lru_cache(maxsize=None)
+def slack_template(has_diagnosis, show_approval, approval_buttons):
+    """Compile the Slack payload skeleton for one combination of optional blocks."""
     blocks = [
         {
             'type': 'header',
             'text': {
                 'type': 'plain_text',
-                'text': f'{get_severity_emoji(severity)} {title}',
+                'text': slot('headline'),
                 'emoji': True
             }
         },
         {
             'type': 'section',
             'fields': [
-                {
-                    'type': 'mrkdwn',
-                    'text': f'*Status:*\n{status_data["emoji"]} {status_data["text"]}'
-                },
-                {
-                    'type': 'mrkdwn',
-                    'text': f'*Severity:*\n{get_severity_emoji(severity)} `{severity}`'
-                },
-                {
-                    'type': 'mrkdwn',
-                    'text': f'*Incident ID:*\n`{incident_id[:20]}...`'
-                },
-                {
-                    'type': 'mrkdwn',
-                    'text': f'*Time:*\n<!date^{int(time.time())}^{{time}}|{time.strftime("%H:%M:%S")}>'
-                }
+                {'type': 'mrkdwn', 'text': slot('status_field')},
+                {'type': 'mrkdwn', 'text': slot('severity_field')},
+                {'type': 'mrkdwn', 'text': slot('incident_field')},
+                {'type': 'mrkdwn', 'text': slot('time_field')}
             ]
         },
         {
             'type': 'section',
             'text': {
                 'type': 'mrkdwn',
-                'text': f'*Description:*\n{description[:500]}'
+                'text': slot('description_field')
             }
         }
     ]
-    
-    # Add diagnosis if available
-    if diagnosis:
-        diagnosis_text = diagnosis if isinstance(diagnosis, str) else str(diagnosis)[:300]
-        confidence_text = f' (Confidence: {confidence}%)' if confidence else ''
+
+    if has_diagnosis:
         blocks.append({
             'type': 'section',
             'text': {
                 'type': 'mrkdwn',
-                'text': f'*🤖 AI Diagnosis:*{confidence_text}\n```{diagnosis_text}```'
+                'text': slot('diagnosis_field')
             }
         })
-    
-    # Add action buttons
+
     action_elements = []
-    
-    # Add approval buttons if required
-    if approval_buttons and status == 'PENDING_APPROVAL':
+
+    if show_approval:
         action_elements.extend([
             {
                 'type': 'button',
@@ -153,7 +200,7 @@ def send_slack_notification(message):
                     'emoji': True
                 },
                 'style': 'primary',
-                'value': f'approve_{incident_id}',
+                'value': slot('approve_value'),
                 'action_id': 'approve_incident'
             },
             {
@@ -164,12 +211,11 @@ def send_slack_notification(message):
                     'emoji': True
                 },
                 'style': 'danger',
-                'value': f'deny_{incident_id}',
+                'value': slot('deny_value'),
                 'action_id': 'deny_incident'
             }
         ])
-    
-    # Add standard navigation buttons
+
     action_elements.extend([
         {
             'type': 'button',
@@ -178,7 +224,7 @@ def send_slack_notification(message):
                 'text': '📊 View Dashboard',
                 'emoji': True
             },
-            'url': f'http://localhost:3000',
+            'url': DASHBOARD_URL,
             'style': 'primary' if not approval_buttons else None
         },
         {
@@ -188,57 +234,97 @@ def send_slack_notification(message):
                 'text': '📋 View Details',
                 'emoji': True
             },
-            'url': f'https://console.aws.amazon.com/cloudwatch'
+            'url': AWS_CONSOLE_URL
         }
     ])
-    
+
     blocks.append({
         'type': 'actions',
         'elements': action_elements
     })
-    
-    # Add divider and footer
+
     blocks.extend([
         {'type': 'divider'},
         {
             'type': 'context',
             'elements': [
-                {
-                    'type': 'mrkdwn',
-                    'text': f'🤖 *ResiliBot* | Powered by Amazon Bedrock | {time.strftime("%Y-%m-%d %H:%M:%S UTC")}'
-                }
+                {'type': 'mrkdwn', 'text': slot('footer')}
             ]
         }
     ])
-    
-    # Format Slack message with attachments for color
-    slack_payload = {
-        'text': f'{get_severity_emoji(severity)} {title}',
+
+    # Attachments carry the severity color bar
+    return compile_template({
+        'text': slot('headline'),
         'blocks': blocks,
         'attachments': [
             {
-                'color': color,
+                'color': slot('color'),
                 'blocks': [
                     {
                         'type': 'section',
                         'text': {
                             'type': 'mrkdwn',
-                            'text': f'*Status:* {status_data["emoji"]} {status_data["text"]}'
+                            'text': slot('status_summary')
                         }
                     }
                 ]
             }
         ]
+    })
+
+def render_slack_payload(message):
+    """Render the Slack webhook payload for a message as JSON bytes."""
+    incident_id = message.get('incidentId', 'Unknown')
+    title = message.get('title', 'Incident Alert')
+    severity = message.get('severity', 'MEDIUM')
+    description = message.get('description', '')
+    status = message.get('status', 'OPEN')
+    diagnosis = message.get('diagnosis')
+    confidence = message.get('confidence')
+    approval_buttons = message.get('approvalButtons', False)
+
+    emoji = get_severity_emoji(severity)
+    status_field, status_summary = _SLACK_STATUS_FIELDS.get(status, _SLACK_STATUS_FIELDS['OPEN'])
+
+    values = {
+        'headline': f'{emoji} {title}',
+        'status_field': status_field,
+        'severity_field': f'*Severity:*\n{emoji} `{severity}`',
+        'incident_field': f'*Incident ID:*\n`{incident_id[:20]}...`',
+        'time_field': f'*Time:*\n<!date^{int(time.time())}^{{time}}|{time.strftime("%H:%M:%S")}>',
+        'description_field': f'*Description:*\n{description[:500]}',
+        'footer': f'🤖 *ResiliBot* | Powered by Amazon Bedrock | {time.strftime("%Y-%m-%d %H:%M:%S UTC")}',
+        'color': SLACK_SEVERITY_COLORS.get(severity, '#6B7280'),
+        'status_summary': status_summary
     }
-    
+
+    if diagnosis:
+        diagnosis_text = diagnosis if isinstance(diagnosis, str) else str(diagnosis)[:300]
+        confidence_text = f' (Confidence: {confidence}%)' if confidence else ''
+        values['diagnosis_field'] = f'*🤖 AI Diagnosis:*{confidence_text}\n```{diagnosis_text}```'
+
+    show_approval = bool(approval_buttons) and status == 'PENDING_APPROVAL'
+    if show_approval:
+        values['approve_value'] = f'approve_{incident_id}'
+        values['deny_value'] = f'deny_{incident_id}'
+
+    template = slack_template(bool(diagnosis), show_approval, bool(approval_buttons))
+    return template.render(values)
+
+def send_slack_notification(message):
+    """Send notification to Slack via webhook."""
+    if not SLACK_WEBHOOK_URL:
+        return {'status': 'SKIPPED', 'message': 'Slack webhook not configured'}
+
     try:
         response = http.request(
             'POST',
             SLACK_WEBHOOK_URL,
-            body=json.dumps(slack_payload).encode('utf-8'),
+            body=render_slack_payload(message),
             headers={'Content-Type': 'application/json'}
         )
-        
+
         if response.status == 200:
             return {'status': 'SUCCESS', 'message': 'Slack notification sent'}
         else:
@@ -246,30 +332,30 @@ def send_slack_notification(message):
     except Exception as e:
         return {'status': 'FAILED', 'error': str(e)}
 
-def create_jira_ticket(message):
-    """Create Jira ticket via REST API."""
-    if not all([JIRA_URL, JIRA_USERNAME, JIRA_API_TOKEN]):
-        return {'status': 'SKIPPED', 'message': 'Jira credentials not configured'}
-    
+@functools.lru_cache(maxsize=None)
+def jira_template():
+    """Compile the Jira issue skeleton; the project key is fixed per container."""
+    return compile_template({
+        'fields': {
+            'project': {'key': JIRA_PROJECT_KEY},
+            'summary': slot('summary'),
+            'description': slot('description'),
+            'issuetype': {'name': 'Bug'},
+            'priority': {'name': slot('priority')},
+            'labels': ['resilibot', 'incident', slot('severity_label')]
+        }
+    })
+
+def render_jira_payload(message):
+    """Render the Jira create-issue payload for a message as JSON bytes."""
     incident_id = message.get('incidentId', 'Unknown')
     title = message.get('title', 'Incident Alert')
     severity = message.get('severity', 'MEDIUM')
     description = message.get('description', '')
-    
-    # Map severity to Jira priority
-    priority_map = {
-        'CRITICAL': 'Highest',
-        'HIGH': 'High', 
-        'MEDIUM': 'Medium',
-        'LOW': 'Low'
-    }
-    priority = priority_map.get(severity, 'Medium')
-    
-    jira_payload = {
-        'fields': {
-            'project': {'key': JIRA_PROJECT_KEY},
-            'summary': f'[ResiliBot] {title}',
-            'description': f'''
+
+    return jira_template().render({
+        'summary': f'[ResiliBot] {title}',
+        'description': f'''
 *Incident ID:* {incident_id}
 *Severity:* {severity}
 *Source:* ResiliBot Autonomous Agent
@@ -277,35 +363,48 @@ def create_jira_ticket(message):
 *Description:*
 {description}
 
-*Dashboard:* http://localhost:3000
-*AWS Console:* https://console.aws.amazon.com/cloudwatch
+*Dashboard:* {DASHBOARD_URL}
+*AWS Console:* {AWS_CONSOLE_URL}
 
 This incident was automatically detected and is being processed by ResiliBot.
             '''.strip(),
-            'issuetype': {'name': 'Bug'},
-            'priority': {'name': priority},
-            'labels': ['resilibot', 'incident', severity.lower()]
-        }
-    }
-    
+        'priority': JIRA_PRIORITIES.get(severity, 'Medium'),
+        'severity_label': severity.lower()
+    })
+
+def create_jira_ticket(message):
+    """Create a Jira ticket for an incident, or update the one it already has."""
+    if not all([JIRA_URL, JIRA_USERNAME, JIRA_API_TOKEN]):
+        return {'status': 'SKIPPED', 'message': 'Jira credentials not configured'}
+
+    incident_id = message.get('incidentId', 'Unknown')
+
     try:
-        import base64
-        auth_string = f"{JIRA_USERNAME}:{JIRA_API_TOKEN}"
-        auth_bytes = base64.b64encode(auth_string.encode()).decode()
-        
-        response = http.request(
-            'POST',
-            f'{JIRA_URL}/rest/api/2/issue',
-            body=json.dumps(jira_payload).encode('utf-8'),
-            headers={
-                'Content-Type': 'application/json',
-                'Authorization': f'Basic {auth_bytes}'
-            }
-        )
-        
+        ticket = lookup_jira_ticket(incident_id, message)
+        if ticket:
+            return update_jira_ticket(incident_id, ticket, message)
+
+        persisted = reserve_jira_ticket(incident_id)
+        if persisted is None:
+            # Another invocation is creating the ticket; its flush posts this update
+            hold_jira_update(incident_id, format_jira_update(message), JIRA_UPDATE_WINDOW_SECONDS)
+            return {'status': 'BATCHED', 'message': 'Update queued for the Jira ticket being created'}
+
+        try:
+            response = http.request(
+                'POST',
+                f'{JIRA_URL}/rest/api/2/issue',
+                body=render_jira_payload(message),
+                headers=jira_headers()
+            )
+        except Exception:
+            if persisted:
+                release_jira_ticket(incident_id)
+            raise
+
         if response.status == 201:
             response_data = json.loads(response.data.decode())
-            ticket_key = response_data.get('key')
+            ticket_key = remember_jira_ticket(incident_id, response_data.get('key'), persisted)
             return {
                 'status': 'SUCCESS',
                 'message': f'Jira ticket created: {ticket_key}',
@@ -313,64 +412,349 @@ This incident was automatically detected and is being processed by ResiliBot.
                 'url': f'{JIRA_URL}/browse/{ticket_key}'
             }
         else:
+            if persisted:
+                release_jira_ticket(incident_id)
             return {'status': 'FAILED', 'error': f'HTTP {response.status}'}
     except Exception as e:
         return {'status': 'FAILED', 'error': str(e)}
 
-def trigger_pagerduty(message):
-    """Trigger PagerDuty incident via Events API."""
-    if not PAGERDUTY_INTEGRATION_KEY:
-        return {'status': 'SKIPPED', 'message': 'PagerDuty integration key not configured'}
-    
-    incident_id = message.get('incidentId', 'Unknown')
-    title = message.get('title', 'Incident Alert')
-    severity = message.get('severity', 'MEDIUM')
-    description = message.get('description', '')
-    
-    # Map severity to PagerDuty severity
-    pd_severity_map = {
-        'CRITICAL': 'critical',
-        'HIGH': 'error',
-        'MEDIUM': 'warning', 
-        'LOW': 'info'
+@functools.lru_cache(maxsize=None)
+def jira_headers():
+    """Build the Jira request headers once per container."""
+    auth_string = f"{JIRA_USERNAME}:{JIRA_API_TOKEN}"
+    auth_bytes = base64.b64encode(auth_string.encode()).decode()
+    return {
+        'Content-Type': 'application/json',
+        'Authorization': f'Basic {auth_bytes}'
     }
-    pd_severity = pd_severity_map.get(severity, 'warning')
-    
-    pd_payload = {
+
+def get_incidents_table():
+    """Return the incidents table, or None when it is not configured."""
+    global _incidents_table
+    if _incidents_table is None and INCIDENTS_TABLE:
+        _incidents_table = aws_clients.resource('dynamodb').Table(INCIDENTS_TABLE)
+    return _incidents_table
+
+def get_incident_record(incident_id):
+    """Fetch the current incident item holding the Jira mapping."""
+    table = get_incidents_table()
+    if table is None:
+        return {}
+
+    response = table.get_item(Key=incident_key(incident_id))
+    return response.get('Item', {})
+
+def lookup_jira_ticket(incident_id, message):
+    """Find the Jira ticket already mapped to an incident, if any.
+
+    The in-memory cache is checked first, then a key passed along by the
+    agent in the message, and finally the incident record itself. A ticket
+    that is still being created is not found.
+    """
+    ticket = _jira_tickets.get(incident_id)
+    if ticket:
+        return ticket
+
+    record = get_incident_record(incident_id)
+    ticket_key = message.get('jiraTicket') or record.get('jiraTicket')
+    if not ticket_key or ticket_key == JIRA_RESERVED:
+        return None
+
+    ticket = {
+        'key': ticket_key,
+        'persisted': bool(record),
+        'lastUpdateAt': int(record.get('jiraLastUpdateAt', 0))
+    }
+    _jira_tickets[incident_id] = ticket
+    return ticket
+
+def reserve_jira_ticket(incident_id):
+    """Claim the creation of an incident's ticket before posting it.
+
+    Returns True when the claim is held on the incident record, False when
+    there is no record to coordinate on (the ticket is created unpersisted),
+    and None when another invocation is already creating the ticket.
+    """
+    table = get_incidents_table()
+    if table is None:
+        return False
+
+    now = int(time.time())
+    try:
+        table.update_item(
+            Key=incident_key(incident_id),
+            UpdateExpression='SET jiraTicket = :reserved, jiraLastUpdateAt = :now',
+            ConditionExpression='attribute_exists(pk) AND (attribute_not_exists(jiraTicket) '
+                                'OR (jiraTicket = :reserved AND jiraLastUpdateAt < :abandoned))',
+            ExpressionAttributeValues={
+                ':reserved': JIRA_RESERVED,
+                ':now': now,
+                ':abandoned': now - JIRA_RESERVATION_SECONDS
+            }
+        )
+        return True
+    except ClientError as e:
+        if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+            raise
+    return None if get_incident_record(incident_id) else False
+
+def release_jira_ticket(incident_id):
+    """Give up a creation claim so the next notification tries again."""
+    try:
+        get_incidents_table().update_item(
+            Key=incident_key(incident_id),
+            UpdateExpression='REMOVE jiraTicket',
+            ConditionExpression='jiraTicket = :reserved',
+            ExpressionAttributeValues={':reserved': JIRA_RESERVED}
+        )
+    except Exception as e:
+        log_event('notification.jira_release_failed', {'incidentId': incident_id, 'error': str(e)}, level='WARNING')
+
+def remember_jira_ticket(incident_id, ticket_key, persisted):
+    """Replace the creation claim with the new ticket and cache it; returns the incident's ticket key.
+
+    If the claim was lost in the meantime (abandoned and taken over), the
+    ticket already stored on the incident is kept and cached instead.
+    """
+    now = int(time.time())
+    if persisted:
+        try:
+            get_incidents_table().update_item(
+                Key=incident_key(incident_id),
+                UpdateExpression='SET jiraTicket = :key, jiraLastUpdateAt = :now',
+                ConditionExpression='jiraTicket = :reserved',
+                ExpressionAttributeValues={':key': ticket_key, ':now': now, ':reserved': JIRA_RESERVED}
+            )
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                raise
+            stored = get_incident_record(incident_id).get('jiraTicket')
+            if stored and stored != JIRA_RESERVED:
+                log_event('notification.jira_duplicate_ticket', {'incidentId': incident_id, 'ticket': ticket_key, 'kept': stored}, level='WARNING')
+                ticket_key = stored
+
+    _jira_tickets[incident_id] = {
+        'key': ticket_key,
+        'persisted': persisted,
+        'lastUpdateAt': now
+    }
+    return ticket_key
+
+def format_jira_update(message):
+    """Format one notification as a line of a Jira comment."""
+    status = message.get('status', 'OPEN')
+    line = f"*{time.strftime('%Y-%m-%d %H:%M:%S UTC')}* - Status: {status}"
+
+    diagnosis = message.get('diagnosis')
+    if diagnosis:
+        confidence = message.get('confidence')
+        confidence_text = f' ({confidence}% confidence)' if confidence else ''
+        line += f"\nDiagnosis{confidence_text}: {str(diagnosis)[:500]}"
+    return line
+
+def update_jira_ticket(incident_id, ticket, message):
+    """Add a notification to an existing ticket, batching updates within a window.
+
+    Updates arriving within JIRA_UPDATE_WINDOW_SECONDS of the last API call
+    are appended to the incident record instead of being posted. The next
+    update outside the window, any terminal status, or the delayed flush
+    scheduled when the first update is held posts everything pending as a
+    single comment (or transition, when configured).
+    """
+    line = format_jira_update(message)
+    status = message.get('status', 'OPEN')
+    terminal = status in JIRA_TERMINAL_STATUSES
+    elapsed = int(time.time()) - ticket['lastUpdateAt']
+
+    if not terminal and elapsed < JIRA_UPDATE_WINDOW_SECONDS:
+        if get_incidents_table() is not None and ticket['persisted']:
+            hold_jira_update(incident_id, line, JIRA_UPDATE_WINDOW_SECONDS - elapsed)
+        else:
+            ticket.setdefault('pending', []).append(line)
+        return {'status': 'BATCHED', 'message': f'Update queued for Jira ticket {ticket["key"]}', 'ticketId': ticket['key']}
+
+    return post_jira_updates(incident_id, ticket, [line], terminal)
+
+def hold_jira_update(incident_id, line, delay):
+    """Append a line to the incident's pending updates; the first one held schedules their flush."""
+    response = get_incidents_table().update_item(
+        Key=incident_key(incident_id),
+        UpdateExpression='SET jiraPendingUpdates = list_append(if_not_exists(jiraPendingUpdates, :empty), :line)',
+        ExpressionAttributeValues={':empty': [], ':line': [line]},
+        ReturnValues='UPDATED_OLD'
+    )
+    if not response.get('Attributes', {}).get('jiraPendingUpdates'):
+        schedule_jira_flush(incident_id, delay)
+
+def schedule_jira_flush(incident_id, delay):
+    """Have the flush queue deliver the incident back to this function after ``delay`` seconds."""
+    if not JIRA_FLUSH_QUEUE_URL:
+        return
+    try:
+        sqs.send_message(
+            QueueUrl=JIRA_FLUSH_QUEUE_URL,
+            MessageBody=json.dumps({'incidentId': incident_id}),
+            DelaySeconds=min(max(int(delay), 0), MAX_FLUSH_DELAY_SECONDS)
+        )
+    except Exception as e:
+        # The next notification outside the window still posts what is pending
+        log_event('notification.jira_flush_schedule_failed', {'incidentId': incident_id, 'error': str(e)}, level='WARNING')
+
+def post_jira_updates(incident_id, ticket, lines, terminal=False):
+    """Post the incident's pending updates followed by ``lines`` as one comment (or transition)."""
+    table = get_incidents_table()
+    now = int(time.time())
+    key = incident_key(incident_id)
+    persisted = table is not None and ticket['persisted']
+
+    # Atomically take the pending lines so concurrent flushes never post them twice
+    if persisted:
+        request = {
+            'Key': key,
+            'UpdateExpression': 'SET jiraLastUpdateAt = :now REMOVE jiraPendingUpdates',
+            'ExpressionAttributeValues': {':now': now},
+            'ReturnValues': 'UPDATED_OLD'
+        }
+        if not lines:
+            # A flush with nothing left to post leaves the record alone
+            request['ConditionExpression'] = 'attribute_exists(jiraPendingUpdates)'
+        try:
+            response = table.update_item(**request)
+        except ClientError as e:
+            if lines or e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                raise
+            response = {}
+        pending = response.get('Attributes', {}).get('jiraPendingUpdates', [])
+    else:
+        pending = ticket.pop('pending', [])
+    lines = list(pending) + list(lines)
+    if not lines:
+        return {'status': 'SKIPPED', 'message': f'No pending updates for Jira ticket {ticket["key"]}', 'ticketId': ticket['key']}
+    ticket['lastUpdateAt'] = now
+
+    comment = '\n\n'.join(lines)
+    if terminal and JIRA_RESOLVE_TRANSITION_ID:
+        url = f'{JIRA_URL}/rest/api/2/issue/{ticket["key"]}/transitions'
+        body = {
+            'transition': {'id': JIRA_RESOLVE_TRANSITION_ID},
+            'update': {'comment': [{'add': {'body': comment}}]}
+        }
+        expected_status = 204
+    else:
+        url = f'{JIRA_URL}/rest/api/2/issue/{ticket["key"]}/comment'
+        body = {'body': comment}
+        expected_status = 201
+
+    response = http.request('POST', url, body=encode_json(body), headers=jira_headers())
+
+    if response.status == expected_status:
+        return {
+            'status': 'SUCCESS',
+            'message': f'Jira ticket {ticket["key"]} updated with {len(lines)} update(s)',
+            'ticketId': ticket['key'],
+            'url': f'{JIRA_URL}/browse/{ticket["key"]}'
+        }
+
+    # Put the lines back so the next flush retries them
+    if persisted:
+        table.update_item(
+            Key=key,
+            UpdateExpression='SET jiraPendingUpdates = list_append(:lines, if_not_exists(jiraPendingUpdates, :empty))',
+            ExpressionAttributeValues={':empty': [], ':lines': lines}
+        )
+    else:
+        ticket['pending'] = lines + ticket.get('pending', [])
+    return {'status': 'FAILED', 'error': f'HTTP {response.status}'}
+
+def flush_jira_updates(incident_id):
+    """Post whatever is still pending for an incident once its window has passed."""
+    ticket = lookup_jira_ticket(incident_id, {})
+    if ticket:
+        return post_jira_updates(incident_id, ticket, [])
+    if get_incident_record(incident_id).get('jiraTicket') == JIRA_RESERVED:
+        # Still being created; look again after another window
+        schedule_jira_flush(incident_id, JIRA_UPDATE_WINDOW_SECONDS)
+    return {'status': 'SKIPPED', 'message': 'No Jira ticket to flush'}
+
+def flush_jira_batch(event):
+    """Flush the incidents named by a batch of flush-queue messages.
+
+    Messages whose flush failed are reported back to SQS, which delivers
+    them again until the queue's retention period runs out.
+    """
+    messages = {}
+    for record in event['Records']:
+        messages.setdefault(json.loads(record['body'])['incidentId'], []).append(record['messageId'])
+
+    failures = []
+    if ENABLE_JIRA and all([JIRA_URL, JIRA_USERNAME, JIRA_API_TOKEN]):
+        for incident_id, message_ids in messages.items():
+            try:
+                result = flush_jira_updates(incident_id)
+            except Exception as e:
+                result = {'status': 'FAILED', 'error': str(e)}
+            if result['status'] == 'FAILED':
+                log_event('notification.jira_flush_failed', {'incidentId': incident_id, 'error': result.get('error')}, level='WARNING')
+                failures += [{'itemIdentifier': message_id} for message_id in message_ids]
+    return {'batchItemFailures': failures}
+
+@functools.lru_cache(maxsize=None)
+def pagerduty_template():
+    """Compile the PagerDuty event skeleton; the routing key is fixed per container."""
+    return compile_template({
         'routing_key': PAGERDUTY_INTEGRATION_KEY,
         'event_action': 'trigger',
-        'dedup_key': f'resilibot-{incident_id}',
+        'dedup_key': slot('dedup_key'),
         'payload': {
-            'summary': f'[ResiliBot] {title}',
+            'summary': slot('summary'),
             'source': 'ResiliBot',
-            'severity': pd_severity,
+            'severity': slot('pd_severity'),
             'component': 'AWS Infrastructure',
             'group': 'DevOps',
             'class': 'Infrastructure',
             'custom_details': {
-                'incident_id': incident_id,
-                'severity': severity,
-                'description': description,
-                'dashboard_url': 'http://localhost:3000',
-                'aws_console': 'https://console.aws.amazon.com/cloudwatch'
+                'incident_id': slot('incident_id'),
+                'severity': slot('severity'),
+                'description': slot('description'),
+                'dashboard_url': DASHBOARD_URL,
+                'aws_console': AWS_CONSOLE_URL
             }
         },
         'links': [
             {
-                'href': 'http://localhost:3000',
+                'href': DASHBOARD_URL,
                 'text': 'ResiliBot Dashboard'
             }
         ]
-    }
-    
+    })
+
+def render_pagerduty_payload(message):
+    """Render the PagerDuty Events API payload for a message as JSON bytes."""
+    incident_id = message.get('incidentId', 'Unknown')
+    severity = message.get('severity', 'MEDIUM')
+
+    return pagerduty_template().render({
+        'dedup_key': f'resilibot-{incident_id}',
+        'summary': f'[ResiliBot] {message.get("title", "Incident Alert")}',
+        'pd_severity': PAGERDUTY_SEVERITIES.get(severity, 'warning'),
+        'incident_id': incident_id,
+        'severity': severity,
+        'description': message.get('description', '')
+    })
+
+def trigger_pagerduty(message):
+    """Trigger PagerDuty incident via Events API."""
+    if not PAGERDUTY_INTEGRATION_KEY:
+        return {'status': 'SKIPPED', 'message': 'PagerDuty integration key not configured'}
+
     try:
         response = http.request(
             'POST',
             'https://events.pagerduty.com/v2/enqueue',
-            body=json.dumps(pd_payload).encode('utf-8'),
+            body=render_pagerduty_payload(message),
             headers={'Content-Type': 'application/json'}
         )
-        
+
         if response.status == 202:
             response_data = json.loads(response.data.decode())
             return {
@@ -384,53 +768,26 @@ def trigger_pagerduty(message):
     except Exception as e:
         return {'status': 'FAILED', 'error': str(e)}
 
-def get_severity_emoji(severity):
-    """Get emoji for severity level."""
-    emoji_map = {
-        'CRITICAL': ':fire:',
-        'HIGH': ':rotating_light:',
-        'MEDIUM': ':warning:',
-        'LOW': ':information_source:'
-    }
-    return emoji_map.get(severity, ':question:')
-
-def send_teams_notification(message):
-    """Send notification to Microsoft Teams via webhook."""
-    if not TEAMS_WEBHOOK_URL:
-        return {'status': 'SKIPPED', 'message': 'Teams webhook not configured'}
-    
-    incident_id = message.get('incidentId', 'Unknown')
-    title = message.get('title', 'Incident Alert')
-    severity = message.get('severity', 'MEDIUM')
-    description = message.get('description', '')
-    status = message.get('status', 'OPEN')
-    
-    # Get theme color based on severity
-    color_map = {
-        'CRITICAL': 'FF0000',  # Red
-        'HIGH': 'FF8C00',      # Orange
-        'MEDIUM': 'FFD700',    # Gold
-        'LOW': '0078D4'        # Blue
-    }
-    theme_color = color_map.get(severity, '808080')
-    
-    teams_payload = {
+@functools.lru_cache(maxsize=None)
+def teams_template():
+    """Compile the Teams MessageCard skeleton."""
+    return compile_template({
         '@type': 'MessageCard',
         '@context': 'https://schema.org/extensions',
-        'summary': f'ResiliBot Alert: {title}',
-        'themeColor': theme_color,
+        'summary': slot('summary'),
+        'themeColor': slot('theme_color'),
         'sections': [
             {
-                'activityTitle': f'🤖 ResiliBot Alert',
-                'activitySubtitle': f'{get_severity_emoji(severity)} {title}',
+                'activityTitle': '🤖 ResiliBot Alert',
+                'activitySubtitle': slot('subtitle'),
                 'activityImage': 'https://raw.githubusercontent.com/aws/aws-icons/main/PNG%20Light/Arch_Amazon-Bedrock_64.png',
                 'facts': [
-                    {'name': 'Incident ID', 'value': incident_id[:20] + '...'},
-                    {'name': 'Severity', 'value': severity},
-                    {'name': 'Status', 'value': status},
-                    {'name': 'Time', 'value': time.strftime('%Y-%m-%d %H:%M:%S UTC')}
+                    {'name': 'Incident ID', 'value': slot('incident_id')},
+                    {'name': 'Severity', 'value': slot('severity')},
+                    {'name': 'Status', 'value': slot('status')},
+                    {'name': 'Time', 'value': slot('time')}
                 ],
-                'text': description[:500]
+                'text': slot('text')
             }
         ],
         'potentialAction': [
@@ -438,27 +795,48 @@ def send_teams_notification(message):
                 '@type': 'OpenUri',
                 'name': 'View Dashboard',
                 'targets': [
-                    {'os': 'default', 'uri': 'http://localhost:3000'}
+                    {'os': 'default', 'uri': DASHBOARD_URL}
                 ]
             },
             {
-                '@type': 'OpenUri', 
+                '@type': 'OpenUri',
                 'name': 'AWS Console',
                 'targets': [
-                    {'os': 'default', 'uri': 'https://console.aws.amazon.com/cloudwatch'}
+                    {'os': 'default', 'uri': AWS_CONSOLE_URL}
                 ]
             }
         ]
-    }
-    
+    })
+
+def render_teams_payload(message):
+    """Render the Teams webhook payload for a message as JSON bytes."""
+    title = message.get('title', 'Incident Alert')
+    severity = message.get('severity', 'MEDIUM')
+
+    return teams_template().render({
+        'summary': f'ResiliBot Alert: {title}',
+        'theme_color': TEAMS_SEVERITY_COLORS.get(severity, '808080'),
+        'subtitle': f'{get_severity_emoji(severity)} {title}',
+        'incident_id': message.get('incidentId', 'Unknown')[:20] + '...',
+        'severity': severity,
+        'status': message.get('status', 'OPEN'),
+        'time': time.strftime('%Y-%m-%d %H:%M:%S UTC'),
+        'text': message.get('description', '')[:500]
+    })
+
+def send_teams_notification(message):
+    """Send notification to Microsoft Teams via webhook."""
+    if not TEAMS_WEBHOOK_URL:
+        return {'status': 'SKIPPED', 'message': 'Teams webhook not configured'}
+
     try:
         response = http.request(
             'POST',
             TEAMS_WEBHOOK_URL,
-            body=json.dumps(teams_payload).encode('utf-8'),
+            body=render_teams_payload(message),
             headers={'Content-Type': 'application/json'}
         )
-        
+
         if response.status == 200:
             return {'status': 'SUCCESS', 'message': 'Teams notification sent'}
         else:
@@ -472,8 +850,7 @@ def send_email_notification(message):
         return {'status': 'SKIPPED', 'message': 'Email configuration not complete'}
     
     try:
-        import boto3
-        ses_client = boto3.client('ses')
+        ses_client = aws_clients.client('ses')
         
         incident_id = message.get('incidentId', 'Unknown')
         title = message.get('title', 'Incident Alert')
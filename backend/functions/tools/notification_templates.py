@@ -0,0 +1,54 @@
+"""
+Precompiled notification payload templates.
+
+A template is compiled once per container from a payload skeleton in which
+the dynamic values are marked with ``slot('name')``. Compilation serializes
+the skeleton a single time and splits it into static byte chunks around the
+slots, so rendering a message only encodes the slot values and joins bytes.
+"""
+import re
+
+from serialization import dumps_bytes
+
+_SLOT_MARK = '\x00'
+_SLOT_PATTERN = re.compile(rb'"\\u0000([A-Za-z0-9_]+)\\u0000"')
+
+
+def encode_json(value):
+    """Encode a value as compact UTF-8 JSON bytes."""
+    return dumps_bytes(value)
+
+
+def slot(name):
+    """Return a placeholder marking a dynamic value in a payload skeleton."""
+    return f'{_SLOT_MARK}{name}{_SLOT_MARK}'
+
+
+class PayloadTemplate:
+    """A payload skeleton compiled into static chunks and named slots."""
+
+    __slots__ = ('chunks', 'slots')
+
+    def __init__(self, chunks, slots):
+        self.chunks = chunks
+        self.slots = slots
+
+    def render(self, values):
+        """Render the payload to JSON bytes, filling every slot from ``values``."""
+        chunks = self.chunks
+        parts = [chunks[0]]
+        for index, name in enumerate(self.slots, 1):
+            parts.append(encode_json(values[name]))
+            parts.append(chunks[index])
+        return b''.join(parts)
+
+
+def compile_template(skeleton):
+    """Compile a payload skeleton into a reusable PayloadTemplate."""
+    encoded = encode_json(skeleton)
+    pieces = _SLOT_PATTERN.split(encoded)
+    # re.split alternates static chunks with captured slot names
+    return PayloadTemplate(
+        chunks=tuple(pieces[0::2]),
+        slots=tuple(name.decode('ascii') for name in pieces[1::2])
+    )
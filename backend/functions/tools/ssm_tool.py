@@ -1,27 +1,56 @@
 import json
-import boto3
 
-ssm = boto3.client('ssm')
-ec2 = boto3.client('ec2')
+import aws_clients
+from metrics import emit, timings
+from tenancy import TenantClients
+from utils import logged_handler
 
+ssm = aws_clients.lazy_client('ssm')
+ec2 = aws_clients.lazy_client('ec2')
+# Actions run in the account and region named by the event (the incident's)
+tenant_clients = TenantClients.from_env()
+
+TOOLS_METRICS_NAMESPACE = 'ResiliBot/Tools'
+
+# Clients named in AWS_CLIENT_PREWARM are created during init instead of the first request
+aws_clients.prewarm()
+
+@logged_handler
 def handler(event, context):
     """
     SSM Tool: Execute commands on EC2 instances via Systems Manager.
-    Supports restart, run commands, and health checks.
+    Supports restart, run commands, and health checks, in the account and
+    region given by ``accountId`` / ``region`` (default: this function's).
     """
     action = event.get('action')
     target = event.get('target', {})
+    location = (event.get('accountId'), event.get('region'))
+    timings.reset()
     
+    with timings.timer('action'):
+        result = run_action(action, target, location)
+    
+    # SSM and EC2 call latencies come from the client timing hooks
+    emit(
+        {('ActionDuration' if name == 'action' else name): ms for name, ms in timings.since({}).items()},
+        {'Action': action or 'unknown', 'Severity': event.get('severity', 'UNKNOWN'), 'Source': event.get('source', 'unknown')},
+        dimension_sets=[['Action'], ['Action', 'Severity', 'Source']],
+        namespace=TOOLS_METRICS_NAMESPACE
+    )
+    return result
+
+def run_action(action, target, location=(None, None)):
+    """Run one SSM tool action."""
     if action == 'restart_service':
-        return restart_service(target)
+        return restart_service(target, location)
     elif action == 'run_command':
-        return run_command(target)
+        return run_command(target, location)
     elif action == 'health_check':
-        return health_check(target)
+        return health_check(target, location)
     else:
         return {'error': f'Unknown action: {action}'}
 
-def restart_service(target):
+def restart_service(target, location=(None, None)):
     """Restart a service on target instances."""
     instance_ids = target.get('instanceIds', [])
     service_name = target.get('serviceName', 'application')
@@ -30,7 +59,7 @@ def restart_service(target):
         return {'error': 'No instance IDs provided'}
     
     try:
-        response = ssm.send_command(
+        response = tenant_clients.client('ssm', *location, default=ssm).send_command(
             InstanceIds=instance_ids,
             DocumentName='AWS-RunShellScript',
             Parameters={
@@ -52,7 +81,7 @@ def restart_service(target):
     except Exception as e:
         return {'status': 'FAILED', 'error': str(e)}
 
-def run_command(target):
+def run_command(target, location=(None, None)):
     """Run arbitrary command on target instances."""
     instance_ids = target.get('instanceIds', [])
     commands = target.get('commands', [])
@@ -61,7 +90,7 @@ def run_command(target):
         return {'error': 'Missing instanceIds or commands'}
     
     try:
-        response = ssm.send_command(
+        response = tenant_clients.client('ssm', *location, default=ssm).send_command(
             InstanceIds=instance_ids,
             DocumentName='AWS-RunShellScript',
             Parameters={'commands': commands},
@@ -75,7 +104,7 @@ def run_command(target):
     except Exception as e:
         return {'status': 'FAILED', 'error': str(e)}
 
-def health_check(target):
+def health_check(target, location=(None, None)):
     """Check health status of target instances."""
     instance_ids = target.get('instanceIds', [])
     
@@ -83,7 +112,7 @@ def health_check(target):
         return {'error': 'No instance IDs provided'}
     
     try:
-        response = ec2.describe_instance_status(InstanceIds=instance_ids)
+        response = tenant_clients.client('ec2', *location, default=ec2).describe_instance_status(InstanceIds=instance_ids)
         
         statuses = []
         for status in response['InstanceStatuses']:
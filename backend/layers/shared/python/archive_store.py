@@ -0,0 +1,98 @@
+"""
+Date-partitioned archive of expired incidents in S3.
+
+Resolved incidents get an ``expiresAt`` TTL; when DynamoDB removes them the
+archiver Lambda writes them, with their history events, as gzip-compressed
+JSON Lines under ``archive/dt=<YYYY-MM-DD>/``, partitioned by the day the
+incident was last updated. The Hive-style prefix lets Athena or Glue read the
+same files directly.
+"""
+import gzip
+import time
+import uuid
+from datetime import date, datetime, timedelta
+from typing import Callable, Dict, Iterable, List, Optional
+
+from serialization import dumps_bytes, loads
+
+ARCHIVE_PREFIX = 'archive/'
+ARCHIVE_STATUSES = ('RESOLVED', 'CLOSED', 'DENIED')
+
+# Bounds a single query to at most this many daily partitions
+MAX_QUERY_DAYS = 31
+
+
+def archive_expiry(now: datetime, days: int) -> int:
+    """TTL (epoch seconds) for an incident that reached a terminal status at ``now``."""
+    return int((now + timedelta(days=days)).timestamp())
+
+
+def partition_day(incident: Dict) -> str:
+    """Archive partition (YYYY-MM-DD) of an incident."""
+    moment = str(incident.get('updatedAt') or incident.get('createdAt') or '')
+    return moment[:10] if len(moment) >= 10 else datetime.utcnow().strftime('%Y-%m-%d')
+
+
+def partition_prefix(day: str) -> str:
+    return f'{ARCHIVE_PREFIX}dt={day}/'
+
+
+def encode_records(records: Iterable[Dict]) -> bytes:
+    """Serialize records as gzip-compressed JSON Lines."""
+    return gzip.compress(b''.join(dumps_bytes(record) + b'\n' for record in records))
+
+
+def decode_records(data: bytes) -> List[Dict]:
+    """Parse a gzip-compressed JSON Lines file."""
+    return [loads(line) for line in gzip.decompress(data).splitlines() if line]
+
+
+def write_archive(s3, bucket: str, records: List[Dict]) -> List[str]:
+    """Write archive records, one object per daily partition. Returns the keys written."""
+    by_day = {}
+    for record in records:
+        by_day.setdefault(partition_day(record['incident']), []).append(record)
+
+    keys = []
+    for day, day_records in sorted(by_day.items()):
+        key = f'{partition_prefix(day)}part-{int(time.time() * 1000)}-{uuid.uuid4().hex[:8]}.jsonl.gz'
+        s3.put_object(
+            Bucket=bucket,
+            Key=key,
+            Body=encode_records(day_records),
+            ContentType='application/x-ndjson',
+            ContentEncoding='gzip'
+        )
+        keys.append(key)
+    return keys
+
+
+def days_between(start: date, end: date) -> List[str]:
+    """Partition days from ``start`` to ``end`` inclusive."""
+    return [(start + timedelta(days=offset)).isoformat() for offset in range((end - start).days + 1)]
+
+
+def query_archive(s3, bucket: str, start: date, end: date,
+                  predicate: Optional[Callable[[Dict], bool]] = None, limit: int = 50) -> List[Dict]:
+    """Read archived records from the daily partitions in [start, end], newest day first.
+
+    Archive writes are at-least-once, so records are deduplicated by incident
+    and version.
+    """
+    seen = set()
+    results = []
+    paginator = s3.get_paginator('list_objects_v2')
+    for day in reversed(days_between(start, end)):
+        for page in paginator.paginate(Bucket=bucket, Prefix=partition_prefix(day)):
+            for obj in page.get('Contents', []):
+                body = s3.get_object(Bucket=bucket, Key=obj['Key'])['Body'].read()
+                for record in decode_records(body):
+                    incident = record['incident']
+                    identity = (incident.get('incidentId'), incident.get('version'))
+                    if identity in seen or (predicate and not predicate(incident)):
+                        continue
+                    seen.add(identity)
+                    results.append(record)
+                    if len(results) >= limit:
+                        return results
+    return results
@@ -0,0 +1,119 @@
+"""
+Lazily created, process-wide boto3 clients and resources.
+
+Creating a boto3 client loads and parses the service model, which dominates a
+Lambda cold start when a handler builds every client it might need at import
+time. The registry creates each client on first use, from one shared session
+so the botocore loader caches are reused, and keeps it for warm invocations.
+
+Handlers bind module globals to proxies::
+
+    s3 = aws_clients.lazy_client('s3')
+    table = aws_clients.lazy_table(os.environ['INCIDENTS_TABLE'])
+
+The proxies resolve on first attribute access, and tests can still replace
+the module globals with their own clients. Services listed in
+``AWS_CLIENT_PREWARM`` (comma separated) can be created during the init phase
+with ``prewarm()``, which suits provisioned concurrency. The session carries
+the timing hooks from ``metrics``, so every API call made through the
+registry is timed.
+"""
+import os
+import threading
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+
+import boto3
+
+import metrics
+
+_lock = threading.RLock()
+_session = None
+_clients: Dict[Tuple, Any] = {}
+_resources: Dict[Tuple, Any] = {}
+
+
+def session() -> boto3.session.Session:
+    """The process-wide boto3 session."""
+    global _session
+    if _session is None:
+        with _lock:
+            if _session is None:
+                _session = boto3.session.Session()
+                metrics.instrument_session(_session)
+    return _session
+
+
+def _cache_key(service: str, kwargs: Dict) -> Tuple:
+    return (service, tuple(sorted((name, repr(value)) for name, value in kwargs.items())))
+
+
+def client(service: str, **kwargs) -> Any:
+    """Return the shared client for a service, creating it on first use."""
+    key = _cache_key(service, kwargs)
+    found = _clients.get(key)
+    if found is None:
+        with _lock:
+            found = _clients.get(key)
+            if found is None:
+                found = _clients[key] = session().client(service, **kwargs)
+    return found
+
+
+def resource(service: str, **kwargs) -> Any:
+    """Return the shared resource for a service, creating it on first use."""
+    key = _cache_key(service, kwargs)
+    found = _resources.get(key)
+    if found is None:
+        with _lock:
+            found = _resources.get(key)
+            if found is None:
+                found = _resources[key] = session().resource(service, **kwargs)
+    return found
+
+
+class LazyProxy:
+    """Stands in for an object built by ``factory`` on first attribute access."""
+
+    __slots__ = ('_factory', '_target', '_label')
+
+    def __init__(self, factory: Callable[[], Any], label: str):
+        self._factory = factory
+        self._target = None
+        self._label = label
+
+    def _resolve(self) -> Any:
+        if self._target is None:
+            self._target = self._factory()
+        return self._target
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._resolve(), name)
+
+    def __repr__(self) -> str:
+        state = 'created' if self._target is not None else 'not created'
+        return f'<lazy {self._label} ({state})>'
+
+
+def lazy_client(service: str, **kwargs) -> LazyProxy:
+    return LazyProxy(lambda: client(service, **kwargs), f'{service} client')
+
+
+def lazy_resource(service: str, **kwargs) -> LazyProxy:
+    return LazyProxy(lambda: resource(service, **kwargs), f'{service} resource')
+
+
+def lazy_table(table_name: str) -> LazyProxy:
+    """A DynamoDB Table whose resource is only created when the table is used."""
+    return LazyProxy(lambda: resource('dynamodb').Table(table_name), f'table {table_name}')
+
+
+def prewarm(services: Optional[Iterable[str]] = None) -> None:
+    """Create clients ahead of the first request (defaults to ``AWS_CLIENT_PREWARM``)."""
+    if services is None:
+        services = [name.strip() for name in os.environ.get('AWS_CLIENT_PREWARM', '').split(',')]
+    for service in services:
+        if service == 'dynamodb':
+            resource('dynamodb')
+        elif service:
+            client(service)
+
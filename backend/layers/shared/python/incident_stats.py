@@ -0,0 +1,172 @@
+"""
+Incrementally maintained incident aggregates for the dashboard.
+
+Counters live in the stats table and are moved, after the incident write
+that changes them has committed, by plain ``ADD`` updates:
+- ``GLOBAL``: totals per status and per severity, plus the MTTR sum and a
+  histogram of resolution times;
+- ``HOUR#<YYYY-MM-DDTHH>``: incidents created and resolved in that hour, with
+  the same MTTR sum and histogram for incidents resolved in it.
+
+The counter updates are deliberately kept out of the incident transaction:
+every write would otherwise also touch the single ``GLOBAL`` item, and during
+an alarm storm concurrent transactions on it are cancelled with
+``TransactionConflict``. A plain ``ADD`` is serialized by DynamoDB instead of
+conflicting, and a counter update that still fails is logged and dropped, so
+the dashboard can drift but an incident write never fails because of it.
+
+Reading the stats is a single BatchGetItem regardless of how many incidents
+have been stored.
+"""
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from utils import log_event
+
+GLOBAL_KEY = 'GLOBAL'
+HOUR_KEY_PREFIX = 'HOUR#'
+
+ACTIVE_STATUSES = ('OPEN', 'PENDING_APPROVAL', 'APPROVED', 'IN_PROGRESS')
+RESOLVED_STATUSES = ('RESOLVED', 'CLOSED')
+
+# Upper bounds (seconds) of the MTTR histogram buckets; the last bucket is open-ended
+MTTR_BUCKETS = (300, 900, 3600, 14400, 86400)
+
+
+def hour_key(moment: datetime) -> str:
+    """Stats item key for the hour containing ``moment``."""
+    return f"{HOUR_KEY_PREFIX}{moment.strftime('%Y-%m-%dT%H')}"
+
+
+def mttr_bucket(seconds: float) -> str:
+    """Histogram bucket label for a resolution time."""
+    for bound in MTTR_BUCKETS:
+        if seconds <= bound:
+            return f'le_{bound}'
+    return f'gt_{MTTR_BUCKETS[-1]}'
+
+
+def parse_timestamp(value: Any) -> Optional[datetime]:
+    """Parse an ISO-8601 timestamp as stored on incidents."""
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(str(value).rstrip('Z'))
+    except ValueError:
+        return None
+
+
+def _counter_update(table_name: str, key: str, deltas: Dict[str, int]) -> Dict:
+    """Build an UpdateItem request that ADDs deltas to counters."""
+    names = {f'#c{i}': name for i, name in enumerate(deltas)}
+    values = {f':c{i}': delta for i, delta in enumerate(deltas.values())}
+    return {
+        'TableName': table_name,
+        'Key': {'statsKey': key},
+        'UpdateExpression': 'ADD ' + ', '.join(f'{n} {v}' for n, v in zip(names, values)),
+        'ExpressionAttributeNames': names,
+        'ExpressionAttributeValues': values
+    }
+
+
+def creation_updates(table_name: str, incident: Dict, now: datetime) -> List[Dict]:
+    """Counter updates for a newly stored incident."""
+    status = incident.get('status', 'OPEN')
+    severity = incident.get('severity', 'MEDIUM')
+    return [
+        _counter_update(table_name, GLOBAL_KEY, {
+            'total': 1,
+            f'status#{status}': 1,
+            f'severity#{severity}': 1
+        }),
+        _counter_update(table_name, hour_key(now), {'created': 1})
+    ]
+
+
+def transition_updates(table_name: str, incident: Dict, new_status: str, now: datetime) -> List[Dict]:
+    """Counter updates for a status transition; empty when the status is unchanged."""
+    old_status = incident.get('status', 'OPEN')
+    if new_status == old_status:
+        return []
+
+    global_deltas = {f'status#{old_status}': -1, f'status#{new_status}': 1}
+    updates = []
+
+    newly_resolved = new_status in RESOLVED_STATUSES and old_status not in RESOLVED_STATUSES
+    created_at = parse_timestamp(incident.get('createdAt'))
+    if newly_resolved and created_at:
+        seconds = max(0, int((now - created_at).total_seconds()))
+        resolution = {
+            'resolved': 1,
+            'mttrSumSeconds': seconds,
+            f'mttr#{mttr_bucket(seconds)}': 1
+        }
+        global_deltas.update(resolution)
+        updates.append(_counter_update(table_name, hour_key(now), resolution))
+
+    updates.insert(0, _counter_update(table_name, GLOBAL_KEY, global_deltas))
+    return updates
+
+
+def apply_updates(client: Any, updates: List[Dict]) -> None:
+    """Apply counter updates one by one; a failure is logged and the rest still applied."""
+    for update in updates:
+        try:
+            client.update_item(**update)
+        except Exception as e:
+            log_event('stats.update_failed', {'statsKey': update['Key']['statsKey'], 'error': str(e)}, level='WARNING')
+
+
+def _counters(item: Dict, prefix: str) -> Dict[str, int]:
+    """Collect ``prefix#name`` counters from a stats item as {name: count}."""
+    return {
+        name[len(prefix) + 1:]: int(value)
+        for name, value in item.items()
+        if name.startswith(prefix + '#')
+    }
+
+
+def _mttr_summary(item: Dict) -> Dict:
+    resolved = int(item.get('resolved', 0))
+    total_seconds = int(item.get('mttrSumSeconds', 0))
+    return {
+        'resolved': resolved,
+        'averageSeconds': round(total_seconds / resolved) if resolved else 0,
+        'histogram': _counters(item, 'mttr')
+    }
+
+
+def read_stats(dynamodb, table_name: str, hours: int = 24, now: Optional[datetime] = None) -> Dict:
+    """Read the global counters and the last ``hours`` hourly buckets."""
+    now = now or datetime.utcnow()
+    hour_keys = [hour_key(now - timedelta(hours=offset)) for offset in range(hours - 1, -1, -1)]
+    keys = [GLOBAL_KEY] + hour_keys
+
+    items = {}
+    # BatchGetItem accepts at most 100 keys per request
+    for start in range(0, len(keys), 100):
+        request = {table_name: {'Keys': [{'statsKey': key} for key in keys[start:start + 100]]}}
+        while request:
+            response = dynamodb.batch_get_item(RequestItems=request)
+            for item in response.get('Responses', {}).get(table_name, []):
+                items[item['statsKey']] = item
+            request = response.get('UnprocessedKeys') or None
+
+    global_item = items.get(GLOBAL_KEY, {})
+    by_status = {name: count for name, count in _counters(global_item, 'status').items() if count}
+
+    return {
+        'total': int(global_item.get('total', 0)),
+        'active': sum(by_status.get(status, 0) for status in ACTIVE_STATUSES),
+        'byStatus': by_status,
+        'bySeverity': _counters(global_item, 'severity'),
+        'mttr': _mttr_summary(global_item),
+        'hourly': [
+            {
+                'hour': key[len(HOUR_KEY_PREFIX):],
+                'created': int(items.get(key, {}).get('created', 0)),
+                **_mttr_summary(items.get(key, {}))
+            }
+            for key in hour_keys
+        ]
+    }
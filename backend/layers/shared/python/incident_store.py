@@ -0,0 +1,252 @@
+"""
+Single-table data model for incidents.
+
+Items (partition key ``pk``, sort key ``sk``):
+- ``INCIDENT#<id>`` / ``CURRENT``: the compact current state of an incident;
+- ``INCIDENT#<id>`` / ``EVENT#<version>``: append-only history, one event per
+  write, so the timeline of an incident is a single Query.
+
+Secondary indexes serve the hot list reads:
+- ``byOpenSeverity`` (``gsi1pk`` = ``OPEN#<severity>``, ``gsi1sk`` = createdAt)
+  is sparse: only incidents in an active status carry the keys;
+- ``byUpdated`` (``gsi2pk`` = ``INCIDENTS#<shard>``, ``gsi2sk`` =
+  ``<updatedAt>#<id>``) lists incidents by last update and answers since-cursor
+  polls. It is spread over LIST_SHARDS partitions to avoid a hot key.
+
+Writes are returned as TransactWriteItems entries for the caller to commit,
+so the current item and its history event are written atomically. Dashboard
+counters are not part of that transaction: they are best-effort ADDs applied
+after the commit (``incident_stats.apply_updates``).
+"""
+import zlib
+from typing import Dict, List, Optional, Tuple
+
+from boto3.dynamodb.conditions import Key
+
+CURRENT_SK = 'CURRENT'
+EVENT_SK_PREFIX = 'EVENT#'
+OPEN_INDEX = 'byOpenSeverity'
+UPDATED_INDEX = 'byUpdated'
+LIST_SHARDS = 4
+
+ACTIVE_STATUSES = ('OPEN', 'PENDING_APPROVAL', 'APPROVED', 'IN_PROGRESS')
+SEVERITIES = ('CRITICAL', 'HIGH', 'MEDIUM', 'LOW')
+
+# Storage-only attributes that are stripped before incidents leave the store
+KEY_ATTRIBUTES = ('pk', 'sk', 'gsi1pk', 'gsi1sk', 'gsi2pk', 'gsi2sk')
+
+
+def incident_pk(incident_id: str) -> str:
+    """Partition key shared by an incident's current item and its events."""
+    return f'INCIDENT#{incident_id}'
+
+
+def incident_key(incident_id: str) -> Dict[str, str]:
+    """Primary key of an incident's current item."""
+    return {'pk': incident_pk(incident_id), 'sk': CURRENT_SK}
+
+
+def event_sk(version: int) -> str:
+    """Sort key of the history event written for a version."""
+    return f'{EVENT_SK_PREFIX}{int(version):08d}'
+
+
+def list_shard(incident_id: str) -> str:
+    """byUpdated partition an incident is listed under."""
+    return f'INCIDENTS#{zlib.crc32(incident_id.encode("utf-8")) % LIST_SHARDS}'
+
+
+def index_attributes(incident: Dict) -> Dict[str, str]:
+    """Secondary index keys for an incident's current state."""
+    incident_id = incident['incidentId']
+    attributes = {
+        'gsi2pk': list_shard(incident_id),
+        'gsi2sk': f"{incident.get('updatedAt') or incident.get('createdAt', '')}#{incident_id}"
+    }
+    if incident.get('status') in ACTIVE_STATUSES:
+        attributes['gsi1pk'] = f"OPEN#{incident.get('severity', 'MEDIUM')}"
+        attributes['gsi1sk'] = incident.get('createdAt', '')
+    return attributes
+
+
+def to_incident(item: Optional[Dict]) -> Dict:
+    """Strip storage keys from a current item."""
+    if not item:
+        return {}
+    return {k: v for k, v in item.items() if k not in KEY_ATTRIBUTES}
+
+
+def event_item(incident_id: str, version: int, event_type: str, changes: Dict, at: str) -> Dict:
+    """History event recording the attributes written by one version."""
+    return {
+        'pk': incident_pk(incident_id),
+        'sk': event_sk(version),
+        'incidentId': incident_id,
+        'version': version,
+        'eventType': event_type,
+        'at': at,
+        'changes': changes
+    }
+
+
+def creation_transaction(table_name: str, incident: Dict) -> List[Dict]:
+    """Transaction items storing a new incident and its CREATED event."""
+    incident = {**incident, 'version': 1}
+    return [
+        {
+            'Put': {
+                'TableName': table_name,
+                'Item': {**incident, **incident_key(incident['incidentId']), **index_attributes(incident)},
+                'ConditionExpression': 'attribute_not_exists(pk)'
+            }
+        },
+        {
+            'Put': {
+                'TableName': table_name,
+                'Item': event_item(incident['incidentId'], 1, 'CREATED', to_incident(incident), incident['createdAt'])
+            }
+        }
+    ]
+
+
+def update_transaction(table_name: str, incident: Dict, updates: Dict,
+                       expected_statuses: Optional[Tuple[str, ...]] = None) -> Tuple[List[Dict], Dict]:
+    """Transaction items applying ``updates`` to the current item.
+
+    The write is conditioned on the version read in ``incident`` (and, with
+    ``expected_statuses``, on the stored status being one of them), bumps the
+    version, maintains the index keys and appends an UPDATED event. Returns the
+    items and the resulting incident.
+    """
+    incident_id = incident['incidentId']
+    version = int(incident.get('version', 0) or 0)
+    updated = {**incident, **updates, 'version': version + 1}
+
+    index = index_attributes(updated)
+    set_values = {**updates, **index, 'version': version + 1}
+    removals = [name for name in ('gsi1pk', 'gsi1sk') if name not in index]
+
+    names = {f'#a{i}': name for i, name in enumerate(list(set_values) + removals)}
+    placeholders = list(names)
+    values = {f':a{i}': value for i, value in enumerate(set_values.values())}
+
+    expression = 'SET ' + ', '.join(f'{placeholders[i]} = :a{i}' for i in range(len(set_values)))
+    if removals:
+        expression += ' REMOVE ' + ', '.join(placeholders[len(set_values):])
+
+    names['#version'] = 'version'
+    if version:
+        condition = '#version = :expected'
+        values[':expected'] = version
+    else:
+        condition = 'attribute_not_exists(#version)'
+    if expected_statuses:
+        names['#status'] = 'status'
+        values.update({f':s{i}': status for i, status in enumerate(expected_statuses)})
+        condition += ' AND #status IN (' + ', '.join(f':s{i}' for i in range(len(expected_statuses))) + ')'
+
+    items = [
+        {
+            'Update': {
+                'TableName': table_name,
+                'Key': incident_key(incident_id),
+                'UpdateExpression': expression,
+                'ConditionExpression': condition,
+                'ExpressionAttributeNames': names,
+                'ExpressionAttributeValues': values
+            }
+        },
+        {
+            'Put': {
+                'TableName': table_name,
+                'Item': event_item(incident_id, version + 1, 'UPDATED', updates, updated.get('updatedAt', ''))
+            }
+        }
+    ]
+    return items, to_incident(updated)
+
+
+def get_incident(table, incident_id: str, consistent: bool = False) -> Dict:
+    """Latest state of one incident (a single GetItem)."""
+    response = table.get_item(Key=incident_key(incident_id), ConsistentRead=consistent)
+    return to_incident(response.get('Item'))
+
+
+def _query_all(table, **kwargs) -> List[Dict]:
+    items = []
+    while True:
+        response = table.query(**kwargs)
+        items.extend(response.get('Items', []))
+        if 'LastEvaluatedKey' not in response:
+            return items
+        kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+
+def list_incidents(table, limit: int = 50) -> List[Dict]:
+    """The ``limit`` most recently updated incidents."""
+    items = []
+    for shard in range(LIST_SHARDS):
+        response = table.query(
+            IndexName=UPDATED_INDEX,
+            KeyConditionExpression=Key('gsi2pk').eq(f'INCIDENTS#{shard}'),
+            ScanIndexForward=False,
+            Limit=limit
+        )
+        items.extend(response.get('Items', []))
+
+    items.sort(key=lambda item: item.get('gsi2sk', ''), reverse=True)
+    return [to_incident(item) for item in items[:limit]]
+
+
+def list_changes(table, since: str, limit: int = 50) -> Tuple[List[Dict], Optional[str], bool]:
+    """
+    One page of incidents updated after the ``since`` cursor, oldest change first.
+
+    Returns the page, the ``gsi2sk`` of its last item (a cursor that resumes
+    right after it) and whether more changes follow the page.
+    """
+    items = []
+    more = False
+    for shard in range(LIST_SHARDS):
+        # The ``limit`` oldest changes of every shard cover the ``limit`` oldest overall
+        response = table.query(
+            IndexName=UPDATED_INDEX,
+            KeyConditionExpression=Key('gsi2pk').eq(f'INCIDENTS#{shard}') & Key('gsi2sk').gt(since),
+            Limit=limit
+        )
+        items.extend(response.get('Items', []))
+        more = more or 'LastEvaluatedKey' in response
+
+    items.sort(key=lambda item: item.get('gsi2sk', ''))
+    more = more or len(items) > limit
+    items = items[:limit]
+    last_key = items[-1]['gsi2sk'] if items else None
+    return [to_incident(item) for item in items], last_key, more
+
+
+def list_open_incidents(table, severity: Optional[str] = None, limit: Optional[int] = None) -> List[Dict]:
+    """Incidents in an active status, optionally for one severity, oldest first (at most ``limit``)."""
+    severities = [severity] if severity else SEVERITIES
+    items = []
+    for level in severities:
+        condition = Key('gsi1pk').eq(f'OPEN#{level}')
+        if limit is None:
+            items.extend(_query_all(table, IndexName=OPEN_INDEX, KeyConditionExpression=condition))
+        else:
+            # The oldest ``limit`` of every severity cover the oldest ``limit`` overall
+            response = table.query(IndexName=OPEN_INDEX, KeyConditionExpression=condition, Limit=limit)
+            items.extend(response.get('Items', []))
+
+    items.sort(key=lambda item: item.get('gsi1sk', ''))
+    if limit is not None:
+        items = items[:limit]
+    return [to_incident(item) for item in items]
+
+
+def get_timeline(table, incident_id: str) -> List[Dict]:
+    """History events of one incident in version order."""
+    items = _query_all(
+        table,
+        KeyConditionExpression=Key('pk').eq(incident_pk(incident_id)) & Key('sk').begins_with(EVENT_SK_PREFIX)
+    )
+    return [to_incident(item) for item in items]
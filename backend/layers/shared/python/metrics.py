@@ -0,0 +1,127 @@
+"""
+Latency instrumentation: per-invocation timings and CloudWatch Embedded
+Metric Format (EMF) output.
+
+``timings`` accumulates durations by name for the current invocation:
+- ``with timings.timer('phase.OBSERVE'):`` times a block;
+- boto3 calls are timed automatically as ``<service>.<Operation>`` (for
+  example ``bedrock-runtime.InvokeModel``) by hooks that ``aws_clients``
+  installs on its session, so every client from the registry is covered;
+- ``TimedPoolManager`` times urllib3 requests as ``http.<host>``.
+
+``emit`` writes an EMF document through the structured logger, so it is
+flushed with the invocation's other records and CloudWatch extracts the
+metrics from the log line without a PutMetricData call.
+"""
+import os
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence
+from urllib.parse import urlsplit
+
+import structured_logging
+
+NAMESPACE = os.environ.get('METRICS_NAMESPACE', 'ResiliBot')
+
+_STARTED = 'resilibot.startedAt'
+
+
+class Timings:
+    """Durations (ms) and call counts by name, for one invocation."""
+
+    def __init__(self, clock: Callable[[], float] = time.perf_counter):
+        self.clock = clock
+        self.totals: Dict[str, float] = {}
+        self.counts: Dict[str, int] = {}
+
+    def reset(self) -> None:
+        self.totals.clear()
+        self.counts.clear()
+
+    def record(self, name: str, milliseconds: float) -> None:
+        self.totals[name] = self.totals.get(name, 0.0) + milliseconds
+        self.counts[name] = self.counts.get(name, 0) + 1
+
+    @contextmanager
+    def timer(self, name: str) -> Iterator[None]:
+        started = self.clock()
+        try:
+            yield
+        finally:
+            self.record(name, (self.clock() - started) * 1000)
+
+    def mark(self) -> Dict[str, float]:
+        """Current totals, to diff against with ``since``."""
+        return dict(self.totals)
+
+    def since(self, mark: Dict[str, float]) -> Dict[str, float]:
+        """Time spent per name since ``mark``, rounded to 0.1 ms."""
+        return {
+            name: round(total - mark.get(name, 0.0), 1)
+            for name, total in self.totals.items() if total > mark.get(name, 0.0)
+        }
+
+
+timings = Timings()
+
+
+def _before_call(context: Optional[Dict] = None, **kwargs) -> None:
+    if context is not None:
+        context[_STARTED] = timings.clock()
+
+
+def _after_call(event_name: str = '', context: Optional[Dict] = None, **kwargs) -> None:
+    started = (context or {}).pop(_STARTED, None)
+    if started is None:
+        return
+    # after-call.<service-id>.<Operation>
+    _, service, operation = event_name.split('.', 2)
+    timings.record(f'{service}.{operation}', (timings.clock() - started) * 1000)
+
+
+def instrument_session(session: Any) -> None:
+    """Time every API call of clients created from a boto3 session."""
+    session.events.register('before-call', _before_call, unique_id='resilibot-timing-before')
+    session.events.register('after-call', _after_call, unique_id='resilibot-timing-after')
+    session.events.register('after-call-error', _after_call, unique_id='resilibot-timing-error')
+
+
+class TimedPoolManager:
+    """urllib3 pool whose requests are timed as ``http.<host>``."""
+
+    def __init__(self, pool: Any = None):
+        if pool is None:
+            import urllib3
+            pool = urllib3.PoolManager()
+        self.pool = pool
+
+    def request(self, method: str, url: str, *args, **kwargs) -> Any:
+        with timings.timer(f'http.{urlsplit(url).hostname}'):
+            return self.pool.request(method, url, *args, **kwargs)
+
+
+def emf_document(metrics: Dict[str, float], dimensions: Dict[str, str],
+                 dimension_sets: Optional[Sequence[Sequence[str]]] = None,
+                 properties: Optional[Dict[str, Any]] = None, unit: str = 'Milliseconds',
+                 namespace: str = NAMESPACE) -> Dict[str, Any]:
+    """An EMF log document; values are top-level members alongside the ``_aws`` directive."""
+    sets: List[List[str]] = [list(names) for names in (dimension_sets or [list(dimensions)])]
+    return {
+        '_aws': {
+            'Timestamp': int(time.time() * 1000),
+            'CloudWatchMetrics': [{
+                'Namespace': namespace,
+                'Dimensions': sets,
+                'Metrics': [{'Name': name, 'Unit': unit} for name in metrics]
+            }]
+        },
+        **(properties or {}),
+        **{name: str(value) for name, value in dimensions.items()},
+        **metrics
+    }
+
+
+def emit(metrics: Dict[str, float], dimensions: Dict[str, str], **options) -> None:
+    """Write an EMF document with the invocation's buffered log records."""
+    if metrics:
+        structured_logging.logger.emit(emf_document(metrics, dimensions, **options))
@@ -0,0 +1,126 @@
+"""
+Postmortems in S3: batched, compressed objects plus monthly index manifests.
+
+The postmortem Lambda writes the postmortems of one stream batch together,
+one object per resolution day:
+``postmortems/dt=<YYYY-MM-DD>/batch-<ms>-<id>.jsonl.gz``. The object is a
+multi-member gzip file with one member (one JSON line) per postmortem. Every
+member decompresses on its own, so a single postmortem is read with a ranged
+GET of its bytes, and the whole file still reads with any gzip tool.
+
+``postmortems/index/<YYYY-MM>.json`` lists a month's postmortems (ID, title,
+severity, category, resolvedAt, object key and byte range), so the dashboard
+pages through them with one GET instead of listing the prefix. Index updates
+are conditional writes (``IfMatch``) retried on conflict, so concurrent
+batches never drop each other's entries. Entries are keyed by incident: a
+retried batch replaces its entries instead of duplicating them.
+"""
+import gzip
+import time
+import uuid
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from botocore.exceptions import ClientError
+
+from serialization import dumps_bytes, loads
+
+POSTMORTEM_PREFIX = 'postmortems/'
+INDEX_PREFIX = f'{POSTMORTEM_PREFIX}index/'
+INDEX_FIELDS = ('incidentId', 'title', 'severity', 'category', 'resolvedAt', 'enriched')
+CONFLICT_CODES = ('PreconditionFailed', 'ConditionalRequestConflict')
+
+
+def resolution_day(record: Dict) -> str:
+    """Partition day (YYYY-MM-DD) of a postmortem."""
+    moment = str(record.get('resolvedAt') or '')
+    return moment[:10] if len(moment) >= 10 else datetime.utcnow().strftime('%Y-%m-%d')
+
+
+def index_key(month: str) -> str:
+    return f'{INDEX_PREFIX}{month}.json'
+
+
+def encode_members(records: List[Dict]) -> Tuple[bytes, List[Tuple[int, int]]]:
+    """One gzip member per record; returns the body and each member's (offset, length)."""
+    members = [gzip.compress(dumps_bytes(record) + b'\n') for record in records]
+    ranges = []
+    offset = 0
+    for member in members:
+        ranges.append((offset, len(member)))
+        offset += len(member)
+    return b''.join(members), ranges
+
+
+def write_batch(s3, bucket: str, records: List[Dict]) -> List[Dict]:
+    """Write postmortems, one object per resolution day. Returns their index entries."""
+    by_day = {}
+    for record in records:
+        by_day.setdefault(resolution_day(record), []).append(record)
+
+    entries = []
+    for day, day_records in sorted(by_day.items()):
+        key = f'{POSTMORTEM_PREFIX}dt={day}/batch-{int(time.time() * 1000)}-{uuid.uuid4().hex[:8]}.jsonl.gz'
+        body, ranges = encode_members(day_records)
+        s3.put_object(
+            Bucket=bucket,
+            Key=key,
+            Body=body,
+            ContentType='application/x-ndjson',
+            ContentEncoding='gzip'
+        )
+        for record, (offset, length) in zip(day_records, ranges):
+            entries.append({
+                **{field: record.get(field) for field in INDEX_FIELDS},
+                'key': key,
+                'offset': offset,
+                'length': length
+            })
+    return entries
+
+
+def read_index(s3, bucket: str, month: str) -> Tuple[List[Dict], Optional[str]]:
+    """A month's index entries, newest first, and the manifest's ETag (None if absent)."""
+    try:
+        response = s3.get_object(Bucket=bucket, Key=index_key(month))
+    except ClientError as e:
+        if e.response['Error']['Code'] in ('NoSuchKey', '404', 'NotFound'):
+            return [], None
+        raise
+    return loads(response['Body'].read())['postmortems'], response.get('ETag')
+
+
+def update_index(s3, bucket: str, entries: List[Dict], attempts: int = 5) -> List[str]:
+    """Merge entries into their monthly manifests. Returns the manifest keys written."""
+    by_month = {}
+    for entry in entries:
+        by_month.setdefault(resolution_day(entry)[:7], []).append(entry)
+
+    keys = []
+    for month, month_entries in sorted(by_month.items()):
+        for attempt in range(attempts):
+            current, etag = read_index(s3, bucket, month)
+            merged = {entry['incidentId']: entry for entry in current}
+            merged.update((entry['incidentId'], entry) for entry in month_entries)
+            body = dumps_bytes({
+                'month': month,
+                'postmortems': sorted(merged.values(), key=lambda entry: str(entry.get('resolvedAt')), reverse=True)
+            })
+            condition = {'IfMatch': etag} if etag else {'IfNoneMatch': '*'}
+            try:
+                s3.put_object(Bucket=bucket, Key=index_key(month), Body=body,
+                              ContentType='application/json', **condition)
+                break
+            except ClientError as e:
+                # Another batch updated the manifest since it was read
+                if e.response['Error']['Code'] not in CONFLICT_CODES or attempt == attempts - 1:
+                    raise
+        keys.append(index_key(month))
+    return keys
+
+
+def read_postmortem(s3, bucket: str, entry: Dict) -> Dict:
+    """One postmortem, fetched with a ranged GET of its gzip member."""
+    end = entry['offset'] + entry['length'] - 1
+    body = s3.get_object(Bucket=bucket, Key=entry['key'], Range=f"bytes={entry['offset']}-{end}")['Body'].read()
+    return loads(gzip.decompress(body))
@@ -0,0 +1,318 @@
+"""
+Severity-priority scheduling of agent work.
+
+Ingestion enqueues each new incident on the queue for its severity instead
+of invoking the agent directly. The scheduler Lambda drains the queues into
+agent invocations:
+- dequeuing is weighted fair across severities (smooth weighted round-robin),
+  so CRITICAL work goes first without starving the rest;
+- at most ``capacity`` agent runs are in flight, and the last ``reserved`` of
+  those slots are only handed to CRITICAL and HIGH incidents;
+- while the shared slots are full, LOW incidents are deferred, and shed once
+  they have waited longer than ``shed_after_seconds``;
+- with ``tenant_capacity`` set, no tenant (source account, see ``tenancy``)
+  holds more than that many slots: its further work is deferred, so one noisy
+  account cannot take every slot from the others.
+
+In-flight runs are tracked as leases, with their priority and tenant, in a
+single ``SCHEDULER`` item of the stats table. The agent releases its lease when a run finishes or stops for
+approval, and leases of runs that crashed expire on their own.
+"""
+import time
+from collections import deque
+from typing import Callable, Dict, List, Optional
+
+from botocore.exceptions import ClientError
+
+from serialization import dumps, loads
+from tenancy import DEFAULT_TENANT
+from utils import log_event
+
+PRIORITIES = ('CRITICAL', 'HIGH', 'MEDIUM', 'LOW')
+RESERVED_PRIORITIES = ('CRITICAL', 'HIGH')
+DEFERRABLE_PRIORITIES = ('LOW',)
+DEFAULT_WEIGHTS = {'CRITICAL': 8, 'HIGH': 4, 'MEDIUM': 2, 'LOW': 1}
+
+SCHEDULER_KEY = 'SCHEDULER'
+METRICS_NAMESPACE = 'ResiliBot/Scheduler'
+
+# SQS caps a single receive at 10 messages
+RECEIVE_BATCH = 10
+# Bounds how much of a backlog one run defers or sheds
+MAX_DEFER_BATCHES = 10
+
+
+def priority_of(severity: Optional[str]) -> str:
+    """Queue priority of an incident severity; unknown severities are MEDIUM."""
+    severity = str(severity or '').upper()
+    return severity if severity in PRIORITIES else 'MEDIUM'
+
+
+class InMemoryWorkQueue:
+    """Per-priority queues with SQS-like visibility, for tests and local runs."""
+
+    def __init__(self, clock: Callable[[], float] = time.time):
+        self.clock = clock
+        self._queues = {priority: deque() for priority in PRIORITIES}
+        self._next_handle = 0
+
+    def send(self, priority: str, body: Dict):
+        self._next_handle += 1
+        self._queues[priority].append({
+            'handle': str(self._next_handle), 'body': body, 'sentAt': self.clock(), 'visibleAt': 0.0
+        })
+
+    def receive(self, priority: str, max_messages: int = RECEIVE_BATCH,
+                visibility_seconds: int = 60) -> List[Dict]:
+        now = self.clock()
+        messages = []
+        for message in self._queues[priority]:
+            if len(messages) >= max_messages:
+                break
+            if message['visibleAt'] <= now:
+                message['visibleAt'] = now + visibility_seconds
+                messages.append({'handle': message['handle'], 'body': message['body'], 'sentAt': message['sentAt']})
+        return messages
+
+    def delete(self, priority: str, handle: str):
+        queue = self._queues[priority]
+        for message in list(queue):
+            if message['handle'] == handle:
+                queue.remove(message)
+
+    def change_visibility(self, priority: str, handle: str, seconds: int):
+        for message in self._queues[priority]:
+            if message['handle'] == handle:
+                message['visibleAt'] = self.clock() + seconds
+
+    def depth(self, priority: str) -> int:
+        return len(self._queues[priority])
+
+
+class SqsWorkQueue:
+    """One SQS queue per priority."""
+
+    def __init__(self, sqs, queue_urls: Dict[str, str]):
+        self.sqs = sqs
+        self.queue_urls = queue_urls
+
+    def send(self, priority: str, body: Dict):
+        self.sqs.send_message(QueueUrl=self.queue_urls[priority], MessageBody=dumps(body))
+
+    def receive(self, priority: str, max_messages: int = RECEIVE_BATCH,
+                visibility_seconds: int = 60) -> List[Dict]:
+        response = self.sqs.receive_message(
+            QueueUrl=self.queue_urls[priority],
+            MaxNumberOfMessages=max_messages,
+            VisibilityTimeout=visibility_seconds,
+            AttributeNames=['SentTimestamp']
+        )
+        return [
+            {
+                'handle': message['ReceiptHandle'],
+                'body': loads(message['Body']),
+                'sentAt': int(message['Attributes']['SentTimestamp']) / 1000
+            }
+            for message in response.get('Messages', [])
+        ]
+
+    def delete(self, priority: str, handle: str):
+        self.sqs.delete_message(QueueUrl=self.queue_urls[priority], ReceiptHandle=handle)
+
+    def change_visibility(self, priority: str, handle: str, seconds: int):
+        self.sqs.change_message_visibility(
+            QueueUrl=self.queue_urls[priority], ReceiptHandle=handle, VisibilityTimeout=seconds
+        )
+
+    def depth(self, priority: str) -> int:
+        attributes = self.sqs.get_queue_attributes(
+            QueueUrl=self.queue_urls[priority],
+            AttributeNames=['ApproximateNumberOfMessages', 'ApproximateNumberOfMessagesNotVisible']
+        )['Attributes']
+        return int(attributes['ApproximateNumberOfMessages']) + int(attributes['ApproximateNumberOfMessagesNotVisible'])
+
+
+def read_leases(stats_table) -> Dict[str, Dict]:
+    """In-flight leases keyed by incident ID, expired ones included."""
+    item = stats_table.get_item(Key={'statsKey': SCHEDULER_KEY}, ConsistentRead=True).get('Item')
+    if not item:
+        # Lease updates write into the map, so it has to exist first
+        try:
+            stats_table.put_item(
+                Item={'statsKey': SCHEDULER_KEY, 'leases': {}},
+                ConditionExpression='attribute_not_exists(statsKey)'
+            )
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                raise
+        return {}
+    return item.get('leases', {})
+
+
+def acquire_lease(stats_table, incident_id: str, priority: str, expires_at: float,
+                  tenant: str = DEFAULT_TENANT):
+    stats_table.update_item(
+        Key={'statsKey': SCHEDULER_KEY},
+        UpdateExpression='SET leases.#id = :lease',
+        ExpressionAttributeNames={'#id': incident_id},
+        ExpressionAttributeValues={':lease': {'priority': priority, 'tenant': tenant, 'expiresAt': int(expires_at)}}
+    )
+
+
+def release_lease(stats_table, incident_id: str):
+    """Free an incident's agent slot; a no-op when it holds none."""
+    try:
+        stats_table.update_item(
+            Key={'statsKey': SCHEDULER_KEY},
+            UpdateExpression='REMOVE leases.#id',
+            ConditionExpression='attribute_exists(leases.#id)',
+            ExpressionAttributeNames={'#id': incident_id}
+        )
+    except ClientError as e:
+        if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+            raise
+
+
+def expire_leases(stats_table, leases: Dict[str, Dict], now: float) -> List[str]:
+    """Drop leases whose run never released them. Returns their incident IDs."""
+    stale = [incident_id for incident_id, lease in leases.items() if float(lease.get('expiresAt', 0)) <= now]
+    for incident_id in stale:
+        release_lease(stats_table, incident_id)
+    return stale
+
+
+class PriorityScheduler:
+    """Weighted fair dispatch from the per-priority queues into agent runs."""
+
+    def __init__(self, queue, capacity: int = 10, reserved: int = 3,
+                 weights: Optional[Dict[str, int]] = None, defer_seconds: int = 60,
+                 shed_after_seconds: int = 3600, visibility_seconds: int = 60,
+                 tenant_capacity: int = 0, clock: Callable[[], float] = time.time):
+        self.queue = queue
+        self.capacity = capacity
+        self.reserved = min(reserved, capacity)
+        self.weights = weights or DEFAULT_WEIGHTS
+        self.defer_seconds = defer_seconds
+        self.shed_after_seconds = shed_after_seconds
+        self.visibility_seconds = visibility_seconds
+        # Slots one tenant may hold; 0 leaves tenants unlimited
+        self.tenant_capacity = tenant_capacity
+        self.clock = clock
+        # Smooth weighted round-robin state; kept across runs in a warm container
+        self._current = {priority: 0 for priority in PRIORITIES}
+
+    def run(self, in_flight: Dict[str, int], dispatch: Callable[[str, Dict], None],
+            tenant_in_flight: Optional[Dict[str, int]] = None) -> Dict:
+        """
+        Dispatch queued work into the free agent slots.
+
+        ``in_flight`` counts running agent runs per priority, and
+        ``tenant_in_flight`` per tenant; ``dispatch`` is called with (priority,
+        message body) for every run started. Returns per-priority counts of
+        dispatched, deferred, throttled (tenant at capacity) and shed work,
+        with wait times and queue depths for metrics.
+        """
+        now = self.clock()
+        running = sum(in_flight.values())
+        shared_limit = self.capacity - self.reserved
+        buffers = {priority: deque() for priority in PRIORITIES}
+        exhausted = set()
+        tenants = dict(tenant_in_flight or {})
+        throttled = 0
+        result = {
+            'dispatched': {priority: 0 for priority in PRIORITIES},
+            'deferred': {priority: 0 for priority in PRIORITIES},
+            'throttled': {priority: 0 for priority in PRIORITIES},
+            'shed': {priority: 0 for priority in PRIORITIES},
+            'waitSeconds': {priority: [] for priority in PRIORITIES},
+            'dispatchedIds': []
+        }
+
+        def admissible(priority):
+            if running >= self.capacity:
+                return False
+            return priority in RESERVED_PRIORITIES or running < shared_limit
+
+        def has_work(priority):
+            if not buffers[priority] and priority not in exhausted:
+                received = self.queue.receive(priority, RECEIVE_BATCH, self.visibility_seconds)
+                if len(received) < RECEIVE_BATCH:
+                    exhausted.add(priority)
+                buffers[priority].extend(received)
+            return bool(buffers[priority])
+
+        while True:
+            eligible = [priority for priority in PRIORITIES if admissible(priority) and has_work(priority)]
+            if not eligible:
+                break
+            total = sum(self.weights[priority] for priority in eligible)
+            for priority in eligible:
+                self._current[priority] += self.weights[priority]
+            chosen = max(eligible, key=lambda priority: self._current[priority])
+            self._current[chosen] -= total
+
+            message = buffers[chosen].popleft()
+            tenant = message['body'].get('tenantId') or DEFAULT_TENANT
+            if self.tenant_capacity and tenants.get(tenant, 0) >= self.tenant_capacity:
+                # Later messages of other tenants get their turn while this one waits
+                self.queue.change_visibility(chosen, message['handle'], self.defer_seconds)
+                result['throttled'][chosen] += 1
+                throttled += 1
+                if throttled >= RECEIVE_BATCH * MAX_DEFER_BATCHES:
+                    exhausted.update(PRIORITIES)
+                continue
+            dispatch(chosen, message['body'])
+            self.queue.delete(chosen, message['handle'])
+            running += 1
+            tenants[tenant] = tenants.get(tenant, 0) + 1
+            result['dispatched'][chosen] += 1
+            result['waitSeconds'][chosen].append(max(now - message['sentAt'], 0.0))
+            result['dispatchedIds'].append(message['body'].get('incidentId'))
+
+        # Received but not dispatched: hand the messages back to the queue
+        for priority, buffer in buffers.items():
+            for message in buffer:
+                self.queue.change_visibility(priority, message['handle'], 0)
+
+        if running >= shared_limit:
+            self._defer_or_shed(now, result)
+
+        result['depth'] = {priority: self.queue.depth(priority) for priority in PRIORITIES}
+        result['inFlight'] = running
+        return result
+
+    def _defer_or_shed(self, now, result):
+        """Under pressure, push deferrable work back and drop what has waited too long."""
+        for priority in DEFERRABLE_PRIORITIES:
+            for _ in range(MAX_DEFER_BATCHES):
+                messages = self.queue.receive(priority, RECEIVE_BATCH, self.defer_seconds)
+                for message in messages:
+                    if now - message['sentAt'] >= self.shed_after_seconds:
+                        self.queue.delete(priority, message['handle'])
+                        result['shed'][priority] += 1
+                        log_event('scheduler.shed', {
+                            'incidentId': message['body'].get('incidentId'),
+                            'priority': priority,
+                            'queuedSeconds': round(now - message['sentAt'])
+                        }, level='WARNING')
+                    else:
+                        result['deferred'][priority] += 1
+                if len(messages) < RECEIVE_BATCH:
+                    break
+
+
+def metric_data(result: Dict) -> List[Dict]:
+    """CloudWatch metric data for a scheduler run, dimensioned by priority."""
+    data = [{'MetricName': 'InFlight', 'Value': result['inFlight'], 'Unit': 'Count'}]
+    for priority in PRIORITIES:
+        dimensions = [{'Name': 'Priority', 'Value': priority}]
+        data.append({'MetricName': 'QueueDepth', 'Dimensions': dimensions,
+                     'Value': result['depth'][priority], 'Unit': 'Count'})
+        for name in ('dispatched', 'deferred', 'throttled', 'shed'):
+            data.append({'MetricName': name.capitalize(), 'Dimensions': dimensions,
+                         'Value': result[name][priority], 'Unit': 'Count'})
+        waits = result['waitSeconds'][priority]
+        if waits:
+            data.append({'MetricName': 'WaitTime', 'Dimensions': dimensions,
+                         'Values': waits, 'Unit': 'Seconds'})
+    return data
@@ -0,0 +1,227 @@
+"""
+Opt-in profiling of Lambda handlers, stored in S3 per incident.
+
+``@profiled`` wraps a handler. Profiling is requested either for every
+invocation of a function, with ``PROFILE_MODE``, or for one invocation, with
+a ``profile`` field on the event (``{"incidentId": ..., "profile": "sampling"}``
+or ``"profile": true``). API Gateway events cannot carry that field: clients
+control only the request's headers, query string and body.
+
+Modes (comma separated):
+- ``cprofile``: deterministic cProfile; stored as gzipped pstats data;
+- ``sampling``: stacks of the handler thread sampled every
+  ``PROFILE_INTERVAL_MS``; stored as gzipped folded stacks, a format
+  flamegraph.pl and speedscope read. Much lower overhead than cProfile;
+- ``memory``: tracemalloc; the peak and top allocation sites are stored as
+  gzipped JSON.
+
+Artifacts go to ``PROFILES_BUCKET`` (default ``POSTMORTEMS_BUCKET``) under
+``profiles/<incidentId>/<time>-<function>-<requestId>.<kind>.gz``.
+``backend/benchmarks/profile_report.py`` lists them and renders hotspots.
+
+When no profile is requested the wrapper does one environment lookup and one
+dict lookup per invocation; the profilers are only imported when used.
+"""
+import functools
+import gzip
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, Optional, Set
+
+import aws_clients
+from serialization import dumps_bytes, loads
+from utils import log_event
+
+MODES = ('cprofile', 'sampling', 'memory')
+PROFILE_PREFIX = 'profiles'
+
+
+def requested_modes(event: Any, default: Optional[str] = None) -> Set[str]:
+    """Modes asked for by the event's ``profile`` field, else by ``PROFILE_MODE``."""
+    requested = event.get('profile') if isinstance(event, dict) else None
+    if requested is True:
+        requested = default or 'cprofile'
+    elif not isinstance(requested, str):
+        requested = default
+    return {mode.strip() for mode in (requested or '').split(',') if mode.strip() in MODES}
+
+
+def incident_id_of(event: Any, result: Any = None) -> str:
+    """The incident an invocation worked on, from its event or its API response."""
+    if isinstance(event, dict):
+        for candidate in (
+            event.get('incidentId'),
+            (event.get('pathParameters') or {}).get('incident_id'),
+            (event.get('pathParameters') or {}).get('id'),
+            (event.get('message') or {}).get('incidentId')
+        ):
+            if candidate:
+                return str(candidate)
+    if isinstance(result, dict) and isinstance(result.get('body'), str):
+        try:
+            body = loads(result['body'])
+        except ValueError:
+            body = None
+        if isinstance(body, dict) and body.get('incidentId'):
+            return str(body['incidentId'])
+    return 'unknown'
+
+
+def _frame_label(code) -> str:
+    return f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})'
+
+
+class SamplingProfiler:
+    """Samples one thread's stack from a background thread and counts folded stacks."""
+
+    def __init__(self, interval_seconds: float = 0.005):
+        self.interval_seconds = interval_seconds
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._target = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self) -> None:
+        self._target = threading.get_ident()
+        self._thread = threading.Thread(target=self._run, name='sampling-profiler', daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval_seconds):
+            frame = sys._current_frames().get(self._target)
+            stack = []
+            while frame is not None:
+                stack.append(_frame_label(frame.f_code))
+                frame = frame.f_back
+            if stack:
+                self.stacks[';'.join(reversed(stack))] += 1
+                self.samples += 1
+
+    def folded(self) -> bytes:
+        return '\n'.join(f'{stack} {count}' for stack, count in self.stacks.most_common()).encode('utf-8')
+
+
+class Session:
+    """The profilers running for one invocation."""
+
+    def __init__(self, modes: Iterable[str], interval_seconds: float = 0.005, memory_frames: int = 10):
+        self.modes = set(modes)
+        self.interval_seconds = interval_seconds
+        self.memory_frames = memory_frames
+        self.artifacts: Dict[str, bytes] = {}
+        self._cprofile = None
+        self._sampler = None
+        self._started = 0.0
+
+    def start(self) -> None:
+        if 'memory' in self.modes:
+            import tracemalloc
+            tracemalloc.start(self.memory_frames)
+        if 'sampling' in self.modes:
+            self._sampler = SamplingProfiler(self.interval_seconds)
+            self._sampler.start()
+        if 'cprofile' in self.modes:
+            import cProfile
+            self._cprofile = cProfile.Profile()
+            self._cprofile.enable()
+        self._started = time.perf_counter()
+
+    def stop(self) -> Dict[str, bytes]:
+        """Stop every profiler; return the compressed artifacts by kind."""
+        elapsed_ms = (time.perf_counter() - self._started) * 1000
+        if self._cprofile is not None:
+            import marshal
+            import pstats
+            self._cprofile.disable()
+            self.artifacts['pstats'] = gzip.compress(marshal.dumps(pstats.Stats(self._cprofile).stats))
+        if self._sampler is not None:
+            self._sampler.stop()
+            self.artifacts['folded'] = gzip.compress(self._sampler.folded())
+        if 'memory' in self.modes:
+            self.artifacts['memory.json'] = gzip.compress(dumps_bytes(memory_summary(elapsed_ms)))
+        return self.artifacts
+
+
+def memory_summary(elapsed_ms: float, top: int = 50) -> Dict[str, Any]:
+    """Peak traced memory and the largest allocation sites; stops tracemalloc."""
+    import tracemalloc
+    snapshot = tracemalloc.take_snapshot().filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, '<frozen importlib._bootstrap*>')
+    ))
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        'elapsedMs': round(elapsed_ms, 1),
+        'currentBytes': current,
+        'peakBytes': peak,
+        'top': [
+            {
+                'size': stat.size,
+                'count': stat.count,
+                # Most recent frame first, so the allocation site leads
+                'traceback': [f'{frame.filename}:{frame.lineno}' for frame in reversed(stat.traceback)]
+            }
+            for stat in snapshot.statistics('traceback')[:top]
+        ]
+    }
+
+
+def artifact_key(incident_id: str, function_name: str, request_id: str, kind: str) -> str:
+    stamp = datetime.utcnow().strftime('%Y%m%dT%H%M%S')
+    return f'{PROFILE_PREFIX}/{incident_id}/{stamp}-{function_name}-{request_id}.{kind}.gz'
+
+
+def store_artifacts(artifacts: Dict[str, bytes], incident_id: str, context: Any) -> None:
+    """Upload an invocation's artifacts; profiling never fails the invocation."""
+    bucket = os.environ.get('PROFILES_BUCKET') or os.environ.get('POSTMORTEMS_BUCKET')
+    function_name = getattr(context, 'function_name', None) or os.environ.get('AWS_LAMBDA_FUNCTION_NAME', 'local')
+    request_id = getattr(context, 'aws_request_id', None) or str(int(time.time() * 1000))
+    if not bucket:
+        log_event('profiling.no_bucket', {'incidentId': incident_id}, level='WARNING')
+        return
+    keys = []
+    for kind, body in artifacts.items():
+        key = artifact_key(incident_id, function_name, request_id, kind)
+        try:
+            aws_clients.client('s3').put_object(Bucket=bucket, Key=key, Body=body, ContentEncoding='gzip')
+            keys.append(key)
+        except Exception as e:
+            log_event('profiling.store_failed', {'key': key, 'error': str(e)}, level='WARNING')
+    log_event('profiling.stored', {'incidentId': incident_id, 'bucket': bucket, 'keys': keys})
+
+
+def profiled(func: Callable) -> Callable:
+    """Wrap a Lambda handler so a requested profile is captured and stored."""
+    @functools.wraps(func)
+    def wrapper(event, context=None):
+        default = os.environ.get('PROFILE_MODE')
+        if not default and not (isinstance(event, dict) and 'profile' in event):
+            return func(event, context)
+        modes = requested_modes(event, default)
+        if not modes:
+            return func(event, context)
+
+        session = Session(
+            modes,
+            interval_seconds=float(os.environ.get('PROFILE_INTERVAL_MS', '5')) / 1000,
+            memory_frames=int(os.environ.get('PROFILE_MEMORY_FRAMES', '10'))
+        )
+        session.start()
+        result = None
+        try:
+            result = func(event, context)
+            return result
+        finally:
+            store_artifacts(session.stop(), incident_id_of(event, result), context)
+    return wrapper
@@ -0,0 +1,116 @@
+"""
+Route-table dispatch for API Gateway proxy events.
+
+Path templates such as ``/incidents/{incident_id}/approve`` or
+``/items/{page:int}`` are compiled once, when the route is registered:
+- templates without parameters go into a dict keyed by (method, path);
+- parameterized templates become anchored regular expressions, grouped by
+  method and segment count, so a request is only tested against templates
+  that have the same number of segments.
+
+Path parameters are URL-decoded, converted to their declared type and passed
+to the handler as keyword arguments. A path that matches with another method
+answers 405 with an ``Allow`` header; no match answers 404.
+"""
+import re
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import unquote
+
+from utils import format_response
+
+# Converter name -> (segment pattern, conversion)
+CONVERTERS = {
+    'str': (r'[^/]+', str),
+    'int': (r'-?\d+', int)
+}
+
+_PARAM = re.compile(r'^\{(\w+)(?::(\w+))?\}$')
+
+Handler = Callable[..., Dict]
+
+
+def normalize_path(path: Optional[str]) -> str:
+    """Collapse duplicate and trailing slashes: '/incidents//x/' -> '/incidents/x'."""
+    return '/' + '/'.join(segment for segment in (path or '').split('/') if segment)
+
+
+class Router:
+    """Method + path template dispatch table."""
+
+    def __init__(self):
+        self._static: Dict[Tuple[str, str], Handler] = {}
+        self._dynamic: Dict[Tuple[str, int], List[Tuple[Any, Dict[str, Callable], Handler]]] = {}
+        self._templates: List[Tuple[str, Any]] = []  # (method, matcher) for 405 answers
+
+    def add(self, method: str, template: str, handler: Handler) -> None:
+        method = method.upper()
+        template = normalize_path(template)
+        segments = template.strip('/').split('/') if template != '/' else []
+
+        converters = {}
+        parts = []
+        for segment in segments:
+            param = _PARAM.match(segment)
+            if not param:
+                parts.append(re.escape(segment))
+                continue
+            name, kind = param.group(1), param.group(2) or 'str'
+            if kind not in CONVERTERS:
+                raise ValueError(f'Unknown path parameter type {kind!r} in {template}')
+            converters[name] = CONVERTERS[kind][1]
+            parts.append(f'(?P<{name}>{CONVERTERS[kind][0]})')
+
+        if not converters:
+            self._static[(method, template)] = handler
+            self._templates.append((method, template))
+            return
+
+        pattern = re.compile('^/' + '/'.join(parts) + '$')
+        self._dynamic.setdefault((method, len(segments)), []).append((pattern, converters, handler))
+        self._templates.append((method, pattern))
+
+    def route(self, method: str, template: str) -> Callable[[Handler], Handler]:
+        """Decorator form of ``add``."""
+        def register(handler: Handler) -> Handler:
+            self.add(method, template, handler)
+            return handler
+        return register
+
+    def match(self, method: str, path: str) -> Tuple[Optional[Handler], Dict[str, Any]]:
+        """Return (handler, path params), or (None, {}) when nothing matches."""
+        method = method.upper()
+        path = normalize_path(path)
+        handler = self._static.get((method, path))
+        if handler is not None:
+            return handler, {}
+
+        segment_count = path.count('/') if path != '/' else 0
+        for pattern, converters, handler in self._dynamic.get((method, segment_count), ()):
+            found = pattern.match(path)
+            if found:
+                try:
+                    params = {name: convert(unquote(found.group(name))) for name, convert in converters.items()}
+                except ValueError:
+                    continue
+                return handler, params
+        return None, {}
+
+    def allowed_methods(self, path: str) -> List[str]:
+        path = normalize_path(path)
+        return sorted({
+            method for method, matcher in self._templates
+            if (matcher == path if isinstance(matcher, str) else matcher.match(path))
+        })
+
+    def dispatch(self, event: Dict) -> Dict:
+        """Call the handler for an API Gateway proxy event as ``handler(event, **params)``."""
+        method = event.get('httpMethod', 'GET')
+        path = event.get('path', '')
+        handler, params = self.match(method, path)
+        if handler is not None:
+            return handler(event, **params)
+
+        allowed = self.allowed_methods(path)
+        if allowed:
+            return format_response(405, {'error': f'Method {method} not allowed'}, {'Allow': ', '.join(allowed)})
+        return format_response(404, {'error': f'No route for {normalize_path(path)}'})
@@ -0,0 +1,103 @@
+"""
+JSON encoding shared by the Lambda functions.
+
+- ``dumps``/``dumps_bytes`` produce compact JSON, with orjson when it is
+  installed and the stdlib encoder otherwise. DynamoDB ``Decimal``s become
+  JSON numbers (not strings), sets become lists and datetimes ISO 8601.
+- ``loads`` parses with orjson when it can; ``parse_float=Decimal`` keeps the
+  stdlib parser, for data headed back into DynamoDB.
+- ``to_item_value`` converts plain Python data to DynamoDB-storable values
+  (floats to ``Decimal``) without a JSON round-trip.
+- ``EncodedCache`` keeps the encoding of payloads that are served repeatedly,
+  keyed by a content identity such as an ETag, so they are encoded once.
+"""
+import json
+import math
+from collections import OrderedDict
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Callable, Optional, Union
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; fall back to the stdlib encoder
+    orjson = None
+
+_ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS if orjson is not None else 0
+
+
+def json_default(value: Any) -> Any:
+    """Encode values JSON has no type for."""
+    if isinstance(value, Decimal):
+        if not value.is_finite():
+            return None
+        # Integral Decimals stay exact; orjson falls back to the stdlib above 64 bits
+        return int(value) if value == value.to_integral_value() else float(value)
+    if isinstance(value, (set, frozenset)):
+        return sorted(value, key=str)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, bytes):
+        return value.decode('utf-8', 'replace')
+    return str(value)
+
+
+def dumps_bytes(value: Any) -> bytes:
+    """Compact UTF-8 JSON bytes, for HTTP bodies, Lambda payloads and S3 objects."""
+    if orjson is not None:
+        try:
+            return orjson.dumps(value, default=json_default, option=_ORJSON_OPTIONS)
+        except orjson.JSONEncodeError:
+            pass  # e.g. integers beyond 64 bits, which the stdlib encoder handles
+    return json.dumps(value, default=json_default, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+
+
+def dumps(value: Any) -> str:
+    """Compact JSON text, for API Gateway bodies and log lines."""
+    return dumps_bytes(value).decode('utf-8')
+
+
+def loads(data: Union[str, bytes, bytearray], parse_float: Optional[Callable[[str], Any]] = None) -> Any:
+    """Parse JSON text or bytes."""
+    if parse_float is None and orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data, parse_float=parse_float)
+
+
+def to_item_value(value: Any) -> Any:
+    """Copy of ``value`` that DynamoDB accepts: floats as Decimal, tuples as lists."""
+    if isinstance(value, dict):
+        return {str(key): to_item_value(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [to_item_value(item) for item in value]
+    if isinstance(value, float):
+        # repr() is the shortest exact form, as the JSON encoder would write it
+        return Decimal(repr(value)) if math.isfinite(value) else None
+    if value is None or isinstance(value, (str, bool, int, Decimal, set, frozenset, bytes)):
+        return value
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return str(value)
+
+
+class EncodedCache:
+    """Bounded LRU of encoded payloads keyed by content identity."""
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def dumps(self, key: Any, value: Any) -> str:
+        """Encoding of ``value``; ``key`` must change whenever the value does."""
+        encoded = self._entries.get(key)
+        if encoded is not None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return encoded
+        self.misses += 1
+        encoded = self._entries[key] = dumps(value)
+        if len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return encoded
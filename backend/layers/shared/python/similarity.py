@@ -0,0 +1,174 @@
+"""
+MinHash signatures and an LSH index for finding similar incidents.
+
+Text (title, description and log lines) is normalized into templates, so
+request IDs, numbers, addresses and timestamps do not make two occurrences of
+the same failure look different. It is then shingled into word n-grams and
+summarized as a fixed-size MinHash signature, whose slot agreement estimates
+the Jaccard similarity of the shingle sets. Signatures are bucketed by LSH
+bands, so a lookup only scores incidents that share at least one band.
+"""
+import operator
+import re
+import struct
+import zlib
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+NUM_PERM = 64
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+SHINGLE_SIZE = 3
+MAX_LOG_TEMPLATES = 20
+
+_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+
+
+def _permutations(count: int, seed: int = 1) -> List[Tuple[int, int]]:
+    """Deterministic (a, b) coefficients for the universal hash family."""
+    state = seed
+    coefficients = []
+    for _ in range(count):
+        # 64-bit LCG keeps signatures stable across processes without numpy
+        state = (state * 6364136223846793005 + 1442695040888963407) & ((1 << 64) - 1)
+        a = (state >> 3) % (_PRIME - 1) + 1
+        state = (state * 6364136223846793005 + 1442695040888963407) & ((1 << 64) - 1)
+        b = (state >> 3) % _PRIME
+        coefficients.append((a, b))
+    return coefficients
+
+
+_COEFFICIENTS = _permutations(NUM_PERM)
+
+_TEMPLATE_PATTERNS = [
+    (re.compile(r'\b[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}\b', re.I), '<id>'),
+    (re.compile(r'\b\d{4}-\d{2}-\d{2}[t ]\d{2}:\d{2}:\d{2}(\.\d+)?z?\b', re.I), '<ts>'),
+    (re.compile(r'\b\d{1,3}(\.\d{1,3}){3}(:\d+)?\b'), '<ip>'),
+    (re.compile(r'\b(i|vol|sg|subnet|eni|ami)-[0-9a-f]{8,17}\b', re.I), '<resource>'),
+    (re.compile(r'\b0x[0-9a-f]+\b|\b[0-9a-f]{12,}\b', re.I), '<hex>'),
+    (re.compile(r'\b\d+(\.\d+)?\b'), '<num>'),
+]
+_TOKEN = re.compile(r'<\w+>|[a-z0-9_]+')
+
+
+def log_template(line: str) -> str:
+    """Replace the variable parts of a log line with placeholders."""
+    line = line.strip().lower()
+    for pattern, placeholder in _TEMPLATE_PATTERNS:
+        line = pattern.sub(placeholder, line)
+    return line
+
+
+def incident_text(incident: Dict, logs: Optional[Iterable[str]] = None) -> str:
+    """Text that characterizes an incident: title, description and distinct log templates."""
+    templates = []
+    for line in logs or ():
+        template = log_template(str(line))
+        if template and template not in templates:
+            templates.append(template)
+            if len(templates) >= MAX_LOG_TEMPLATES:
+                break
+    parts = [str(incident.get('title', '')), str(incident.get('description', ''))] + templates
+    return log_template(' '.join(parts))
+
+
+def shingles(text: str, size: int = SHINGLE_SIZE) -> Set[str]:
+    """Word n-grams of a text, plus single words so short texts still compare."""
+    tokens = _TOKEN.findall(text.lower())
+    grams = {' '.join(tokens[i:i + size]) for i in range(max(len(tokens) - size + 1, 0))}
+    return grams | set(tokens)
+
+
+def signature(features: Set[str]) -> Tuple[int, ...]:
+    """MinHash signature of a feature set."""
+    if not features:
+        return tuple([_MAX_HASH] * NUM_PERM)
+    hashes = [zlib.crc32(feature.encode('utf-8')) for feature in features]
+    return tuple(
+        min(((a * h + b) % _PRIME) & _MAX_HASH for h in hashes)
+        for a, b in _COEFFICIENTS
+    )
+
+
+def incident_signature(incident: Dict, logs: Optional[Iterable[str]] = None) -> Tuple[int, ...]:
+    return signature(shingles(incident_text(incident, logs)))
+
+
+def similarity(left: Tuple[int, ...], right: Tuple[int, ...]) -> float:
+    """Estimated Jaccard similarity of two signatures."""
+    return sum(map(operator.eq, left, right)) / NUM_PERM
+
+
+def encode_signature(sig: Tuple[int, ...]) -> str:
+    """Compact hex form of a signature (8 characters per slot)."""
+    return struct.pack(f'>{NUM_PERM}I', *sig).hex()
+
+
+def decode_signature(value: str) -> Tuple[int, ...]:
+    return struct.unpack(f'>{NUM_PERM}I', bytes.fromhex(value))
+
+
+def _band_keys(sig: Tuple[int, ...]) -> List[Tuple[int, int]]:
+    return [(band, hash(sig[band * ROWS:(band + 1) * ROWS])) for band in range(BANDS)]
+
+
+class SimilarityIndex:
+    """In-memory LSH index of incident signatures with their stored payloads."""
+
+    def __init__(self):
+        self.entries = {}  # incidentId -> (signature, payload)
+        self._buckets = {}  # (band, band hash) -> set of incidentIds
+
+    def __len__(self):
+        return len(self.entries)
+
+    def add(self, incident_id: str, sig: Tuple[int, ...], payload: Dict):
+        """Insert or replace an incident."""
+        self.remove(incident_id)
+        self.entries[incident_id] = (tuple(sig), payload)
+        for key in _band_keys(sig):
+            self._buckets.setdefault(key, set()).add(incident_id)
+
+    def remove(self, incident_id: str):
+        entry = self.entries.pop(incident_id, None)
+        if entry is None:
+            return
+        for key in _band_keys(entry[0]):
+            bucket = self._buckets.get(key)
+            if bucket:
+                bucket.discard(incident_id)
+                if not bucket:
+                    del self._buckets[key]
+
+    def query(self, sig: Tuple[int, ...], k: int = 3, min_similarity: float = 0.0,
+              exclude: Optional[str] = None, where: Optional[Callable[[Dict], bool]] = None) -> List[Dict]:
+        """The ``k`` most similar incidents sharing an LSH band, best first; ``where`` filters payloads."""
+        candidates = set()
+        for key in _band_keys(sig):
+            candidates.update(self._buckets.get(key, ()))
+        candidates.discard(exclude)
+
+        scored = []
+        for incident_id in candidates:
+            candidate_sig, payload = self.entries[incident_id]
+            if where is not None and not where(payload):
+                continue
+            score = similarity(sig, candidate_sig)
+            if score >= min_similarity:
+                scored.append((score, incident_id, payload))
+        scored.sort(key=lambda entry: (-entry[0], entry[1]))
+        return [
+            {'incidentId': incident_id, 'similarity': round(score, 3), **payload}
+            for score, incident_id, payload in scored[:k]
+        ]
+
+    def to_records(self) -> List[Dict]:
+        """Serializable form of every entry."""
+        return [
+            {'incidentId': incident_id, 'signature': encode_signature(sig), 'payload': payload}
+            for incident_id, (sig, payload) in self.entries.items()
+        ]
+
+    def add_records(self, records: Iterable[Dict]):
+        for record in records:
+            self.add(record['incidentId'], decode_signature(record['signature']), record.get('payload', {}))
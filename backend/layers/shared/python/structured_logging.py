@@ -0,0 +1,200 @@
+"""
+Structured, sampled and buffered logging for the Lambda handlers.
+
+Every record is one JSON line: timestamp, level, event type, the invocation's
+request id and function name, and the event data. Data is sanitized before it
+is encoded:
+- values under keys that look like secrets (tokens, passwords, webhook URLs,
+  signatures, ...) and Slack webhook URLs anywhere in text are redacted;
+- long strings, long lists and deep nesting are truncated, so a large
+  CloudWatch or API Gateway event costs a bounded amount to ingest.
+
+Records below ``LOG_LEVEL`` are dropped. ``LOG_SAMPLE_RATES`` (for example
+``DEBUG=0.05,INFO=0.5``) keeps that fraction of invocations for a level; the
+decision is made once per invocation, so a kept invocation logs its whole
+story. WARNING and ERROR are never sampled out.
+
+During an invocation records are buffered and written with a single stdout
+write when the handler returns (``logged_handler``), when the buffer is full,
+or right away for ERROR records. Outside an invocation (module import) they
+are written immediately. ``emit`` buffers pre-built documents such as EMF
+metrics the same way.
+"""
+import functools
+import os
+import random
+import re
+import sys
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, TextIO
+
+from serialization import dumps
+
+LEVELS = {'DEBUG': 10, 'INFO': 20, 'WARNING': 30, 'ERROR': 40}
+UNSAMPLED_LEVELS = ('WARNING', 'ERROR')
+REDACTED = '[REDACTED]'
+
+SENSITIVE_KEY = re.compile(
+    r'secret|token|passw(or)?d|api[_-]?key|authorization|cookie|credential|signature|webhook|private[_-]?key',
+    re.IGNORECASE
+)
+SENSITIVE_TEXT = re.compile(
+    r'https://hooks\.slack\.com/\S+|https://[\w.-]+\.webhook\.office\.com/\S+|xox[abpors]-[\w-]+'
+)
+
+
+def parse_sample_rates(value: Optional[str]) -> Dict[str, float]:
+    """Parse ``LEVEL=rate`` pairs; malformed pairs are ignored."""
+    rates = {}
+    for pair in (value or '').split(','):
+        level, _, rate = pair.partition('=')
+        level = level.strip().upper()
+        try:
+            rates[level] = min(max(float(rate), 0.0), 1.0)
+        except ValueError:
+            continue
+    return rates
+
+
+class StructuredLogger:
+    """Leveled JSON-lines logger with per-invocation sampling and buffering."""
+
+    def __init__(self, level: str = 'INFO', sample_rates: Optional[Dict[str, float]] = None,
+                 max_string: int = 1024, max_items: int = 25, max_depth: int = 6, buffer_limit: int = 100,
+                 stream: Optional[TextIO] = None, rng: Callable[[], float] = random.random):
+        self.level = LEVELS.get(str(level).upper(), LEVELS['INFO'])
+        self.sample_rates = sample_rates or {}
+        self.max_string = max_string
+        self.max_items = max_items
+        self.max_depth = max_depth
+        self.buffer_limit = buffer_limit
+        self.stream = stream
+        self.rng = rng
+        self.context: Dict[str, Any] = {}
+        self.dropped = 0
+        self._buffer: List[str] = []
+        self._sampled: Dict[str, bool] = {}
+        self._in_invocation = False
+
+    @classmethod
+    def from_environment(cls) -> 'StructuredLogger':
+        return cls(
+            level=os.environ.get('LOG_LEVEL', 'INFO'),
+            sample_rates=parse_sample_rates(os.environ.get('LOG_SAMPLE_RATES')),
+            max_string=int(os.environ.get('LOG_MAX_STRING', '1024')),
+            max_items=int(os.environ.get('LOG_MAX_ITEMS', '25'))
+        )
+
+    def begin_invocation(self, context: Any = None) -> None:
+        """Start buffering and draw this invocation's sampling decisions."""
+        self.flush()
+        self.context = {}
+        request_id = getattr(context, 'aws_request_id', None)
+        if request_id:
+            self.context['requestId'] = request_id
+        function_name = getattr(context, 'function_name', None)
+        if function_name:
+            self.context['function'] = function_name
+        self._sampled = {
+            level: self.rng() < rate
+            for level, rate in self.sample_rates.items() if level not in UNSAMPLED_LEVELS
+        }
+        self._in_invocation = True
+
+    def end_invocation(self) -> None:
+        self._in_invocation = False
+        self.flush()
+
+    def enabled(self, level: str) -> bool:
+        """Whether a record at ``level`` would be kept in this invocation."""
+        return LEVELS.get(level, LEVELS['INFO']) >= self.level and self._sampled.get(level, True)
+
+    def log(self, level: str, event_type: str, data: Any = None) -> None:
+        level = level.upper() if level.upper() in LEVELS else 'INFO'
+        if not self.enabled(level):
+            self.dropped += 1
+            return
+
+        record = {'timestamp': datetime.utcnow().isoformat(), 'level': level, 'eventType': event_type}
+        record.update(self.context)
+        if data is not None:
+            record['data'] = self.sanitize(data)
+        self._buffer.append(dumps(record))
+
+        if not self._in_invocation or level == 'ERROR' or len(self._buffer) >= self.buffer_limit:
+            self.flush()
+
+    def emit(self, document: Dict[str, Any]) -> None:
+        """Buffer a pre-built JSON document as is (e.g. EMF metrics); never sampled."""
+        self._buffer.append(dumps(document))
+        if not self._in_invocation or len(self._buffer) >= self.buffer_limit:
+            self.flush()
+
+    def flush(self) -> None:
+        """Write the buffered records with a single write."""
+        if not self._buffer:
+            return
+        stream = self.stream or sys.stdout
+        stream.write('\n'.join(self._buffer) + '\n')
+        stream.flush()
+        self._buffer.clear()
+
+    def sanitize(self, value: Any, depth: int = 0) -> Any:
+        """Redacted, size-bounded copy of ``value``."""
+        if isinstance(value, str):
+            value = SENSITIVE_TEXT.sub(REDACTED, value)
+            if len(value) > self.max_string:
+                return f'{value[:self.max_string]}...[{len(value) - self.max_string} more chars]'
+            return value
+        if value is None or isinstance(value, (bool, int, float)):
+            return value
+        if depth >= self.max_depth:
+            return '[nested too deep]'
+        if isinstance(value, dict):
+            return {
+                str(key): REDACTED if SENSITIVE_KEY.search(str(key)) else self.sanitize(item, depth + 1)
+                for key, item in value.items()
+            }
+        if isinstance(value, (list, tuple, set, frozenset)):
+            items = list(value)
+            kept = [self.sanitize(item, depth + 1) for item in items[:self.max_items]]
+            if len(items) > self.max_items:
+                kept.append(f'...[{len(items) - self.max_items} more items]')
+            return kept
+        return self.sanitize(str(value), depth)
+
+
+logger = StructuredLogger.from_environment()
+
+
+def event_summary(event: Any) -> Dict[str, Any]:
+    """Small description of a Lambda event, logged instead of the whole event."""
+    if not isinstance(event, dict):
+        return {'type': type(event).__name__}
+    summary: Dict[str, Any] = {'keys': sorted(event)[:20]}
+    for key in ('httpMethod', 'path', 'source', 'detail-type', 'action', 'incidentId', 'phase'):
+        if key in event:
+            summary[key] = event[key]
+    if isinstance(event.get('Records'), list):
+        summary['records'] = len(event['Records'])
+    if isinstance(event.get('body'), str):
+        summary['bodyBytes'] = len(event['body'])
+    return summary
+
+
+def logged_handler(func: Callable) -> Callable:
+    """Wrap a Lambda handler: log the event, buffer records, flush once at the end."""
+    @functools.wraps(func)
+    def wrapper(event, context=None):
+        logger.begin_invocation(context)
+        try:
+            logger.log('INFO', 'invocation.received', event_summary(event))
+            if logger.enabled('DEBUG'):
+                logger.log('DEBUG', 'invocation.event', event)
+            return func(event, context)
+        except Exception as e:
+            logger.log('ERROR', 'invocation.failed', {'error': str(e), 'errorType': type(e).__name__})
+            raise
+        finally:
+            logger.end_invocation()
+    return wrapper
@@ -0,0 +1,131 @@
+"""
+Tenants: the AWS accounts incidents come from, and clients that act in them.
+
+An incident's tenant is its ``tenantId``, set at ingestion from the account
+EventBridge delivered the alarm for. Incidents created through the API are
+always the ``default`` tenant: an account named in a request body is never
+trusted, or any API caller could have the agent assume a role in it. The
+agent observes and the tools remediate in the incident's own account and
+region through a role assumed there:
+- ``TENANT_ROLE_ARNS`` (JSON, account -> role ARN) names roles per account;
+- otherwise ``TENANT_ROLE_NAME`` is assumed in every account but this one
+  (``TENANT_HOME_ACCOUNT``), with ``TENANT_EXTERNAL_ID`` when it is set.
+Incidents of this account, or of accounts without a role, use the function's
+own credentials (a regional client when the incident's region differs).
+
+Assumed-role credentials are cached until shortly before they expire, and
+the clients built from them live as long as the credentials. Clients come
+from the shared session in ``aws_clients``, so service models are loaded
+once and every call is timed like the rest.
+"""
+import json
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import aws_clients
+
+DEFAULT_TENANT = 'default'
+ROLE_SESSION_NAME = 'resilibot'
+# Credentials are renewed this long before they expire
+REFRESH_MARGIN_SECONDS = 300
+
+
+def tenant_id(incident: Dict) -> str:
+    """The tenant an incident belongs to, as recorded at ingestion."""
+    return str(incident.get('tenantId') or DEFAULT_TENANT)
+
+
+def incident_location(incident: Dict) -> Tuple[Optional[str], Optional[str]]:
+    """(account, region) an incident happened in; None for what its alarm did not say."""
+    metadata = incident.get('metadata') or {}
+    tenant = tenant_id(incident)
+    return (tenant if tenant != DEFAULT_TENANT else None), (metadata.get('region') or None)
+
+
+class TenantClients:
+    """Per-account clients through assumed roles, cached until their credentials expire."""
+
+    def __init__(self, home_account: str = '', role_name: str = '', role_arns: Optional[Dict[str, str]] = None,
+                 external_id: str = '', duration_seconds: int = 3600, sts: Any = None,
+                 clock: Callable[[], float] = time.time):
+        self.home_account = home_account
+        self.role_name = role_name
+        self.role_arns = role_arns or {}
+        self.external_id = external_id
+        self.duration_seconds = duration_seconds
+        self.sts = sts if sts is not None else aws_clients.lazy_client('sts')
+        self.clock = clock
+        self._lock = threading.RLock()
+        self._credentials: Dict[str, Dict] = {}
+        self._clients: Dict[Tuple, Tuple[Any, float]] = {}
+
+    @classmethod
+    def from_env(cls, environ=os.environ, **kwargs) -> 'TenantClients':
+        return cls(
+            home_account=environ.get('TENANT_HOME_ACCOUNT', ''),
+            role_name=environ.get('TENANT_ROLE_NAME', ''),
+            role_arns=json.loads(environ.get('TENANT_ROLE_ARNS') or '{}'),
+            external_id=environ.get('TENANT_EXTERNAL_ID', ''),
+            **kwargs
+        )
+
+    def role_arn(self, account: Optional[str]) -> Optional[str]:
+        """The role to assume in an account; None to act with the function's own credentials."""
+        if not account or account == self.home_account:
+            return None
+        if account in self.role_arns:
+            return self.role_arns[account]
+        if self.role_name and account.isdigit():
+            return f'arn:aws:iam::{account}:role/{self.role_name}'
+        return None
+
+    def client(self, service: str, account: Optional[str] = None, region: Optional[str] = None,
+               default: Any = None) -> Any:
+        """A client acting in ``account`` and ``region``; ``default`` when that is this function's own."""
+        role_arn = self.role_arn(account)
+        if role_arn is None:
+            if region and region != aws_clients.session().region_name:
+                return aws_clients.client(service, region_name=region)
+            return default if default is not None else aws_clients.client(service)
+
+        key = (role_arn, service, region)
+        found = self._clients.get(key)
+        now = self.clock()
+        if found is not None and now < found[1]:
+            return found[0]
+        with self._lock:
+            credentials = self.credentials(role_arn)
+            built = aws_clients.session().client(
+                service,
+                region_name=region,
+                aws_access_key_id=credentials['AccessKeyId'],
+                aws_secret_access_key=credentials['SecretAccessKey'],
+                aws_session_token=credentials['SessionToken']
+            )
+            self._clients[key] = (built, credentials['renewAt'])
+            return built
+
+    def credentials(self, role_arn: str) -> Dict:
+        """Temporary credentials for a role, assumed again when they are about to expire."""
+        cached = self._credentials.get(role_arn)
+        if cached is not None and self.clock() < cached['renewAt']:
+            return cached
+        request = {
+            'RoleArn': role_arn,
+            'RoleSessionName': ROLE_SESSION_NAME,
+            'DurationSeconds': self.duration_seconds
+        }
+        if self.external_id:
+            request['ExternalId'] = self.external_id
+        credentials = dict(self.sts.assume_role(**request)['Credentials'])
+        expires_at = credentials['Expiration'].timestamp()
+        credentials['renewAt'] = expires_at - min(REFRESH_MARGIN_SECONDS, self.duration_seconds / 2)
+        self._credentials[role_arn] = credentials
+        return credentials
+
+    def for_incident(self, service: str, incident: Dict, default: Any = None) -> Any:
+        """A client acting where the incident happened."""
+        account, region = incident_location(incident)
+        return self.client(service, account, region, default)
@@ -1,26 +1,19 @@
 """
 Shared utilities for ResiliBot Lambda functions.
 """
-import json
-import logging
 from datetime import datetime
 from typing import Any, Dict
 
-# Configure logging
-logger = logging.getLogger()
-logger.setLevel(logging.INFO)
+from serialization import dumps, loads
+import structured_logging
+from structured_logging import logged_handler
 
-def log_event(event_type: str, data: Dict[str, Any]) -> None:
-    """Log structured event data."""
-    log_entry = {
-        'timestamp': datetime.utcnow().isoformat(),
-        'eventType': event_type,
-        'data': data
-    }
-    logger.info(json.dumps(log_entry))
+def log_event(event_type: str, data: Any = None, level: str = 'INFO') -> None:
+    """Log structured event data as one JSON line (see structured_logging)."""
+    structured_logging.logger.log(level, event_type, data)
 
-def format_response(status_code: int, body: Any, headers: Dict[str, str] = None) -> Dict:
-    """Format API Gateway response."""
+def format_response(status_code: int, body: Any = None, headers: Dict[str, str] = None) -> Dict:
+    """Format API Gateway response; a None body is sent empty."""
     default_headers = {
         'Content-Type': 'application/json',
         'Access-Control-Allow-Origin': '*',
@@ -34,14 +27,14 @@ def format_response(status_code: int, body: Any, headers: Dict[str, str] = None)
     return {
         'statusCode': status_code,
         'headers': default_headers,
-        'body': json.dumps(body) if not isinstance(body, str) else body
+        'body': '' if body is None else body if isinstance(body, str) else dumps(body)
     }
 
 def parse_event_body(event: Dict) -> Dict:
-    """Parse API Gateway event body."""
-    body = event.get('body', '{}')
+    """Parse API Gateway event body; a missing or empty body is an empty object."""
+    body = event.get('body') or '{}'
     if isinstance(body, str):
-        return json.loads(body)
+        return loads(body)
     return body
 
 def get_timestamp() -> int:
@@ -0,0 +1,91 @@
+"""
+Copy incidents from the legacy table (incidentId + timestamp per row) into the
+single-table incident store.
+
+For every incident the newest row becomes the CURRENT item. Older rows, left
+behind when the same incident was ingested more than once, become history
+events, followed by a MIGRATED event holding the migrated snapshot. Items are
+written with overwrite semantics, so the tool can be re-run safely.
+
+Usage:
+    python backend/migrations/migrate_to_single_table.py \\
+        --source <LegacyIncidentsTableName> --target <IncidentsTableName> [--dry-run]
+"""
+import argparse
+import os
+import sys
+from datetime import datetime
+
+import boto3
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../layers/shared/python'))
+
+from incident_store import event_item, incident_key, index_attributes, to_incident  # noqa: E402
+
+def scan_legacy(table):
+    """Yield every row of the legacy table."""
+    kwargs = {}
+    while True:
+        response = table.scan(**kwargs)
+        yield from response.get('Items', [])
+        if 'LastEvaluatedKey' not in response:
+            return
+        kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+def group_by_incident(rows):
+    """Group legacy rows by incident, oldest first."""
+    incidents = {}
+    for row in rows:
+        incidents.setdefault(row['incidentId'], []).append(row)
+    for versions in incidents.values():
+        versions.sort(key=lambda row: row.get('timestamp', 0))
+    return incidents
+
+def row_time(row):
+    """Best available ISO timestamp for a legacy row."""
+    if row.get('updatedAt') or row.get('createdAt'):
+        return str(row.get('updatedAt') or row.get('createdAt')).rstrip('Z')
+    return datetime.utcfromtimestamp(int(row.get('timestamp', 0)) / 1000).isoformat()
+
+def migrate_incident(incident_id, rows):
+    """Build the single-table items for one incident's legacy rows."""
+    latest = {k: v for k, v in rows[-1].items() if k != 'timestamp'}
+    latest.setdefault('createdAt', row_time(rows[0]))
+    latest.setdefault('updatedAt', row_time(rows[-1]))
+    # Keep the incident's own version when it is ahead, so existing ETags stay valid
+    version = max(int(latest.get('version', 0) or 0), len(rows))
+    latest['version'] = version
+
+    items = []
+    for number, row in enumerate(rows[:-1], start=1):
+        snapshot = {k: v for k, v in row.items() if k != 'timestamp'}
+        items.append(event_item(incident_id, number, 'CREATED' if number == 1 else 'MIGRATED', snapshot, row_time(row)))
+    items.append(event_item(incident_id, version, 'MIGRATED', to_incident(latest), latest['updatedAt']))
+    items.append({**latest, **incident_key(incident_id), **index_attributes(latest)})
+    return items
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--source', required=True, help='legacy incidents table name')
+    parser.add_argument('--target', required=True, help='single-table incident store name')
+    parser.add_argument('--region', default=os.environ.get('AWS_REGION', 'us-east-1'))
+    parser.add_argument('--dry-run', action='store_true', help='report what would be written')
+    args = parser.parse_args()
+
+    dynamodb = boto3.resource('dynamodb', region_name=args.region)
+    incidents = group_by_incident(scan_legacy(dynamodb.Table(args.source)))
+    print(f"Read {sum(len(rows) for rows in incidents.values())} rows for {len(incidents)} incidents from {args.source}")
+
+    written = 0
+    with dynamodb.Table(args.target).batch_writer(overwrite_by_pkeys=['pk', 'sk']) as batch:
+        for incident_id, rows in incidents.items():
+            for item in migrate_incident(incident_id, rows):
+                if not args.dry_run:
+                    batch.put_item(Item=item)
+                written += 1
+
+    action = 'Would write' if args.dry_run else 'Wrote'
+    print(f"{action} {written} items to {args.target}")
+
+if __name__ == '__main__':
+    main()
@@ -3,12 +3,17 @@ Unit tests for agent Lambda function.
 """
 import json
 import pytest
-from unittest.mock import Mock, patch
+from unittest.mock import Mock
 import sys
 import os
 
 # Add parent directory to path
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../functions/agent'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../functions/ingestion'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../layers/shared/python'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../migrations'))
+
+RUNBOOKS_DIR = os.path.join(os.path.dirname(__file__), '../../runbooks')
 
 @pytest.fixture
 def mock_env(monkeypatch):
@@ -17,6 +22,52 @@ def mock_env(monkeypatch):
     monkeypatch.setenv('BEDROCK_MODEL_ID', 'anthropic.claude-3-sonnet-20240229-v1:0')
     monkeypatch.setenv('RUNBOOKS_BUCKET', 'test-runbooks-bucket')
     monkeypatch.setenv('POSTMORTEMS_BUCKET', 'test-postmortems-bucket')
+    monkeypatch.setenv('AWS_DEFAULT_REGION', 'us-east-1')
+    monkeypatch.setenv('AWS_ACCESS_KEY_ID', 'testing')
+    monkeypatch.setenv('AWS_SECRET_ACCESS_KEY', 'testing')
+
+@pytest.fixture
+def incidents_table(mock_env, monkeypatch):
+    """In-memory incidents table bound to the agent module."""
+    import boto3
+    from moto import mock_aws
+
+    with mock_aws():
+        table = boto3.resource('dynamodb').create_table(
+            TableName='test-incidents-table',
+            KeySchema=[
+                {'AttributeName': 'pk', 'KeyType': 'HASH'},
+                {'AttributeName': 'sk', 'KeyType': 'RANGE'}
+            ],
+            AttributeDefinitions=[
+                {'AttributeName': name, 'AttributeType': 'S'}
+                for name in ('pk', 'sk', 'gsi1pk', 'gsi1sk', 'gsi2pk', 'gsi2sk')
+            ],
+            GlobalSecondaryIndexes=[
+                {
+                    'IndexName': index_name,
+                    'KeySchema': [
+                        {'AttributeName': f'{prefix}pk', 'KeyType': 'HASH'},
+                        {'AttributeName': f'{prefix}sk', 'KeyType': 'RANGE'}
+                    ],
+                    'Projection': {'ProjectionType': 'ALL'}
+                }
+                for index_name, prefix in (('byOpenSeverity', 'gsi1'), ('byUpdated', 'gsi2'))
+            ],
+            BillingMode='PAY_PER_REQUEST'
+        )
+        import agent
+        from incident_cache import IncidentCache
+        monkeypatch.setattr(agent, 'dynamodb', boto3.resource('dynamodb'))
+        monkeypatch.setattr(agent, 'table', table)
+        monkeypatch.setattr(agent, 'incident_cache', IncidentCache())
+        monkeypatch.setattr(agent, 'incident_list_cache', {'expiresAt': 0.0, 'incidents': None})
+        yield table
+
+def store_incident(table, incident):
+    """Write an incident's current item the way the incident store lays it out."""
+    from incident_store import incident_key, index_attributes
+    table.put_item(Item={**incident, **incident_key(incident['incidentId']), **index_attributes(incident)})
 
 @pytest.fixture
 def sample_incident():
@@ -31,51 +82,78 @@ def sample_incident():
         'createdAt': '2025-01-15T10:00:00Z'
     }
 
-def test_parse_cloudwatch_alarm():
-    """Test CloudWatch alarm parsing."""
-    from ingestion import parse_cloudwatch_alarm
-    
-    event = {
-        'detail': {
-            'alarmName': 'HighCPUAlarm',
-            'state': {
-                'value': 'ALARM',
-                'reason': 'CPU exceeded threshold'
-            },
-            'alarmArn': 'arn:aws:cloudwatch:us-east-1:123456789012:alarm:HighCPUAlarm'
-        },
-        'region': 'us-east-1',
-        'account': '123456789012'
-    }
-    
-    result = parse_cloudwatch_alarm(event)
-    
-    assert result['title'] == 'CloudWatch Alarm: HighCPUAlarm'
-    assert result['severity'] == 'HIGH'
-    assert result['source'] == 'cloudwatch'
-
 def test_observe_metrics(mock_env, sample_incident):
     """Test metrics observation."""
     # This would require mocking boto3 clients
     # Placeholder for actual implementation
     pass
 
-def test_reason_with_bedrock(mock_env):
-    """Test Bedrock reasoning."""
-    # This would require mocking Bedrock client
-    # Placeholder for actual implementation
-    pass
+def test_reason_with_bedrock(incidents_table, sample_incident, monkeypatch):
+    """Test one structured call yields diagnosis and actions, with text answers repaired and validated."""
+    import agent
 
-def test_plan_remediation():
-    """Test remediation planning."""
-    diagnosis = {
-        'diagnosis': 'High CPU due to memory leak',
-        'confidence': 85
+    def answer(*content):
+        return {'body': Mock(read=Mock(return_value=json.dumps({'content': list(content)})))}
+
+    monkeypatch.setattr(agent, 'bedrock', Mock())
+    monkeypatch.setattr(agent, 'plan_template_store', Mock(categories=Mock(return_value=['database-connection', 'high-cpu'])))
+    context = {'incident': sample_incident, 'metrics': [], 'logs': [], 'runbooks': [], 'similarIncidents': []}
+
+    agent.bedrock.invoke_model.return_value = answer({'type': 'tool_use', 'name': 'incident_analysis', 'input': {
+        'diagnosis': 'Runaway worker', 'confidence': 92, 'category': 'High CPU',
+        'actions': [{'type': 'restart_service', 'reason': 'stop the spin'}, {'type': 'reboot_router'}]
+    }})
+    analysis = agent.reason_with_bedrock(context)
+    request = json.loads(agent.bedrock.invoke_model.call_args.kwargs['body'])
+    assert request['tool_choice'] == {'type': 'tool', 'name': 'incident_analysis'}
+    assert 'high-cpu' in request['messages'][0]['content']
+    assert analysis == {
+        'diagnosis': 'Runaway worker', 'confidence': 92, 'category': 'high-cpu',
+        'actions': [{'type': 'restart_service', 'reason': 'stop the spin'}], 'rejectedActions': ['reboot_router']
     }
-    
-    # Would test plan_remediation function
-    # Placeholder for actual implementation
-    pass
+
+    # Text cut off by max_tokens, wrapped in a code fence
+    agent.bedrock.invoke_model.return_value = answer({'type': 'text', 'text': (
+        'Analysis:\n```json\n{"diagnosis": "Pool exhausted", "confidence": "70%", '
+        '"category": "database-connection", "actions": [{"type": "increase_pool_size"}, {"type": "kill_'
+    )})
+    analysis = agent.reason_with_bedrock(context)
+    assert (analysis['confidence'], analysis['actions']) == (70, [{'type': 'increase_pool_size', 'reason': ''}])
+
+    agent.bedrock.invoke_model.return_value = answer({'type': 'text', 'text': 'The CPU is high.'})
+    analysis = agent.reason_with_bedrock(context)
+    assert (analysis['diagnosis'], analysis['confidence']) == ('The CPU is high.', 0)
+
+def test_plan_remediation(incidents_table, agent_clients, sample_incident):
+    """Test plans come from runbook templates, or from the model's actions for unseen categories."""
+    import agent
+
+    context = {'incident': {**sample_incident, 'metadata': {'service': 'checkout'}}}
+    plan = agent.plan_remediation({'diagnosis': 'High CPU due to memory leak', 'confidence': 85}, context)
+
+    assert plan['category'] == 'high-cpu' and plan['template'] == 'high-cpu-runbook.md'
+    assert [(a['type'], a['target'], a['safe']) for a in plan['actions']] == [
+        ('restart_service', 'checkout', True), ('scale_up', 'auto_scaling_group', True)
+    ]
+    assert 'terminate_instance' in [a['type'] for a in plan['escalation']]
+    assert plan['success'] and not plan['requiresApproval']
+
+    # Runbook actions outside a "Safe" section go to approval
+    plan = agent.plan_remediation({'diagnosis': 'Connection pool exhausted by long queries'}, context)
+    assert plan['category'] == 'database-connection' and plan['requiresApproval']
+
+    # An unseen category is planned from the model's actions and kept as a template
+    diagnosis = {'diagnosis': 'Root volume is full', 'category': 'disk-full',
+                 'actions': [{'type': 'clear_cache'}, {'type': 'restart_service'}]}
+    first = agent.plan_remediation(diagnosis, context)
+    assert first['category'] == 'disk-full' and first['template'] == 'model'
+    assert [(a['type'], a['safe']) for a in first['actions']] == [('restart_service', True)]
+    assert [a['type'] for a in first['escalation']] == ['clear_cache']
+    assert agent.plan_remediation({'diagnosis': 'Disk full again', 'category': 'disk-full'}, context) == first
+
+    # No template and no recommended actions: no plan rather than a made-up one
+    plan = agent.plan_remediation({'diagnosis': 'Packet loss', 'category': 'network'}, context)
+    assert plan['actions'] == [] and not plan['success']
 
 def test_execute_actions():
     """Test action execution."""
@@ -90,5 +168,554 @@ def test_execute_actions():
     # Placeholder for actual implementation
     pass
 
+def test_unsafe_actions_wait_for_approval_at_act(incidents_table, sample_incident, monkeypatch):
+    """Test held actions move the incident to approval and run once approved, before any resolution."""
+    import agent
+
+    plan = {'success': True, 'actions': [
+        {'type': 'restart_service', 'target': 'app', 'safe': True},
+        {'type': 'scale_up', 'target': 'app-asg', 'safe': False}
+    ]}
+    store_incident(incidents_table, {
+        **sample_incident, 'status': 'APPROVED', 'requiresApproval': False, 'agentPhase': 'ACT', 'plan': plan, 'version': 1
+    })
+    for name in ('send_approval_notification', 'send_notification', 'index_resolved_incident', 'start_agent'):
+        monkeypatch.setattr(agent, name, Mock())
+
+    held = agent.run_agent_phase('test-incident-123')
+    assert held == {'incidentId': 'test-incident-123', 'phase': 'ACT', 'status': 'PENDING_APPROVAL', 'done': True}
+    agent.send_approval_notification.assert_called_once()
+    stored = agent.load_incident('test-incident-123')
+    assert [taken.get('status') for taken in stored['actionsTaken']] == [None, 'PENDING_APPROVAL']
+
+    # Nothing is resolved or indexed while the unsafe action waits
+    assert agent.run_agent_phase('test-incident-123')['done']
+    assert not agent.index_resolved_incident.called
+
+    assert agent.handle_approval_action({'action': 'approve', 'incidentId': 'test-incident-123', 'user': 'alice'})['statusCode'] == 202
+    resumed = agent.run_agent_phase('test-incident-123')
+    assert resumed['status'] == 'RESOLVED' and resumed['phase'] == 'POSTMORTEM'
+    stored = agent.load_incident('test-incident-123')
+    assert [taken['result']['status'] for taken in stored['actionsTaken']] == ['SUCCESS', 'SUCCESS']
+    assert stored['actionsAwaitingApproval'] is False
+
+    assert agent.run_agent_phase('test-incident-123')['done']
+    agent.index_resolved_incident.assert_called_once()
+    assert agent.send_notification.call_args[0][3] == 'RESOLVED'
+
+def test_list_incidents_since_pages_and_lags_cursor(incidents_table, sample_incident):
+    """Test since polls are paged oldest first and the final cursor stays behind recent writes."""
+    import agent
+    from datetime import datetime
+
+    recent = datetime.utcnow().isoformat()
+    for n, updated_at in enumerate(['2025-01-15T12:00:00', '2025-01-15T13:00:00', recent]):
+        store_incident(incidents_table, {**sample_incident, 'incidentId': f'inc-{n}', 'updatedAt': updated_at})
+
+    def poll(since):
+        response = agent.handle_api_request({
+            'httpMethod': 'GET',
+            'path': '/incidents',
+            'queryStringParameters': {'since': since, 'limit': '2'}
+        })
+        return json.loads(response['body'])
+
+    first = poll('2025-01-15T11:00:00')
+    assert [i['incidentId'] for i in first['incidents']] == ['inc-0', 'inc-1']
+    assert first['more'] is True and first['cursor'] == '2025-01-15T13:00:00#inc-1'
+
+    last = poll(first['cursor'])
+    assert [i['incidentId'] for i in last['incidents']] == ['inc-2']
+    assert last['more'] is False
+    # A write stamped earlier than inc-2 may still be committing: the next poll covers it again
+    assert first['cursor'] < last['cursor'] < recent
+    assert [i['incidentId'] for i in poll(last['cursor'])['incidents']] == ['inc-2']
+
+def test_get_incident_conditional_get(incidents_table, sample_incident):
+    """Test single-incident GET returns 304 when the ETag still matches."""
+    import agent
+
+    store_incident(incidents_table, {**sample_incident, 'version': 1})
+    event = {'httpMethod': 'GET', 'path': '/incidents/test-incident-123'}
+
+    first = agent.handle_api_request(event)
+    assert first['statusCode'] == 200
+    etag = first['headers']['ETag']
+
+    cached = agent.handle_api_request({**event, 'headers': {'If-None-Match': etag}})
+    assert cached['statusCode'] == 304
+    assert cached['body'] == ''
+
+    agent.update_incident('test-incident-123', {'status': 'IN_PROGRESS'})
+    changed = agent.handle_api_request({**event, 'headers': {'if-none-match': etag}})
+    assert changed['statusCode'] == 200
+    assert changed['headers']['ETag'] != etag
+
+def test_list_incidents_since_cursor(incidents_table, sample_incident):
+    """Test the since cursor only returns incidents updated after it."""
+    import agent
+
+    store_incident(incidents_table, {**sample_incident, 'updatedAt': '2025-01-15T10:00:00'})
+    store_incident(incidents_table, {
+        **sample_incident, 'incidentId': 'test-incident-456', 'updatedAt': '2025-01-15T12:00:00'
+    })
+
+    response = agent.handle_api_request({
+        'httpMethod': 'GET',
+        'path': '/incidents',
+        'queryStringParameters': {'since': '2025-01-15T11:00:00Z'}
+    })
+    body = json.loads(response['body'])
+
+    assert [i['incidentId'] for i in body['incidents']] == ['test-incident-456']
+    # The last change is long settled, so the cursor resumes right after it
+    assert body['cursor'] == '2025-01-15T12:00:00#test-incident-456'
+    assert body['more'] is False
+
+    unchanged = agent.handle_api_request({
+        'httpMethod': 'GET',
+        'path': '/incidents',
+        'queryStringParameters': {'since': '2025-01-15T11:00:00Z'},
+        'headers': {'If-None-Match': response['headers']['ETag']}
+    })
+    assert unchanged['statusCode'] == 304
+
+def test_update_incident_conflicts_keep_concurrent_decisions(incidents_table, sample_incident):
+    """Test a stale update is only reapplied when the concurrent write left status and phase alone."""
+    import agent
+    from incident_store import incident_key
+
+    def write_behind_cache(version, **attributes):
+        names = {f'#a{i}': name for i, name in enumerate(['version', *attributes])}
+        values = {f':a{i}': value for i, value in enumerate([version, *attributes.values()])}
+        incidents_table.update_item(
+            Key=incident_key('test-incident-123'),
+            UpdateExpression='SET ' + ', '.join(f'{n} = {v}' for n, v in zip(names, values)),
+            ExpressionAttributeNames=names,
+            ExpressionAttributeValues=values
+        )
+
+    store_incident(incidents_table, {**sample_incident, 'version': 1, 'agentPhase': 'ACT'})
+    agent.incident_cache.begin_invocation()
+    try:
+        # An unrelated write (a Jira ticket) does not invalidate the checkpoint
+        agent.get_incident('test-incident-123')
+        write_behind_cache(2, jiraTicket='INC-1')
+        updated = agent.update_incident('test-incident-123', {'agentPhase': 'POSTMORTEM'})
+        assert updated['version'] == 3
+        assert updated['jiraTicket'] == 'INC-1'
+        assert updated['agentPhase'] == 'POSTMORTEM'
+
+        # A deny landing during the phase is kept and the stale checkpoint dropped
+        write_behind_cache(4, status='DENIED', deniedBy='bob')
+        assert agent.update_incident('test-incident-123', {'status': 'RESOLVED', 'agentPhase': 'DONE'}) is None
+    finally:
+        agent.incident_cache.end_invocation()
+
+    stored = incidents_table.get_item(Key=incident_key('test-incident-123'))['Item']
+    assert stored['status'] == 'DENIED'
+    assert stored['agentPhase'] == 'POSTMORTEM'
+    assert stored['version'] == 4
+
+    # The item disappearing between the conflict and the re-read is not an error
+    agent.incident_cache.begin_invocation()
+    try:
+        agent.get_incident('test-incident-123')
+        incidents_table.delete_item(Key=incident_key('test-incident-123'))
+        assert agent.update_incident('test-incident-123', {'agentPhase': 'DONE'}) is None
+    finally:
+        agent.incident_cache.end_invocation()
+
+def test_approval_reads_incident_once_per_invocation(incidents_table, sample_incident, monkeypatch):
+    """Test repeated reads within one invocation are served from the cache."""
+    import agent
+    from incident_store import incident_key
+
+    store_incident(incidents_table, {**sample_incident, 'version': 1})
+    load = Mock(wraps=agent.load_incident)
+    monkeypatch.setattr(agent, 'load_incident', load)
+    monkeypatch.setattr(agent, 'send_notification', Mock())
+
+    result = agent.handler({'action': 'deny', 'incidentId': 'test-incident-123', 'user': 'bob'}, None)
+
+    assert result['statusCode'] == 200
+    assert load.call_count == 1
+    stored = incidents_table.get_item(Key=incident_key('test-incident-123'))['Item']
+    assert stored['status'] == 'DENIED'
+
+def test_stats_follow_incident_transitions(incidents_table, sample_incident, monkeypatch):
+    """Test counters are maintained by ingestion and status transitions."""
+    import boto3
+    import agent
+    import ingestion
+
+    boto3.resource('dynamodb').create_table(
+        TableName='test-stats-table',
+        KeySchema=[{'AttributeName': 'statsKey', 'KeyType': 'HASH'}],
+        AttributeDefinitions=[{'AttributeName': 'statsKey', 'AttributeType': 'S'}],
+        BillingMode='PAY_PER_REQUEST'
+    )
+    for module in (agent, ingestion):
+        monkeypatch.setattr(module, 'STATS_TABLE', 'test-stats-table')
+        monkeypatch.setattr(module, 'dynamodb', boto3.resource('dynamodb'))
+    monkeypatch.setattr(ingestion, 'table', incidents_table)
+    monkeypatch.setattr(ingestion, 'lambda_client', Mock())
+
+    for incident_id in ('inc-1', 'inc-2'):
+        body = {**sample_incident, 'incidentId': incident_id}
+        assert ingestion.handler({'body': json.dumps(body)}, None)['statusCode'] == 200
+
+    agent.update_incident('inc-1', {'status': 'RESOLVED'})
+    agent.update_incident('inc-1', {'status': 'RESOLVED'})  # no transition, no double count
+
+    response = agent.handle_api_request({'httpMethod': 'GET', 'path': '/stats'})
+    stats = json.loads(response['body'])
+
+    assert stats['total'] == 2
+    assert stats['active'] == 1
+    assert stats['byStatus'] == {'OPEN': 1, 'RESOLVED': 1}
+    assert stats['bySeverity'] == {'HIGH': 2}
+    assert stats['mttr']['resolved'] == 1
+    assert sum(stats['mttr']['histogram'].values()) == 1
+    assert len(stats['hourly']) == 24
+    assert stats['hourly'][-1]['created'] == 2
+
+    # A counter that cannot be updated never fails the incident write itself
+    for module in (agent, ingestion):
+        monkeypatch.setattr(module, 'STATS_TABLE', 'missing-stats-table')
+    assert ingestion.handler({'body': json.dumps({**sample_incident, 'incidentId': 'inc-3'})}, None)['statusCode'] == 200
+    assert agent.update_incident('inc-3', {'status': 'RESOLVED'})['status'] == 'RESOLVED'
+
+def test_single_table_access_patterns(incidents_table, sample_incident, monkeypatch):
+    """Test open-by-severity listing, version history and duplicate ingestion."""
+    import boto3
+    import agent
+    import ingestion
+
+    monkeypatch.setattr(ingestion, 'dynamodb', boto3.resource('dynamodb'))
+    monkeypatch.setattr(ingestion, 'table', incidents_table)
+    monkeypatch.setattr(ingestion, 'lambda_client', Mock())
+    monkeypatch.setenv('AGENT_LAMBDA_NAME', 'test-agent')
+
+    for incident_id, severity in (('inc-1', 'HIGH'), ('inc-2', 'LOW'), ('inc-3', 'HIGH')):
+        body = {**sample_incident, 'incidentId': incident_id, 'severity': severity}
+        assert ingestion.handler({'body': json.dumps(body)}, None)['statusCode'] == 200
+
+    duplicate = ingestion.handler({'body': json.dumps({**sample_incident, 'incidentId': 'inc-1'})}, None)
+    assert json.loads(duplicate['body'])['message'] == 'Incident already exists'
+    assert ingestion.lambda_client.invoke.call_count == 3
+
+    agent.update_incident('inc-1', {'status': 'IN_PROGRESS'})
+    agent.update_incident('inc-3', {'status': 'RESOLVED'})
+
+    response = agent.handle_api_request({
+        'httpMethod': 'GET',
+        'path': '/incidents',
+        'queryStringParameters': {'status': 'open', 'severity': 'HIGH'}
+    })
+    assert [i['incidentId'] for i in json.loads(response['body'])['incidents']] == ['inc-1']
+
+    def list_ids(**params):
+        response = agent.handle_api_request({'httpMethod': 'GET', 'path': '/incidents', 'queryStringParameters': params})
+        return response['statusCode'], [i['incidentId'] for i in json.loads(response['body']).get('incidents', [])]
+
+    # Severity is matched case-insensitively, unknown ones are rejected and limit applies to every listing
+    assert list_ids(status='open', severity='high') == (200, ['inc-1'])
+    assert list_ids(status='open', severity='urgent')[0] == 400
+    assert list_ids(limit='many')[0] == 400
+    assert len(list_ids(status='open', limit='1')[1]) == 1
+    assert len(list_ids(limit='2')[1]) == 2
+
+    listed = json.loads(agent.handle_api_request({'httpMethod': 'GET', 'path': '/incidents'})['body'])
+    assert sorted(i['incidentId'] for i in listed['incidents']) == ['inc-1', 'inc-2', 'inc-3']
+    assert all('pk' not in i and 'gsi2sk' not in i for i in listed['incidents'])
+
+    timeline = agent.handle_api_request({'httpMethod': 'GET', 'path': '/incidents/inc-1/timeline'})
+    events = json.loads(timeline['body'])['events']
+    assert [(int(e['version']), e['eventType']) for e in events] == [(1, 'CREATED'), (2, 'UPDATED')]
+    assert events[1]['changes']['status'] == 'IN_PROGRESS'
+
+def test_migrate_legacy_rows(sample_incident):
+    """Test legacy rows become one current item plus history events."""
+    from migrate_to_single_table import group_by_incident, migrate_incident
+
+    rows = [
+        {**sample_incident, 'timestamp': 2, 'status': 'RESOLVED', 'version': 4},
+        {**sample_incident, 'timestamp': 1}
+    ]
+    incidents = group_by_incident(rows)
+    items = migrate_incident('test-incident-123', incidents['test-incident-123'])
+
+    current = items[-1]
+    assert current['sk'] == 'CURRENT'
+    assert current['status'] == 'RESOLVED' and current['version'] == 4
+    assert 'timestamp' not in current and 'gsi1pk' not in current
+    assert [item['sk'] for item in items[:-1]] == ['EVENT#00000001', 'EVENT#00000004']
+
+def test_similar_incident_signatures():
+    """Test incidents differing only in variable log fields are near-identical."""
+    from similarity import SimilarityIndex, incident_signature, similarity
+
+    cpu = {'title': 'CloudWatch Alarm: HighCPUAlarm', 'description': 'Threshold Crossed: 1 datapoint [93.2] was greater than the threshold (90.0).'}
+    first = incident_signature(cpu, ['ERROR request 8f2c1a9e-1111-2222-3333-444455556666 timed out after 3021 ms on 10.0.1.12'])
+    second = incident_signature(
+        {**cpu, 'description': cpu['description'].replace('93.2', '97.9')},
+        ['ERROR request 0a2c1a9e-9999-2222-3333-444455556666 timed out after 15 ms on 10.0.3.7']
+    )
+    disk = incident_signature({'title': 'CloudWatch Alarm: DiskFull', 'description': 'Volume vol-0abc12345def67890 is 98% full'})
+
+    assert similarity(first, second) > 0.9
+    assert similarity(first, disk) < 0.3
+
+    index = SimilarityIndex()
+    index.add('cpu', first, {'title': 'cpu'})
+    index.add('disk', disk, {'title': 'disk'})
+    assert [match['incidentId'] for match in index.query(second, k=3, min_similarity=0.3)] == ['cpu']
+
+@pytest.fixture
+def agent_clients(incidents_table, monkeypatch):
+    """Bind the agent's AWS clients to the mock and stub out Bedrock."""
+    import boto3
+    import agent
+    from plan_templates import PlanTemplates
+    from similar_incidents import SimilarIncidentStore
+
+    s3 = boto3.client('s3')
+    s3.create_bucket(Bucket='test-postmortems-bucket')
+    s3.create_bucket(Bucket='test-runbooks-bucket')
+    for name in os.listdir(RUNBOOKS_DIR):
+        with open(os.path.join(RUNBOOKS_DIR, name), 'rb') as f:
+            s3.put_object(Bucket='test-runbooks-bucket', Key=name, Body=f.read())
+    for name in ('s3', 'cloudwatch', 'logs_client', 'lambda_client'):
+        monkeypatch.setattr(agent, name, boto3.client({'logs_client': 'logs', 'lambda_client': 'lambda'}.get(name, name)))
+    monkeypatch.setattr(agent, 'similar_incident_store', SimilarIncidentStore(s3, 'test-postmortems-bucket'))
+    monkeypatch.setattr(agent, 'plan_template_store', PlanTemplates(s3, 'test-runbooks-bucket'))
+    monkeypatch.setattr(agent, 'reason_with_bedrock', Mock(return_value={'diagnosis': 'High CPU from a runaway worker', 'confidence': 80}))
+    return s3
+
+def test_agent_reuses_plan_of_near_duplicate(incidents_table, agent_clients, sample_incident):
+    """Test a near-duplicate of the same tenant skips Bedrock and reuses its category, not its targets."""
+    import agent
+    from similar_incidents import SimilarIncidentStore
+    from similarity import incident_signature
+
+    s3 = agent_clients
+
+    store = SimilarIncidentStore(s3, 'test-postmortems-bucket')
+    plan = {'category': 'high-cpu', 'actions': [{'type': 'restart_service', 'target': 'billing', 'safe': True}],
+            'requiresApproval': False, 'success': True}
+    store.add('past-incident', incident_signature(sample_incident, []), {
+        'title': sample_incident['title'],
+        'diagnosis': {'diagnosis': 'Runaway worker pinned the CPU', 'confidence': 90},
+        'plan': plan
+    })
+    # An identical incident of another account is never a match
+    store.add('other-account', incident_signature(sample_incident, []), {
+        'tenantId': '222222222222',
+        'title': sample_incident['title'],
+        'diagnosis': {'diagnosis': 'Another account', 'confidence': 99},
+        'plan': {**plan, 'actions': [{'type': 'terminate_instance', 'target': 'i-0other', 'safe': True}]}
+    })
+
+    store_incident(incidents_table, {**sample_incident, 'metadata': {'service': 'checkout'}, 'requiresApproval': False, 'version': 1})
+    result = agent.execute_agent_loop('test-incident-123')
+
+    agent.reason_with_bedrock.assert_not_called()
+    assert result['plan']['reusedFrom'] == 'past-incident'
+    assert result['diagnosis']['diagnosis'] == 'Runaway worker pinned the CPU'
+    assert result['plan']['template'] == 'high-cpu-runbook.md'
+    assert ('restart_service', 'checkout') in [(a['type'], a['target']) for a in result['plan']['actions']]
+    assert 'billing' not in [a['target'] for a in result['plan']['actions']]
+    assert s3.list_objects_v2(Bucket='test-postmortems-bucket', Prefix='similarity/deltas/test-incident-123')['KeyCount'] == 1
+
+def test_agent_resumes_from_last_checkpoint(incidents_table, agent_clients, sample_incident, monkeypatch):
+    """Test a failed phase is retried from its checkpoint without redoing earlier phases."""
+    import agent
+    from incident_store import incident_key
+
+    store_incident(incidents_table, {**sample_incident, 'requiresApproval': False, 'version': 1})
+    monkeypatch.setattr(agent, 'execute_actions', Mock(side_effect=TimeoutError('Task timed out')))
+
+    with pytest.raises(TimeoutError):
+        agent.execute_agent_loop('test-incident-123')
+
+    checkpoint = incidents_table.get_item(Key=incident_key('test-incident-123'))['Item']
+    assert checkpoint['agentPhase'] == 'ACT'
+    assert checkpoint['diagnosis']['diagnosis'] == 'High CPU from a runaway worker'
+    assert json.loads(checkpoint['observation'])['logs'] == []
+
+    monkeypatch.setattr(agent, 'execute_actions', Mock(return_value=[]))
+    steps = [agent.run_agent_phase('test-incident-123') for _ in range(2)]
+
+    assert [step['phase'] for step in steps] == ['POSTMORTEM', 'DONE']
+    assert steps[-1]['done'] and steps[-1]['status'] == 'RESOLVED'
+    assert agent.reason_with_bedrock.call_count == 1
+
+def test_agent_phase_timings_and_metrics(incidents_table, agent_clients, sample_incident, monkeypatch):
+    """Test every phase stores its timing breakdown and emits EMF metrics with severity and source."""
+    import io
+    import agent
+    import aws_clients
+    import structured_logging
+    from incident_store import incident_key
+
+    logger = structured_logging.StructuredLogger(stream=io.StringIO())
+    monkeypatch.setattr(structured_logging, 'logger', logger)
+    # Registry clients carry the timing hooks
+    monkeypatch.setattr(agent, 'cloudwatch', aws_clients.client('cloudwatch'))
+
+    store_incident(incidents_table, {**sample_incident, 'requiresApproval': False, 'version': 1, 'source': 'cloudwatch'})
+    agent.execute_agent_loop('test-incident-123')
+
+    timings = incidents_table.get_item(Key=incident_key('test-incident-123'))['Item']['timings']
+    assert set(timings) == set(agent.AGENT_PHASES)
+    assert timings['OBSERVE']['durationMs'] >= timings['OBSERVE']['calls']['cloudwatch.GetMetricStatistics'] > 0
+
+    documents = [json.loads(line) for line in logger.stream.getvalue().splitlines() if '"_aws"' in line]
+    assert [document['Phase'] for document in documents] == list(agent.AGENT_PHASES)
+    observe = documents[0]
+    directive = observe['_aws']['CloudWatchMetrics'][0]
+    assert directive['Namespace'] == 'ResiliBot/Agent'
+    assert directive['Dimensions'] == [['Phase'], ['Phase', 'Severity', 'Source']]
+    assert {'PhaseDuration', 'cloudwatch.GetMetricStatistics'} <= {metric['Name'] for metric in directive['Metrics']}
+    assert (observe['Severity'], observe['Source'], observe['incidentId']) == ('HIGH', 'cloudwatch', 'test-incident-123')
+    assert observe['PhaseDuration'] > 0
+
+def test_profiling_is_opt_in_per_invocation(incidents_table, agent_clients, monkeypatch):
+    """Test a handler is only profiled when asked, and its artifacts are stored under the incident."""
+    import gzip
+    import marshal
+    import profiling
+
+    calls = []
+
+    @profiling.profiled
+    def handler(event, context):
+        calls.append(sum(i * i for i in range(20000)))
+        return {'ok': True}
+
+    monkeypatch.delenv('PROFILE_MODE', raising=False)
+    monkeypatch.setenv('PROFILE_INTERVAL_MS', '1')
+    context = Mock(aws_request_id='req-1', function_name='agent')
+    assert handler({'incidentId': 'inc-1'}, context) == {'ok': True}
+    assert agent_clients.list_objects_v2(Bucket='test-postmortems-bucket', Prefix='profiles/')['KeyCount'] == 0
+
+    assert handler({'incidentId': 'inc-1', 'profile': 'cprofile,memory,sampling'}, context) == {'ok': True}
+    keys = [item['Key'] for item in agent_clients.list_objects_v2(Bucket='test-postmortems-bucket', Prefix='profiles/inc-1/')['Contents']]
+    assert sorted(key.split('.', 1)[1] for key in keys) == ['folded.gz', 'memory.json.gz', 'pstats.gz']
+    assert all('-agent-req-1.' in key for key in keys)
+
+    def artifact(kind):
+        key = next(key for key in keys if key.endswith(kind))
+        return gzip.decompress(agent_clients.get_object(Bucket='test-postmortems-bucket', Key=key)['Body'].read())
+
+    assert any(name == 'handler' for _, _, name in marshal.loads(artifact('pstats.gz')))
+    assert json.loads(artifact('memory.json.gz'))['peakBytes'] > 0
+    assert len(calls) == 2
+
+def test_approval_returns_before_agent_runs(incidents_table, agent_clients, sample_incident, monkeypatch):
+    """Test approving hands the incident to an asynchronous run instead of blocking."""
+    import agent
+
+    store_incident(incidents_table, {**sample_incident, 'status': 'PENDING_APPROVAL', 'version': 1})
+    monkeypatch.setenv('AWS_LAMBDA_FUNCTION_NAME', 'test-agent')
+    monkeypatch.setattr(agent, 'lambda_client', Mock())
+
+    response = agent.handler({
+        'httpMethod': 'POST',
+        'path': '/incidents/test-incident-123/approve',
+        'body': json.dumps({'action': 'approve', 'user': 'alice'})
+    }, None)
+
+    assert response['statusCode'] == 202
+    payload = json.loads(agent.lambda_client.invoke.call_args.kwargs['Payload'])
+    assert payload == {'incidentId': 'test-incident-123', 'run': 'local'}
+    assert agent.get_incident('test-incident-123')['status'] == 'APPROVED'
+    agent.reason_with_bedrock.assert_not_called()
+
+def test_slack_decisions_are_verified_and_recorded_once(incidents_table, agent_clients, sample_incident, monkeypatch):
+    """Test Slack clicks need a valid signature and repeated clicks neither rewrite nor restart the incident."""
+    import hashlib
+    import hmac
+    import time
+    from urllib.parse import urlencode
+    import agent
+
+    store_incident(incidents_table, {**sample_incident, 'status': 'PENDING_APPROVAL', 'version': 1})
+    monkeypatch.setattr(agent, 'SLACK_SIGNING_SECRET', 'test-signing-secret')
+    monkeypatch.setattr(agent, 'start_agent', Mock(return_value={'status': 'QUEUED'}))
+    monkeypatch.setattr(agent, 'send_notification', Mock())
+
+    def click(action_id, value, secret='test-signing-secret', timestamp=None):
+        body = urlencode({'payload': json.dumps({
+            'type': 'block_actions',
+            'user': {'id': 'U1', 'username': 'alice'},
+            'actions': [{'action_id': action_id, 'value': value}]
+        })})
+        timestamp = str(timestamp or int(time.time()))
+        digest = hmac.new(secret.encode(), f'v0:{timestamp}:{body}'.encode(), hashlib.sha256).hexdigest()
+        return agent.handler({
+            'httpMethod': 'POST',
+            'path': '/slack/interactions',
+            'headers': {'X-Slack-Request-Timestamp': timestamp, 'X-Slack-Signature': f'v0={digest}'},
+            'body': body
+        }, None)
+
+    assert click('approve_incident', 'approve_test-incident-123', secret='wrong')['statusCode'] == 401
+    assert click('approve_incident', 'approve_test-incident-123', timestamp=int(time.time()) - 600)['statusCode'] == 401
+    assert agent.get_incident('test-incident-123')['status'] == 'PENDING_APPROVAL'
+
+    for _ in range(3):
+        assert click('approve_incident', 'approve_test-incident-123')['statusCode'] == 200
+    stored = agent.load_incident('test-incident-123')
+    assert stored['status'] == 'APPROVED' and stored['approvedBy'] == 'alice' and stored['version'] == 2
+    agent.start_agent.assert_called_once_with('test-incident-123')
+
+    # A click from another container with a stale copy fails its condition check only
+    agent.incident_cache.put({**stored, 'status': 'PENDING_APPROVAL', 'version': 1})
+    duplicate = agent.handle_approval_action({'action': 'approve', 'incidentId': 'test-incident-123', 'user': 'bob'})
+    assert duplicate['statusCode'] == 200 and json.loads(duplicate['body'])['duplicate']
+    assert agent.handle_approval_action({'action': 'deny', 'incidentId': 'test-incident-123'})['statusCode'] == 409
+    assert agent.load_incident('test-incident-123')['version'] == 2
+    assert agent.start_agent.call_count == 1 and not agent.send_notification.called
+
+def test_decisions_are_refused_once_the_agent_runs(incidents_table, sample_incident, monkeypatch):
+    """Test an OPEN incident already in the agent's hands cannot be approved into a second run."""
+    import agent
+
+    monkeypatch.setattr(agent, 'start_agent', Mock(return_value={'status': 'QUEUED'}))
+    running = [
+        {**sample_incident, 'requiresApproval': False},
+        {**sample_incident, 'agentPhase': 'REASON'}
+    ]
+    for incident in running:
+        store_incident(incidents_table, {**incident, 'version': 1})
+        agent.incident_cache.invalidate('test-incident-123')
+        response = agent.handle_approval_action({'action': 'approve', 'incidentId': 'test-incident-123', 'user': 'bob'})
+        assert response['statusCode'] == 409
+        assert agent.load_incident('test-incident-123')['status'] == 'OPEN'
+    assert not agent.start_agent.called
+
+def test_api_route_table(incidents_table, sample_incident):
+    """Test requests dispatch by method and template, and Decimals are sent as JSON numbers."""
+    import agent
+    from router import Router
+    store_incident(incidents_table, {**sample_incident, 'version': 3})
+
+    response = agent.handle_api_request({'httpMethod': 'GET', 'path': '/incidents/test-incident-123/'})
+    assert response['statusCode'] == 200
+    assert json.loads(response['body'])['version'] == 3
+
+    not_allowed = agent.handle_api_request({'httpMethod': 'DELETE', 'path': '/incidents/test-incident-123'})
+    assert not_allowed['statusCode'] == 405
+    assert not_allowed['headers']['Allow'] == 'GET'
+    assert agent.handle_api_request({'httpMethod': 'GET', 'path': '/incidents/a/b/c'})['statusCode'] == 404
+
+    router = Router()
+    router.add('GET', '/pages/{page:int}', lambda event, page: page)
+    router.add('GET', '/pages/{name}', lambda event, name: name)
+    assert router.dispatch({'httpMethod': 'GET', 'path': '/pages/42'}) == 42
+    assert router.dispatch({'httpMethod': 'GET', 'path': '/pages/first%20page'}) == 'first page'
+
 if __name__ == '__main__':
     pytest.main([__file__])
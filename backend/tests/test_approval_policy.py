@@ -0,0 +1,99 @@
+"""
+Unit tests for the ingestion approval policy.
+"""
+import json
+import pytest
+from unittest.mock import Mock
+import sys
+import os
+
+# Add ingestion directory and shared layer to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../functions/ingestion'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../layers/shared/python'))
+
+@pytest.fixture
+def mock_env(monkeypatch):
+    """Mock AWS credentials for the in-memory S3 bucket."""
+    monkeypatch.setenv('AWS_DEFAULT_REGION', 'us-east-1')
+    monkeypatch.setenv('AWS_ACCESS_KEY_ID', 'testing')
+    monkeypatch.setenv('AWS_SECRET_ACCESS_KEY', 'testing')
+
+def test_approval_policy_rules_and_hot_reload(mock_env, monkeypatch):
+    """Test approval rules by severity, source, alarm, hour and rate, reloaded only on a new version."""
+    import boto3
+    from moto import mock_aws
+    from approval_policy import CompiledPolicy, PolicyStore, env_policy
+
+    # Without a policy object the AUTO_APPROVE_* variables keep their meaning
+    fallback = CompiledPolicy(env_policy({'AUTO_APPROVE_HIGH_SEVERITY': 'true', 'AUTO_APPROVE_SOURCES': 'synthetic, test'}))
+    assert [fallback.evaluate({'severity': s, 'source': 'api'}, 12).requires_approval for s in ('LOW', 'MEDIUM', 'HIGH')] == [False, True, False]
+    assert not fallback.evaluate({'severity': 'CRITICAL', 'source': 'test'}, 12).requires_approval
+
+    policy = CompiledPolicy({
+        'version': '1',
+        'default': 'require',
+        'rules': [
+            {'name': 'storm', 'decision': 'require', 'when': {'severity': ['LOW', 'MEDIUM'], 'minIncidentsPerHour': 50}},
+            {'name': 'low', 'decision': 'auto', 'when': {'severity': 'LOW'}},
+            {'name': 'night-db', 'decision': 'auto', 'when': {
+                'source': ['cloudwatch'], 'alarmName': ['Database*', 'RDS-*'], 'hours': '22-06'
+            }}
+        ]
+    })
+    rate = Mock(return_value=3)
+    db_alarm = {'severity': 'HIGH', 'source': 'cloudwatch', 'metadata': {'alarmName': 'DatabaseConnectionsAlarm'}}
+    assert policy.evaluate(db_alarm, 23).rule == 'night-db'
+    assert policy.evaluate(db_alarm, 5).rule == 'night-db'
+    assert policy.evaluate(db_alarm, 6).rule == 'default'
+    assert policy.evaluate({**db_alarm, 'metadata': {'alarmName': 'HighCPUAlarm'}}, 23).requires_approval
+    assert policy.evaluate({**db_alarm, 'source': 'api'}, 23).rule == 'default'
+    single_hour = CompiledPolicy({'rules': [{'name': 'five', 'decision': 'auto', 'when': {'hours': '5'}}]})
+    assert [single_hour.evaluate(db_alarm, hour).rule for hour in (4, 5, 6)] == ['default', 'five', 'default']
+    rate.assert_not_called()  # no rule that needs the rate was reached
+
+    assert policy.evaluate({'severity': 'LOW', 'source': 'api'}, 12, rate).rule == 'low'
+    rate.return_value = 80
+    decision = policy.evaluate({'severity': 'LOW', 'source': 'api'}, 12, rate)
+    assert decision.requires_approval and decision.rule == 'storm' and decision.version == '1'
+
+    with pytest.raises(ValueError):
+        CompiledPolicy({'rules': [{'decision': 'auto', 'when': {'region': ['us-east-1']}}]})
+
+    with mock_aws():
+        s3 = boto3.client('s3')
+        s3.create_bucket(Bucket='test-policy-bucket')
+        now = [0.0]
+        store = PolicyStore(s3, 'test-policy-bucket', 'policies/approval.json', env_policy({}), refresh_seconds=60, clock=lambda: now[0])
+        assert store.policy().version == 'env'  # no object yet
+
+        def publish(version, default):
+            s3.put_object(Bucket='test-policy-bucket', Key='policies/approval.json',
+                          Body=json.dumps({'version': version, 'default': default, 'rules': []}))
+
+        publish('1', 'auto')
+        assert store.policy().version == 'env'  # not due for a refresh
+        now[0] = 61
+        compiled = store.policy()
+        assert compiled.version == '1' and not compiled.evaluate({'severity': 'HIGH'}, 0).requires_approval
+
+        publish('1', 'require')  # same version: the compiled policy is kept
+        now[0] = 122
+        assert store.policy() is compiled
+
+        s3.put_object(Bucket='test-policy-bucket', Key='policies/approval.json', Body=b'{"version": "2", "default": "maybe"}')
+        now[0] = 183
+        assert store.policy() is compiled  # invalid documents are ignored
+
+        publish('3', 'require')
+        now[0] = 244
+        assert store.policy().version == '3' and store.policy().evaluate({'severity': 'LOW'}, 0).requires_approval
+
+        # S3 unreachable: not a ClientError, and the compiled policy still applies
+        from botocore.exceptions import EndpointConnectionError
+        monkeypatch.setattr(s3, 'get_object', Mock(side_effect=EndpointConnectionError(endpoint_url='https://s3')))
+        now[0] = 305
+        assert store.policy().version == '3'
+
+
+if __name__ == '__main__':
+    pytest.main([__file__])
@@ -0,0 +1,114 @@
+"""
+Unit tests for archiver Lambda function.
+"""
+import json
+import pytest
+import sys
+import os
+
+# Add archiver, agent and shared layer directories to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../functions/archiver'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../functions/agent'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../layers/shared/python'))
+
+@pytest.fixture
+def archive_env(monkeypatch):
+    """In-memory incidents table and postmortems bucket shared by archiver and agent."""
+    import boto3
+    from moto import mock_aws
+
+    for name, value in {
+        'INCIDENTS_TABLE': 'test-incidents-table',
+        'POSTMORTEMS_BUCKET': 'test-postmortems-bucket',
+        'BEDROCK_MODEL_ID': 'anthropic.claude-3-sonnet-20240229-v1:0',
+        'RUNBOOKS_BUCKET': 'test-runbooks-bucket',
+        'AWS_DEFAULT_REGION': 'us-east-1',
+        'AWS_ACCESS_KEY_ID': 'testing',
+        'AWS_SECRET_ACCESS_KEY': 'testing'
+    }.items():
+        monkeypatch.setenv(name, value)
+
+    with mock_aws():
+        table = boto3.resource('dynamodb').create_table(
+            TableName='test-incidents-table',
+            KeySchema=[
+                {'AttributeName': 'pk', 'KeyType': 'HASH'},
+                {'AttributeName': 'sk', 'KeyType': 'RANGE'}
+            ],
+            AttributeDefinitions=[
+                {'AttributeName': 'pk', 'AttributeType': 'S'},
+                {'AttributeName': 'sk', 'AttributeType': 'S'}
+            ],
+            BillingMode='PAY_PER_REQUEST'
+        )
+        s3 = boto3.client('s3')
+        s3.create_bucket(Bucket='test-postmortems-bucket')
+
+        import archiver
+        import agent
+        from incident_cache import IncidentCache
+        for module in (archiver, agent):
+            monkeypatch.setattr(module, 'dynamodb', boto3.resource('dynamodb'))
+            monkeypatch.setattr(module, 'table', table)
+            monkeypatch.setattr(module, 's3', s3)
+        monkeypatch.setattr(agent, 'incident_cache', IncidentCache())
+        yield archiver, agent, table
+
+def ttl_removal(old_image):
+    """Build the stream record DynamoDB emits when TTL deletes an item."""
+    from boto3.dynamodb.types import TypeSerializer
+    serializer = TypeSerializer()
+    return {
+        'eventName': 'REMOVE',
+        'userIdentity': {'type': 'Service', 'principalId': 'dynamodb.amazonaws.com'},
+        'dynamodb': {
+            'Keys': {'pk': {'S': old_image['pk']}, 'sk': {'S': old_image['sk']}},
+            'OldImage': {key: serializer.serialize(value) for key, value in old_image.items()}
+        }
+    }
+
+def test_expired_incidents_move_to_archive(archive_env):
+    """Test a resolved incident gets a TTL, and its expiry archives it with its history."""
+    from incident_store import creation_transaction, incident_key
+
+    archiver, agent, table = archive_env
+    incident = {
+        'incidentId': 'inc-1', 'title': 'High CPU Alert', 'description': 'CPU above 90%',
+        'severity': 'HIGH', 'status': 'OPEN',
+        'createdAt': '2025-01-15T10:00:00', 'updatedAt': '2025-01-15T10:00:00'
+    }
+    agent.dynamodb.meta.client.transact_write_items(TransactItems=creation_transaction(table.name, incident))
+    agent.update_incident('inc-1', {'status': 'RESOLVED', 'updatedAt': '2025-01-15T10:30:00'})
+
+    current = table.get_item(Key=incident_key('inc-1'))['Item']
+    assert current['expiresAt'] > 0
+
+    # A user deleting an item is not an expiry
+    manual = {**ttl_removal(current), 'userIdentity': None}
+    assert archiver.handler({'Records': [manual]}, None) == {'archived': 0}
+
+    table.delete_item(Key=incident_key('inc-1'))
+    result = archiver.handler({'Records': [ttl_removal(current)]}, None)
+
+    assert result['archived'] == 1
+    assert result['keys'][0].startswith('archive/dt=2025-01-15/')
+    assert table.scan()['Items'] == []
+
+    response = agent.handle_api_request({
+        'httpMethod': 'GET',
+        'path': '/archive',
+        'queryStringParameters': {'from': '2025-01-14', 'to': '2025-01-16', 'incidentId': 'inc-1'}
+    })
+    body = json.loads(response['body'])
+    assert [i['status'] for i in body['incidents']] == ['RESOLVED']
+    assert [e['eventType'] for e in body['events']] == ['CREATED', 'UPDATED']
+
+    too_wide = agent.handle_api_request({
+        'httpMethod': 'GET',
+        'path': '/archive',
+        'queryStringParameters': {'from': '2024-01-01', 'to': '2025-01-16'}
+    })
+    assert too_wide['statusCode'] == 400
+
+if __name__ == '__main__':
+    pytest.main([__file__])
@@ -0,0 +1,32 @@
+"""
+Unit tests for the shared AWS client registry.
+"""
+import pytest
+import sys
+import os
+
+# Add shared layer to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../layers/shared/python'))
+
+@pytest.fixture
+def mock_env(monkeypatch):
+    """Mock AWS region and credentials."""
+    monkeypatch.setenv('AWS_DEFAULT_REGION', 'us-east-1')
+    monkeypatch.setenv('AWS_ACCESS_KEY_ID', 'testing')
+    monkeypatch.setenv('AWS_SECRET_ACCESS_KEY', 'testing')
+
+def test_clients_are_created_on_first_use(mock_env, monkeypatch):
+    """Test handler clients are shared lazy proxies that are only built when used."""
+    import aws_clients
+    monkeypatch.setattr(aws_clients, '_clients', {})
+    proxy = aws_clients.lazy_client('sqs')
+    assert aws_clients._clients == {}
+    assert proxy.meta.service_model.service_name == 'sqs'
+    assert list(aws_clients._clients) == [('sqs', ())]
+    assert aws_clients.lazy_client('sqs')._resolve() is proxy._resolve()
+
+    aws_clients.prewarm(['sts'])
+    assert ('sts', ()) in aws_clients._clients
+
+if __name__ == '__main__':
+    pytest.main([__file__])
@@ -0,0 +1,64 @@
+"""
+Unit tests for ingestion Lambda function.
+"""
+import pytest
+from datetime import datetime
+from unittest.mock import Mock
+import sys
+import os
+
+# Add ingestion directory and shared layer to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../functions/ingestion'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../layers/shared/python'))
+
+@pytest.fixture
+def mock_env(monkeypatch):
+    """Mock environment variables."""
+    monkeypatch.setenv('INCIDENTS_TABLE', 'test-incidents-table')
+    monkeypatch.setenv('AWS_DEFAULT_REGION', 'us-east-1')
+    monkeypatch.setenv('AWS_ACCESS_KEY_ID', 'testing')
+    monkeypatch.setenv('AWS_SECRET_ACCESS_KEY', 'testing')
+
+def test_parse_cloudwatch_alarm(mock_env):
+    """Test CloudWatch alarm parsing."""
+    from ingestion import parse_cloudwatch_alarm
+    
+    event = {
+        'detail': {
+            'alarmName': 'HighCPUAlarm',
+            'state': {
+                'value': 'ALARM',
+                'reason': 'CPU exceeded threshold'
+            },
+            'alarmArn': 'arn:aws:cloudwatch:us-east-1:123456789012:alarm:HighCPUAlarm'
+        },
+        'region': 'us-east-1',
+        'account': '123456789012'
+    }
+    
+    result = parse_cloudwatch_alarm(event)
+    
+    assert result['title'] == 'CloudWatch Alarm: HighCPUAlarm'
+    assert result['severity'] == 'HIGH'
+    assert result['source'] == 'cloudwatch'
+
+def test_approval_requirement_by_flag_or_policy(mock_env, monkeypatch):
+    """Test the autoApprove flag skips the policy, which otherwise decides on the upper-cased severity."""
+    import ingestion
+    from approval_policy import CompiledPolicy
+
+    policy = CompiledPolicy({'version': '1', 'rules': [{'name': 'low', 'decision': 'auto', 'when': {'severity': 'LOW'}}]})
+    monkeypatch.setattr(ingestion, 'approval_policy', Mock(policy=Mock(return_value=policy)))
+    monkeypatch.setattr(ingestion, 'STATS_TABLE', '')
+    now = datetime(2025, 1, 15, 3)
+
+    decision = ingestion.determine_approval_requirement({'severity': 'HIGH', 'autoApprove': True}, now)
+    assert not decision.requires_approval and decision.rule == 'autoApprove'
+    ingestion.approval_policy.policy.assert_not_called()
+
+    decision = ingestion.determine_approval_requirement({'severity': 'low', 'source': 'api'}, now)
+    assert not decision.requires_approval and decision.rule == 'low' and decision.version == '1'
+    assert ingestion.determine_approval_requirement({'severity': 'HIGH'}, now).requires_approval
+
+if __name__ == '__main__':
+    pytest.main([__file__])
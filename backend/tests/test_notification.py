@@ -0,0 +1,181 @@
+"""
+Unit tests for notification Lambda function.
+"""
+import json
+import pytest
+import sys
+import os
+from unittest.mock import Mock
+
+# Add tools directory and shared layer to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../functions/tools'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../layers/shared/python'))
+
+@pytest.fixture
+def sample_message():
+    """Sample notification message."""
+    return {
+        'incidentId': 'test-incident-123',
+        'title': 'High CPU Alert',
+        'severity': 'HIGH',
+        'description': 'CPU utilization exceeded 90%',
+        'status': 'PENDING_APPROVAL',
+        'approvalButtons': True
+    }
+
+def test_compile_template_fills_slots():
+    """Test that compiled templates splice encoded values into the skeleton."""
+    from notification_templates import compile_template, slot
+
+    template = compile_template({'a': slot('a'), 'nested': [{'b': slot('b')}, 'static']})
+
+    assert template.slots == ('a', 'b')
+    rendered = json.loads(template.render({'a': 'x "quoted"', 'b': {'n': 1}}))
+    assert rendered == {'a': 'x "quoted"', 'nested': [{'b': {'n': 1}}, 'static']}
+
+def test_render_slack_payload_with_approval(sample_message):
+    """Test Slack payload rendering includes approval buttons."""
+    from notification import render_slack_payload
+
+    payload = json.loads(render_slack_payload(sample_message))
+
+    assert payload['text'] == ':rotating_light: High CPU Alert'
+    assert payload['attachments'][0]['color'] == '#EA580C'
+    actions = next(b for b in payload['blocks'] if b['type'] == 'actions')['elements']
+    assert actions[0]['value'] == 'approve_test-incident-123'
+    assert actions[1]['action_id'] == 'deny_incident'
+
+def test_render_slack_payload_without_diagnosis(sample_message):
+    """Test Slack payload omits optional blocks when not applicable."""
+    from notification import render_slack_payload
+
+    sample_message['status'] = 'OPEN'
+    payload = json.loads(render_slack_payload(sample_message))
+
+    texts = [b.get('text', {}).get('text', '') for b in payload['blocks']]
+    assert not any('AI Diagnosis' in t for t in texts)
+    actions = next(b for b in payload['blocks'] if b['type'] == 'actions')['elements']
+    assert len(actions) == 2
+
+def test_render_channel_payloads(sample_message):
+    """Test Jira, PagerDuty and Teams payload rendering."""
+    from notification import render_jira_payload, render_pagerduty_payload, render_teams_payload
+
+    jira = json.loads(render_jira_payload(sample_message))
+    assert jira['fields']['priority'] == {'name': 'High'}
+    assert jira['fields']['labels'] == ['resilibot', 'incident', 'high']
+
+    pagerduty = json.loads(render_pagerduty_payload(sample_message))
+    assert pagerduty['dedup_key'] == 'resilibot-test-incident-123'
+    assert pagerduty['payload']['severity'] == 'error'
+
+    teams = json.loads(render_teams_payload(sample_message))
+    assert teams['themeColor'] == 'FF8C00'
+    assert teams['sections'][0]['facts'][2] == {'name': 'Status', 'value': 'PENDING_APPROVAL'}
+
+@pytest.fixture
+def jira_env(monkeypatch):
+    """Configure Jira and an in-memory incidents table for the notification module."""
+    import boto3
+    from moto import mock_aws
+    import notification
+
+    monkeypatch.setenv('AWS_DEFAULT_REGION', 'us-east-1')
+    monkeypatch.setenv('AWS_ACCESS_KEY_ID', 'testing')
+    monkeypatch.setenv('AWS_SECRET_ACCESS_KEY', 'testing')
+    monkeypatch.setattr(notification, 'JIRA_URL', 'https://jira.example.com')
+    monkeypatch.setattr(notification, 'JIRA_USERNAME', 'bot')
+    monkeypatch.setattr(notification, 'JIRA_API_TOKEN', 'token')
+    monkeypatch.setattr(notification, 'INCIDENTS_TABLE', 'test-incidents-table')
+    monkeypatch.setattr(notification, '_incidents_table', None)
+    monkeypatch.setattr(notification, '_jira_tickets', {})
+
+    with mock_aws():
+        table = boto3.resource('dynamodb').create_table(
+            TableName='test-incidents-table',
+            KeySchema=[
+                {'AttributeName': 'pk', 'KeyType': 'HASH'},
+                {'AttributeName': 'sk', 'KeyType': 'RANGE'}
+            ],
+            AttributeDefinitions=[
+                {'AttributeName': 'pk', 'AttributeType': 'S'},
+                {'AttributeName': 'sk', 'AttributeType': 'S'}
+            ],
+            BillingMode='PAY_PER_REQUEST'
+        )
+        table.put_item(Item={
+            'pk': 'INCIDENT#test-incident-123', 'sk': 'CURRENT', 'incidentId': 'test-incident-123', 'status': 'OPEN'
+        })
+
+        http = Mock()
+        monkeypatch.setattr(notification, 'http', http)
+        yield notification, table, http
+
+def test_jira_ticket_is_created_once_then_batched(jira_env, sample_message):
+    """Test repeated notifications update the mapped ticket instead of creating new ones."""
+    notification, table, http = jira_env
+    http.request.return_value = Mock(status=201, data=json.dumps({'key': 'INC-7'}).encode())
+
+    created = notification.create_jira_ticket(sample_message)
+    assert created['ticketId'] == 'INC-7'
+
+    record = table.get_item(Key={'pk': 'INCIDENT#test-incident-123', 'sk': 'CURRENT'})['Item']
+    assert record['jiraTicket'] == 'INC-7'
+
+    # Within the update window: queued on the record, no API call
+    sample_message['status'] = 'IN_PROGRESS'
+    batched = notification.create_jira_ticket(sample_message)
+    assert batched['status'] == 'BATCHED'
+    assert http.request.call_count == 1
+
+    # Terminal status flushes everything pending in a single comment
+    sample_message['status'] = 'RESOLVED'
+    flushed = notification.create_jira_ticket(sample_message)
+    assert flushed['status'] == 'SUCCESS'
+    assert http.request.call_count == 2
+    method, url = http.request.call_args[0]
+    assert url == 'https://jira.example.com/rest/api/2/issue/INC-7/comment'
+    comment = json.loads(http.request.call_args[1]['body'])['body']
+    assert 'IN_PROGRESS' in comment and 'RESOLVED' in comment
+
+    record = table.get_item(Key={'pk': 'INCIDENT#test-incident-123', 'sk': 'CURRENT'})['Item']
+    assert 'jiraPendingUpdates' not in record
+
+def test_jira_creation_is_claimed_and_held_updates_flushed_later(jira_env, sample_message, monkeypatch):
+    """Test a second first notification does not create a ticket and held updates are flushed by the queue."""
+    notification, table, http = jira_env
+    sqs = Mock()
+    monkeypatch.setattr(notification, 'sqs', sqs)
+    monkeypatch.setattr(notification, 'JIRA_FLUSH_QUEUE_URL', 'https://sqs.example.com/flush')
+    monkeypatch.setattr(notification, 'ENABLE_JIRA', True)
+    key = {'pk': 'INCIDENT#test-incident-123', 'sk': 'CURRENT'}
+
+    # Another invocation holds the creation claim: this update waits for its ticket
+    assert notification.reserve_jira_ticket('test-incident-123') is True
+    held = notification.create_jira_ticket(sample_message)
+    assert held['status'] == 'BATCHED'
+    assert http.request.call_count == 0
+    assert sqs.send_message.call_args[1]['DelaySeconds'] == notification.JIRA_UPDATE_WINDOW_SECONDS
+
+    # The claim holder creates the ticket; the last notification is not terminal
+    assert notification.remember_jira_ticket('test-incident-123', 'INC-9', True) == 'INC-9'
+    sample_message['status'] = 'IN_PROGRESS'
+    assert notification.create_jira_ticket(sample_message)['status'] == 'BATCHED'
+    assert sqs.send_message.call_count == 1  # already scheduled for this batch
+
+    # The delayed message posts everything held as one comment; a repeat finds nothing
+    event = {'Records': [{'messageId': 'm-1', 'body': json.dumps({'incidentId': 'test-incident-123'})}]}
+    http.request.return_value = Mock(status=201)
+    assert notification.handler(event, None) == {'batchItemFailures': []}
+    assert http.request.call_count == 1
+    url = http.request.call_args[0][1]
+    assert url == 'https://jira.example.com/rest/api/2/issue/INC-9/comment'
+    comment = json.loads(http.request.call_args[1]['body'])['body']
+    assert 'PENDING_APPROVAL' in comment and 'IN_PROGRESS' in comment
+    assert 'jiraPendingUpdates' not in table.get_item(Key=key)['Item']
+
+    assert notification.handler(event, None) == {'batchItemFailures': []}
+    assert http.request.call_count == 1
+
+if __name__ == '__main__':
+    pytest.main([__file__])
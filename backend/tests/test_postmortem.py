@@ -0,0 +1,127 @@
+"""
+Unit tests for postmortem Lambda function.
+"""
+import json
+import pytest
+from unittest.mock import Mock
+import sys
+import os
+
+# Add postmortem, agent and shared layer directories to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../functions/postmortem'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../functions/agent'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../layers/shared/python'))
+
+@pytest.fixture
+def postmortem_env(monkeypatch):
+    """In-memory incidents table and postmortems bucket shared by the postmortem Lambda and agent."""
+    import boto3
+    from moto import mock_aws
+
+    for name, value in {
+        'INCIDENTS_TABLE': 'test-incidents-table',
+        'POSTMORTEMS_BUCKET': 'test-postmortems-bucket',
+        'BEDROCK_MODEL_ID': 'anthropic.claude-3-sonnet-20240229-v1:0',
+        'RUNBOOKS_BUCKET': 'test-runbooks-bucket',
+        'AWS_DEFAULT_REGION': 'us-east-1',
+        'AWS_ACCESS_KEY_ID': 'testing',
+        'AWS_SECRET_ACCESS_KEY': 'testing'
+    }.items():
+        monkeypatch.setenv(name, value)
+
+    with mock_aws():
+        table = boto3.resource('dynamodb').create_table(
+            TableName='test-incidents-table',
+            KeySchema=[
+                {'AttributeName': 'pk', 'KeyType': 'HASH'},
+                {'AttributeName': 'sk', 'KeyType': 'RANGE'}
+            ],
+            AttributeDefinitions=[
+                {'AttributeName': 'pk', 'AttributeType': 'S'},
+                {'AttributeName': 'sk', 'AttributeType': 'S'}
+            ],
+            BillingMode='PAY_PER_REQUEST'
+        )
+        s3 = boto3.client('s3')
+        s3.create_bucket(Bucket='test-postmortems-bucket')
+
+        import postmortem
+        import agent
+        from incident_cache import IncidentCache
+        monkeypatch.setattr(agent, 'dynamodb', boto3.resource('dynamodb'))
+        for module in (postmortem, agent):
+            monkeypatch.setattr(module, 'table', table)
+            monkeypatch.setattr(module, 's3', s3)
+        monkeypatch.setattr(agent, 'incident_cache', IncidentCache())
+        yield postmortem, agent, table, s3
+
+def stream_update(old_image, new_image):
+    """Build the stream record DynamoDB emits when a current item is modified."""
+    from boto3.dynamodb.types import TypeSerializer
+    serializer = TypeSerializer()
+    return {
+        'eventName': 'MODIFY',
+        'dynamodb': {
+            'Keys': {'pk': {'S': new_image['pk']}, 'sk': {'S': new_image['sk']}},
+            'OldImage': {key: serializer.serialize(value) for key, value in old_image.items()},
+            'NewImage': {key: serializer.serialize(value) for key, value in new_image.items()}
+        }
+    }
+
+def resolve(agent, table, incident_id):
+    """Create an incident, resolve it, and return the RESOLVED transition's stream record."""
+    from incident_store import creation_transaction, incident_key
+
+    agent.dynamodb.meta.client.transact_write_items(TransactItems=creation_transaction(table.name, {
+        'incidentId': incident_id, 'title': f'High CPU on {incident_id}', 'description': 'CPU above 90%',
+        'severity': 'HIGH', 'status': 'OPEN',
+        'createdAt': '2025-01-15T10:00:00', 'updatedAt': '2025-01-15T10:00:00'
+    }))
+    agent.update_incident(incident_id, {'status': 'IN_PROGRESS', 'agentPhase': 'ACT', 'updatedAt': '2025-01-15T10:10:00'})
+    before = table.get_item(Key=incident_key(incident_id))['Item']
+    agent.update_incident(incident_id, {
+        'status': 'RESOLVED', 'resolvedAt': '2025-01-15T10:30:00', 'updatedAt': '2025-01-15T10:30:00',
+        'diagnosis': {'diagnosis': 'Runaway worker', 'confidence': 90, 'category': 'high-cpu'},
+        'actionsTaken': [{'action': {'type': 'restart_service', 'target': 'application'}, 'result': {'status': 'SUCCESS'}}]
+    })
+    return stream_update(before, table.get_item(Key=incident_key(incident_id))['Item'])
+
+def test_resolved_incidents_get_batched_postmortems_and_index(postmortem_env, monkeypatch):
+    """Test RESOLVED transitions are written as one compressed batch, indexed and served without listing."""
+    postmortem, agent, table, s3 = postmortem_env
+    records = [resolve(agent, table, incident_id) for incident_id in ('inc-1', 'inc-2')]
+
+    # Other writes to a resolved incident do not produce another postmortem
+    again = {**records[0], 'dynamodb': {**records[0]['dynamodb'], 'OldImage': records[0]['dynamodb']['NewImage']}}
+    assert postmortem.handler({'Records': [again]}, None) == {'written': 0}
+
+    result = postmortem.handler({'Records': records}, None)
+    assert result['written'] == 2 and len(result['keys']) == 1
+    assert result['keys'][0].startswith('postmortems/dt=2025-01-15/')
+
+    # A retried batch replaces its index entries instead of duplicating them
+    postmortem.handler({'Records': records[:1]}, None)
+
+    s3.list_objects_v2 = Mock(side_effect=AssertionError('the dashboard must not list the bucket'))
+    listing = json.loads(agent.handle_api_request({
+        'httpMethod': 'GET', 'path': '/postmortems', 'queryStringParameters': {'month': '2025-01'}
+    })['body'])
+    assert sorted(entry['incidentId'] for entry in listing['postmortems']) == ['inc-1', 'inc-2']
+    assert {entry['category'] for entry in listing['postmortems']} == {'high-cpu'}
+
+    response = agent.handle_api_request({'httpMethod': 'GET', 'path': '/incidents/inc-2/postmortem'})
+    document = json.loads(response['body'])
+    assert response['statusCode'] == 200 and not document['enriched']
+    assert '## Timeline' in document['markdown'] and 'status=RESOLVED' in document['markdown']
+    assert '- restart_service on application: SUCCESS' in document['markdown']
+
+    monkeypatch.setattr(postmortem, 'POSTMORTEM_ENRICH', True)
+    sections = {'summary': 'Worker spin', 'impact': '12 minutes of slow checkout', 'rootCause': 'Retry loop', 'prevention': ['Cap retries']}
+    monkeypatch.setattr(postmortem, 'bedrock', Mock(invoke_model=Mock(return_value={'body': Mock(read=Mock(
+        return_value=json.dumps({'content': [{'type': 'text', 'text': json.dumps(sections)}]})
+    ))})))
+    record = postmortem.build_postmortem(agent.get_incident('inc-1'), [])
+    assert record['enriched'] and '12 minutes of slow checkout' in record['markdown'] and '- Cap retries' in record['markdown']
+
+if __name__ == '__main__':
+    pytest.main([__file__])
@@ -0,0 +1,126 @@
+"""
+Unit tests for realtime Lambda function.
+"""
+import json
+import pytest
+import sys
+import os
+
+# Add realtime directory and shared layer to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../functions/realtime'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../layers/shared/python'))
+
+import realtime
+
+@pytest.fixture
+def local_feed(monkeypatch):
+    """Use the in-memory subscription store and publisher."""
+    store = realtime.InMemorySubscriptionStore()
+    publisher = realtime.InMemoryPublisher()
+    monkeypatch.setattr(realtime, '_store', store)
+    monkeypatch.setattr(realtime, '_publisher', publisher)
+    return store, publisher
+
+def websocket_event(route, connection_id, body=None):
+    """Build an API Gateway WebSocket event."""
+    return {
+        'requestContext': {'routeKey': route, 'connectionId': connection_id},
+        'body': json.dumps(body) if body is not None else None
+    }
+
+def stream_record(event_name, old=None, new=None, sk='CURRENT'):
+    """Build a DynamoDB stream record with NEW_AND_OLD_IMAGES."""
+    images = {}
+    if old is not None:
+        images['OldImage'] = {k: {'S': v} for k, v in old.items()}
+    if new is not None:
+        images['NewImage'] = {k: {'S': v} for k, v in new.items()}
+    return {
+        'eventName': event_name,
+        'dynamodb': {'Keys': {'pk': {'S': 'INCIDENT#inc-1'}, 'sk': {'S': sk}}, **images}
+    }
+
+def test_subscribed_clients_receive_only_deltas(local_feed):
+    """Test updates are pushed as changed attributes to matching subscribers."""
+    store, publisher = local_feed
+    realtime.handler(websocket_event('subscribe', 'conn-a', {'action': 'subscribe', 'incidentId': 'inc-1'}), None)
+    realtime.handler(websocket_event('subscribe', 'conn-b', {'action': 'subscribe', 'incidentId': 'inc-2'}), None)
+    realtime.handler(websocket_event('subscribe', 'conn-all', {'action': 'subscribe'}), None)
+
+    old = {'incidentId': 'inc-1', 'title': 'High CPU', 'status': 'OPEN'}
+    new = {'incidentId': 'inc-1', 'title': 'High CPU', 'status': 'IN_PROGRESS'}
+    result = realtime.handler({'Records': [stream_record('MODIFY', old, new)]}, None)
+
+    assert result == {'delivered': 2, 'deltas': 1}
+    message = publisher.sent['conn-a'][0]
+    assert message['deltas'] == [{
+        'type': 'incident.updated',
+        'incidentId': 'inc-1',
+        'changes': {'status': 'IN_PROGRESS'}
+    }]
+    assert 'conn-all' in publisher.sent
+    assert 'conn-b' not in publisher.sent
+
+def test_gone_connections_are_unsubscribed(local_feed):
+    """Test stale connections are dropped after a failed push."""
+    store, publisher = local_feed
+    realtime.handler(websocket_event('subscribe', 'conn-a', {'action': 'subscribe'}), None)
+    publisher.gone.add('conn-a')
+
+    realtime.handler({'Records': [stream_record('INSERT', None, {'incidentId': 'inc-1'})]}, None)
+
+    assert store.connections_for([realtime.ALL_INCIDENTS]) == {}
+
+def test_unchanged_records_are_not_published(local_feed):
+    """Test no message is sent for history events or when only excluded attributes change."""
+    store, publisher = local_feed
+    realtime.handler(websocket_event('subscribe', 'conn-a', {'action': 'subscribe'}), None)
+
+    old = {'incidentId': 'inc-1', 'jiraPendingUpdates': 'a', 'gsi2sk': '2024-01-01T00:00:00#inc-1'}
+    new = {'incidentId': 'inc-1', 'jiraPendingUpdates': 'b', 'gsi2sk': '2024-01-01T00:05:00#inc-1'}
+    history = stream_record('INSERT', None, {'incidentId': 'inc-1', 'eventType': 'UPDATED'}, sk='EVENT#00000002')
+    result = realtime.handler({'Records': [stream_record('MODIFY', old, new), history]}, None)
+
+    assert result['deltas'] == 0
+    assert publisher.sent == {}
+
+def test_bulky_changes_are_omitted_and_messages_split(local_feed, monkeypatch):
+    """Test agent output is only named in deltas and large batches are split under the message limit."""
+    store, publisher = local_feed
+    monkeypatch.setattr(realtime, 'MAX_MESSAGE_BYTES', 400)
+    realtime.handler(websocket_event('subscribe', 'conn-a', {'action': 'subscribe'}), None)
+
+    checkpoint = stream_record(
+        'MODIFY',
+        {'incidentId': 'inc-1', 'agentPhase': 'OBSERVE'},
+        {'incidentId': 'inc-1', 'agentPhase': 'REASON', 'observation': 'x' * 1000}
+    )
+    updates = [
+        stream_record('MODIFY', {'incidentId': 'inc-1', 'title': 'a'}, {'incidentId': 'inc-1', 'title': 'b' * 100})
+        for _ in range(5)
+    ]
+    oversized = stream_record('MODIFY', {'incidentId': 'inc-1'}, {'incidentId': 'inc-1', 'description': 'd' * 1000})
+    realtime.handler({'Records': [checkpoint, *updates, oversized]}, None)
+
+    messages = publisher.sent['conn-a']
+    assert len(messages) > 1
+    deltas = [delta for message in messages for delta in message['deltas']]
+    assert deltas[0]['changes'] == {'agentPhase': 'REASON'} and deltas[0]['omitted'] == ['observation']
+    assert len(deltas) == 7
+    assert deltas[-1] == {'type': 'incident.updated', 'incidentId': 'inc-1', 'truncated': True}
+
+def test_failing_connection_does_not_fail_the_batch(local_feed):
+    """Test a connection that errors is skipped and stays subscribed while others still receive the delta."""
+    store, publisher = local_feed
+    for connection_id in ('conn-a', 'conn-b'):
+        realtime.handler(websocket_event('subscribe', connection_id, {'action': 'subscribe'}), None)
+    publisher.failing.add('conn-a')
+
+    result = realtime.handler({'Records': [stream_record('INSERT', None, {'incidentId': 'inc-1'})]}, None)
+
+    assert result == {'delivered': 1, 'deltas': 1}
+    assert list(publisher.sent) == ['conn-b']
+    assert set(store.connections_for([realtime.ALL_INCIDENTS])) == {'conn-a', 'conn-b'}
+
+if __name__ == '__main__':
+    pytest.main([__file__])
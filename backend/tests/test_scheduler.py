@@ -0,0 +1,137 @@
+"""
+Unit tests for the priority scheduler between ingestion and the agent.
+"""
+import json
+import pytest
+import sys
+import os
+from unittest.mock import Mock
+
+# Add scheduler directory and shared layer to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../functions/scheduler'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../layers/shared/python'))
+
+from priority_queue import InMemoryWorkQueue, PriorityScheduler
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+def test_weighted_fair_dispatch_with_reserved_capacity():
+    """Test CRITICAL goes first without starving others, and reserved slots only take CRITICAL/HIGH."""
+    clock = FakeClock()
+    queue = InMemoryWorkQueue(clock=clock)
+    for priority in ('LOW', 'MEDIUM', 'HIGH', 'CRITICAL'):
+        for n in range(20):
+            queue.send(priority, {'incidentId': f'{priority.lower()}-{n}'})
+    clock.now += 30
+
+    dispatched = []
+    scheduler = PriorityScheduler(queue, capacity=15, reserved=3, clock=clock)
+    result = scheduler.run({}, lambda priority, body: dispatched.append(priority))
+
+    # One full round of the 8:4:2:1 weights; LOW and MEDIUM only fit before the reserved slots
+    assert dispatched[:3] == ['CRITICAL', 'HIGH', 'CRITICAL']
+    assert result['dispatched'] == {'CRITICAL': 8, 'HIGH': 4, 'MEDIUM': 2, 'LOW': 1}
+    assert 'LOW' not in dispatched[12:] and 'MEDIUM' not in dispatched[12:]
+    assert result['inFlight'] == 15
+    assert result['waitSeconds']['LOW'] == [30.0]
+    assert result['depth'] == {'CRITICAL': 12, 'HIGH': 16, 'MEDIUM': 18, 'LOW': 19}
+    # The shared slots are full, so the remaining LOW work is deferred
+    assert result['deferred']['LOW'] == 19
+
+    # Full: nothing is dispatched, and LOW work is deferred again once visible
+    clock.now += 60
+    result = scheduler.run({'CRITICAL': 10, 'HIGH': 5}, lambda priority, body: dispatched.append(priority))
+    assert sum(result['dispatched'].values()) == 0
+    assert result['deferred']['LOW'] == 19
+
+    # Only reserved slots free: HIGH is admitted, MEDIUM waits, LOW that waited too long is shed
+    clock.now += 3600
+    result = scheduler.run({'MEDIUM': 12, 'HIGH': 2}, lambda priority, body: dispatched.append(priority))
+    assert result['dispatched'] == {'CRITICAL': 1, 'HIGH': 0, 'MEDIUM': 0, 'LOW': 0}
+    assert result['shed']['LOW'] == 19
+    assert result['depth']['LOW'] == 0
+    assert result['depth']['MEDIUM'] == 18
+
+def test_tenant_capacity_keeps_a_noisy_account_from_taking_every_slot():
+    """Test one tenant's backlog is throttled at its slot limit while other tenants are dispatched."""
+    clock = FakeClock()
+    queue = InMemoryWorkQueue(clock=clock)
+    for n in range(20):
+        queue.send('CRITICAL', {'incidentId': f'noisy-{n}', 'tenantId': '111111111111'})
+    queue.send('MEDIUM', {'incidentId': 'quiet-1', 'tenantId': '222222222222'})
+    queue.send('LOW', {'incidentId': 'legacy-1'})
+
+    dispatched = []
+    scheduler = PriorityScheduler(queue, capacity=8, reserved=0, tenant_capacity=3, clock=clock)
+    result = scheduler.run({'HIGH': 1}, lambda priority, body: dispatched.append(body['incidentId']),
+                           {'111111111111': 1})
+
+    assert sorted(dispatched) == ['legacy-1', 'noisy-0', 'noisy-1', 'quiet-1']
+    assert result['throttled']['CRITICAL'] == 18
+    assert result['inFlight'] == 5
+
+    # Throttled work waits out the deferral, then fills the slots its tenant got back
+    clock.now += 61
+    result = scheduler.run({}, lambda priority, body: dispatched.append(body['incidentId']), {})
+    assert result['dispatched']['CRITICAL'] == 3 and result['throttled']['CRITICAL'] == 15
+
+def test_scheduler_handler_tracks_leases(monkeypatch):
+    """Test dispatched runs hold slots until the agent releases them or they expire."""
+    import boto3
+    from moto import mock_aws
+
+    for name, value in {
+        'AGENT_LAMBDA_NAME': 'agent-fn',
+        'STATS_TABLE': 'test-stats-table',
+        'AGENT_CAPACITY': '2',
+        'AGENT_RESERVED_CAPACITY': '1',
+        'AWS_DEFAULT_REGION': 'us-east-1',
+        'AWS_ACCESS_KEY_ID': 'testing',
+        'AWS_SECRET_ACCESS_KEY': 'testing'
+    }.items():
+        monkeypatch.setenv(name, value)
+
+    with mock_aws():
+        sqs = boto3.client('sqs')
+        urls = {p: sqs.create_queue(QueueName=f'agent-{p.lower()}')['QueueUrl']
+                for p in ('CRITICAL', 'HIGH', 'MEDIUM', 'LOW')}
+        monkeypatch.setenv('AGENT_QUEUE_URLS', json.dumps(urls))
+        stats_table = boto3.resource('dynamodb').create_table(
+            TableName='test-stats-table',
+            KeySchema=[{'AttributeName': 'statsKey', 'KeyType': 'HASH'}],
+            AttributeDefinitions=[{'AttributeName': 'statsKey', 'AttributeType': 'S'}],
+            BillingMode='PAY_PER_REQUEST'
+        )
+
+        import scheduler
+        from priority_queue import SqsWorkQueue, release_lease
+        monkeypatch.setattr(scheduler, 'lambda_client', Mock())
+        queue = SqsWorkQueue(sqs, urls)
+        for incident_id, priority in (('inc-med', 'MEDIUM'), ('inc-high', 'HIGH'), ('inc-crit', 'CRITICAL')):
+            queue.send(priority, {'incidentId': incident_id, 'severity': priority})
+
+        # CRITICAL takes the shared slot, so only HIGH may use the reserved one
+        result = scheduler.handler({}, None)
+        assert result['dispatched'] == {'CRITICAL': 1, 'HIGH': 1, 'MEDIUM': 0, 'LOW': 0}
+        invoked = [json.loads(c.kwargs['Payload'])['incidentId'] for c in scheduler.lambda_client.invoke.call_args_list]
+        assert invoked == ['inc-crit', 'inc-high']
+
+        # Releasing the reserved slot is not enough for MEDIUM
+        release_lease(stats_table, 'inc-high')
+        release_lease(stats_table, 'inc-unknown')
+        assert scheduler.handler({}, None)['dispatched']['MEDIUM'] == 0
+
+        release_lease(stats_table, 'inc-crit')
+        result = scheduler.handler({}, None)
+        assert result['dispatched']['MEDIUM'] == 1
+        assert result['depth']['MEDIUM'] == 0
+        leases = stats_table.get_item(Key={'statsKey': 'SCHEDULER'})['Item']['leases']
+        assert list(leases) == ['inc-med'] and leases['inc-med']['tenant'] == 'default'
+
+if __name__ == '__main__':
+    pytest.main([__file__])
@@ -0,0 +1,31 @@
+"""
+Unit tests for the shared JSON serialization helpers.
+"""
+import json
+import pytest
+import sys
+import os
+
+# Add shared layer to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../layers/shared/python'))
+
+def test_serialization_keeps_numbers():
+    """Test Decimals encode as numbers, floats are stored as Decimals, and cached bodies are reused."""
+    from decimal import Decimal
+    import serialization
+
+    document = {'version': Decimal(3), 'confidence': Decimal('0.85'), 'big': Decimal(2 ** 70), 'tags': {'b', 'a'}}
+    assert json.loads(serialization.dumps(document)) == {'version': 3, 'confidence': 0.85, 'big': 2 ** 70, 'tags': ['a', 'b']}
+    assert serialization.to_item_value({'confidence': 0.1, 'steps': (1, 2.5)}) == {
+        'confidence': Decimal('0.1'), 'steps': [1, Decimal('2.5')]
+    }
+
+    cache = serialization.EncodedCache(max_entries=1)
+    first = cache.dumps('"inc-1-3"', document)
+    assert cache.dumps('"inc-1-3"', {}) is first
+    cache.dumps('"inc-2-1"', {})
+    assert (cache.hits, cache.misses) == (1, 2)
+    assert cache.dumps('"inc-1-3"', {}) == '{}'
+
+if __name__ == '__main__':
+    pytest.main([__file__])
@@ -0,0 +1,54 @@
+"""
+Unit tests for structured logging.
+"""
+import json
+import pytest
+from unittest.mock import Mock, patch
+import sys
+import os
+
+# Add shared layer to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../layers/shared/python'))
+
+def test_structured_logging_buffers_samples_and_redacts():
+    """Test records are redacted, truncated, sampled per invocation and written once per invocation."""
+    import io
+    from structured_logging import StructuredLogger, logged_handler, parse_sample_rates
+
+    stream = io.StringIO()
+    stream.write = Mock(wraps=stream.write)
+    logger = StructuredLogger(level='DEBUG', sample_rates=parse_sample_rates('DEBUG=0.1,ERROR=0'),
+                              max_string=10, max_items=2, stream=stream, rng=lambda: 0.5)
+    context = Mock(aws_request_id='req-1', function_name='agent')
+
+    with patch('structured_logging.logger', logger):
+        @logged_handler
+        def handler(event, context):
+            logger.log('INFO', 'slack.sent', {
+                'webhookUrl': 'https://hooks.slack.com/services/T0/B0/x',
+                'text': 'see https://hooks.slack.com/services/T0/B0/x',
+                'instances': ['i-1', 'i-2', 'i-3'],
+                'apiToken': 'secret'
+            })
+            logger.log('DEBUG', 'payload', {'full': 'event'})
+            return {'ok': True}
+
+        assert handler({'httpMethod': 'GET', 'path': '/incidents'}, context) == {'ok': True}
+
+    assert stream.write.call_count == 1
+    records = [json.loads(line) for line in stream.getvalue().splitlines()]
+    assert [record['eventType'] for record in records] == ['invocation.received', 'slack.sent']
+    assert all(record['requestId'] == 'req-1' for record in records)
+    data = records[1]['data']
+    assert data['webhookUrl'] == data['apiToken'] == '[REDACTED]'
+    assert data['text'] == 'see [REDAC...[4 more chars]'
+    assert data['instances'] == ['i-1', 'i-2', '...[1 more items]']
+    assert logger.dropped == 1
+
+    # Errors are never sampled out and are written right away
+    logger.begin_invocation(context)
+    logger.log('ERROR', 'failed', {'error': 'boom'})
+    assert stream.write.call_count == 2
+
+if __name__ == '__main__':
+    pytest.main([__file__])
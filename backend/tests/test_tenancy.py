@@ -0,0 +1,143 @@
+"""
+Unit tests for per-account (tenant) incident handling.
+"""
+import json
+import pytest
+from unittest.mock import Mock
+import sys
+import os
+
+# Add agent and ingestion directories and shared layer to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../functions/agent'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../functions/ingestion'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../layers/shared/python'))
+
+@pytest.fixture
+def mock_env(monkeypatch):
+    """Mock environment variables."""
+    monkeypatch.setenv('INCIDENTS_TABLE', 'test-incidents-table')
+    monkeypatch.setenv('BEDROCK_MODEL_ID', 'anthropic.claude-3-sonnet-20240229-v1:0')
+    monkeypatch.setenv('RUNBOOKS_BUCKET', 'test-runbooks-bucket')
+    monkeypatch.setenv('POSTMORTEMS_BUCKET', 'test-postmortems-bucket')
+    monkeypatch.setenv('AWS_DEFAULT_REGION', 'us-east-1')
+    monkeypatch.setenv('AWS_ACCESS_KEY_ID', 'testing')
+    monkeypatch.setenv('AWS_SECRET_ACCESS_KEY', 'testing')
+
+@pytest.fixture
+def incidents_table(mock_env, monkeypatch):
+    """In-memory incidents table bound to the agent module."""
+    import boto3
+    from moto import mock_aws
+
+    with mock_aws():
+        table = boto3.resource('dynamodb').create_table(
+            TableName='test-incidents-table',
+            KeySchema=[
+                {'AttributeName': 'pk', 'KeyType': 'HASH'},
+                {'AttributeName': 'sk', 'KeyType': 'RANGE'}
+            ],
+            AttributeDefinitions=[
+                {'AttributeName': name, 'AttributeType': 'S'}
+                for name in ('pk', 'sk', 'gsi1pk', 'gsi1sk', 'gsi2pk', 'gsi2sk')
+            ],
+            GlobalSecondaryIndexes=[
+                {
+                    'IndexName': index_name,
+                    'KeySchema': [
+                        {'AttributeName': f'{prefix}pk', 'KeyType': 'HASH'},
+                        {'AttributeName': f'{prefix}sk', 'KeyType': 'RANGE'}
+                    ],
+                    'Projection': {'ProjectionType': 'ALL'}
+                }
+                for index_name, prefix in (('byOpenSeverity', 'gsi1'), ('byUpdated', 'gsi2'))
+            ],
+            BillingMode='PAY_PER_REQUEST'
+        )
+        import agent
+        from incident_cache import IncidentCache
+        monkeypatch.setattr(agent, 'dynamodb', boto3.resource('dynamodb'))
+        monkeypatch.setattr(agent, 'table', table)
+        monkeypatch.setattr(agent, 'incident_cache', IncidentCache())
+        monkeypatch.setattr(agent, 'incident_list_cache', {'expiresAt': 0.0, 'incidents': None})
+        yield table
+
+@pytest.fixture
+def sample_incident():
+    """Sample incident data."""
+    return {
+        'incidentId': 'test-incident-123',
+        'title': 'High CPU Alert',
+        'description': 'CPU utilization exceeded 90%',
+        'severity': 'HIGH',
+        'status': 'OPEN',
+        'source': 'cloudwatch',
+        'createdAt': '2025-01-15T10:00:00Z'
+    }
+
+def test_observation_uses_cached_tenant_role_clients(incidents_table, sample_incident, monkeypatch):
+    """Test incidents of other accounts are observed through assumed roles cached until expiry."""
+    import boto3
+    import agent
+    import ingestion
+    from datetime import datetime, timezone
+    from tenancy import TenantClients
+
+    expiration = datetime(2030, 1, 1, tzinfo=timezone.utc).timestamp()
+    now = [expiration - 3600]
+    sts = Mock()
+    sts.assume_role.side_effect = lambda **request: {'Credentials': {
+        'AccessKeyId': f'key-{sts.assume_role.call_count}', 'SecretAccessKey': 'secret', 'SessionToken': 'token',
+        'Expiration': datetime.fromtimestamp(now[0] + 3600, tz=timezone.utc)
+    }}
+    clients = TenantClients.from_env(
+        {'TENANT_HOME_ACCOUNT': '123456789012', 'TENANT_ROLE_NAME': 'ResiliBotTenant', 'TENANT_ROLE_ARNS': '{"333333333333": "arn:aws:iam::333333333333:role/Custom"}'},
+        sts=sts, clock=lambda: now[0]
+    )
+    monkeypatch.setattr(agent, 'tenant_clients', clients)
+    home_cloudwatch = Mock()
+    monkeypatch.setattr(agent, 'cloudwatch', home_cloudwatch)
+
+    # Ingestion records the account EventBridge delivered the alarm for as the tenant...
+    from incident_store import incident_key
+    monkeypatch.setattr(ingestion, 'table', incidents_table)
+    monkeypatch.setattr(ingestion, 'dynamodb', boto3.resource('dynamodb'))
+    monkeypatch.setattr(ingestion, 'lambda_client', Mock())
+    ingestion.handler({
+        'detail': {'alarmName': 'HighCPUAlarm', 'state': {'value': 'ALARM'}},
+        'region': 'eu-west-1', 'account': '111111111111'
+    }, None)
+    alarm = next(item for item in incidents_table.scan()['Items'] if item['sk'] == 'CURRENT')
+    assert alarm['tenantId'] == '111111111111'
+
+    # ...but never an account named by an API caller
+    body = {**sample_incident, 'incidentId': 'api-incident', 'tenantId': '111111111111', 'metadata': {'accountId': '111111111111'}}
+    assert ingestion.handler({'httpMethod': 'POST', 'path': '/incidents', 'body': json.dumps(body)}, None)['statusCode'] == 200
+    claimed = incidents_table.get_item(Key=incident_key('api-incident'))['Item']
+    assert claimed['tenantId'] == 'default'
+    assert clients.for_incident('cloudwatch', claimed, default=home_cloudwatch) is home_cloudwatch
+
+    incident = {**sample_incident, 'tenantId': alarm['tenantId'], 'metadata': alarm['metadata']}
+
+    agent.observe_metrics(incident)
+    agent.observe_metrics(incident)
+    remote = clients.for_incident('cloudwatch', incident)
+    assert remote.meta.region_name == 'eu-west-1'
+    assert remote._request_signer._credentials.access_key == 'key-1'
+    assert sts.assume_role.call_count == 1
+    assert sts.assume_role.call_args.kwargs['RoleArn'] == 'arn:aws:iam::111111111111:role/ResiliBotTenant'
+    home_cloudwatch.get_metric_statistics.assert_not_called()
+
+    # This account's incidents keep the function's own client
+    agent.observe_metrics({**sample_incident, 'metadata': {'accountId': '123456789012'}})
+    agent.observe_metrics(sample_incident)
+    assert home_cloudwatch.get_metric_statistics.call_count == 2
+    assert clients.role_arn('333333333333') == 'arn:aws:iam::333333333333:role/Custom'
+
+    # Credentials are assumed again shortly before they expire, and clients rebuilt with them
+    now[0] = expiration - 120
+    renewed = clients.for_incident('cloudwatch', incident)
+    assert renewed is not remote and renewed._request_signer._credentials.access_key == 'key-2'
+    assert clients.for_incident('cloudwatch', incident) is renewed
+
+if __name__ == '__main__':
+    pytest.main([__file__])
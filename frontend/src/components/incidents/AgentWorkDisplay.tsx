@@ -24,6 +24,7 @@ import {
 } from '@mui/icons-material';
 import { motion } from 'framer-motion';
 import type { Incident } from '@/types';
+import { useAppStore } from '@/store/useAppStore';
 
 interface AgentWorkDisplayProps {
   incident: Incident;
@@ -57,8 +58,17 @@ interface AgentAnalysis {
   status?: string;
   approvalRequested?: boolean;
   llmResponse?: string;
+  timings?: Record<string, PhaseTiming>;
 }
 
+// Per-phase breakdown stored by the agent: phase duration and time per external call
+interface PhaseTiming {
+  durationMs: number;
+  calls?: Record<string, number>;
+}
+
+const AGENT_PHASES = ['OBSERVE', 'REASON', 'PLAN', 'ACT', 'POSTMORTEM'];
+
 export const AgentWorkDisplay: React.FC<AgentWorkDisplayProps> = ({
   incident,
 }) => {
@@ -66,6 +76,7 @@ export const AgentWorkDisplay: React.FC<AgentWorkDisplayProps> = ({
   const [loading, setLoading] = useState(false);
   const [error, setError] = useState<string | null>(null);
   const [realTimeLog, setRealTimeLog] = useState<string[]>([]);
+  const realtimeConnected = useAppStore((state) => state.realtimeConnected);
 
   const updateRealTimeLog = useCallback((analysis: AgentAnalysis, incidentData?: Record<string, unknown>) => {
     const logs: string[] = [];
@@ -182,6 +193,7 @@ export const AgentWorkDisplay: React.FC<AgentWorkDisplayProps> = ({
         actionsTaken: incidentData.actionsTaken,
         status: incidentData.status || 'ANALYZING',
         approvalRequested: incidentData.approvalRequested,
+        timings: incidentData.timings,
         llmResponse: incidentData.diagnosis?.diagnosis || incidentData.llmResponse || 'Agent analysis in progress...'
       };
       
@@ -289,14 +301,18 @@ Implementing circuit breakers and auto-scaling policies to prevent future cascad
   }, [incident.id, incident.incidentId, incident.title, incident.createdAt, incident.severity, incident.source, incident.status, incident.updatedAt, updateRealTimeLog]);
 
   useEffect(() => {
-    // Initial load
+    // Initial load; pushed updates re-run this effect via the incident props
     fetchAgentAnalysis();
     
-    // Set up polling for real-time updates every 15 seconds
+    if (realtimeConnected) {
+      return;
+    }
+
+    // Fall back to polling every 15 seconds without a live connection
     const interval = setInterval(fetchAgentAnalysis, 15000);
     
     return () => clearInterval(interval);
-  }, [fetchAgentAnalysis]);
+  }, [fetchAgentAnalysis, realtimeConnected]);
 
   const getStatusColor = (status?: string) => {
     switch (status) {
@@ -511,6 +527,47 @@ Implementing circuit breakers and auto-scaling policies to prevent future cascad
             </Accordion>
           )}
 
+          {/* Phase Timings */}
+          {agentData.timings && Object.keys(agentData.timings).length > 0 && (
+            <Accordion>
+              <AccordionSummary expandIcon={<ExpandMore />}>
+                <Box sx={{ display: 'flex', alignItems: 'center', gap: 2 }}>
+                  <Timeline />
+                  <Typography variant="subtitle1">
+                    Phase Timings
+                  </Typography>
+                  <Chip 
+                    label={`${(Object.values(agentData.timings).reduce((total, timing) => total + timing.durationMs, 0) / 1000).toFixed(1)}s total`} 
+                    size="small" 
+                  />
+                </Box>
+              </AccordionSummary>
+              <AccordionDetails>
+                <Box sx={{ display: 'flex', flexDirection: 'column', gap: 1 }}>
+                  {AGENT_PHASES.filter((phase) => agentData.timings?.[phase]).map((phase) => {
+                    const timing = agentData.timings![phase];
+                    const calls = Object.entries(timing.calls || {}).sort(([, a], [, b]) => b - a);
+                    return (
+                      <Paper key={phase} sx={{ p: 2, bgcolor: 'grey.50' }}>
+                        <Box sx={{ display: 'flex', alignItems: 'center', gap: 2, mb: calls.length ? 1 : 0 }}>
+                          <Typography variant="body2" fontWeight="bold">
+                            {phase}
+                          </Typography>
+                          <Chip label={`${Math.round(timing.durationMs)} ms`} size="small" />
+                        </Box>
+                        {calls.map(([name, ms]) => (
+                          <Typography key={name} variant="caption" color="text.secondary" component="div">
+                            {name}: {Math.round(ms)} ms
+                          </Typography>
+                        ))}
+                      </Paper>
+                    );
+                  })}
+                </Box>
+              </AccordionDetails>
+            </Accordion>
+          )}
+
           {/* Approval Required */}
           {agentData.approvalRequested && agentData.status === 'PENDING_APPROVAL' && (
             <Alert severity="info" sx={{ mt: 2 }}>
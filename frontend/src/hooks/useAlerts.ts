@@ -1,6 +1,7 @@
 import { useQuery } from '@tanstack/react-query';
 import type { Alert } from '@/types';
 import { alertService } from '@/services/apiService';
+import { useAppStore } from '@/store/useAppStore';
 
 // Real API service calls - only return real data from API
 const fetchAlerts = async (): Promise<Alert[]> => {
@@ -13,10 +14,11 @@ const fetchAlerts = async (): Promise<Alert[]> => {
 };
 
 export const useAlerts = () => {
+  const realtimeConnected = useAppStore((state) => state.realtimeConnected);
   return useQuery({
     queryKey: ['alerts'],
     queryFn: fetchAlerts,
-    refetchInterval: 20000, // Refetch every 20 seconds
+    refetchInterval: realtimeConnected ? false : 20000, // Poll only without a live connection
     staleTime: 5000, // Consider data stale after 5 seconds
   });
 };
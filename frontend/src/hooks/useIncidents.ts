@@ -6,88 +6,90 @@ import type {
   IncidentSeverity,
 } from "@/types";
 import { incidentService } from "@/services/apiService";
+import { useAppStore } from "@/store/useAppStore";
+
+// Transform an incident from the API (or a cached one with pushed changes) to match our interface
+export const toIncident = (incident: Record<string, unknown>): Incident => {
+  // Parse tags - handle both array and string formats
+  let tags: string[] = [];
+  if (Array.isArray(incident.tags)) {
+    tags = incident.tags.map(String);
+  } else if (typeof incident.tags === "string") {
+    // Handle comma-separated string tags
+    tags = incident.tags
+      .split(",")
+      .map((t) => t.trim())
+      .filter(Boolean);
+  }
+
+  // Extract real tags from metadata if no tags field exists
+  if (tags.length === 0 && incident.metadata && typeof incident.metadata === 'object') {
+    const metadata = incident.metadata as Record<string, unknown>;
+    
+    // Extract service from metadata
+    if (metadata.service) {
+      tags.push(String(metadata.service));
+    }
+    
+    // Extract region from metadata
+    if (metadata.region) {
+      tags.push(String(metadata.region));
+    }
+    
+    // Extract affected services from metadata
+    if (Array.isArray(metadata.affectedServices)) {
+      metadata.affectedServices.slice(0, 3).forEach(service => {
+        tags.push(String(service));
+      });
+    }
+    
+    // Extract other useful metadata fields
+    if (metadata.testType) {
+      tags.push(String(metadata.testType));
+    }
+  }
+  
+  // If still no tags, use source as a tag (only if it's meaningful)
+  if (tags.length === 0) {
+    const source = String(incident.source || '').trim();
+    if (source && source !== 'manual' && source !== 'unknown' && source.length > 0) {
+      tags.push(source);
+    }
+  }
+
+  return {
+    id: String(incident.incidentId || incident.id || ""),
+    incidentId: String(incident.incidentId || incident.id || ""),
+    title: String(incident.title || "Untitled Incident"),
+    description: String(incident.description || ""),
+    status: (incident.status as IncidentStatus) || "OPEN",
+    priority: (incident.priority as IncidentPriority) || "MEDIUM",
+    severity: (incident.severity as IncidentSeverity) || "INFO",
+    createdAt: String(
+      incident.createdAt || incident.timestamp || new Date().toISOString()
+    ),
+    updatedAt: String(
+      incident.updatedAt || incident.timestamp || new Date().toISOString()
+    ),
+    resolvedAt: incident.resolvedAt
+      ? String(incident.resolvedAt)
+      : undefined,
+    duration: incident.duration ? Number(incident.duration) : undefined,
+    tags,
+    source: String(incident.source || "Unknown"),
+    metrics: incident.metrics || {},
+    aiAnalysis: incident.aiAnalysis,
+    actions: incident.actions || [],
+    assignee: incident.assignee,
+    postmortem: incident.postmortem,
+  };
+};
 
 // Real API service calls - only return real data from API
 const fetchIncidents = async (): Promise<Incident[]> => {
   try {
     const realIncidents = await incidentService.getIncidents();
-
-    // Transform the real API data to match our interface
-    return realIncidents.map((incident: Record<string, unknown>) => {
-      // Parse tags - handle both array and string formats
-      let tags: string[] = [];
-      if (Array.isArray(incident.tags)) {
-        tags = incident.tags.map(String);
-      } else if (typeof incident.tags === "string") {
-        // Handle comma-separated string tags
-        tags = incident.tags
-          .split(",")
-          .map((t) => t.trim())
-          .filter(Boolean);
-      }
-
-      // Extract real tags from metadata if no tags field exists
-      if (tags.length === 0 && incident.metadata && typeof incident.metadata === 'object') {
-        const metadata = incident.metadata as Record<string, unknown>;
-        
-        // Extract service from metadata
-        if (metadata.service) {
-          tags.push(String(metadata.service));
-        }
-        
-        // Extract region from metadata
-        if (metadata.region) {
-          tags.push(String(metadata.region));
-        }
-        
-        // Extract affected services from metadata
-        if (Array.isArray(metadata.affectedServices)) {
-          metadata.affectedServices.slice(0, 3).forEach(service => {
-            tags.push(String(service));
-          });
-        }
-        
-        // Extract other useful metadata fields
-        if (metadata.testType) {
-          tags.push(String(metadata.testType));
-        }
-      }
-      
-      // If still no tags, use source as a tag (only if it's meaningful)
-      if (tags.length === 0) {
-        const source = String(incident.source || '').trim();
-        if (source && source !== 'manual' && source !== 'unknown' && source.length > 0) {
-          tags.push(source);
-        }
-      }
-
-      return {
-        id: String(incident.incidentId || incident.id || ""),
-        incidentId: String(incident.incidentId || incident.id || ""),
-        title: String(incident.title || "Untitled Incident"),
-        description: String(incident.description || ""),
-        status: (incident.status as IncidentStatus) || "OPEN",
-        priority: (incident.priority as IncidentPriority) || "MEDIUM",
-        severity: (incident.severity as IncidentSeverity) || "INFO",
-        createdAt: String(
-          incident.createdAt || incident.timestamp || new Date().toISOString()
-        ),
-        updatedAt: String(
-          incident.updatedAt || incident.timestamp || new Date().toISOString()
-        ),
-        resolvedAt: incident.resolvedAt
-          ? String(incident.resolvedAt)
-          : undefined,
-        duration: incident.duration ? Number(incident.duration) : undefined,
-        tags,
-        source: String(incident.source || "Unknown"),
-        metrics: incident.metrics || {},
-        aiAnalysis: incident.aiAnalysis,
-        actions: incident.actions || [],
-        assignee: incident.assignee,
-        postmortem: incident.postmortem,
-      };
-    });
+    return realIncidents.map(toIncident);
   } catch (error) {
     console.error("Failed to fetch incidents:", error);
     throw new Error("Unable to fetch incidents from API");
@@ -95,10 +97,12 @@ const fetchIncidents = async (): Promise<Incident[]> => {
 };
 
 export const useIncidents = () => {
+  const realtimeConnected = useAppStore((state) => state.realtimeConnected);
   return useQuery({
     queryKey: ["incidents"],
     queryFn: fetchIncidents,
-    refetchInterval: 30000, // Refetch every 30 seconds
+    // Pushed deltas are merged into the cache; poll only without a live connection
+    refetchInterval: realtimeConnected ? false : 30000,
     staleTime: 10000, // Consider data stale after 10 seconds
     retry: 2,
     retryDelay: 1000,
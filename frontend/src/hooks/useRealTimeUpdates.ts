@@ -1,17 +1,163 @@
 import { useEffect } from 'react';
 import { useQueryClient } from '@tanstack/react-query';
+import type { Incident } from '@/types';
+import { toIncident } from '@/hooks/useIncidents';
 import { useAppStore } from '@/store/useAppStore';
+import { WS_CONFIG } from '@/constants';
+
+interface IncidentDelta {
+  type: 'incident.created' | 'incident.updated' | 'incident.removed';
+  incidentId: string;
+  changes?: Record<string, unknown>;
+  removed?: string[];
+  // Bulky attributes that changed but are not pushed
+  omitted?: string[];
+  // Set instead of the changes when they were too large to push
+  truncated?: boolean;
+}
+
+// Only connect when a realtime endpoint has been configured explicitly
+const REALTIME_URL = process.env.NEXT_PUBLIC_WS_URL;
+
+// Attributes the alerts and dashboard metrics are derived from
+const SUMMARY_FIELDS = ['status', 'severity', 'priority', 'title', 'description', 'source', 'createdAt'];
+
+// Apply a pushed update to a cached incident
+const mergeIncident = (incident: Incident, delta: IncidentDelta): Incident => {
+  const merged: Record<string, unknown> = { ...incident, ...delta.changes };
+  (delta.removed ?? []).forEach((name) => {
+    delete merged[name];
+  });
+  return toIncident(merged);
+};
+
+const changesSummaries = (delta: IncidentDelta) =>
+  delta.type !== 'incident.updated' ||
+  delta.truncated ||
+  SUMMARY_FIELDS.some((name) => (delta.changes && name in delta.changes) || delta.removed?.includes(name));
 
 export const useRealTimeUpdates = () => {
   const queryClient = useQueryClient();
-  const { addNotification } = useAppStore();
+  const { addNotification, setRealtimeConnected } = useAppStore();
+
+  useEffect(() => {
+    if (!REALTIME_URL) {
+      return;
+    }
+
+    const url: string = REALTIME_URL;
+    let socket: WebSocket | null = null;
+    let reconnectAttempts = 0;
+    let reconnectTimer: ReturnType<typeof setTimeout> | undefined;
+    let closed = false;
+
+    const applyDeltas = (deltas: IncidentDelta[]) => {
+      // Pushed changes are merged into the cache; only what it cannot apply is refetched
+      let unseen = false;
+      queryClient.setQueryData<Incident[]>(['incidents'], (incidents) => {
+        if (!incidents) {
+          return incidents;
+        }
+        let next = incidents;
+        deltas.forEach((delta) => {
+          const index = next.findIndex((incident) => incident.id === delta.incidentId);
+          if (delta.truncated) {
+            unseen = true;
+          } else if (delta.type === 'incident.removed') {
+            next = index >= 0 ? next.filter((_, i) => i !== index) : next;
+          } else if (index >= 0) {
+            next = next.map((incident, i) => (i === index ? mergeIncident(incident, delta) : incident));
+          } else if (delta.type === 'incident.created') {
+            next = [toIncident(delta.changes ?? {}), ...next];
+          } else {
+            // Changes to an incident the cached list does not hold
+            unseen = true;
+          }
+        });
+        return next;
+      });
+      if (unseen) {
+        queryClient.invalidateQueries({ queryKey: ['incidents'] });
+      }
+
+      deltas.forEach((delta) => {
+        const queryKey = ['incident', delta.incidentId];
+        const cached = queryClient.getQueryData<Incident | null>(queryKey);
+        if (cached === undefined) {
+          return;
+        }
+        if (delta.type === 'incident.removed') {
+          queryClient.setQueryData(queryKey, null);
+        } else if (delta.truncated || delta.omitted) {
+          // The detail view needs what the push left out
+          queryClient.invalidateQueries({ queryKey });
+        } else if (cached) {
+          queryClient.setQueryData(queryKey, mergeIncident(cached, delta));
+        } else if (delta.type === 'incident.created') {
+          queryClient.setQueryData(queryKey, toIncident(delta.changes ?? {}));
+        } else {
+          queryClient.invalidateQueries({ queryKey });
+        }
+      });
+
+      // Alerts and metrics are derived server-side; refetch them only when what they show changed
+      if (deltas.some(changesSummaries)) {
+        queryClient.invalidateQueries({ queryKey: ['system-metrics'] });
+        queryClient.invalidateQueries({ queryKey: ['alerts'] });
+      }
+    };
+
+    const connect = () => {
+      socket = new WebSocket(url);
+
+      socket.onopen = () => {
+        reconnectAttempts = 0;
+        socket?.send(JSON.stringify({ action: 'subscribe' }));
+        setRealtimeConnected(true);
+        // Changes made while disconnected were never pushed
+        queryClient.invalidateQueries({ queryKey: ['incidents'] });
+      };
+
+      socket.onmessage = (event) => {
+        try {
+          const message = JSON.parse(event.data);
+          if (message.type === 'incidents.delta' && Array.isArray(message.deltas)) {
+            applyDeltas(message.deltas);
+          }
+        } catch (error) {
+          console.error('Invalid realtime message:', error);
+        }
+      };
+
+      socket.onclose = () => {
+        setRealtimeConnected(false);
+        if (!closed && reconnectAttempts < WS_CONFIG.MAX_RECONNECT_ATTEMPTS) {
+          reconnectAttempts += 1;
+          reconnectTimer = setTimeout(connect, WS_CONFIG.RECONNECT_INTERVAL);
+        }
+      };
+    };
+
+    connect();
+
+    return () => {
+      closed = true;
+      clearTimeout(reconnectTimer);
+      socket?.close();
+      setRealtimeConnected(false);
+    };
+  }, [queryClient, setRealtimeConnected]);
 
   useEffect(() => {
-    // Set up polling for real-time updates
+    // Set up polling for real-time updates when no push connection is configured
+    if (REALTIME_URL) {
+      return;
+    }
+
     const interval = setInterval(() => {
       // Invalidate and refetch incidents data
       queryClient.invalidateQueries({ queryKey: ['incidents'] });
-      queryClient.invalidateQueries({ queryKey: ['metrics'] });
+      queryClient.invalidateQueries({ queryKey: ['system-metrics'] });
       queryClient.invalidateQueries({ queryKey: ['alerts'] });
     }, 15000); // Poll every 15 seconds
 
@@ -51,4 +197,4 @@ export const useRealTimeUpdates = () => {
 
     return () => clearInterval(notificationInterval);
   }, [addNotification]);
-};
\ No newline at end of file
+};
@@ -1,6 +1,7 @@
 import { useQuery } from '@tanstack/react-query';
 import type { SystemMetrics } from '@/types';
 import { metricsService } from '@/services/apiService';
+import { useAppStore } from '@/store/useAppStore';
 
 // Real API service calls - only return real data from API
 const fetchSystemMetrics = async (): Promise<SystemMetrics> => {
@@ -13,10 +14,11 @@ const fetchSystemMetrics = async (): Promise<SystemMetrics> => {
 };
 
 export const useSystemMetrics = () => {
+  const realtimeConnected = useAppStore((state) => state.realtimeConnected);
   return useQuery({
     queryKey: ['system-metrics'],
     queryFn: fetchSystemMetrics,
-    refetchInterval: 15000, // Refetch every 15 seconds
+    refetchInterval: realtimeConnected ? false : 15000, // Poll only without a live connection
     staleTime: 5000, // Consider data stale after 5 seconds
   });
 };
\ No newline at end of file
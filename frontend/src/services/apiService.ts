@@ -1,5 +1,5 @@
 import axios, { AxiosResponse } from "axios";
-import type { Incident, Alert, SystemMetrics, ApiResponse } from "@/types";
+import type { Incident, Alert, SystemMetrics, ApiResponse, IncidentStats, Postmortem, PostmortemSummary } from "@/types";
 import { API_CONFIG } from "@/constants";
 
 // Get API Gateway URL from environment
@@ -371,19 +371,46 @@ export const alertService = {
   },
 };
 
+export const statsService = {
+  // Get precomputed dashboard aggregates (O(1) regardless of incident history)
+  getStats: async (hours: number = 24): Promise<IncidentStats> => {
+    const response = await apiClient.get("/stats", { params: { hours } });
+    return response.data;
+  },
+};
+
+export const postmortemService = {
+  // List a month's postmortems (YYYY-MM) from the index manifest; no bucket listing
+  listPostmortems: async (month?: string): Promise<PostmortemSummary[]> => {
+    const response = await apiClient.get("/postmortems", { params: month ? { month } : {} });
+    return response.data.postmortems ?? [];
+  },
+
+  // Get one postmortem, read with a ranged fetch of its batch object
+  getPostmortem: async (incidentId: string): Promise<Postmortem | null> => {
+    try {
+      const response = await apiClient.get(`/incidents/${incidentId}/postmortem`);
+      return response.data;
+    } catch {
+      return null;
+    }
+  },
+};
+
 export const metricsService = {
-  // Get system metrics - calculate from real incidents data
+  // Get system metrics - from precomputed stats, or calculated from real incidents data
   getSystemMetrics: async (): Promise<SystemMetrics> => {
     try {
-      // Get real incidents data to calculate metrics
-      const incidents = await incidentService.getIncidents();
+      // Prefer the stats endpoint; fall back to deriving metrics from the incident list
+      const stats = await statsService.getStats().catch(() => null);
+      const incidents = stats ? [] : await incidentService.getIncidents();
 
       // Calculate real metrics from incidents
       const now = new Date();
       const dayAgo = new Date(now.getTime() - 24 * 60 * 60 * 1000);
 
-      const totalIncidents = incidents.length;
-      const activeIncidents = incidents.filter(
+      const totalIncidents = stats ? stats.total : incidents.length;
+      const activeIncidents = stats ? stats.active : incidents.filter(
         (i: Record<string, unknown>) =>
           i.status === "OPEN" ||
           i.status === "INVESTIGATING" ||
@@ -395,16 +422,18 @@ export const metricsService = {
         return incidentTime > dayAgo;
       });
 
-      const resolvedToday = todayIncidents.filter(
-        (i: Record<string, unknown>) => i.status === "RESOLVED" || i.status === "CLOSED"
-      ).length;
+      const resolvedToday = stats
+        ? stats.hourly.reduce((sum, bucket) => sum + bucket.resolved, 0)
+        : todayIncidents.filter(
+          (i: Record<string, unknown>) => i.status === "RESOLVED" || i.status === "CLOSED"
+        ).length;
 
       // Calculate average resolution time from resolved incidents
       const resolvedIncidents = incidents.filter(
         (i: Record<string, unknown>) => i.status === "RESOLVED" || i.status === "CLOSED"
       );
 
-      let avgResolutionTime = 0;
+      let avgResolutionTime = stats ? stats.mttr.averageSeconds : 0;
       if (resolvedIncidents.length > 0) {
         const totalResolutionTime = resolvedIncidents.reduce(
           (sum: number, incident: Record<string, unknown>) => {
@@ -429,10 +458,13 @@ export const metricsService = {
           return incidentTime >= hourStart && incidentTime < hourEnd;
         });
 
+        // Stats buckets line up with the 24 hours generated here, oldest first
+        const hourCount = stats ? (stats.hourly[i]?.created ?? 0) : hourIncidents.length;
+
         // Health decreases with more incidents
         let healthValue = 100;
-        if (hourIncidents.length > 0) {
-          healthValue = Math.max(20, 100 - hourIncidents.length * 15);
+        if (hourCount > 0) {
+          healthValue = Math.max(20, 100 - hourCount * 15);
         }
 
         // Add some variation for realism
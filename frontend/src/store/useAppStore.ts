@@ -17,6 +17,9 @@ interface AppState {
   // Loading states
   isLoading: boolean;
 
+  // Realtime push connection state
+  realtimeConnected: boolean;
+
   // Actions
   setUser: (user: User | null) => void;
   setAuthenticated: (authenticated: boolean) => void;
@@ -28,6 +31,7 @@ interface AppState {
   markNotificationAsRead: (id: string) => void;
   clearNotifications: () => void;
   setLoading: (loading: boolean) => void;
+  setRealtimeConnected: (connected: boolean) => void;
 }
 
 export const useAppStore = create<AppState>()(
@@ -41,6 +45,7 @@ export const useAppStore = create<AppState>()(
         sidebarOpen: false,
         notifications: [],
         isLoading: false,
+        realtimeConnected: false,
 
         // Actions
         setUser: (user) => set({ user, isAuthenticated: !!user }),
@@ -112,6 +117,8 @@ export const useAppStore = create<AppState>()(
         clearNotifications: () => set({ notifications: [] }),
 
         setLoading: (loading) => set({ isLoading: loading }),
+
+        setRealtimeConnected: (connected) => set({ realtimeConnected: connected }),
       }),
       {
         name: 'resilibot-storage',
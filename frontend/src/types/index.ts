@@ -109,6 +109,40 @@ export interface SystemMetrics {
   healthHistory: HealthDataPoint[];
 }
 
+export interface IncidentStatsBucket {
+  hour: string;
+  created: number;
+  resolved: number;
+  averageSeconds: number;
+  histogram: Record<string, number>;
+}
+
+export interface IncidentStats {
+  total: number;
+  active: number;
+  byStatus: Record<string, number>;
+  bySeverity: Record<string, number>;
+  mttr: {
+    resolved: number;
+    averageSeconds: number;
+    histogram: Record<string, number>;
+  };
+  hourly: IncidentStatsBucket[];
+}
+
+export interface PostmortemSummary {
+  incidentId: string;
+  title: string;
+  severity: string;
+  category?: string | null;
+  resolvedAt: string;
+  enriched: boolean;
+}
+
+export interface Postmortem extends PostmortemSummary {
+  markdown: string;
+}
+
 export interface SystemHealth {
   overall: 'HEALTHY' | 'WARNING' | 'CRITICAL';
   services: ServiceHealth[];
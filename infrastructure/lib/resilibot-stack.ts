@@ -3,22 +3,84 @@ import * as lambda from "aws-cdk-lib/aws-lambda";
 import * as dynamodb from "aws-cdk-lib/aws-dynamodb";
 import * as s3 from "aws-cdk-lib/aws-s3";
 import * as apigateway from "aws-cdk-lib/aws-apigateway";
+import * as apigatewayv2 from "aws-cdk-lib/aws-apigatewayv2";
+import * as apigatewayv2Integrations from "aws-cdk-lib/aws-apigatewayv2-integrations";
+import * as lambdaEventSources from "aws-cdk-lib/aws-lambda-event-sources";
 import * as events from "aws-cdk-lib/aws-events";
 import * as targets from "aws-cdk-lib/aws-events-targets";
 import * as iam from "aws-cdk-lib/aws-iam";
+import * as sqs from "aws-cdk-lib/aws-sqs";
+import * as sfn from "aws-cdk-lib/aws-stepfunctions";
+import * as tasks from "aws-cdk-lib/aws-stepfunctions-tasks";
 import { Construct } from "constructs";
 
 export class ResiliBotStack extends cdk.Stack {
   constructor(scope: Construct, id: string, props?: cdk.StackProps) {
     super(scope, id, props);
 
-    // DynamoDB Table for Incidents
-    const incidentsTable = new dynamodb.Table(this, "IncidentsTable", {
+    // Pre-single-table incidents table (incidentId + timestamp per version).
+    // Retained as the source for backend/migrations/migrate_to_single_table.py.
+    const legacyIncidentsTable = new dynamodb.Table(this, "IncidentsTable", {
       partitionKey: { name: "incidentId", type: dynamodb.AttributeType.STRING },
       sortKey: { name: "timestamp", type: dynamodb.AttributeType.NUMBER },
       billingMode: dynamodb.BillingMode.PAY_PER_REQUEST,
+      removalPolicy: cdk.RemovalPolicy.RETAIN,
+      pointInTimeRecovery: true,
+    });
+
+    // Single-table incident store: INCIDENT#<id> / CURRENT holds the current
+    // state, INCIDENT#<id> / EVENT#<version> the append-only history
+    const incidentsTable = new dynamodb.Table(this, "IncidentStoreTable", {
+      partitionKey: { name: "pk", type: dynamodb.AttributeType.STRING },
+      sortKey: { name: "sk", type: dynamodb.AttributeType.STRING },
+      billingMode: dynamodb.BillingMode.PAY_PER_REQUEST,
       removalPolicy: cdk.RemovalPolicy.DESTROY,
       pointInTimeRecovery: true,
+      stream: dynamodb.StreamViewType.NEW_AND_OLD_IMAGES,
+      // Set on finished incidents; expired items are moved to the S3 archive
+      timeToLiveAttribute: "expiresAt",
+    });
+
+    // Sparse index: only incidents in an active status carry gsi1pk
+    incidentsTable.addGlobalSecondaryIndex({
+      indexName: "byOpenSeverity",
+      partitionKey: { name: "gsi1pk", type: dynamodb.AttributeType.STRING },
+      sortKey: { name: "gsi1sk", type: dynamodb.AttributeType.STRING },
+      projectionType: dynamodb.ProjectionType.ALL,
+    });
+
+    // Incidents by last update, sharded over INCIDENTS#0..3
+    incidentsTable.addGlobalSecondaryIndex({
+      indexName: "byUpdated",
+      partitionKey: { name: "gsi2pk", type: dynamodb.AttributeType.STRING },
+      sortKey: { name: "gsi2sk", type: dynamodb.AttributeType.STRING },
+      projectionType: dynamodb.ProjectionType.ALL,
+    });
+
+    // Dashboard aggregates: GLOBAL counters plus HOUR#<yyyy-mm-ddThh> buckets
+    const statsTable = new dynamodb.Table(this, "StatsTable", {
+      partitionKey: { name: "statsKey", type: dynamodb.AttributeType.STRING },
+      billingMode: dynamodb.BillingMode.PAY_PER_REQUEST,
+      removalPolicy: cdk.RemovalPolicy.DESTROY,
+    });
+
+    // WebSocket subscriptions: one item per (topic, connection)
+    const connectionsTable = new dynamodb.Table(this, "ConnectionsTable", {
+      partitionKey: { name: "topic", type: dynamodb.AttributeType.STRING },
+      sortKey: { name: "connectionId", type: dynamodb.AttributeType.STRING },
+      billingMode: dynamodb.BillingMode.PAY_PER_REQUEST,
+      removalPolicy: cdk.RemovalPolicy.DESTROY,
+      timeToLiveAttribute: "expiresAt",
+    });
+
+    connectionsTable.addGlobalSecondaryIndex({
+      indexName: "byConnection",
+      partitionKey: {
+        name: "connectionId",
+        type: dynamodb.AttributeType.STRING,
+      },
+      sortKey: { name: "topic", type: dynamodb.AttributeType.STRING },
+      projectionType: dynamodb.ProjectionType.KEYS_ONLY,
     });
 
     // S3 Buckets
@@ -91,6 +153,27 @@ export class ResiliBotStack extends cdk.Stack {
       })
     );
 
+    // Tenancy: incidents of other accounts are observed and remediated through
+    // a role assumed in that account (TENANT_ROLE_NAME, or TENANT_ROLE_ARNS per account)
+    const tenantEnvironment = {
+      TENANT_HOME_ACCOUNT: this.account,
+      TENANT_ROLE_NAME: process.env.TENANT_ROLE_NAME || "",
+      TENANT_ROLE_ARNS: process.env.TENANT_ROLE_ARNS || "{}",
+      TENANT_EXTERNAL_ID: process.env.TENANT_EXTERNAL_ID || "",
+    };
+    // The tenant is only ever the account EventBridge delivered an alarm for;
+    // TENANT_ACCOUNTS additionally limits the role grant to the member accounts
+    const tenantAccounts = (process.env.TENANT_ACCOUNTS || "*").split(",").map((account) => account.trim()).filter(Boolean);
+    const tenantRoleArns = [
+      ...(process.env.TENANT_ROLE_NAME
+        ? tenantAccounts.map((account) => `arn:aws:iam::${account}:role/${process.env.TENANT_ROLE_NAME}`)
+        : []),
+      ...Object.values(JSON.parse(process.env.TENANT_ROLE_ARNS || "{}") as Record<string, string>),
+    ];
+    const tenantAssumeRolePolicy = tenantRoleArns.length
+      ? new iam.PolicyStatement({ actions: ["sts:AssumeRole"], resources: tenantRoleArns })
+      : undefined;
+
     // Ingestion Lambda
     const ingestionLambda = new lambda.Function(this, "IngestionLambda", {
       runtime: lambda.Runtime.PYTHON_3_11,
@@ -98,6 +181,10 @@ export class ResiliBotStack extends cdk.Stack {
       code: lambda.Code.fromAsset("../backend/functions/ingestion"),
       environment: {
         INCIDENTS_TABLE: incidentsTable.tableName,
+        STATS_TABLE: statsTable.tableName,
+        PROFILES_BUCKET: postmortemsBucket.bucketName,
+        APPROVAL_POLICY_BUCKET: runbooksBucket.bucketName,
+        APPROVAL_POLICY_KEY: "policies/approval-policy.json",
       },
       timeout: cdk.Duration.seconds(30),
       layers: [sharedLayer],
@@ -112,8 +199,16 @@ export class ResiliBotStack extends cdk.Stack {
     );
 
     incidentsTable.grantWriteData(ingestionLambda);
+    // Counters are also read for the approval policy's incident-rate rules
+    statsTable.grantReadWriteData(ingestionLambda);
+    runbooksBucket.grantRead(ingestionLambda, "policies/*");
+    // Opt-in profiles (PROFILE_MODE or an event "profile" field)
+    postmortemsBucket.grantPut(ingestionLambda, "profiles/*");
 
     // Agent Orchestrator Lambda
+    if (tenantAssumeRolePolicy) {
+      agentRole.addToPolicy(tenantAssumeRolePolicy);
+    }
     const agentLambda = new lambda.Function(this, "AgentLambda", {
       runtime: lambda.Runtime.PYTHON_3_11,
       handler: "agent.handler",
@@ -121,18 +216,77 @@ export class ResiliBotStack extends cdk.Stack {
       role: agentRole,
       environment: {
         INCIDENTS_TABLE: incidentsTable.tableName,
+        STATS_TABLE: statsTable.tableName,
         RUNBOOKS_BUCKET: runbooksBucket.bucketName,
         POSTMORTEMS_BUCKET: postmortemsBucket.bucketName,
+        PROFILES_BUCKET: postmortemsBucket.bucketName,
         BEDROCK_MODEL_ID: "anthropic.claude-3-sonnet-20240229-v1:0",
+        ARCHIVE_AFTER_DAYS: "30",
+        SLACK_SIGNING_SECRET: process.env.SLACK_SIGNING_SECRET || "",
+        ...tenantEnvironment,
       },
       timeout: cdk.Duration.minutes(5),
       memorySize: 1024,
       layers: [sharedLayer],
     });
 
+    // Agent state machine: runs one checkpointed phase per Lambda invocation
+    // (OBSERVE, REASON, PLAN, ACT, POSTMORTEM) until the agent reports done.
+    // The ARN is derived from a fixed name so the agent can reference it
+    // without a circular dependency.
+    const agentStateMachineName = `${this.stackName}-AgentPhases`;
+    const agentStateMachineArn = cdk.Arn.format(
+      {
+        service: "states",
+        resource: "stateMachine",
+        resourceName: agentStateMachineName,
+        arnFormat: cdk.ArnFormat.COLON_RESOURCE_NAME,
+      },
+      this
+    );
+
+    const runAgentPhase = new tasks.LambdaInvoke(this, "RunAgentPhase", {
+      lambdaFunction: agentLambda,
+      payload: sfn.TaskInput.fromObject({
+        action: "step",
+        "incidentId.$": "$.incidentId",
+      }),
+      payloadResponseOnly: true,
+    });
+    runAgentPhase.addRetry({
+      errors: ["States.ALL"],
+      interval: cdk.Duration.seconds(10),
+      maxAttempts: 3,
+      backoffRate: 2,
+    });
+
+    const agentStateMachine = new sfn.StateMachine(this, "AgentStateMachine", {
+      stateMachineName: agentStateMachineName,
+      definitionBody: sfn.DefinitionBody.fromChainable(
+        runAgentPhase.next(
+          new sfn.Choice(this, "AgentDone")
+            .when(
+              sfn.Condition.booleanEquals("$.done", true),
+              new sfn.Succeed(this, "AgentFinished")
+            )
+            .otherwise(runAgentPhase)
+        )
+      ),
+      timeout: cdk.Duration.hours(1),
+    });
+
+    agentLambda.addEnvironment("STATE_MACHINE_ARN", agentStateMachineArn);
+    agentRole.addToPolicy(
+      new iam.PolicyStatement({
+        actions: ["states:StartExecution"],
+        resources: [agentStateMachineArn],
+      })
+    );
+
     incidentsTable.grantReadWriteData(agentLambda);
+    statsTable.grantReadWriteData(agentLambda);
     runbooksBucket.grantRead(agentLambda);
-    postmortemsBucket.grantWrite(agentLambda);
+    postmortemsBucket.grantReadWrite(agentLambda);
 
     // Grant ingestion lambda permission to invoke agent lambda
     agentLambda.grantInvoke(ingestionLambda);
@@ -143,14 +297,76 @@ export class ResiliBotStack extends cdk.Stack {
       agentLambda.functionName
     );
 
+    // Priority scheduling: ingestion queues incidents per severity and the
+    // scheduler dispatches them into a bounded number of agent runs, with
+    // slots reserved for CRITICAL/HIGH (backend/layers/shared/python/priority_queue.py)
+    const agentQueueUrls: Record<string, string> = {};
+    const agentQueues = ["CRITICAL", "HIGH", "MEDIUM", "LOW"].map((priority) => {
+      const queue = new sqs.Queue(this, `AgentQueue${priority}`, {
+        retentionPeriod: cdk.Duration.days(4),
+        visibilityTimeout: cdk.Duration.seconds(60),
+      });
+      agentQueueUrls[priority] = queue.queueUrl;
+      return queue;
+    });
+
+    const schedulerLambda = new lambda.Function(this, "SchedulerLambda", {
+      runtime: lambda.Runtime.PYTHON_3_11,
+      handler: "scheduler.handler",
+      code: lambda.Code.fromAsset("../backend/functions/scheduler"),
+      environment: {
+        AGENT_LAMBDA_NAME: agentLambda.functionName,
+        AGENT_QUEUE_URLS: cdk.Stack.of(this).toJsonString(agentQueueUrls),
+        STATS_TABLE: statsTable.tableName,
+        AGENT_CAPACITY: "10",
+        AGENT_RESERVED_CAPACITY: "3",
+        AGENT_LEASE_SECONDS: "1800",
+        LOW_PRIORITY_SHED_AFTER_SECONDS: "3600",
+        // Slots one source account may hold; 0 leaves accounts unlimited
+        AGENT_TENANT_CAPACITY: process.env.AGENT_TENANT_CAPACITY || "0",
+      },
+      timeout: cdk.Duration.seconds(30),
+      // A single scheduler at a time keeps the slot accounting exact
+      reservedConcurrentExecutions: 1,
+      layers: [sharedLayer],
+    });
+
+    for (const queue of agentQueues) {
+      queue.grantSendMessages(ingestionLambda);
+      queue.grantConsumeMessages(schedulerLambda);
+    }
+    statsTable.grantReadWriteData(schedulerLambda);
+    agentLambda.grantInvoke(schedulerLambda);
+    schedulerLambda.grantInvoke(ingestionLambda);
+    schedulerLambda.addToRolePolicy(
+      new iam.PolicyStatement({
+        actions: ["cloudwatch:PutMetricData"],
+        resources: ["*"],
+        conditions: { StringEquals: { "cloudwatch:namespace": "ResiliBot/Scheduler" } },
+      })
+    );
+
+    // Picks up deferred work and slots freed by finished runs
+    new events.Rule(this, "SchedulerTick", {
+      schedule: events.Schedule.rate(cdk.Duration.minutes(1)),
+    }).addTarget(new targets.LambdaFunction(schedulerLambda));
+
+    ingestionLambda.addEnvironment("AGENT_QUEUE_URLS", cdk.Stack.of(this).toJsonString(agentQueueUrls));
+    ingestionLambda.addEnvironment("SCHEDULER_LAMBDA_NAME", schedulerLambda.functionName);
+    agentLambda.addEnvironment("AGENT_SCHEDULED", "true");
+
     // Tool Lambdas
     const ssmToolLambda = new lambda.Function(this, "SSMToolLambda", {
       runtime: lambda.Runtime.PYTHON_3_11,
       handler: "ssm_tool.handler",
       code: lambda.Code.fromAsset("../backend/functions/tools"),
+      environment: tenantEnvironment,
       timeout: cdk.Duration.minutes(2),
       layers: [sharedLayer],
     });
+    if (tenantAssumeRolePolicy) {
+      ssmToolLambda.addToRolePolicy(tenantAssumeRolePolicy);
+    }
 
     ssmToolLambda.addToRolePolicy(
       new iam.PolicyStatement({
@@ -169,11 +385,33 @@ export class ResiliBotStack extends cdk.Stack {
       code: lambda.Code.fromAsset("../backend/functions/tools"),
       environment: {
         SLACK_WEBHOOK_URL: process.env.SLACK_WEBHOOK_URL || "",
+        INCIDENTS_TABLE: incidentsTable.tableName,
+        PROFILES_BUCKET: postmortemsBucket.bucketName,
       },
       timeout: cdk.Duration.seconds(30),
       layers: [sharedLayer],
     });
 
+    // Jira ticket mapping and batched updates live on the incident record
+    incidentsTable.grantReadWriteData(notificationLambda);
+
+    // Delivers an incident back to the notification Lambda once its Jira
+    // update window has passed, so held updates are posted even when no
+    // later notification comes; failed flushes are retried for an hour
+    const jiraFlushQueue = new sqs.Queue(this, "JiraFlushQueue", {
+      retentionPeriod: cdk.Duration.hours(1),
+      visibilityTimeout: cdk.Duration.seconds(60),
+    });
+    jiraFlushQueue.grantSendMessages(notificationLambda);
+    notificationLambda.addEnvironment("JIRA_FLUSH_QUEUE_URL", jiraFlushQueue.queueUrl);
+    notificationLambda.addEventSource(
+      new lambdaEventSources.SqsEventSource(jiraFlushQueue, {
+        batchSize: 10,
+        reportBatchItemFailures: true,
+      })
+    );
+    postmortemsBucket.grantPut(notificationLambda, "profiles/*");
+
     // Grant agent lambda permission to invoke notification lambda
     notificationLambda.grantInvoke(agentLambda);
 
@@ -188,6 +426,7 @@ export class ResiliBotStack extends cdk.Stack {
       defaultCorsPreflightOptions: {
         allowOrigins: apigateway.Cors.ALL_ORIGINS,
         allowMethods: apigateway.Cors.ALL_METHODS,
+        allowHeaders: [...apigateway.Cors.DEFAULT_HEADERS, "If-None-Match"],
       },
     });
 
@@ -202,10 +441,174 @@ export class ResiliBotStack extends cdk.Stack {
     const incident = incidents.addResource("{incidentId}");
     incident.addMethod("GET", new apigateway.LambdaIntegration(agentLambda));
     
+    // Incident version history
+    const timeline = incident.addResource("timeline");
+    timeline.addMethod("GET", new apigateway.LambdaIntegration(agentLambda));
+
+    // Postmortem of a resolved incident, located through the monthly index
+    const incidentPostmortem = incident.addResource("postmortem");
+    incidentPostmortem.addMethod("GET", new apigateway.LambdaIntegration(agentLambda));
+
     // Add approval endpoint
     const approve = incident.addResource("approve");
     approve.addMethod("POST", new apigateway.LambdaIntegration(agentLambda));
 
+    // Slack interactivity request URL (Approve / Deny buttons)
+    const slack = api.root.addResource("slack");
+    const slackInteractions = slack.addResource("interactions");
+    slackInteractions.addMethod("POST", new apigateway.LambdaIntegration(agentLambda));
+
+    // Archived (expired) incidents
+    const archive = api.root.addResource("archive");
+    archive.addMethod("GET", new apigateway.LambdaIntegration(agentLambda));
+
+    // Postmortems of a month, from the index manifest
+    const postmortems = api.root.addResource("postmortems");
+    postmortems.addMethod("GET", new apigateway.LambdaIntegration(agentLambda));
+
+    // Dashboard aggregates
+    const stats = api.root.addResource("stats");
+    stats.addMethod("GET", new apigateway.LambdaIntegration(agentLambda));
+
+    // Realtime Lambda: WebSocket subscriptions and incident delta fan-out
+    const realtimeLambda = new lambda.Function(this, "RealtimeLambda", {
+      runtime: lambda.Runtime.PYTHON_3_11,
+      handler: "realtime.handler",
+      code: lambda.Code.fromAsset("../backend/functions/realtime"),
+      environment: {
+        CONNECTIONS_TABLE: connectionsTable.tableName,
+      },
+      timeout: cdk.Duration.seconds(30),
+      layers: [sharedLayer],
+    });
+
+    connectionsTable.grantReadWriteData(realtimeLambda);
+
+    const realtimeIntegration =
+      new apigatewayv2Integrations.WebSocketLambdaIntegration(
+        "RealtimeIntegration",
+        realtimeLambda
+      );
+
+    const webSocketApi = new apigatewayv2.WebSocketApi(
+      this,
+      "ResiliBotWebSocketAPI",
+      {
+        apiName: "ResiliBot Realtime API",
+        routeSelectionExpression: "$request.body.action",
+        connectRouteOptions: { integration: realtimeIntegration },
+        disconnectRouteOptions: { integration: realtimeIntegration },
+      }
+    );
+    webSocketApi.addRoute("subscribe", { integration: realtimeIntegration });
+    webSocketApi.addRoute("unsubscribe", { integration: realtimeIntegration });
+
+    const webSocketStage = new apigatewayv2.WebSocketStage(
+      this,
+      "ResiliBotWebSocketStage",
+      {
+        webSocketApi,
+        stageName: "prod",
+        autoDeploy: true,
+      }
+    );
+
+    realtimeLambda.addEnvironment(
+      "WEBSOCKET_CALLBACK_URL",
+      webSocketStage.callbackUrl
+    );
+    webSocketApi.grantManageConnections(realtimeLambda);
+
+    realtimeLambda.addEventSource(
+      new lambdaEventSources.DynamoEventSource(incidentsTable, {
+        startingPosition: lambda.StartingPosition.LATEST,
+        batchSize: 100,
+        maxBatchingWindow: cdk.Duration.seconds(1),
+        retryAttempts: 2,
+      })
+    );
+
+    // Archiver Lambda: moves TTL-expired incidents to archive/dt=<day>/ in S3
+    const archiverLambda = new lambda.Function(this, "ArchiverLambda", {
+      runtime: lambda.Runtime.PYTHON_3_11,
+      handler: "archiver.handler",
+      code: lambda.Code.fromAsset("../backend/functions/archiver"),
+      environment: {
+        INCIDENTS_TABLE: incidentsTable.tableName,
+        POSTMORTEMS_BUCKET: postmortemsBucket.bucketName,
+      },
+      timeout: cdk.Duration.minutes(1),
+      layers: [sharedLayer],
+    });
+
+    incidentsTable.grantReadWriteData(archiverLambda);
+    postmortemsBucket.grantWrite(archiverLambda);
+
+    archiverLambda.addEventSource(
+      new lambdaEventSources.DynamoEventSource(incidentsTable, {
+        startingPosition: lambda.StartingPosition.TRIM_HORIZON,
+        batchSize: 100,
+        maxBatchingWindow: cdk.Duration.seconds(30),
+        retryAttempts: 5,
+        // Only TTL deletions of current items reach the archiver
+        filters: [
+          lambda.FilterCriteria.filter({
+            eventName: lambda.FilterRule.isEqual("REMOVE"),
+            userIdentity: {
+              type: lambda.FilterRule.isEqual("Service"),
+              principalId: lambda.FilterRule.isEqual("dynamodb.amazonaws.com"),
+            },
+            dynamodb: { Keys: { sk: { S: lambda.FilterRule.isEqual("CURRENT") } } },
+          }),
+        ],
+      })
+    );
+
+    // Postmortem Lambda: writes postmortems off the agent's critical path,
+    // batched per stream read, with monthly index manifests for the dashboard
+    const postmortemLambda = new lambda.Function(this, "PostmortemLambda", {
+      runtime: lambda.Runtime.PYTHON_3_11,
+      handler: "postmortem.handler",
+      code: lambda.Code.fromAsset("../backend/functions/postmortem"),
+      environment: {
+        INCIDENTS_TABLE: incidentsTable.tableName,
+        POSTMORTEMS_BUCKET: postmortemsBucket.bucketName,
+        BEDROCK_MODEL_ID: "anthropic.claude-3-sonnet-20240229-v1:0",
+        POSTMORTEM_ENRICH: process.env.POSTMORTEM_ENRICH || "false",
+      },
+      timeout: cdk.Duration.minutes(2),
+      layers: [sharedLayer],
+    });
+
+    incidentsTable.grantReadData(postmortemLambda);
+    postmortemsBucket.grantReadWrite(postmortemLambda, "postmortems/*");
+    postmortemLambda.addToRolePolicy(
+      new iam.PolicyStatement({
+        actions: ["bedrock:InvokeModel"],
+        resources: ["*"],
+      })
+    );
+
+    postmortemLambda.addEventSource(
+      new lambdaEventSources.DynamoEventSource(incidentsTable, {
+        startingPosition: lambda.StartingPosition.TRIM_HORIZON,
+        batchSize: 100,
+        maxBatchingWindow: cdk.Duration.seconds(30),
+        retryAttempts: 5,
+        // Only transitions of current items into RESOLVED reach the postmortem Lambda
+        filters: [
+          lambda.FilterCriteria.filter({
+            eventName: lambda.FilterRule.isEqual("MODIFY"),
+            dynamodb: {
+              Keys: { sk: { S: lambda.FilterRule.isEqual("CURRENT") } },
+              NewImage: { status: { S: lambda.FilterRule.isEqual("RESOLVED") } },
+              OldImage: { status: { S: lambda.FilterRule.notEquals("RESOLVED") } },
+            },
+          }),
+        ],
+      })
+    );
+
     // EventBridge Rule for CloudWatch Alarms
     const alarmRule = new events.Rule(this, "AlarmRule", {
       eventPattern: {
@@ -227,11 +630,26 @@ export class ResiliBotStack extends cdk.Stack {
       description: "API Gateway endpoint URL",
     });
 
+    new cdk.CfnOutput(this, "WebSocketEndpoint", {
+      value: webSocketStage.url,
+      description: "WebSocket endpoint for realtime incident updates",
+    });
+
     new cdk.CfnOutput(this, "IncidentsTableName", {
       value: incidentsTable.tableName,
       description: "DynamoDB incidents table name",
     });
 
+    new cdk.CfnOutput(this, "AgentStateMachineArn", {
+      value: agentStateMachine.stateMachineArn,
+      description: "Step Functions state machine running the agent phases",
+    });
+
+    new cdk.CfnOutput(this, "LegacyIncidentsTableName", {
+      value: legacyIncidentsTable.tableName,
+      description: "Pre-migration incidents table (source for the migration tool)",
+    });
+
     new cdk.CfnOutput(this, "RunbooksBucketName", {
       value: runbooksBucket.bucketName,
       description: "S3 bucket for runbooks",